@@ -10,6 +10,10 @@ import asyncio
 from datetime import datetime, timezone
 from logger_config import logger
 from database import bots_collection, trades_collection
+from market_data_hub import market_data_hub
+from portfolio_summary import portfolio_summary
+from pnl_rollups import pnl_rollups
+from performance_ranker import performance_ranker
 
 
 class AdvancedOrderManager:
@@ -81,12 +85,14 @@ class AdvancedOrderManager:
                     if order['status'] != 'active':
                         continue
                     
-                    # Get current price
-                    from paper_trading_engine import paper_engine
-                    current_price = await paper_engine.get_real_price(
-                        order['pair'], 'luno'
+                    # Get current price from the shared snapshot (5s budget = loop cadence)
+                    current_price = await market_data_hub.get_price(
+                        order['pair'], 'luno', max_age=5
                     )
                     
+                    if not current_price:
+                        continue
+                    
                     executed = False
                     
                     if order['type'] == 'stop_loss':
@@ -142,10 +148,13 @@ class AdvancedOrderManager:
                 "price": price,
                 "pnl": 0,  # Calculate based on position
                 "reason": reason,
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": datetime.now(timezone.utc)
             }
             
             await trades_collection.insert_one(trade)
+            await portfolio_summary.record_trade(trade)
+            await pnl_rollups.record_trade(trade)
+            performance_ranker.invalidate(trade.get('user_id'))
             order['status'] = 'executed'
             
             logger.info(f"Order executed: {order['type']} for {order['pair']} at R{price:.2f}")
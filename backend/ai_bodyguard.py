@@ -9,7 +9,6 @@ AI Bodyguard - Continuous System Monitoring
 
 import asyncio
 from datetime import datetime, timezone, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 
@@ -22,11 +21,9 @@ class AIBodyguard:
         self.check_interval = 300  # 5 minutes in seconds
         
     async def init_db(self):
-        """Initialize database connection"""
-        mongo_url = os.getenv('MONGO_URL', 'mongodb://localhost:27017')
-        db_name = os.getenv('DB_NAME', 'amarktai_trading')
-        client = AsyncIOMotorClient(mongo_url)
-        self.db = client[db_name]
+        """Use the process-wide database client (see db_pool)"""
+        from database import db
+        self.db = db
         
     async def start(self):
         """Start continuous monitoring"""
@@ -86,7 +83,7 @@ class AIBodyguard:
         """Detect extreme drawdowns (>15% in 1 hour)"""
         try:
             # Get trades from last hour
-            one_hour_ago = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+            one_hour_ago = (datetime.now(timezone.utc) - timedelta(hours=1))
             
             recent_trades = await self.db.trades.find({
                 'bot_id': bot_id,
@@ -157,7 +154,7 @@ class AIBodyguard:
                 logger.warning(f"Bot {bot_id}: Suspicious pattern - consecutive losses")
                 
             # Pattern 2: Extremely high trade frequency (> 100 trades/hour)
-            one_hour_ago = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+            one_hour_ago = (datetime.now(timezone.utc) - timedelta(hours=1))
             hourly_trades = await self.db.trades.count_documents({
                 'bot_id': bot_id,
                 'timestamp': {'$gte': one_hour_ago}
@@ -204,7 +201,7 @@ class AIBodyguard:
             # Check daily loss limit
             max_daily_loss = float(os.getenv('MAX_DAILY_LOSS_PERCENT', 5))
             
-            today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0).isoformat()
+            today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)
             
             today_trades = await self.db.trades.find({
                 'user_id': user_id,
@@ -263,7 +260,7 @@ class AIBodyguard:
                 'type': 'bodyguard',
                 'severity': severity,
                 'message': message,
-                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'timestamp': datetime.now(timezone.utc),
                 'dismissed': False
             }
             
@@ -35,7 +35,7 @@ class AIChatHandler:
             
             # Get today's trades
             from datetime import datetime, timezone as tz
-            today_start = datetime.now(tz.utc).replace(hour=0, minute=0, second=0).isoformat()
+            today_start = datetime.now(tz.utc).replace(hour=0, minute=0, second=0)
             trades_today = await trades_collection.count_documents({
                 "user_id": user_id,
                 "timestamp": {"$gte": today_start}
@@ -17,6 +17,7 @@ logger = logging.getLogger(__name__)
 class AIScheduler:
     def __init__(self):
         self.is_running = False
+        self.task = None
         self.last_run = None
     
     async def run_nightly_ai_cycle(self):
@@ -103,11 +104,14 @@ class AIScheduler:
     
     async def start(self):
         """Start the scheduler"""
-        asyncio.create_task(self.schedule_loop())
+        self.task = asyncio.create_task(self.schedule_loop())
     
     def stop(self):
         """Stop the scheduler"""
         self.is_running = False
+        if self.task:
+            self.task.cancel()
+            self.task = None
 
 # Global instance
 ai_scheduler = AIScheduler()
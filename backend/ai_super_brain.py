@@ -9,7 +9,8 @@ AI Super-Brain
 import asyncio
 from datetime import datetime, timezone, timedelta
 from logger_config import logger
-from database import trades_collection, bots_collection
+from database import bots_collection
+from pnl_rollups import pnl_rollups
 import os
 
 
@@ -50,13 +51,9 @@ class AISuperBrain:
     
     async def _gather_trading_data(self, user_id: str) -> dict:
         """Gather trading data for analysis"""
-        # Get last 7 days of trades
-        seven_days_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
-        
-        trades = await trades_collection.find({
-            "user_id": user_id,
-            "timestamp": {"$gte": seven_days_ago}
-        }, {"_id": 0}).to_list(10000)
+        # Last 7 days of hourly P&L buckets (at most 168 documents)
+        seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
+        buckets = await pnl_rollups.get_buckets(user_id, "hour", since=seven_days_ago)
         
         bots = await bots_collection.find(
             {"user_id": user_id, "status": "active"},
@@ -64,55 +61,38 @@ class AISuperBrain:
         ).to_list(1000)
         
         return {
-            "trades": trades,
+            "buckets": buckets,
             "bots": bots,
             "period": "7_days"
         }
     
     async def _analyze_patterns(self, data: dict) -> dict:
         """Analyze trading patterns"""
-        trades = data['trades']
+        buckets = data['buckets']
+        totals = pnl_rollups.summarize(buckets)
         
-        if not trades:
+        if not totals['trades']:
             return {"no_data": True}
         
-        # Winning patterns
-        winning_trades = [t for t in trades if t.get('pnl', 0) > 0]
-        losing_trades = [t for t in trades if t.get('pnl', 0) < 0]
-        
         # By pair
-        pair_performance = {}
-        for trade in trades:
-            pair = trade.get('pair', 'BTC/ZAR')
-            if pair not in pair_performance:
-                pair_performance[pair] = {'wins': 0, 'losses': 0, 'total_pnl': 0}
-            
-            if trade.get('pnl', 0) > 0:
-                pair_performance[pair]['wins'] += 1
-            else:
-                pair_performance[pair]['losses'] += 1
-            
-            pair_performance[pair]['total_pnl'] += trade.get('pnl', 0)
+        pair_performance = {
+            pair: {'wins': p['wins'], 'losses': p['trades'] - p['wins'], 'total_pnl': p['pnl']}
+            for pair, p in totals['pairs'].items()
+        }
         
         # By time of day
         hour_performance = {}
-        for trade in trades:
-            try:
-                ts = datetime.fromisoformat(trade.get('timestamp', ''))
-                hour = ts.hour
-                if hour not in hour_performance:
-                    hour_performance[hour] = {'wins': 0, 'losses': 0}
-                
-                if trade.get('pnl', 0) > 0:
-                    hour_performance[hour]['wins'] += 1
-                else:
-                    hour_performance[hour]['losses'] += 1
-            except:
-                pass
+        for bucket in buckets:
+            hour = bucket['bucket_start'].hour
+            if hour not in hour_performance:
+                hour_performance[hour] = {'wins': 0, 'losses': 0}
+            
+            hour_performance[hour]['wins'] += bucket.get('wins', 0)
+            hour_performance[hour]['losses'] += bucket.get('trades', 0) - bucket.get('wins', 0)
         
         return {
-            "total_trades": len(trades),
-            "win_rate": (len(winning_trades) / len(trades)) * 100 if trades else 0,
+            "total_trades": totals['trades'],
+            "win_rate": (totals['wins'] / totals['trades']) * 100,
             "best_pair": max(pair_performance.items(), key=lambda x: x[1]['total_pnl'])[0] if pair_performance else None,
             "worst_pair": min(pair_performance.items(), key=lambda x: x[1]['total_pnl'])[0] if pair_performance else None,
             "pair_performance": pair_performance,
@@ -9,7 +9,6 @@ Autopilot Engine - Autonomous Bot Management
 import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from datetime import datetime, timezone, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 
@@ -22,11 +21,9 @@ class AutopilotEngine:
         self.running = False
         
     async def init_db(self):
-        """Initialize database connection"""
-        mongo_url = os.getenv('MONGO_URL', 'mongodb://localhost:27017')
-        db_name = os.getenv('DB_NAME', 'amarktai_trading')
-        client = AsyncIOMotorClient(mongo_url)
-        self.db = client[db_name]
+        """Use the process-wide database client (see db_pool)"""
+        from database import db
+        self.db = db
         
     async def start(self):
         """Start the autopilot engine"""
@@ -40,7 +37,8 @@ class AutopilotEngine:
             hour=23,
             minute=59,
             timezone='UTC',
-            id='daily_reinvestment'
+            id='daily_reinvestment',
+            replace_existing=True  # Safe to restart after a leader hand-over
         )
         
         # Check paper bot promotions every hour
@@ -48,7 +46,8 @@ class AutopilotEngine:
             self.check_paper_bot_promotions,
             trigger='interval',
             hours=1,
-            id='paper_bot_check'
+            id='paper_bot_check',
+            replace_existing=True  # Safe to restart after a leader hand-over
         )
         
         # Autopilot strategy optimization every 6 hours
@@ -56,7 +55,8 @@ class AutopilotEngine:
             self.optimize_strategies,
             trigger='interval',
             hours=6,
-            id='strategy_optimization'
+            id='strategy_optimization',
+            replace_existing=True  # Safe to restart after a leader hand-over
         )
         
         self.scheduler.start()
@@ -110,7 +110,7 @@ class AutopilotEngine:
                     'type': 'autopilot',
                     'severity': 'low',
                     'message': f'Daily reinvestment complete. Profit: R{total_profit:.2f}',
-                    'timestamp': datetime.now(timezone.utc).isoformat(),
+                    'timestamp': datetime.now(timezone.utc),
                     'dismissed': False
                 })
                 
@@ -247,7 +247,7 @@ class AutopilotEngine:
                 'type': 'autopilot',
                 'severity': 'medium',
                 'message': f"🎉 Bot '{bot['name']}' promoted to LIVE trading! Win rate: {bot['win_rate']}%",
-                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'timestamp': datetime.now(timezone.utc),
                 'dismissed': False
             })
             
@@ -0,0 +1,145 @@
+"""
+Background Engines - the singleton trading and autonomous loops
+- Started only by the process holding the leader lease (see leader_election)
+- Stopped cleanly on demotion or shutdown so another process can take over
+"""
+
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundEngines:
+    """Starts/stops every loop that must run exactly once across all workers"""
+
+    def __init__(self):
+        self.is_running = False
+        self.tasks = []  # Loops that have no task handle of their own
+
+    async def start(self):
+        """Start all autonomous systems"""
+        if self.is_running:
+            return
+        self.is_running = True
+
+        from autopilot_engine import autopilot
+        await autopilot.start()
+        logger.info("🤖 Autopilot Engine started")
+
+        from ai_bodyguard import bodyguard
+        self.tasks.append(asyncio.create_task(bodyguard.start()))
+        logger.info("🛡️ AI Bodyguard activated")
+
+        from self_learning import learning_system
+        await learning_system.init_db()
+        logger.info("📚 Self-Learning System initialized")
+
+        # Start NEW Autonomous Scheduler
+        from autonomous_scheduler import autonomous_scheduler
+        await autonomous_scheduler.start()
+        logger.info("🤖 Autonomous Scheduler started (lifecycle, capital, regime)")
+
+        # Start Self-Healing System
+        from self_healing import self_healing
+        await self_healing.start()
+        logger.info("🏥 Self-Healing System started")
+
+        # Batched trade/bot writes for the paper trading engine
+        from write_behind import write_behind
+        await write_behind.start()
+
+        # Keep the local candle history current (any worker can still sync on demand)
+        from candle_store import candle_store
+        await candle_store.start()
+
+        # Start Paper Trading Scheduler
+        from trading_scheduler import trading_scheduler
+        trading_scheduler.start()
+        logger.info("💹 Paper Trading Scheduler started - event-driven dispatch")
+
+        # Start wallet balance monitor
+        try:
+            from jobs.wallet_balance_monitor import wallet_balance_monitor
+            wallet_balance_monitor.start()
+            logger.info("✅ Wallet balance monitor started")
+        except Exception as e:
+            logger.warning(f"Could not start wallet monitor: {e}")
+
+        # Start AI Backend Scheduler (nightly at 2 AM)
+        from ai_scheduler import ai_scheduler
+        await ai_scheduler.start()
+        logger.info("🧠 AI Backend Scheduler started - runs nightly at 2 AM (promotions, rankings, evolution)")
+
+        # Start AI Memory Manager (archives old chats, cleans up after 6 months)
+        from ai_memory_manager import memory_manager
+        self.tasks.append(asyncio.create_task(memory_manager.run_maintenance()))
+        logger.info("💾 AI Memory Manager started - archives 30-day old chats, deletes 6-month old archives")
+
+        # Start Production Trading Engine
+        from engines.trading_engine_production import trading_engine
+        trading_engine.start()
+        logger.info("💹 Production Trading Engine started - 50 trades/day limit, 25-30 min cooldown")
+
+        # Start Production Autopilot (R500 reinvestment, auto-spawn, rebalancing)
+        from engines.autopilot_production import autopilot_production
+        autopilot_production.start()
+        logger.info("🤖 Production Autopilot started - R500 reinvestment, auto-spawn, intelligent rebalancing")
+
+        # Start Risk Management (Stop Loss, Take Profit, Trailing Stop)
+        from engines.risk_management import risk_management
+        risk_management.start()
+        logger.info("🎯 Risk Management started - Stop Loss, Take Profit, Trailing Stop active")
+
+        # Start Self-Healing System
+        from engines.self_healing import self_healing as engine_self_healing
+        engine_self_healing.start()
+        logger.info("🛡️ Self-Healing System started - rogue bot detection every 30 min")
+
+        logger.info(f"🚀 Background engines running in process {os.getpid()}")
+
+    async def stop(self):
+        """Stop all autonomous systems (each one independently)"""
+        if not self.is_running:
+            return
+        self.is_running = False
+
+        from autopilot_engine import autopilot
+        from ai_bodyguard import bodyguard
+        from autonomous_scheduler import autonomous_scheduler
+        from self_healing import self_healing
+        from trading_scheduler import trading_scheduler
+        from jobs.wallet_balance_monitor import wallet_balance_monitor
+        from ai_scheduler import ai_scheduler
+        from engines.trading_engine_production import trading_engine
+        from engines.autopilot_production import autopilot_production
+        from engines.risk_management import risk_management
+        from engines.self_healing import self_healing as engine_self_healing
+        from write_behind import write_behind
+        from candle_store import candle_store
+
+        stoppers = [
+            autopilot.stop, bodyguard.stop, autonomous_scheduler.stop, self_healing.stop,
+            trading_scheduler.stop, wallet_balance_monitor.stop, ai_scheduler.stop,
+            trading_engine.stop, autopilot_production.stop, risk_management.stop,
+            engine_self_healing.stop, candle_store.stop,
+            write_behind.stop  # Last: drains writes from the loops stopped above
+        ]
+        for stop in stoppers:
+            try:
+                result = stop()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Background engine stop error: {e}")
+
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+        logger.info("🔴 Background engines stopped")
+
+
+# Global instance
+background_engines = BackgroundEngines()
@@ -1,168 +1,558 @@
 """
 Backtesting Engine
-- Test strategies on historical data
-- Performance simulation
-- Strategy optimization
+- Replays stored OHLCV candles (candle_store) through the paper engine's rules:
+  5-vs-10 candle trend entry, risk-mode position sizing, taker fees both ways,
+  slippage tiers and the minimum-profit threshold
+- Signals, stop-loss/take-profit exits and trade returns are computed for all
+  candles at once with NumPy; only the trades taken are walked in order
+  (compounding and the capital-dependent slippage/threshold rules)
+- The AI sources and the simulated order rejections/latency of live paper trades
+  have no history, so replays use the trend alone and are deterministic
+- Strategy optimization: grid, random or bayesian (optuna, optional) sweeps on a
+  process pool, optionally walk-forward; workers memory-map the same candle files
+  (no copies), and results are stored in Mongo so repeated sweeps only run new points
 """
 
 import asyncio
-from datetime import datetime, timezone, timedelta
-from logger_config import logger
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from logger_config import logger
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pymongo.errors import BulkWriteError
+
+from config import POSITION_SIZES, MIN_TRADE_PROFIT_THRESHOLD_ZAR, BACKTEST_WORKERS, BACKTEST_CHUNK_SIZE, BACKTEST_MAX_POINTS
+from exchange_limits import get_fee_rate
+from indicators import trend_change_pct
+
+try:
+    import optuna  # Optional: bayesian (TPE) sweeps
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+except ImportError:
+    optuna = None
+
+RECENT_CANDLES = 5   # PaperTradingEngine.analyze_trend: last 5 closes ...
+OLDER_CANDLES = 10   # ... against the 10 before them
+
+DEFAULT_STRATEGY = {
+    "exchange": "luno",
+    "pair": "BTC/ZAR",
+    "timeframe": "5m",
+    "risk_mode": "safe",
+    "position_size": None,  # None = POSITION_SIZES[risk_mode]
+    "trend_threshold_pct": 0.4,  # analyze_trend's bullish threshold
+    "hold_candles": 6,
+    "cooldown_candles": 0,  # Candles to wait after an exit
+    "stop_loss_pct": 2.0,  # engines.risk_management defaults
+    "take_profit_pct": 5.0
+}
+
+
+# Swept by default: 5 x 3 x 3 x 3 x 3 = 405 grid points
+SEARCH_SPACE = {
+    "position_size": [0.1, 0.2, 0.3, 0.4, 0.5],
+    "stop_loss_pct": [1.0, 2.0, 3.0],
+    "take_profit_pct": [2.0, 5.0, 8.0],
+    "cooldown_candles": [0, 3, 12],
+    "trend_threshold_pct": [0.2, 0.4, 0.8],
+}
+OBJECTIVES = ("total_return", "sharpe_ratio", "profit_factor")
+REPLAY_VERSION = 1  # Bump when replay() rules change so stored sweep results are not reused
+
+
+def _to_ms(date: str) -> int:
+    parsed = datetime.fromisoformat(date)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def _no_trades() -> dict:
+    """replay() result of a window with no trades"""
+    empty = np.array([], dtype=np.float64)
+    return {
+        "entry_index": np.array([], dtype=np.int64),
+        "exit_index": np.array([], dtype=np.int64),
+        "entry_price": empty,
+        "exit_price": empty,
+        "exit_reason": np.array([], dtype=str),
+        "trade_amount": empty,
+        "fees": empty,
+        "slippage_cost": empty,
+        "pnl": empty,
+        "skipped": 0
+    }
+
+
+def replay(candles, params: dict, capital: float) -> dict:
+    """Run one strategy over a CandleSeries; returns per-trade arrays (taken trades only)"""
+    params = {**DEFAULT_STRATEGY, **params}
+    hold = max(int(params["hold_candles"]), 1)
+    cooldown = max(int(params["cooldown_candles"]), 0)
+    stop_loss = params["stop_loss_pct"] / 100
+    take_profit = params["take_profit_pct"] / 100
+    opens, highs = np.asarray(candles.open), np.asarray(candles.high)
+    lows, closes = np.asarray(candles.low), np.asarray(candles.close)
+    if len(closes) < RECENT_CANDLES + OLDER_CANDLES + hold:
+        return _no_trades()  # Window too short for a signal and a full hold (e.g. a short walk-forward fold)
+
+    # Bullish signal at the close of candle i, entry at the open of i + 1
+    i = np.arange(RECENT_CANDLES + OLDER_CANDLES - 1, len(closes) - hold)
+    change_pct = trend_change_pct(closes, RECENT_CANDLES, OLDER_CANDLES)[i]
+    entry = i[change_pct > params["trend_threshold_pct"]] + 1
+
+    # First stop or target inside the holding window (the stop wins a shared candle)
+    entry_price = opens[entry]
+    stop, target = entry_price * (1 - stop_loss), entry_price * (1 + take_profit)
+    hit_stop = sliding_window_view(lows, hold)[entry] <= stop[:, None]
+    hit_target = sliding_window_view(highs, hold)[entry] >= target[:, None]
+    first_stop = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1), hold)
+    first_target = np.where(hit_target.any(axis=1), hit_target.argmax(axis=1), hold)
+    stopped = first_stop <= first_target
+    stopped &= first_stop < hold
+    targeted = ~stopped & (first_target < hold)
+    offset = np.where(stopped, first_stop, np.where(targeted, first_target, hold - 1))
+    exit_index = entry + offset
+    gap_open = opens[exit_index]  # Gaps through a level fill at the open
+    exit_price = np.where(stopped, np.minimum(stop, gap_open),
+                          np.where(targeted, np.maximum(target, gap_open), closes[exit_index]))
+    returns = exit_price / entry_price - 1
+
+    # One position at a time: the next entry comes after the previous exit (and cooldown)
+    taken = []
+    k = 0
+    while k < len(entry):
+        taken.append(k)
+        k = int(np.searchsorted(entry, exit_index[k] + cooldown, side="right"))
+    taken = np.asarray(taken, dtype=np.int64)
+
+    # Compounding with the paper engine's sizing, fees, slippage and threshold
+    size = params["position_size"] or POSITION_SIZES.get(params["risk_mode"], 0.20)
+    fee_rate = get_fee_rate(params["exchange"], 'taker')
+    amounts, fees, slippage, pnl, kept = [], [], [], [], []
+    for k, ret in zip(taken.tolist(), returns[taken].tolist()):
+        amount = capital * size
+        slip = 0.002 if amount > 5000 else 0.001
+        if abs(ret) * 100 > 2:
+            slip *= 1.5
+        net = amount * ret - amount * fee_rate * 2 - amount * slip
+        if 0 < net < MIN_TRADE_PROFIT_THRESHOLD_ZAR:
+            continue  # Skipped like a live trade below the threshold
+        capital += net
+        kept.append(k)
+        amounts.append(amount)
+        fees.append(amount * fee_rate * 2)
+        slippage.append(amount * slip)
+        pnl.append(net)
+
+    kept = np.asarray(kept, dtype=np.int64)
+    return {
+        "entry_index": entry[kept],
+        "exit_index": exit_index[kept],
+        "entry_price": entry_price[kept],
+        "exit_price": exit_price[kept],
+        "exit_reason": np.where(stopped[kept], "stop_loss", np.where(targeted[kept], "take_profit", "time")),
+        "trade_amount": np.asarray(amounts),
+        "fees": np.asarray(fees),
+        "slippage_cost": np.asarray(slippage),
+        "pnl": np.asarray(pnl),
+        "skipped": len(taken) - len(kept)
+    }
+
+
+def grid_points(space: dict) -> List[dict]:
+    """Every combination of the listed values"""
+    for name, values in space.items():
+        if not isinstance(values, list):
+            raise ValueError(f"Grid search needs a list of values for {name}")
+    names = list(space)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(space[n] for n in names))]
+
+
+def sweep_size(search: str, space: dict, samples: int) -> int:
+    """Points a sweep evaluates per window, without building the grid"""
+    if search != "grid":
+        return int(samples)
+    for name, values in space.items():
+        if not isinstance(values, list):
+            raise ValueError(f"Grid search needs a list of values for {name}")
+    return math.prod(len(values) for values in space.values())
+
+
+def check_sweep_size(search: str, space: Optional[dict], samples: int):
+    """ValueError above BACKTEST_MAX_POINTS (the pool is shared by every user)"""
+    points = sweep_size(search, space or SEARCH_SPACE, samples)
+    if points > BACKTEST_MAX_POINTS:
+        raise ValueError(f"Sweep of {points} points exceeds the limit of {BACKTEST_MAX_POINTS}")
+
+
+def random_points(space: dict, samples: int, rng: random.Random) -> List[dict]:
+    """Distinct random points: lists are sampled, {"min", "max"} ranges drawn uniformly"""
+    points = {}
+    for _ in range(samples * 20):
+        if len(points) >= samples:
+            break
+        point = {
+            name: rng.choice(values) if isinstance(values, list)
+            else round(rng.uniform(values["min"], values["max"]), 4)
+            for name, values in space.items()
+        }
+        points.setdefault(json.dumps(point, sort_keys=True), point)
+    return list(points.values())
+
+
+def _suggest(trial, space: dict) -> dict:
+    """optuna trial (or the study's best FrozenTrial) -> parameter point"""
+    return {
+        name: trial.suggest_categorical(name, values) if isinstance(values, list)
+        else trial.suggest_float(name, values["min"], values["max"])
+        for name, values in space.items()
+    }
+
+
+def _score(metrics: dict, objective: str) -> float:
+    return metrics.get(objective, float("-inf")) if metrics else float("-inf")
+
+
+def walk_forward_windows(start_ms: int, end_ms: int, train_days: Optional[float],
+                         test_days: Optional[float]) -> List[tuple]:
+    """[(train, test)] windows rolled forward by test_days; a single (period, None) without them"""
+    if not train_days or not test_days:
+        return [((start_ms, end_ms), None)]
+    train, test = int(train_days * 86_400_000), int(test_days * 86_400_000)
+    windows = []
+    cursor = start_ms
+    while cursor + train + test <= end_ms:
+        windows.append(((cursor, cursor + train), (cursor + train, cursor + train + test)))
+        cursor += test
+    return windows
+
+
+def _window_dates(window: tuple) -> dict:
+    start, end = (datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat() for ms in window)
+    return {"start": start, "end": end}
+
+
+def _point_key(params: dict, window: tuple, fingerprint: list, capital: float) -> str:
+    """Stable id of one replay: same rules, candles, window, capital and parameters"""
+    raw = json.dumps([REPLAY_VERSION, params, list(window), fingerprint, capital], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+_worker_stores = {}  # Per worker process: candle store root -> CandleStore (memmaps reused across tasks)
+
+
+def _evaluate_chunk(root: str, series_key: tuple, window: tuple, points: List[tuple], capital: float) -> List[tuple]:
+    """Process-pool task: replay [(index, params)] on one window of a memory-mapped series"""
+    from candle_store import CandleStore
+    store = _worker_stores.get(root)
+    if store is None:
+        store = _worker_stores[root] = CandleStore(root=root)
+    candles = store.get(*series_key).between(*window)
+    return [
+        (index, BacktestingEngine._calculate_metrics(replay(candles, params, capital)["pnl"], capital))
+        for index, params in points
+    ]
 
 
 class BacktestingEngine:
-    def __init__(self):
+    def __init__(self, store=None, results=None):
         self.results_cache = {}
-    
+        self._store = store
+        self._results = results  # Persisted sweep results, keyed by _point_key
+        self._executor = None
+        self.stats = {"evaluated": 0, "cached": 0}
+
+    def _candle_store(self):
+        if self._store is None:
+            from candle_store import candle_store
+            self._store = candle_store
+        return self._store
+
+    def _collection(self):
+        if self._results is None:
+            from database import backtest_results_collection
+            self._results = backtest_results_collection
+        return self._results
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: the API process runs threads (Motor, executors) that must not be forked
+            self._executor = ProcessPoolExecutor(max_workers=BACKTEST_WORKERS or os.cpu_count(),
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def _series(self, params: dict):
+        """Every stored candle of the strategy's series (synced first when behind)"""
+        store = self._candle_store()
+        key = (params["exchange"], params["pair"], params["timeframe"])
+        if not store.is_current(*key):
+            try:
+                await store.sync(*key)
+            except Exception as e:
+                logger.warning(f"Backtest candle sync failed for {key}: {e}")
+        return store.get(*key)
+
     async def backtest_strategy(self, strategy_params: dict, start_date: str, end_date: str, initial_capital: float = 1000) -> dict:
-        """Backtest a trading strategy"""
+        """Backtest a trading strategy on stored candles"""
         try:
             logger.info(f"Starting backtest: {start_date} to {end_date}")
-            
-            # Simulate historical trades
-            trades = await self._simulate_trades(
+
+            # Replay historical candles
+            trades, pnl, candle_count, skipped = await self._simulate_trades(
                 strategy_params,
                 start_date,
                 end_date,
                 initial_capital
             )
-            
+
             # Calculate performance metrics
-            metrics = self._calculate_metrics(trades, initial_capital)
-            
+            metrics = self._calculate_metrics(pnl, initial_capital)
+
             result = {
-                "strategy": strategy_params,
+                "strategy": {**DEFAULT_STRATEGY, **strategy_params},
                 "period": {"start": start_date, "end": end_date},
                 "initial_capital": initial_capital,
+                "candles": candle_count,
+                "skipped_below_threshold": skipped,
                 "trades": trades,
                 "metrics": metrics,
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
-            
+
             return result
-            
+
         except Exception as e:
             logger.error(f"Backtesting failed: {e}")
             return {"error": str(e)}
-    
-    async def _simulate_trades(self, params: dict, start_date: str, end_date: str, capital: float) -> list:
-        """Simulate trades over historical period"""
-        trades = []
-        current_capital = capital
-        
-        # Parse dates
-        start = datetime.fromisoformat(start_date)
-        end = datetime.fromisoformat(end_date)
-        days = (end - start).days
-        
-        # Simulate trades (simplified - would use real historical data in production)
-        risk_mode = params.get('risk_mode', 'safe')
-        
-        # Trade frequency based on risk
-        trades_per_day = {
-            'safe': 2,
-            'balanced': 4,
-            'risky': 6
-        }.get(risk_mode, 2)
-        
-        total_trades = days * trades_per_day
-        
-        # Win rate based on risk
-        win_rate = {
-            'safe': 0.60,
-            'balanced': 0.55,
-            'risky': 0.50
-        }.get(risk_mode, 0.55)
-        
-        for i in range(total_trades):
-            # Simulate trade
-            is_win = random.random() < win_rate
-            
-            if is_win:
-                pnl = current_capital * random.uniform(0.005, 0.02)  # 0.5-2% gain
-            else:
-                pnl = -current_capital * random.uniform(0.003, 0.015)  # 0.3-1.5% loss
-            
-            current_capital += pnl
-            
-            trade = {
-                "date": (start + timedelta(days=i/trades_per_day)).isoformat(),
+
+    async def _simulate_trades(self, params: dict, start_date: str, end_date: str, capital: float) -> tuple:
+        """Replay the stored candles of the period; returns (trades, pnl array, candles, skipped)"""
+        params = {**DEFAULT_STRATEGY, **params}
+        candles = (await self._series(params)).between(_to_ms(start_date), _to_ms(end_date))
+        if len(candles) < RECENT_CANDLES + OLDER_CANDLES + params["hold_candles"]:
+            raise ValueError(f"Not enough stored {params['timeframe']} candles for {params['pair']} "
+                             f"on {params['exchange']} in this period ({len(candles)})")
+
+        result = replay(candles, params, capital)
+        timestamps = candles.timestamp
+        capital_after = capital + np.cumsum(result["pnl"])
+        trades = [
+            {
+                "date": datetime.fromtimestamp(int(timestamps[entry]) / 1000, tz=timezone.utc).isoformat(),
+                "exit_date": datetime.fromtimestamp(int(timestamps[exit_]) / 1000, tz=timezone.utc).isoformat(),
+                "entry_price": round(entry_price, 6),
+                "exit_price": round(exit_price, 6),
+                "exit_reason": reason,
+                "trade_amount": round(amount, 2),
+                "fees": round(fees, 2),
+                "slippage_cost": round(slippage, 2),
                 "pnl": round(pnl, 2),
-                "capital_after": round(current_capital, 2),
-                "side": "buy" if is_win else "sell"
+                "capital_after": round(after, 2),
+                "side": "buy"
             }
-            
-            trades.append(trade)
-        
-        return trades
-    
-    def _calculate_metrics(self, trades: list, initial_capital: float) -> dict:
-        """Calculate performance metrics"""
-        if not trades:
+            for entry, exit_, entry_price, exit_price, reason, amount, fees, slippage, pnl, after in zip(
+                result["entry_index"].tolist(), result["exit_index"].tolist(),
+                result["entry_price"].tolist(), result["exit_price"].tolist(), result["exit_reason"].tolist(),
+                result["trade_amount"].tolist(), result["fees"].tolist(), result["slippage_cost"].tolist(),
+                result["pnl"].tolist(), capital_after.tolist()
+            )
+        ]
+        return trades, result["pnl"], len(candles), result["skipped"]
+
+    @staticmethod
+    def _calculate_metrics(pnl: np.ndarray, initial_capital: float) -> dict:
+        """Calculate performance metrics from per-trade net P&L in one pass over the arrays"""
+        pnl = np.asarray(pnl, dtype=np.float64)
+        if not len(pnl):
             return {}
-        
-        final_capital = trades[-1]['capital_after']
+
+        capital = initial_capital + np.cumsum(pnl)
+        final_capital = float(capital[-1])
         total_return = ((final_capital - initial_capital) / initial_capital) * 100
-        
-        winning_trades = [t for t in trades if t['pnl'] > 0]
-        losing_trades = [t for t in trades if t['pnl'] < 0]
-        
-        win_rate = (len(winning_trades) / len(trades)) * 100 if trades else 0
-        
-        total_profit = sum(t['pnl'] for t in winning_trades)
-        total_loss = abs(sum(t['pnl'] for t in losing_trades))
+
+        wins, losses = pnl > 0, pnl < 0
+        total_profit = float(pnl[wins].sum())
+        total_loss = abs(float(pnl[losses].sum()))
         profit_factor = total_profit / total_loss if total_loss > 0 else total_profit
-        
-        # Calculate max drawdown
-        peak = initial_capital
-        max_drawdown = 0
-        
-        for trade in trades:
-            capital = trade['capital_after']
-            if capital > peak:
-                peak = capital
-            drawdown = ((peak - capital) / peak) * 100
-            max_drawdown = max(max_drawdown, drawdown)
-        
+
+        # Max drawdown against the running peak (starting capital included)
+        peak = np.maximum.accumulate(np.maximum(capital, initial_capital))
+        max_drawdown = float(((peak - capital) / peak).max()) * 100
+
         # Sharpe ratio (simplified)
-        returns = [t['pnl'] / initial_capital for t in trades]
-        avg_return = sum(returns) / len(returns)
-        import math
-        std_dev = math.sqrt(sum((r - avg_return) ** 2 for r in returns) / len(returns))
-        sharpe = (avg_return / std_dev) * math.sqrt(252) if std_dev > 0 else 0
-        
+        returns = pnl / initial_capital
+        std_dev = float(returns.std())
+        sharpe = (float(returns.mean()) / std_dev) * math.sqrt(252) if std_dev > 0 else 0
+
         return {
-            "total_trades": len(trades),
-            "winning_trades": len(winning_trades),
-            "losing_trades": len(losing_trades),
-            "win_rate": round(win_rate, 2),
+            "total_trades": len(pnl),
+            "winning_trades": int(wins.sum()),
+            "losing_trades": int(losses.sum()),
+            "win_rate": round(float(wins.mean()) * 100, 2),
             "total_return": round(total_return, 2),
             "final_capital": round(final_capital, 2),
             "profit_factor": round(profit_factor, 2),
             "max_drawdown": round(max_drawdown, 2),
             "sharpe_ratio": round(sharpe, 2),
-            "avg_trade_pnl": round(sum(t['pnl'] for t in trades) / len(trades), 2)
+            "avg_trade_pnl": round(float(pnl.mean()), 2)
+        }
+
+    async def _load_results(self, keys: List[str]) -> Dict[str, dict]:
+        try:
+            docs = await self._collection().find({"_id": {"$in": keys}}, {"metrics": 1}).to_list(None)
+            return {doc["_id"]: doc["metrics"] for doc in docs}
+        except Exception as e:
+            logger.warning(f"Backtest result cache unavailable: {e}")
+            return {}
+
+    async def _save_results(self, docs: List[dict]):
+        try:
+            await self._collection().insert_many(docs, ordered=False)
+        except BulkWriteError:
+            pass  # Points stored meanwhile by a concurrent sweep
+        except Exception as e:
+            logger.warning(f"Backtest results not saved: {e}")
+
+    async def _evaluate(self, series, window: tuple, points: List[dict], capital: float,
+                        counts: Dict[str, int]) -> List[dict]:
+        """Metrics for every point on one window; stored points are not re-run"""
+        candles = series.between(*window)
+        fingerprint = [len(candles)] + (candles.timestamp[[0, -1]].tolist() if len(candles) else [])
+        keys = [_point_key(point, window, fingerprint, capital) for point in points]
+        stored = await self._load_results(keys)
+        missing = [(i, point) for i, point in enumerate(points) if keys[i] not in stored]
+        for totals in (counts, self.stats):
+            totals["cached"] += len(points) - len(missing)
+
+        if missing:
+            store = self._candle_store()
+            series_key = (points[0]["exchange"], points[0]["pair"], points[0]["timeframe"])
+            loop = asyncio.get_running_loop()
+            chunks = [missing[i:i + BACKTEST_CHUNK_SIZE] for i in range(0, len(missing), BACKTEST_CHUNK_SIZE)]
+            done = await asyncio.gather(*(
+                loop.run_in_executor(self._pool(), _evaluate_chunk, store.root, series_key, window, chunk, capital)
+                for chunk in chunks
+            ))
+            now = datetime.now(timezone.utc)
+            new_docs = []
+            for index, metrics in (item for chunk in done for item in chunk):
+                stored[keys[index]] = metrics
+                new_docs.append({"_id": keys[index], "series": ":".join(series_key), "window": list(window),
+                                 "params": points[index], "metrics": metrics, "created_at": now})
+            for totals in (counts, self.stats):
+                totals["evaluated"] += len(new_docs)
+            await self._save_results(new_docs)
+
+        return [stored[key] for key in keys]
+
+    async def _optimize_window(self, series, base: dict, train: tuple, test: Optional[tuple], search: str,
+                               space: dict, samples: int, objective: str, capital: float, seed: int,
+                               counts: Dict[str, int]) -> dict:
+        """Best point on the train window, then scored on the test window"""
+        if search == "bayesian":
+            study = optuna.create_study(direction="maximize", sampler=optuna.samplers.TPESampler(seed=seed))
+            batch = BACKTEST_WORKERS or os.cpu_count()
+            while len(study.trials) < samples:
+                trials = [study.ask() for _ in range(min(batch, samples - len(study.trials)))]
+                points = [{**base, **_suggest(trial, space)} for trial in trials]
+                for trial, metrics in zip(trials, await self._evaluate(series, train, points, capital, counts)):
+                    study.tell(trial, _score(metrics, objective))
+            best = {**base, **_suggest(study.best_trial, space)}
+            train_metrics = (await self._evaluate(series, train, [best], capital, counts))[0]
+        else:
+            points = [{**base, **point} for point in (
+                grid_points(space) if search == "grid" else random_points(space, samples, random.Random(seed))
+            )]
+            scored = await self._evaluate(series, train, points, capital, counts)
+            best_index = max(range(len(points)), key=lambda i: _score(scored[i], objective))
+            best, train_metrics = points[best_index], scored[best_index]
+
+        fold = {
+            "train": _window_dates(train),
+            "best_params": {name: best[name] for name in space},
+            "train_metrics": train_metrics
         }
-    
-    async def optimize_strategy(self, base_params: dict, start_date: str, end_date: str) -> dict:
-        """Optimize strategy parameters"""
-        best_result = None
-        best_return = float('-inf')
-        
-        risk_modes = ['safe', 'balanced', 'risky']
-        
-        for risk_mode in risk_modes:
-            params = {**base_params, 'risk_mode': risk_mode}
-            result = await self.backtest_strategy(params, start_date, end_date)
-            
-            if 'metrics' in result:
-                total_return = result['metrics'].get('total_return', 0)
-                if total_return > best_return:
-                    best_return = total_return
-                    best_result = result
-        
-        return best_result or {}
+        if test:
+            fold["test"] = _window_dates(test)
+            fold["test_metrics"] = (await self._evaluate(series, test, [best], capital, counts))[0]
+        return fold
+
+    async def optimize_strategy(self, base_params: dict, start_date: str, end_date: str,
+                                search: str = "grid", space: Optional[dict] = None, samples: int = 50,
+                                train_days: Optional[float] = None, test_days: Optional[float] = None,
+                                objective: str = "total_return", initial_capital: float = 1000,
+                                seed: Optional[int] = None) -> dict:
+        """Sweep strategy parameters across the process pool, optionally walk-forward"""
+        try:
+            base = {**DEFAULT_STRATEGY, **base_params}
+            space = dict(space or SEARCH_SPACE)
+            unknown = set(space) - set(DEFAULT_STRATEGY) - {"exchange", "pair", "timeframe"}
+            if unknown:
+                raise ValueError(f"Unknown strategy parameters: {sorted(unknown)}")
+            if search not in ("grid", "random", "bayesian"):
+                raise ValueError(f"Unknown search: {search}")
+            if objective not in OBJECTIVES:
+                raise ValueError(f"Objective must be one of {OBJECTIVES}")
+            check_sweep_size(search, space, samples)
+            if search == "bayesian" and optuna is None:
+                logger.warning("optuna not installed - bayesian search falls back to random")
+                search = "random"
+
+            windows = walk_forward_windows(_to_ms(start_date), _to_ms(end_date), train_days, test_days)
+            if not windows:
+                raise ValueError("Period shorter than one train + test window")
+            series = await self._series(base)
+            counts = {"evaluated": 0, "cached": 0}
+            logger.info(f"🔬 Backtest sweep: {search} over {len(space)} parameters, {len(windows)} window(s) "
+                        f"for {base['pair']} {base['timeframe']}")
+
+            folds = await asyncio.gather(*(
+                self._optimize_window(series, base, train, test, search, space, samples, objective,
+                                      initial_capital, seed, counts)
+                for train, test in windows
+            ))
+
+            result = {
+                "strategy": base,
+                "period": {"start": start_date, "end": end_date},
+                "search": search,
+                "objective": objective,
+                "best_params": folds[-1]["best_params"],  # Fitted on the most recent data
+                "best_metrics": folds[-1]["train_metrics"],
+                "folds": list(folds),
+                "points_evaluated": counts["evaluated"],
+                "points_cached": counts["cached"],
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+            if test_days:
+                test_returns = [f["test_metrics"].get("total_return", 0) for f in folds]
+                result["out_of_sample"] = {
+                    "windows": len(folds),
+                    "total_return": round((float(np.prod([1 + r / 100 for r in test_returns])) - 1) * 100, 2),
+                    "profitable_windows": sum(1 for r in test_returns if r > 0),
+                    "total_trades": sum(f["test_metrics"].get("total_trades", 0) for f in folds)
+                }
+            return result
+
+        except Exception as e:
+            logger.error(f"Strategy optimization failed: {e}")
+            return {"error": str(e)}
+
+    def close(self):
+        """Shut the sweep worker processes down"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
 
 # Global instance
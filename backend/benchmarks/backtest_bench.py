@@ -0,0 +1,77 @@
+"""
+Backtest Benchmark - one year of 5m candles for one pair
+
+Usage (from backend/):
+    python benchmarks/backtest_bench.py [--days 365] [--risk-mode balanced]
+
+Writes a random-walk candle series into a temporary candle store, then times a
+full BacktestingEngine.backtest_strategy run over it: the memory-mapped read,
+the vectorized replay, the trade list and the metrics.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtesting_engine import BacktestingEngine, replay
+from candle_store import CandleStore, timeframe_ms
+
+
+def write_candles(store: CandleStore, count: int):
+    rng = np.random.default_rng(42)
+    closes = 1_000_000 * np.exp(np.cumsum(rng.normal(0, 0.003, count)))
+    opens = np.concatenate(([1_000_000.0], closes[:-1]))
+    wiggle = np.abs(rng.normal(0, 0.002, count))
+    rows = np.column_stack([
+        np.arange(count) * timeframe_ms('5m'), opens,
+        np.maximum(opens, closes) * (1 + wiggle), np.minimum(opens, closes) * (1 - wiggle),
+        closes, rng.uniform(0.1, 5, count)
+    ]).tolist()
+    store.append('luno', 'BTC/ZAR', '5m', rows)
+
+
+async def bench(days: int, risk_mode: str):
+    async def no_fetch(*args):
+        return []
+
+    with tempfile.TemporaryDirectory() as root:
+        store = CandleStore(root=root, fetch=no_fetch)
+        count = days * 288
+        write_candles(store, count)
+        engine = BacktestingEngine(store=store)
+        end = f"{1970 + days // 365 + 1}-01-01"
+
+        start = time.perf_counter()
+        replayed = replay(store.get('luno', 'BTC/ZAR', '5m'), {"risk_mode": risk_mode}, 1000)
+        replay_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = await engine.backtest_strategy({"risk_mode": risk_mode}, "1970-01-01", end)
+        total_s = time.perf_counter() - start
+
+    metrics = result["metrics"]
+    print(f"{count} candles ({days} days of 5m)")
+    print(f"replay only        {replay_s * 1000:8.1f} ms   trades {len(replayed['pnl'])}")
+    print(f"backtest_strategy  {total_s * 1000:8.1f} ms   return {metrics.get('total_return')}%  "
+          f"max drawdown {metrics.get('max_drawdown')}%  win rate {metrics.get('win_rate')}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--risk-mode', default='balanced')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    asyncio.run(bench(args.days, args.risk_mode))
+
+
+if __name__ == "__main__":
+    main()
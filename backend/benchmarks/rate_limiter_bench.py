@@ -0,0 +1,76 @@
+"""
+Rate Limiter Benchmark - can_trade + record_trade throughput per backend
+
+Usage (from backend/):
+    python benchmarks/rate_limiter_bench.py [--ops 5000] [--concurrency 50]
+
+The mongo backend runs against MONGO_URL/DB_NAME in a throwaway collection
+and is skipped when MongoDB is not reachable.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import RateLimiter, InMemoryRateLimitBackend, MongoRateLimitBackend
+
+EXCHANGES = ['luno', 'binance', 'kucoin', 'kraken', 'valr']
+
+
+async def run_backend(limiter: RateLimiter, ops: int, concurrency: int) -> dict:
+    """Each op = can_trade + record_trade for a rotating bot/exchange"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            bot_id = f"bench_bot_{i % 200}"
+            exchange = EXCHANGES[i % len(EXCHANGES)]
+            await limiter.can_trade(bot_id, exchange)
+            await limiter.record_trade(bot_id, exchange)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ops)))
+    elapsed = time.perf_counter() - start
+    return {"ops": ops, "seconds": elapsed, "ops_per_sec": ops / elapsed if elapsed else 0}
+
+
+async def make_mongo_backend():
+    """Throwaway collection on the configured MongoDB, or None if unreachable"""
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'),
+                                    serverSelectionTimeoutMS=2000)
+        await client.admin.command('ping')
+    except Exception as e:
+        print(f"⏭️  mongo backend skipped: {e}")
+        return None, None
+
+    collection = client[os.environ.get('DB_NAME', 'amarktai_trading')]['rate_limits_bench']
+    await collection.drop()
+    return MongoRateLimitBackend(collection=collection), collection
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    results = {"memory": await run_backend(RateLimiter(InMemoryRateLimitBackend()), args.ops, args.concurrency)}
+
+    mongo_backend, collection = await make_mongo_backend()
+    if mongo_backend:
+        results["mongo"] = await run_backend(RateLimiter(mongo_backend), args.ops, args.concurrency)
+        await collection.drop()
+
+    print(f"\n{'backend':<10}{'ops':>10}{'seconds':>12}{'ops/sec':>14}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['ops']:>10}{r['seconds']:>12.3f}{r['ops_per_sec']:>14.0f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+Trade Staggerer Benchmark - 10k queued requests across 5 exchanges
+
+Usage (from backend/):
+    python benchmarks/trade_staggerer_bench.py [--requests 10000] [--blocked-pops 1000]
+
+Measures queueing (with duplicate rejection), draining the queue through the
+token buckets on a simulated clock, and pops while every exchange is at its
+concurrency cap - compared with the previous deque rotation, which re-checked
+every queued item on each pop.
+
+Note: the trade dispatcher only calls next_slot_delay/register_trade_*, so the
+queue paths measured here are not on the live trading path.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engines.trade_staggerer import TradeStaggerer
+
+EXCHANGES = ['luno', 'binance', 'kucoin', 'kraken', 'valr']
+
+
+class SimClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def report(name: str, ops: int, seconds: float):
+    print(f"{name:<34} {ops:>8} ops  {seconds * 1000:9.1f} ms  {ops / seconds if seconds else 0:>12,.0f} ops/s")
+
+
+async def bench(requests: int, blocked_pops: int):
+    clock = SimClock()
+    staggerer = TradeStaggerer(clock=clock)
+
+    start = time.perf_counter()
+    for i in range(requests):
+        await staggerer.add_to_queue(f"bot_{i}", EXCHANGES[i % len(EXCHANGES)], priority=i % 3)
+    report("queue", requests, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    rejected = 0
+    for i in range(requests):
+        rejected += not await staggerer.add_to_queue(f"bot_{i}", EXCHANGES[i % len(EXCHANGES)])
+    report("queue duplicates (rejected)", requests, time.perf_counter() - start)
+    assert rejected == requests
+
+    # Every exchange at its concurrency cap: pops must not scan the queue
+    for exchange, limits in staggerer.exchange_limits.items():
+        for n in range(limits['max_concurrent']):
+            await staggerer.register_trade_start(f"busy_{exchange}_{n}", exchange)
+    start = time.perf_counter()
+    for _ in range(blocked_pops):
+        assert await staggerer.get_next_trade() is None
+    report("pop while all exchanges blocked", blocked_pops, time.perf_counter() - start)
+
+    legacy = deque({"bot_id": f"bot_{i}", "exchange": EXCHANGES[i % len(EXCHANGES)]} for i in range(requests))
+    legacy_pops = max(1, blocked_pops // 100)
+    start = time.perf_counter()
+    for _ in range(legacy_pops):
+        for _ in range(len(legacy)):  # Previous get_next_trade: rotate and re-check every item
+            item = legacy.popleft()
+            ok, _ = await staggerer.can_execute_now(item["bot_id"], item["exchange"])
+            legacy.append(item)
+    report("  legacy deque rotation (same state)", legacy_pops, time.perf_counter() - start)
+
+    for exchange, limits in staggerer.exchange_limits.items():
+        for n in range(limits['max_concurrent']):
+            await staggerer.register_trade_complete(f"busy_{exchange}_{n}", exchange)
+
+    # Drain everything through the token buckets on the simulated clock
+    start = time.perf_counter()
+    drained = 0
+    while staggerer.queued:
+        request = await staggerer.get_next_trade()
+        if request is None:
+            clock.now += 0.5
+            continue
+        await staggerer.register_trade_start(request["bot_id"], request["exchange"])
+        await staggerer.register_trade_complete(request["bot_id"], request["exchange"])
+        drained += 1
+    report("drain through token buckets", drained, time.perf_counter() - start)
+    print(f"\n{requests - drained} requests expired after 30m in queue")
+    print(f"Simulated time to drain: {clock.now / 3600:.1f}h "
+          f"({drained / clock.now * 60 if clock.now else 0:.0f} trades/min across {len(EXCHANGES)} exchanges)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--blocked-pops', type=int, default=1000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # Expired-request warnings
+    asyncio.run(bench(args.requests, args.blocked_pops))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+WebSocket Broadcast Benchmark - 5k simulated sockets, a few of them slow
+
+Usage (from backend/):
+    python benchmarks/websocket_broadcast_bench.py [--sockets 5000] [--slow 50] [--messages 20]
+
+Broadcasts --messages events to every socket through ConnectionManager (one
+serialization per broadcast, per-socket send queues and writers) and reports how
+long until every healthy socket has them - compared with the previous loop, which
+re-serialized per socket and awaited each send in turn, so every slow socket
+delayed all the sockets after it.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from websocket_manager import ConnectionManager
+from time_utils import json_default
+
+
+class SimSocket:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.delay)  # 0 = yields once, like a socket with buffer space
+        self.received += 1
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+
+def make_sockets(count: int, slow: int, slow_delay: float):
+    return [SimSocket(slow_delay if i % (count // slow) == 0 else 0) for i in range(count)] if slow else \
+        [SimSocket(0) for _ in range(count)]
+
+
+def message(n: int) -> dict:
+    return {"type": "trade_executed", "trade": {"pair": "BTC/ZAR", "amount": 0.01, "price": 1234567.0, "n": n},
+            "message": "📊 Trade executed: BTC/ZAR"}
+
+
+async def bench_queued(sockets, messages: int, users: int):
+    manager = ConnectionManager()
+    for i, ws in enumerate(sockets):
+        await manager.connect(ws, f"user_{i % users}")
+    await manager.flush()
+    healthy = [ws for ws in sockets if ws.delay == 0]
+    baseline = {id(ws): ws.received for ws in healthy}
+
+    start = time.perf_counter()
+    for n in range(messages):
+        await manager.deliver_local_all(message(n))
+    enqueued = time.perf_counter() - start
+    while any(ws.received - baseline[id(ws)] < messages for ws in healthy):
+        await asyncio.sleep(0.01)
+    delivered = time.perf_counter() - start
+
+    print(f"queued fan-out     enqueue {enqueued * 1000:8.1f} ms   all healthy sockets served {delivered * 1000:8.1f} ms")
+    print(f"                   serializations {manager.stats['broadcasts']}, max queue depth "
+          f"{manager.get_stats()['max_queue_depth']}, slow sockets still draining: "
+          f"{sum(1 for ws in sockets if ws.delay and ws.received < messages + 1)}")
+    for client in list(manager.clients.values()):
+        client.writer.cancel()
+    manager._heartbeat_task.cancel()
+
+
+async def bench_legacy(sockets, messages: int, users: int):
+    by_user = {}
+    for i, ws in enumerate(sockets):
+        by_user.setdefault(f"user_{i % users}", set()).add(ws)
+
+    start = time.perf_counter()
+    for n in range(messages):
+        for user_id in list(by_user):  # Previous broadcast_to_all -> broadcast_to_user loop
+            for ws in by_user[user_id]:
+                await ws.send_text(json.dumps(message(n), default=json_default))
+    elapsed = time.perf_counter() - start
+    print(f"legacy serial loop all sockets served {elapsed * 1000:8.1f} ms   serializations {messages * len(sockets)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sockets', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--slow', type=int, default=50, help="Sockets that take --slow-delay per send")
+    parser.add_argument('--slow-delay', type=float, default=0.02)
+    parser.add_argument('--messages', type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{args.sockets} sockets ({args.slow} slow at {args.slow_delay * 1000:.0f}ms/send), "
+          f"{args.users} users, {args.messages} broadcasts\n")
+    asyncio.run(bench_queued(make_sockets(args.sockets, args.slow, args.slow_delay), args.messages, args.users))
+    asyncio.run(bench_legacy(make_sockets(args.sockets, args.slow, args.slow_delay), args.messages, args.users))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Candle Store - local OHLCV history per exchange/pair/timeframe
+- Each series is a directory of append-only column files (timestamp int64,
+  open/high/low/close/volume float64) and a meta.json holding the row count
+- Readers memory-map the columns and get zero-copy NumPy slices (CandleSeries);
+  a series is remapped only after it grew
+- Only closed candles are stored: a sync fetches just the candles after the last
+  stored one, so a current series costs nothing and a stale one a single request
+- Appends hold an flock on the series, so any process may sync; meta.json is
+  replaced after the column bytes are written, so readers never see a partial row
+- The background loop keeps watched series current (started with the engines)
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import logging
+
+import numpy as np
+
+from config import (
+    CANDLE_STORE_DIR, CANDLE_SYNC_INTERVAL_SECONDS, CANDLE_SYNC_MIN_INTERVAL_SECONDS,
+    CANDLE_SYNC_BACKFILL, CANDLE_SYNC_PAGE_LIMIT, CANDLE_SYNC_MAX_PAGES
+)
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    ("timestamp", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+)
+
+_TIMEFRAME_UNITS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+
+def timeframe_ms(timeframe: str) -> int:
+    """'5m' -> 300000"""
+    return int(timeframe[:-1]) * _TIMEFRAME_UNITS[timeframe[-1]]
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class CandleSeries:
+    """Candles as parallel NumPy columns (read-only memmap views when loaded from the store)"""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+        self.timestamp = columns["timestamp"]
+        self.open = columns["open"]
+        self.high = columns["high"]
+        self.low = columns["low"]
+        self.close = columns["close"]
+        self.volume = columns["volume"]
+
+    @classmethod
+    def empty(cls) -> "CandleSeries":
+        return cls({name: np.empty(0, dtype) for name, dtype in COLUMNS})
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __getitem__(self, item: slice) -> "CandleSeries":
+        return CandleSeries({name: column[item] for name, column in self.columns.items()})
+
+    def tail(self, n: int) -> "CandleSeries":
+        """The last n candles (no copy)"""
+        return self[max(len(self) - n, 0):]
+
+    def between(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> "CandleSeries":
+        """Candles opening in [start_ms, end_ms) (no copy)"""
+        lo = 0 if start_ms is None else int(np.searchsorted(self.timestamp, start_ms, side="left"))
+        hi = len(self) if end_ms is None else int(np.searchsorted(self.timestamp, end_ms, side="left"))
+        return self[lo:hi]
+
+    def to_list(self) -> List[Dict]:
+        """Oldest-first candle dicts for JSON payloads (copies)"""
+        names = [name for name, _ in COLUMNS]
+        return [dict(zip(names, row)) for row in zip(*(self.columns[n].tolist() for n in names))]
+
+
+class CandleStore:
+    """Memory-mapped OHLCV columns on local disk, synced incrementally from the exchanges"""
+
+    # Kept current in the background so dashboards and engines start warm
+    DEFAULT_WATCHLIST = {
+        ('luno', 'BTC/ZAR'): ['5m', '1h', '1d'],
+        ('luno', 'ETH/ZAR'): ['5m', '1h', '1d'],
+        ('luno', 'XRP/ZAR'): ['5m', '1h', '1d'],
+    }
+
+    def __init__(self, root: str = CANDLE_STORE_DIR,
+                 fetch: Optional[Callable[..., Awaitable[list]]] = None):
+        self.root = root
+        self._fetch = fetch  # fetch(exchange, pair, timeframe, since, limit) -> ccxt OHLCV rows
+        self._views: Dict[tuple, tuple] = {}  # key -> (meta file identity, CandleSeries)
+        self.watched: Set[tuple] = {
+            (ex, pair, tf) for (ex, pair), tfs in self.DEFAULT_WATCHLIST.items() for tf in tfs
+        }
+        self.inflight: Dict[tuple, asyncio.Task] = {}
+        self.synced_at: Dict[tuple, float] = {}  # key -> monotonic time of the last sync attempt
+        self.is_running = False
+        self.task = None
+        self.stats = {"remaps": 0, "syncs": 0, "fetches": 0, "appended": 0, "errors": 0}
+
+    def _fetcher(self):
+        if self._fetch is None:
+            from market_data_hub import market_data_hub
+
+            async def fetch(exchange, pair, timeframe, since, limit):
+                return await market_data_hub.fetch_ohlcv(pair, timeframe, since, limit, exchange)
+            self._fetch = fetch
+        return self._fetch
+
+    @staticmethod
+    def _key(exchange: str, pair: str, timeframe: str) -> tuple:
+        return (exchange.lower(), pair, timeframe)
+
+    def _dir(self, key: tuple) -> str:
+        exchange, pair, timeframe = key
+        return os.path.join(self.root, exchange, pair.replace('/', '-'), timeframe)
+
+    @staticmethod
+    def _read_meta(path: str) -> Dict:
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"rows": 0, "last_ts": None}
+
+    def get(self, exchange: str, pair: str, timeframe: str) -> CandleSeries:
+        """Every stored candle of a series, oldest first (memory-mapped, no copy)"""
+        key = self._key(exchange, pair, timeframe)
+        path = self._dir(key)
+        try:
+            st = os.stat(os.path.join(path, "meta.json"))
+        except FileNotFoundError:
+            return CandleSeries.empty()
+        identity = (st.st_ino, st.st_mtime_ns)  # meta.json is replaced on every append
+        cached = self._views.get(key)
+        if cached and cached[0] == identity:
+            return cached[1]
+
+        rows = self._read_meta(path)["rows"]
+        columns = {}
+        for name, dtype in COLUMNS:
+            if rows:
+                columns[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+            else:
+                columns[name] = np.empty(0, dtype)
+        series = CandleSeries(columns)
+        self._views[key] = (identity, series)
+        self.stats["remaps"] += 1
+        return series
+
+    def append(self, exchange: str, pair: str, timeframe: str, candles: List[list]) -> int:
+        """Append ccxt OHLCV rows newer than the last stored candle; returns rows added"""
+        key = self._key(exchange, pair, timeframe)
+        path = self._dir(key)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            meta = self._read_meta(path)
+            last_ts = meta["last_ts"]
+            fresh = {int(c[0]): c for c in candles if last_ts is None or int(c[0]) > last_ts}
+            if not fresh:
+                return 0
+            new_rows = [fresh[ts] for ts in sorted(fresh)]
+
+            rows = meta["rows"]
+            for index, (name, dtype) in enumerate(COLUMNS):
+                values = np.array([row[index] if row[index] is not None else 0 for row in new_rows], dtype=dtype)
+                with open(os.path.join(path, f"{name}.bin"), "ab") as f:
+                    f.truncate(rows * np.dtype(dtype).itemsize)  # Drops bytes of an interrupted append
+                    f.write(values.tobytes())
+
+            meta = {"rows": rows + len(new_rows), "last_ts": int(new_rows[-1][0])}
+            tmp = os.path.join(path, f"meta.json.{os.getpid()}")
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, os.path.join(path, "meta.json"))
+
+        self.stats["appended"] += len(new_rows)
+        return len(new_rows)
+
+    def is_current(self, exchange: str, pair: str, timeframe: str) -> bool:
+        """True when the last closed candle is stored (or a sync was just attempted)"""
+        key = self._key(exchange, pair, timeframe)
+        attempted = self.synced_at.get(key)
+        if attempted is not None and time.monotonic() - attempted < CANDLE_SYNC_MIN_INTERVAL_SECONDS:
+            return True
+        series = self.get(*key)
+        return len(series) > 0 and int(series.timestamp[-1]) + 2 * timeframe_ms(timeframe) > now_ms()
+
+    async def _sync(self, key: tuple) -> int:
+        exchange, pair, timeframe = key
+        tf_ms = timeframe_ms(timeframe)
+        now = now_ms()
+        last_ts = self._read_meta(self._dir(key))["last_ts"]
+        since = last_ts + tf_ms if last_ts is not None else (now // tf_ms - CANDLE_SYNC_BACKFILL) * tf_ms
+
+        added = 0
+        self.synced_at[key] = time.monotonic()
+        for _ in range(CANDLE_SYNC_MAX_PAGES):
+            if since + tf_ms > now:
+                break  # The next candle has not closed yet
+            batch = await self._fetcher()(exchange, pair, timeframe, since, CANDLE_SYNC_PAGE_LIMIT) or []
+            self.stats["fetches"] += 1
+            closed = [c for c in batch if int(c[0]) >= since and int(c[0]) + tf_ms <= now]
+            if not closed:
+                break
+            added += self.append(exchange, pair, timeframe, closed)
+            since = int(closed[-1][0]) + tf_ms
+            if len(batch) < CANDLE_SYNC_PAGE_LIMIT:
+                break
+        self.stats["syncs"] += 1
+        return added
+
+    async def sync(self, exchange: str, pair: str, timeframe: str) -> int:
+        """Fetch and store the closed candles after the last stored one (shared by concurrent callers)"""
+        key = self._key(exchange, pair, timeframe)
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._sync(key))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def watch(self, exchange: str, pair: str, timeframe: str):
+        """Keep a series current in the background"""
+        self.watched.add(self._key(exchange, pair, timeframe))
+
+    async def recent(self, exchange: str, pair: str, timeframe: str, limit: int) -> CandleSeries:
+        """The latest closed candles, syncing first when the series is behind"""
+        self.watch(exchange, pair, timeframe)
+        if not self.is_current(exchange, pair, timeframe):
+            try:
+                await self.sync(exchange, pair, timeframe)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.debug(f"Candle sync for {pair} {timeframe} on {exchange}: {e}")
+        return self.get(exchange, pair, timeframe).tail(limit)
+
+    async def _sync_loop(self):
+        """Background sync of every watched series that is behind"""
+        while self.is_running:
+            for key in sorted(self.watched):
+                try:
+                    if not self.is_current(*key):
+                        await self.sync(*key)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.warning(f"Candle sync failed for {key[1]} {key[2]} on {key[0]}: {e}")
+            await asyncio.sleep(CANDLE_SYNC_INTERVAL_SECONDS)
+
+    def get_status(self) -> Dict:
+        """Store status for health endpoints"""
+        return {
+            "is_running": self.is_running,
+            "root": self.root,
+            "watched": len(self.watched),
+            "stats": dict(self.stats)
+        }
+
+    async def start(self):
+        """Start background sync"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.task = asyncio.create_task(self._sync_loop())
+        logger.info(f"🕯️ Candle store sync started - {len(self.watched)} series in {self.root}")
+
+    async def stop(self):
+        """Stop background sync"""
+        self.is_running = False
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        logger.info("Candle store sync stopped")
+
+
+# Global instance
+candle_store = CandleStore()
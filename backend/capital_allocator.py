@@ -113,7 +113,7 @@ class CapitalAllocator:
         """Reinvest daily profits to active bots based on performance"""
         try:
             # Calculate today's profit
-            today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0).isoformat()
+            today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)
             
             trades_today = await trades_collection.find({
                 "user_id": user_id,
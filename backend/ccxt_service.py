@@ -3,6 +3,7 @@ import asyncio
 from typing import Dict, Optional, List
 from datetime import datetime, timezone
 import logging
+from market_data_hub import market_data_hub
 
 logger = logging.getLogger(__name__)
 
@@ -57,8 +58,12 @@ class CCXTService:
             return 0.0
     
     async def fetch_ticker(self, exchange: ccxt.Exchange, symbol: str) -> Dict:
-        """Fetch ticker data"""
+        """Fetch ticker data (streamed/polled snapshot first, REST on a miss)"""
         try:
+            ticker = market_data_hub.peek_ticker(symbol, exchange.id)
+            if ticker:
+                return ticker
+            
             ticker = await asyncio.to_thread(exchange.fetch_ticker, symbol)
             return ticker
         except Exception as e:
@@ -17,6 +17,19 @@ load_dotenv()
 MONGO_URL = os.getenv('MONGO_URL', 'mongodb://localhost:27017')
 DB_NAME = os.getenv('DB_NAME', 'amarktai_trading')
 
+# Connection pool (db_pool) - one client per process, so the server-side total is
+# roughly workers x MONGO_MAX_POOL_SIZE (plus monitoring connections)
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '25'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '2'))
+MONGO_MAX_CONNECTING = int(os.getenv('MONGO_MAX_CONNECTING', '2'))  # Caps connection storms on deploy
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '60000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '10000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '30000'))  # 0 = no timeout
+MONGO_READ_PREFERENCE = os.getenv('MONGO_READ_PREFERENCE', 'primary')
+MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', 'zstd,snappy,zlib')  # Missing packages are skipped
+
 # Security
 JWT_SECRET = os.getenv('JWT_SECRET', 'your-secret-key-change-in-production')
 
@@ -77,10 +90,33 @@ EXCHANGE_TRADE_LIMITS = {
     }
 }
 
+# Rate limiter counters: 'memory' (per process) or 'mongo' (shared by all workers/hosts)
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+
+# Paper trade position size per risk mode, as a share of bot capital (the paper
+# engine boosts it on AI agreement, capped at 60%; the backtester uses it as is)
+POSITION_SIZES = {
+    'safe': 0.20,
+    'balanced': 0.30,
+    'risky': 0.40,
+    'aggressive': 0.50
+}
+
 # Global limits
 MAX_TRADES_PER_USER_PER_DAY = 3000  # Total across all bots
 MIN_TRADE_PROFIT_THRESHOLD_ZAR = 2.0  # Minimum net profit target (ignore 30c wins)
 
+# Trade dispatcher (trading_scheduler): each bot is due again this long after its
+# last trade; bots and modes are re-read in full this often as a safety net for
+# missed change events
+TRADING_BOT_COOLDOWN_SECONDS = float(os.getenv('TRADING_BOT_COOLDOWN_SECONDS', '60'))
+TRADING_DISPATCH_RESYNC_SECONDS = float(os.getenv('TRADING_DISPATCH_RESYNC_SECONDS', '60'))
+
+# Write-behind batching (write_behind): paper trade inserts and bot capital deltas
+# are flushed as insert_many / bulk_write every N ms or once M writes are pending
+WRITE_BEHIND_FLUSH_MS = float(os.getenv('WRITE_BEHIND_FLUSH_MS', '200'))
+WRITE_BEHIND_MAX_OPS = int(os.getenv('WRITE_BEHIND_MAX_OPS', '500'))
+
 # Paper → Live promotion criteria
 PAPER_TRAINING_DAYS = 7
 MIN_WIN_RATE = 0.52  # 52%
@@ -109,3 +145,106 @@ STOP_LOSS_AGGRESSIVE = 0.15  # 15%
 # Rogue bot detection
 MAX_HOURLY_LOSS_PERCENT = 0.15  # 15% in 1 hour
 MAX_DRAWDOWN_PERCENT = 0.20  # 20%
+
+# ============================================================================
+# MARKET DATA
+# ============================================================================
+
+# Shared market-data hub: one bulk ticker poll per exchange, read by all engines
+MARKET_DATA_POLL_INTERVAL_SECONDS = float(os.getenv('MARKET_DATA_POLL_INTERVAL_SECONDS', '5'))
+MARKET_DATA_MAX_AGE_SECONDS = float(os.getenv('MARKET_DATA_MAX_AGE_SECONDS', '10'))  # Staleness budget
+
+# Optional WebSocket streaming ingest (pushes into the market-data hub)
+MARKET_DATA_STREAMING = os.getenv('MARKET_DATA_STREAMING', 'false').lower() == 'true'
+MARKET_DATA_STREAM_EXCHANGES = [
+    e.strip().lower() for e in os.getenv('MARKET_DATA_STREAM_EXCHANGES', 'binance,kucoin,luno').split(',') if e.strip()
+]
+MARKET_DATA_REPLAY_FILE = os.getenv('MARKET_DATA_REPLAY_FILE', '')  # Recorded JSONL feed (offline stand-in)
+MARKET_DATA_REPLAY_SPEED = float(os.getenv('MARKET_DATA_REPLAY_SPEED', '1.0'))  # 0 = as fast as possible
+MARKET_DATA_RECORD_FILE = os.getenv('MARKET_DATA_RECORD_FILE', '')  # Record live stream updates to JSONL
+LUNO_STREAM_API_KEY = os.getenv('LUNO_STREAM_API_KEY', '')  # Luno streams require credentials
+LUNO_STREAM_API_SECRET = os.getenv('LUNO_STREAM_API_SECRET', '')
+
+# Local candle store (candle_store): memory-mapped OHLCV columns per
+# exchange/pair/timeframe; syncs fetch only the closed candles after the last one
+CANDLE_STORE_DIR = os.getenv('CANDLE_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'candles'))
+CANDLE_SYNC_INTERVAL_SECONDS = float(os.getenv('CANDLE_SYNC_INTERVAL_SECONDS', '60'))  # Background sync of watched series
+CANDLE_SYNC_MIN_INTERVAL_SECONDS = float(os.getenv('CANDLE_SYNC_MIN_INTERVAL_SECONDS', '30'))  # Per series, on demand
+CANDLE_SYNC_BACKFILL = int(os.getenv('CANDLE_SYNC_BACKFILL', '500'))  # Candles fetched for a new series
+CANDLE_SYNC_PAGE_LIMIT = int(os.getenv('CANDLE_SYNC_PAGE_LIMIT', '500'))
+CANDLE_SYNC_MAX_PAGES = int(os.getenv('CANDLE_SYNC_MAX_PAGES', '20'))
+
+# Backtest sweeps (backtesting_engine.optimize_strategy) run on a process pool
+BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', '0'))  # 0 = one per CPU
+BACKTEST_CHUNK_SIZE = int(os.getenv('BACKTEST_CHUNK_SIZE', '16'))  # Parameter points per worker task
+BACKTEST_MAX_POINTS = int(os.getenv('BACKTEST_MAX_POINTS', '2000'))  # Points per sweep window (grid size or samples)
+
+# Trade signal fan-out (signal_gatherer): price, regime, ML, Flokx, Fetch.ai and
+# trend run concurrently; each gets this deadline before falling back to its last
+# good value (if younger than the cache age) or a neutral value
+SIGNAL_DEADLINE_SECONDS = float(os.getenv('SIGNAL_DEADLINE_SECONDS', '2.0'))
+SIGNAL_CACHE_MAX_AGE_SECONDS = float(os.getenv('SIGNAL_CACHE_MAX_AGE_SECONDS', '300'))
+
+# ============================================================================
+# LEADER ELECTION
+# ============================================================================
+
+# Background engines (trading, autopilot, schedulers, monitors) run only in the
+# worker that holds the Mongo lease; the other workers serve the API only
+LEADER_ELECTION_ENABLED = os.getenv('LEADER_ELECTION_ENABLED', 'true').lower() == 'true'
+LEADER_LEASE_SECONDS = float(os.getenv('LEADER_LEASE_SECONDS', '10'))  # Failover time after a crash
+LEADER_HEARTBEAT_SECONDS = float(os.getenv('LEADER_HEARTBEAT_SECONDS', '3'))
+
+# Run the background engines inside the API workers (leader only), or set to
+# false and run them in the dedicated trading worker: python -m backend.worker
+BACKGROUND_ENGINES_IN_API = os.getenv('BACKGROUND_ENGINES_IN_API', 'true').lower() == 'true'
+EVENT_RELAY_COLLECTION_BYTES = int(os.getenv('EVENT_RELAY_COLLECTION_BYTES', str(16 * 1024 * 1024)))  # Cross-process events
+
+# Pub/sub backbone behind WebSocket fan-out and scheduler events (event_relay):
+# capped (tailable capped collection, any mongod), changestream (replica set only,
+# falls back to capped) or memory (single process - events never leave it)
+WS_PUBSUB_BACKEND = os.getenv('WS_PUBSUB_BACKEND', 'capped')
+
+# WebSocket delivery (websocket_manager): each socket has a bounded send queue and
+# its own writer; a client whose queue overflows or whose send stalls is dropped
+WS_SEND_QUEUE_MAX = int(os.getenv('WS_SEND_QUEUE_MAX', '256'))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv('WS_SEND_TIMEOUT_SECONDS', '10'))
+WS_PING_INTERVAL_SECONDS = float(os.getenv('WS_PING_INTERVAL_SECONDS', '30'))
+WS_PONG_TIMEOUT_SECONDS = float(os.getenv('WS_PONG_TIMEOUT_SECONDS', '10'))  # Silence allowed after a ping
+
+# Dashboard event frames (event_coalescer): a user's events are batched this long,
+# latest-value events collapsed, and sent as one frame
+REALTIME_FRAME_MS = float(os.getenv('REALTIME_FRAME_MS', '250'))
+REALTIME_FRAME_MAX_EVENTS = int(os.getenv('REALTIME_FRAME_MAX_EVENTS', '100'))  # Sent early when reached
+
+# SSE streams (sse_broadcaster): one producer per topic, events only on change
+SSE_OVERVIEW_INTERVAL_SECONDS = float(os.getenv('SSE_OVERVIEW_INTERVAL_SECONDS', '2'))
+SSE_PRICES_INTERVAL_SECONDS = float(os.getenv('SSE_PRICES_INTERVAL_SECONDS', '5'))
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))  # Keepalive comment on idle streams
+
+# ============================================================================
+# DASHBOARD AGGREGATES
+# ============================================================================
+
+# Per-user portfolio summary (portfolio_summary): bot totals are re-aggregated when
+# bots change or at most this old (catches engine-side capital changes)
+PORTFOLIO_SUMMARY_MAX_AGE_SECONDS = float(os.getenv('PORTFOLIO_SUMMARY_MAX_AGE_SECONDS', '30'))
+
+# Bot performance rankings (performance_ranker) are reused for this long unless a
+# trade lands for the user first
+RANKING_CACHE_TTL_SECONDS = float(os.getenv('RANKING_CACHE_TTL_SECONDS', '300'))
+
+# Pre-trade risk state (risk_engine) lives in memory and is rebuilt from Mongo at
+# least this often, or right after a bot change event
+RISK_STATE_RECONCILE_SECONDS = float(os.getenv('RISK_STATE_RECONCILE_SECONDS', '60'))
+
+# Monte Carlo risk bands (monte_carlo_risk): recent trades are block-bootstrapped
+# into equity paths, about one block (a day of trades) per simulated step
+MONTE_CARLO_PATHS = int(os.getenv('MONTE_CARLO_PATHS', '10000'))
+MONTE_CARLO_BOT_PATH_BUDGET = int(os.getenv('MONTE_CARLO_BOT_PATH_BUDGET', '10000'))  # Paths shared by all of a user's bots
+MONTE_CARLO_MIN_BOT_PATHS = int(os.getenv('MONTE_CARLO_MIN_BOT_PATHS', '200'))  # Fewer bots get bands past budget / this
+MONTE_CARLO_HORIZON_DAYS = float(os.getenv('MONTE_CARLO_HORIZON_DAYS', '365'))
+MONTE_CARLO_LOOKBACK_TRADES = int(os.getenv('MONTE_CARLO_LOOKBACK_TRADES', '2000'))
+MONTE_CARLO_MIN_TRADES = int(os.getenv('MONTE_CARLO_MIN_TRADES', '30'))
+MONTE_CARLO_MAX_STEPS = int(os.getenv('MONTE_CARLO_MAX_STEPS', '730'))  # Blocks per path (bounds the cost)
+MONTE_CARLO_CACHE_TTL_SECONDS = float(os.getenv('MONTE_CARLO_CACHE_TTL_SECONDS', '60'))
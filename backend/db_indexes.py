@@ -0,0 +1,351 @@
+"""
+Index Registry - every MongoDB index the app relies on, declared in one place
+- INDEXES: per-collection index specs, created by database.init_db() via ensure_indexes()
+- CAPPED_COLLECTIONS: event relay channels, created capped before any index
+- query_shapes(): the hot query shapes used across the codebase (filter + sort)
+- Audit CLI runs explain() on each shape and flags COLLSCANs, in-memory SORTs
+  and high docs-examined / returned ratios
+
+Usage (from backend/, against a local MongoDB):
+    python db_indexes.py audit [--mongo-url mongodb://localhost:27017] [--db amarktai_trading]
+    python db_indexes.py ensure
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+import logging
+
+from config import EVENT_RELAY_COLLECTION_BYTES
+
+logger = logging.getLogger(__name__)
+
+AUDIT_LOG_RETENTION_DAYS = 90  # Same as AuditLogger.log_retention_days
+EXAMINED_RATIO_WARN = 10  # Docs examined per doc returned before a shape is flagged
+
+# Compound keys follow equality -> sort -> range; a key prefix also serves the
+# shorter query (user_id, timestamp) covers {user_id} so no single-field index is kept
+INDEXES: Dict[str, List[Dict]] = {
+    "users": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("email", 1)], "unique": True},
+    ],
+    "api_keys": [
+        {"keys": [("user_id", 1), ("provider", 1)]},
+    ],
+    "bots": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("user_id", 1), ("status", 1)]},
+        {"keys": [("status", 1), ("user_id", 1)]},  # Scheduler scans active bots across users
+        {"keys": [("trading_mode", 1), ("status", 1)]},
+        {"keys": [("mode", 1), ("status", 1)]},  # Promotion checks
+        {"keys": [("trading_mode", 1), ("promoted_to_live", 1), ("paper_start_date", 1)]},
+        {"keys": [("created_at", 1)]},
+    ],
+    "trades": [
+        {"keys": [("user_id", 1), ("timestamp", -1)]},
+        {"keys": [("bot_id", 1), ("timestamp", -1)]},
+        {"keys": [("timestamp", -1)]},
+    ],
+    "positions": [
+        {"keys": [("trading_mode", 1), ("status", 1)]},
+        {"keys": [("bot_id", 1), ("status", 1)]},
+    ],
+    "learning_data": [
+        {"keys": [("user_id", 1), ("date", -1)]},
+    ],
+    "alerts": [
+        {"keys": [("user_id", 1), ("timestamp", -1)]},
+    ],
+    "audit_log": [
+        {"keys": [("user_id", 1), ("timestamp", -1)]},
+    ],
+    "audit_logs": [
+        {"keys": [("user_id", 1), ("timestamp", -1)]},
+        {"keys": [("timestamp", 1)], "name": "timestamp_ttl",
+         "expireAfterSeconds": AUDIT_LOG_RETENTION_DAYS * 86400},
+    ],
+    "chat_messages": [
+        {"keys": [("user_id", 1), ("timestamp", -1)]},
+        {"keys": [("timestamp", 1)]},  # Memory manager archives by age
+    ],
+    "system_modes": [
+        {"keys": [("user_id", 1)], "unique": True},
+    ],
+    "learning_logs": [
+        {"keys": [("user_id", 1), ("timestamp", -1)]},
+        {"keys": [("bot_id", 1), ("timestamp", -1)]},
+    ],
+    "autopilot_actions": [
+        {"keys": [("user_id", 1), ("timestamp", -1)]},
+        {"keys": [("action_type", 1)]},
+    ],
+    "rogue_detections": [
+        {"keys": [("user_id", 1), ("timestamp", -1)]},
+        {"keys": [("bot_id", 1), ("timestamp", -1)]},
+    ],
+    "pnl_rollups": [
+        {"keys": [("scope", 1), ("user_id", 1), ("granularity", 1), ("bucket_start", 1)]},
+        {"keys": [("scope", 1), ("bot_id", 1), ("granularity", 1), ("bucket_start", 1)]},
+    ],
+    "rate_limits": [
+        {"keys": [("expires_at", 1)], "name": "expires_at_ttl", "expireAfterSeconds": 0},
+        {"keys": [("scope", 1), ("window", 1), ("bucket", 1)]},  # Daily totals per exchange
+    ],
+    # Looked up by _id only (implicit _id index): listed so the audit covers them
+    "leader_leases": [],
+    "backtest_results": [],
+}
+
+# Event relay channels: tailable cursors need capped collections (name -> bytes)
+CAPPED_COLLECTIONS: Dict[str, int] = {
+    "worker_events": EVENT_RELAY_COLLECTION_BYTES,  # Trading worker -> API WebSocket clients
+    "scheduler_events": EVENT_RELAY_COLLECTION_BYTES,  # API -> trade dispatcher
+}
+
+ID_INDEX = {"keys": [("_id", 1)], "unique": True}  # Every collection has it; never created
+
+
+def query_shapes(now: Optional[datetime] = None) -> List[Dict]:
+    """Hot query shapes with representative values (source = where the query lives)"""
+    from bson import ObjectId
+
+    now = now or datetime.now(timezone.utc)
+    day_ago = now - timedelta(days=1)
+    return [
+        {"name": "risk_engine.user_trades_since", "collection": "trades",
+         "filter": {"user_id": "audit-user", "timestamp": {"$gte": day_ago}}},
+        {"name": "ai_bodyguard.bot_trades_since", "collection": "trades",
+         "filter": {"bot_id": "audit-bot", "timestamp": {"$gte": day_ago}},
+         "sort": [("timestamp", -1)]},
+        {"name": "paper_trading.bot_paper_trades", "collection": "trades",
+         "filter": {"bot_id": "audit-bot", "is_paper": True, "timestamp": {"$gte": day_ago}}},
+        {"name": "server.recent_user_trades", "collection": "trades",
+         "filter": {"user_id": "audit-user"}, "sort": [("timestamp", -1)]},
+        {"name": "admin.recent_trades", "collection": "trades",
+         "filter": {}, "sort": [("timestamp", -1)]},
+        {"name": "server.user_bots", "collection": "bots",
+         "filter": {"user_id": "audit-user"}},
+        {"name": "risk_engine.active_user_bots", "collection": "bots",
+         "filter": {"status": "active", "user_id": "audit-user"}},
+        {"name": "trading_scheduler.active_bots", "collection": "bots",
+         "filter": {"status": "active"}},
+        {"name": "trading_engine_production.live_bots", "collection": "bots",
+         "filter": {"trading_mode": "live", "status": "live"}},
+        {"name": "auto_promotion_manager.paper_bots", "collection": "bots",
+         "filter": {"mode": "paper", "status": "active"}},
+        {"name": "autopilot_engine.promotion_candidates", "collection": "bots",
+         "filter": {"trading_mode": "paper", "promoted_to_live": False,
+                    "paper_start_date": {"$lte": now - timedelta(days=7)}}},
+        {"name": "server.bot_by_id", "collection": "bots",
+         "filter": {"id": "audit-bot"}},
+        {"name": "trading_engine_production.open_live_positions", "collection": "positions",
+         "filter": {"trading_mode": "live", "status": "open"}},
+        {"name": "auth.user_by_email", "collection": "users",
+         "filter": {"email": "audit@example.com"}},
+        {"name": "auth.user_by_id", "collection": "users",
+         "filter": {"id": "audit-user"}},
+        {"name": "mode_manager.system_modes", "collection": "system_modes",
+         "filter": {"user_id": "audit-user"}},
+        {"name": "server.user_api_key", "collection": "api_keys",
+         "filter": {"user_id": "audit-user", "provider": "luno"}},
+        {"name": "email_reporter.user_alerts_since", "collection": "alerts",
+         "filter": {"user_id": "audit-user", "timestamp": {"$gte": day_ago}},
+         "sort": [("timestamp", -1)]},
+        {"name": "audit_logger.user_logs_since", "collection": "audit_logs",
+         "filter": {"user_id": "audit-user", "timestamp": {"$gte": now - timedelta(days=30)}},
+         "sort": [("timestamp", -1)]},
+        {"name": "audit_logger.critical_events", "collection": "audit_logs",
+         "filter": {"user_id": "audit-user", "is_critical": True,
+                    "timestamp": {"$gte": now - timedelta(days=30)}},
+         "sort": [("timestamp", -1)]},
+        {"name": "ai_chat.recent_messages", "collection": "chat_messages",
+         "filter": {"user_id": "audit-user"}, "sort": [("timestamp", -1)]},
+        {"name": "ai_memory_manager.old_messages", "collection": "chat_messages",
+         "filter": {"timestamp": {"$lt": now - timedelta(days=30)}}},
+        {"name": "self_learning.bot_learning_logs", "collection": "learning_logs",
+         "filter": {"bot_id": "audit-bot", "timestamp": {"$gte": day_ago}}},
+        {"name": "pnl_rollups.user_buckets", "collection": "pnl_rollups",
+         "filter": {"scope": "user", "user_id": "audit-user", "granularity": "day",
+                    "bucket_start": {"$gte": now - timedelta(days=30)}},
+         "sort": [("bucket_start", 1)]},
+        {"name": "rate_limiter.counters", "collection": "rate_limits",
+         "filter": {"_id": {"$in": ["exchange:luno:day:audit", "bot:audit-bot:day:audit"]}}},
+        {"name": "rate_limiter.daily_totals", "collection": "rate_limits",
+         "filter": {"scope": "exchange", "window": "day", "bucket": now.strftime("%Y-%m-%d")}},
+        {"name": "leader_election.lease", "collection": "leader_leases",
+         "filter": {"_id": "audit-lease"}},
+        {"name": "backtesting_engine.stored_points", "collection": "backtest_results",
+         "filter": {"_id": {"$in": ["audit-point"]}}},
+        {"name": "event_relay.worker_events_tail", "collection": "worker_events",
+         "filter": {"_id": {"$gt": ObjectId.from_datetime(now - timedelta(seconds=5))}}},
+        {"name": "event_relay.scheduler_events_tail", "collection": "scheduler_events",
+         "filter": {"_id": {"$gt": ObjectId.from_datetime(now - timedelta(seconds=5))}}},
+    ]
+
+
+def _split_filter(query: Dict):
+    """Equality fields vs range fields of a find() filter"""
+    equality, ranges = set(), set()
+    for field, value in query.items():
+        if isinstance(value, dict) and any(k.startswith("$") for k in value):
+            ranges.add(field)
+        else:
+            equality.add(field)
+    return equality, ranges
+
+
+def index_serves(keys: List, shape: Dict) -> bool:
+    """Whether an index (key list) bounds the shape's scan and provides its sort"""
+    equality, ranges = _split_filter(shape.get("filter", {}))
+    sort_fields = [f for f, _ in shape.get("sort", [])]
+    fields = [k for k, _ in keys]
+
+    prefix = 0
+    while prefix < len(fields) and fields[prefix] in equality:
+        prefix += 1
+    rest = fields[prefix:]
+
+    if sort_fields:
+        return rest[:len(sort_fields)] == sort_fields and (prefix > 0 or not equality)
+    if prefix == 0:
+        return bool(rest) and rest[0] in ranges and not equality
+    return not ranges or not rest or rest[0] in ranges or prefix == len(equality)
+
+
+def find_index(shape: Dict, indexes: Dict[str, List[Dict]] = INDEXES) -> Optional[Dict]:
+    """First registered index that serves a query shape (None = not covered)"""
+    for spec in indexes.get(shape["collection"], []) + [ID_INDEX]:
+        if index_serves(spec["keys"], shape):
+            return spec
+    return None
+
+
+async def ensure_capped(db, name: str) -> bool:
+    """Create a registered capped collection if missing (True = created here)"""
+    if name in await db.list_collection_names():
+        return False
+    try:
+        await db.create_collection(name, capped=True, size=CAPPED_COLLECTIONS[name])
+        return True
+    except Exception as e:
+        logger.debug(f"Capped collection {name} exists: {e}")  # Created by another process
+        return False
+
+
+async def ensure_indexes(db) -> int:
+    """Create every registered capped collection and index (idempotent)"""
+    for name in CAPPED_COLLECTIONS:
+        await ensure_capped(db, name)
+
+    created = 0
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            try:
+                await db[collection].create_index(spec["keys"], **options)
+                created += 1
+            except Exception as e:
+                logger.error(f"Index {collection}.{spec['keys']} failed: {e}")
+    return created
+
+
+def _plan_stages(plan: Dict) -> List[str]:
+    """Flatten a winning plan tree into its stage names"""
+    if not plan:
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    for child in ("queryPlan", "inputStage", "outerStage", "innerStage"):
+        if isinstance(plan.get(child), dict):
+            stages += _plan_stages(plan[child])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def analyze_explain(explain: Dict) -> Dict:
+    """Summarize explain() output: stages, docs examined/returned and problems"""
+    planner = explain.get("queryPlanner", {})
+    stages = _plan_stages(planner.get("winningPlan", {}))
+    stats = explain.get("executionStats", {})
+    examined = stats.get("totalDocsExamined", 0)
+    returned = stats.get("nReturned", 0)
+    ratio = examined / max(returned, 1)
+
+    problems = []
+    if "COLLSCAN" in stages:
+        problems.append("COLLSCAN")
+    if "SORT" in stages:
+        problems.append("in-memory SORT")
+    if ratio > EXAMINED_RATIO_WARN:
+        problems.append(f"examined/returned {ratio:.0f}x")
+
+    return {
+        "stages": stages,
+        "docs_examined": examined,
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "returned": returned,
+        "ratio": round(ratio, 2),
+        "problems": problems
+    }
+
+
+async def audit_query_shapes(db, shapes: Optional[List[Dict]] = None) -> List[Dict]:
+    """explain() every query shape against a live database"""
+    results = []
+    for shape in shapes or query_shapes():
+        cursor = db[shape["collection"]].find(shape.get("filter", {}))
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        try:
+            report = analyze_explain(await cursor.explain())
+        except Exception as e:
+            report = {"stages": [], "problems": [f"explain failed: {e}"]}
+        spec = find_index(shape)
+        report.update({
+            "name": shape["name"],
+            "collection": shape["collection"],
+            "registered_index": spec["keys"] if spec else None
+        })
+        if spec is None:
+            report["problems"].append("no registered index")
+        results.append(report)
+    return results
+
+
+def print_report(results: List[Dict]):
+    """Plain-text audit table"""
+    for r in results:
+        status = "⚠️ " if r["problems"] else "✅"
+        stages = " > ".join(r["stages"]) or "-"
+        print(f"{status} {r['name']:<48} {stages:<32} "
+              f"examined={r.get('docs_examined', 0)} returned={r.get('returned', 0)} "
+              f"ratio={r.get('ratio', 0)} {'; '.join(r['problems'])}")
+    flagged = sum(1 for r in results if r["problems"])
+    print(f"\n{len(results)} query shapes audited, {flagged} flagged")
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import os
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="MongoDB index registry and query plan audit")
+    parser.add_argument("command", choices=["audit", "ensure"])
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default=os.environ.get("DB_NAME", "amarktai_trading"))
+    parser.add_argument("--no-ensure", action="store_true", help="Audit without creating registered indexes first")
+    args = parser.parse_args()
+
+    async def main():
+        client = AsyncIOMotorClient(args.mongo_url, tz_aware=True)
+        db = client[args.db]
+        try:
+            if args.command == "ensure" or not args.no_ensure:
+                print(f"Ensured {await ensure_indexes(db)} indexes")
+            if args.command == "audit":
+                print_report(await audit_query_shapes(db))
+        finally:
+            client.close()
+
+    asyncio.run(main())
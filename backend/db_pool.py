@@ -0,0 +1,228 @@
+"""
+Database Client - one configured Motor client per process
+- create_client memoizes per URL, so every import path shares one pool
+- Pool size, timeouts, read preference and wire compression come from config
+- Compressors whose Python package is missing (zstandard, python-snappy) are
+  dropped; zlib is always available
+- PoolMetrics listens to pymongo pool events: open and checked-out connections,
+  checkout wait times and checkout failures (wait-queue timeouts) per server
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+import logging
+
+from pymongo import monitoring
+
+from config import (
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_CONNECTING, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS, MONGO_READ_PREFERENCE, MONGO_COMPRESSORS
+)
+
+logger = logging.getLogger(__name__)
+
+COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+WAIT_SAMPLES = 1000  # Recent checkout waits kept for percentiles
+
+
+def available_compressors(names: str) -> List[str]:
+    """Requested compressors (comma separated, in preference order) that can be imported"""
+    usable = []
+    for name in (n.strip() for n in names.split(',')):
+        package = COMPRESSOR_PACKAGES.get(name)
+        if not package:
+            continue
+        try:
+            __import__(package)
+            usable.append(name)
+        except ImportError:
+            logger.debug(f"MongoDB compressor {name} unavailable ({package} not installed)")
+    return usable
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool gauges and checkout wait times, fed by pymongo pool events
+
+    Events arrive on Motor's executor threads, so counters sit behind a lock and
+    checkout start times are thread-local (a checkout starts and ends on one thread).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.pools: Dict[str, Dict] = {}
+
+    def _pool(self, address) -> Dict:
+        key = f"{address[0]}:{address[1]}" if isinstance(address, tuple) else str(address)
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = {
+                "max_pool_size": MONGO_MAX_POOL_SIZE, "open": 0, "in_use": 0, "waiting": 0,
+                "created": 0, "closed": 0, "cleared": 0, "checkouts": 0, "failures": {},
+                "wait_total": 0.0, "wait_max": 0.0, "waits": deque(maxlen=WAIT_SAMPLES)
+            }
+        return pool
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)["max_pool_size"] = event.options.get("maxPoolSize", MONGO_MAX_POOL_SIZE)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address)["cleared"] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["open"] += 1
+            pool["created"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["open"] = max(0, pool["open"] - 1)
+            pool["closed"] += 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.monotonic()
+        with self._lock:
+            self._pool(event.address)["waiting"] += 1
+
+    def _checkout_done(self, pool: Dict):
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        pool["waiting"] = max(0, pool["waiting"] - 1)
+        return time.monotonic() - started if started is not None else None
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            wait = self._checkout_done(pool)
+            pool["in_use"] += 1
+            pool["checkouts"] += 1
+            if wait is not None:
+                pool["wait_total"] += wait
+                pool["wait_max"] = max(pool["wait_max"], wait)
+                pool["waits"].append(wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            self._checkout_done(pool)
+            pool["failures"][event.reason] = pool["failures"].get(event.reason, 0) + 1
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            logger.warning(f"⚠️ MongoDB pool exhausted at {event.address}: checkout timed out")
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["in_use"] = max(0, pool["in_use"] - 1)
+
+    @staticmethod
+    def _wait_ms(waits: List[float], total: float, count: int, longest: float) -> Dict:
+        ordered = sorted(waits)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2) if ordered else 0
+        return {
+            "avg": round(total / count * 1000, 2) if count else 0,
+            "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "max": round(longest * 1000, 2)
+        }
+
+    def snapshot(self) -> Dict:
+        """Per-server and total pool utilisation plus checkout wait times"""
+        with self._lock:
+            pools = {
+                key: {**{k: v for k, v in p.items() if k != "waits"}, "failures": dict(p["failures"]),
+                      "waits": list(p["waits"])}
+                for key, p in self.pools.items()
+            }
+        servers, all_waits = {}, []
+        totals = {"open": 0, "in_use": 0, "waiting": 0, "max_pool_size": 0, "checkouts": 0,
+                  "failures": 0, "wait_total": 0.0, "wait_max": 0.0}
+        for key, p in pools.items():
+            servers[key] = {
+                "open": p["open"], "in_use": p["in_use"], "waiting": p["waiting"],
+                "max_pool_size": p["max_pool_size"],
+                "utilization": round(p["in_use"] / p["max_pool_size"], 3) if p["max_pool_size"] else 0,
+                "created": p["created"], "closed": p["closed"], "cleared": p["cleared"],
+                "checkouts": p["checkouts"], "failures": p["failures"],
+                "wait_ms": self._wait_ms(p["waits"], p["wait_total"], p["checkouts"], p["wait_max"])
+            }
+            for field in ("open", "in_use", "waiting", "max_pool_size", "checkouts", "wait_total"):
+                totals[field] += p[field]
+            totals["failures"] += sum(p["failures"].values())
+            totals["wait_max"] = max(totals["wait_max"], p["wait_max"])
+            all_waits.extend(p["waits"])
+
+        return {
+            "servers": servers,
+            "open": totals["open"],
+            "in_use": totals["in_use"],
+            "waiting": totals["waiting"],
+            "utilization": round(totals["in_use"] / totals["max_pool_size"], 3) if totals["max_pool_size"] else 0,
+            "checkouts": totals["checkouts"],
+            "checkout_failures": totals["failures"],
+            "wait_ms": self._wait_ms(all_waits, totals["wait_total"], totals["checkouts"], totals["wait_max"])
+        }
+
+
+def client_options(**overrides) -> Dict:
+    """MongoClient keyword arguments for the process-wide client"""
+    options = {
+        "tz_aware": True,  # BSON dates come back as aware UTC datetimes
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxConnecting": MONGO_MAX_CONNECTING,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS or None,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "event_listeners": [pool_metrics],
+    }
+    compressors = available_compressors(MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    options.update(overrides)
+    return options
+
+
+def create_client(mongo_url: str, **overrides):
+    """Motor client with the shared pool configuration and metrics listener
+
+    One client per URL and overrides per process: `database` and `backend.database`
+    are separate module objects when both import paths are used, and each would
+    otherwise open its own pool.
+    """
+    key = (mongo_url, repr(sorted(overrides.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            return client
+        from motor.motor_asyncio import AsyncIOMotorClient
+        options = client_options(**overrides)
+        logger.info(
+            f"🗄️ MongoDB client: pool {options['minPoolSize']}-{options['maxPoolSize']}, "
+            f"read {options['readPreference']}, compressors {options.get('compressors', 'none')}"
+        )
+        client = _clients[key] = AsyncIOMotorClient(mongo_url, **options)
+        return client
+
+
+# Global instance
+pool_metrics = PoolMetrics()
+_clients: Dict[tuple, object] = {}  # (url, overrides) -> client, see create_client
+_clients_lock = threading.Lock()
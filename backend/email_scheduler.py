@@ -5,10 +5,9 @@ Runs twice daily: 8 AM and 6 PM
 import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from datetime import datetime, timezone, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
 import logging
 from email_service import email_service
+from pnl_rollups import pnl_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +17,9 @@ class EmailScheduler:
         self.db = None
         
     async def init_db(self):
-        """Initialize database connection"""
-        mongo_url = os.getenv('MONGO_URL', 'mongodb://localhost:27017')
-        db_name = os.getenv('DB_NAME', 'amarktai_trading')
-        client = AsyncIOMotorClient(mongo_url)
-        self.db = client[db_name]
+        """Use the process-wide database client (see db_pool)"""
+        from database import db
+        self.db = db
         
     async def start(self):
         """Start email scheduler"""
@@ -101,35 +98,31 @@ class EmailScheduler:
         """Calculate today's trading statistics"""
         try:
             # Get today's start time
-            today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0).isoformat()
+            today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
             
-            # Get today's trades
-            trades = await self.db.trades.find({
-                'user_id': user_id,
-                'timestamp': {'$gte': today_start}
-            }).to_list(10000)
+            # Get today's P&L buckets (user total + one per bot)
+            today_stats = pnl_rollups.summarize(await pnl_rollups.get_buckets(user_id, "day", since=today_start))
+            bot_buckets = await pnl_rollups.get_buckets(user_id, "day", since=today_start, by_bot=True)
             
             # Get all user bots
             bots = await self.db.bots.find({'user_id': user_id}, {'_id': 0}).to_list(1000)
             
             # Calculate stats
-            total_trades = len(trades)
-            winning_trades = sum(1 for t in trades if t.get('profit_loss', 0) > 0)
+            total_trades = today_stats['trades']
+            winning_trades = today_stats['wins']
             losing_trades = total_trades - winning_trades
             win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
             
-            total_profit = sum(t.get('profit_loss', 0) for t in trades)
-            total_volume = sum(t.get('amount', 0) * t.get('price', 0) for t in trades)
+            total_profit = today_stats['pnl']
+            total_volume = today_stats['volume']
             
             active_bots = sum(1 for b in bots if b.get('status') == 'active')
             total_bots = len(bots)
             
             # Best performing bot
             bot_profits = {}
-            for trade in trades:
-                bot_id = trade.get('bot_id')
-                if bot_id:
-                    bot_profits[bot_id] = bot_profits.get(bot_id, 0) + trade.get('profit_loss', 0)
+            for bucket in bot_buckets:
+                bot_profits[bucket['bot_id']] = bot_profits.get(bucket['bot_id'], 0) + bucket.get('pnl', 0)
             
             best_bot = None
             best_profit = 0
@@ -5,11 +5,12 @@ AI Data Processor Engine
 """
 
 import asyncio
-from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List
 from backend.logger_config import logger
 from backend.database import trades_collection, bots_collection
 from backend.ccxt_service import ccxt_service # For real-time market data
+from candle_store import candle_store  # Flat import: the store the background sync loop watches
+from backend.indicators import snapshot
 
 class AIDataProcessor:
     def __init__(self):
@@ -17,32 +18,28 @@ class AIDataProcessor:
 
     async def get_market_data(self, exchange: str, pair: str, timeframe: str = '1h', limit: int = 100) -> List[Dict]:
         """
-        Fetches historical OHLCV data for a given pair and exchange.
+        Historical OHLCV candles for a given pair and exchange from the local
+        candle store (oldest first, synced if the series is behind).
         """
         try:
-            # Placeholder for actual CCXT implementation
-            # In a real system, this would call ccxt_service.fetch_ohlcv
-            
-            # For now, simulate data structure
-            simulated_data = []
-            now = datetime.now(timezone.utc)
-            for i in range(limit):
-                timestamp = int((now - timedelta(hours=i)).timestamp() * 1000)
-                simulated_data.append({
-                    'timestamp': timestamp,
-                    'open': 100000 + (i * 10),
-                    'high': 100000 + (i * 10) + 50,
-                    'low': 100000 + (i * 10) - 50,
-                    'close': 100000 + (i * 10) + 20,
-                    'volume': 100 + (i * 0.5)
-                })
-            
-            # Reverse to be chronological (oldest first)
-            return simulated_data[::-1]
+            candles = await candle_store.recent(exchange, pair, timeframe, limit)
+            return candles.to_list()
         except Exception as e:
             logger.error(f"Error fetching market data for {exchange}/{pair}: {e}")
             return []
 
+    async def get_indicators(self, exchange: str, pair: str, timeframe: str = '1h', limit: int = 100) -> Dict:
+        """
+        Latest EMA, RSI, ATR, Bollinger and volatility values over the same
+        stored candles as get_market_data.
+        """
+        try:
+            candles = await candle_store.recent(exchange, pair, timeframe, limit)
+            return snapshot(candles)
+        except Exception as e:
+            logger.error(f"Error computing indicators for {exchange}/{pair}: {e}")
+            return {}
+
     async def get_bot_performance_summary(self, bot_id: str) -> Dict:
         """
         Generates a summary of the bot's recent performance.
@@ -80,6 +77,8 @@ class AIDataProcessor:
             # 1. Market Data (e.g., last 100 1-hour candles)
             market_data = await self.get_market_data(exchange, pair, timeframe='1h', limit=100)
             
+            indicators = await self.get_indicators(exchange, pair, timeframe='1h', limit=100)
+            
             # 2. Bot Performance
             performance_summary = await self.get_bot_performance_summary(bot['id'])
             
@@ -96,6 +95,7 @@ class AIDataProcessor:
                 "exchange": exchange,
                 "pair": pair,
                 "market_data": market_data,
+                "indicators": indicators,
                 "performance_summary": performance_summary,
                 "system_context": system_context
             }
@@ -50,6 +50,7 @@ class AIDecisionEngine:
                 f"Analyze the following data for bot '{bot.name}' trading {bot.trading_pair} on {bot.exchange}. "
                 f"The bot is in {bot.trading_mode} mode with {bot.risk_mode} risk.\n\n"
                 f"Market Data (OHLCV, last 100 hours):\n{data_payload['market_data']}\n\n"
+                f"Indicators (latest 1h values):\n{data_payload.get('indicators', {})}\n\n"
                 f"Bot Performance Summary:\n{data_payload['performance_summary']}\n\n"
                 "Based on this, what is the optimal trade action (BUY, SELL, HOLD)? "
                 "Respond ONLY with the required JSON format."
@@ -12,6 +12,7 @@ from datetime import datetime, timezone, timedelta
 import logging
 
 from database import db
+from time_utils import parse_timestamp
 
 logger = logging.getLogger(__name__)
 
@@ -50,7 +51,7 @@ class AuditLogger:
                 "user_id": user_id,
                 "severity": severity,
                 "details": details,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": datetime.now(timezone.utc),
                 "ip_address": details.get('ip_address', 'unknown'),
                 "user_agent": details.get('user_agent', 'unknown')
             }
@@ -165,7 +166,7 @@ class AuditLogger:
                                    event_types: List[str] = None) -> List[Dict]:
         """Get audit trail for a user"""
         try:
-            since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+            since = (datetime.now(timezone.utc) - timedelta(days=days))
             
             query = {
                 "user_id": user_id,
@@ -189,7 +190,7 @@ class AuditLogger:
     async def get_critical_events(self, user_id: str, days: int = 30) -> List[Dict]:
         """Get all critical events for a user"""
         try:
-            since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+            since = (datetime.now(timezone.utc) - timedelta(days=days))
             
             critical_logs = await audit_logs_collection.find(
                 {
@@ -215,8 +216,8 @@ class AuditLogger:
                 {
                     "user_id": user_id,
                     "timestamp": {
-                        "$gte": start_date,
-                        "$lte": end_date
+                        "$gte": parse_timestamp(start_date),
+                        "$lte": parse_timestamp(end_date)
                     }
                 },
                 {"_id": 0}
@@ -260,7 +261,7 @@ class AuditLogger:
         """Clean up audit logs older than retention period"""
         try:
             retention = days or self.log_retention_days
-            cutoff = (datetime.now(timezone.utc) - timedelta(days=retention)).isoformat()
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=retention))
             
             result = await audit_logs_collection.delete_many({
                 "timestamp": {"$lt": cutoff}
@@ -271,7 +272,7 @@ class AuditLogger:
             return {
                 "success": True,
                 "deleted_count": result.deleted_count,
-                "cutoff_date": cutoff
+                "cutoff_date": cutoff.isoformat()
             }
             
         except Exception as e:
@@ -281,7 +282,7 @@ class AuditLogger:
     async def get_statistics(self, user_id: str, days: int = 30) -> Dict:
         """Get audit log statistics"""
         try:
-            since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+            since = (datetime.now(timezone.utc) - timedelta(days=days))
             
             logs = await audit_logs_collection.find(
                 {
@@ -71,7 +71,7 @@ class AutoPromotionManager:
                 "type": "auto_promotion",
                 "severity": "high",
                 "message": f"🎉 AUTO-PROMOTED: {bot['name']} → LIVE trading! 7-day paper period complete with passing performance.",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": datetime.now(timezone.utc),
                 "dismissed": False,
                 "bot_id": bot_id
             })
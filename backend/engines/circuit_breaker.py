@@ -103,7 +103,7 @@ class CircuitBreaker:
                 "type": "circuit_breaker",
                 "severity": "critical",
                 "message": f"🚨 CIRCUIT BREAKER: {bot['name']} paused - {reason}",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": datetime.now(timezone.utc),
                 "dismissed": False
             })
             
@@ -132,7 +132,7 @@ class CircuitBreaker:
                 "type": "emergency_stop",
                 "severity": "critical",
                 "message": f"🚨 EMERGENCY STOP ACTIVATED: {reason}",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": datetime.now(timezone.utc),
                 "dismissed": False
             })
             
@@ -12,7 +12,8 @@ from datetime import datetime, timezone, timedelta
 import logging
 import os
 
-from database import bots_collection, trades_collection, alerts_collection
+from database import bots_collection, alerts_collection
+from pnl_rollups import pnl_rollups
 from engines.audit_logger import audit_logger
 
 logger = logging.getLogger(__name__)
@@ -58,17 +59,10 @@ class EmailReporter:
                 {"_id": 0}
             ).to_list(1000)
             
-            # Get yesterday's trades
-            trades = await trades_collection.find(
-                {
-                    "user_id": user_id,
-                    "timestamp": {
-                        "$gte": yesterday_start.isoformat(),
-                        "$lte": yesterday_end.isoformat()
-                    }
-                },
-                {"_id": 0}
-            ).to_list(10000)
+            # Get yesterday's P&L bucket
+            yesterday_stats = pnl_rollups.summarize(await pnl_rollups.get_buckets(
+                user_id, "day", since=yesterday_start, until=yesterday_end
+            ))
             
             # Get active alerts
             alerts = await alerts_collection.find(
@@ -84,10 +78,10 @@ class EmailReporter:
             active_bots = len([b for b in bots if b.get('status') == 'active'])
             live_bots = len([b for b in bots if b.get('mode') == 'live'])
             
-            total_trades = len(trades)
-            winning_trades = len([t for t in trades if t.get('profit_loss', 0) > 0])
+            total_trades = yesterday_stats['trades']
+            winning_trades = yesterday_stats['wins']
             
-            total_profit = sum(t.get('profit_loss', 0) for t in trades)
+            total_profit = yesterday_stats['pnl']
             
             # Get top performers
             bots_sorted = sorted(bots, key=lambda b: b.get('total_profit', 0), reverse=True)
@@ -229,7 +229,7 @@ class PromotionEngine:
                 return False, f"Paper training incomplete: {days_in_paper}/{PAPER_TRAINING_DAYS} days"
             
             # 2. Get ONLY paper trades from last 7 days
-            seven_days_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
+            seven_days_ago = (datetime.now(timezone.utc) - timedelta(days=7))
             
             paper_trades = await trades_collection.find({
                 "bot_id": bot_id,
@@ -7,6 +7,10 @@ from datetime import datetime, timezone
 from database import bots_collection, trades_collection
 from logger_config import logger
 from typing import Optional, Dict
+from market_data_hub import market_data_hub
+from portfolio_summary import portfolio_summary
+from pnl_rollups import pnl_rollups
+from performance_ranker import performance_ranker
 
 # Default risk parameters
 DEFAULT_STOP_LOSS_PCT = 2.0  # 2% stop loss
@@ -16,13 +20,17 @@ DEFAULT_TRAILING_STOP_PCT = 3.0  # 3% trailing stop
 class RiskManagement:
     def __init__(self):
         self.active_positions = {}  # Track entry prices and stops
+        self.positions_by_symbol = {}  # {(exchange, pair): set(bot_id)} for price-driven checks
+        self.exiting = set()  # bot_ids with an exit in flight
         self.is_running = False
         self.task = None
     
     async def set_position(self, bot_id: str, entry_price: float, 
                           stop_loss_pct: float = None, 
                           take_profit_pct: float = None,
-                          trailing_stop_pct: float = None):
+                          trailing_stop_pct: float = None,
+                          pair: str = None,
+                          exchange: str = None):
         """
         Set stop loss and take profit for a new position
         
@@ -32,6 +40,8 @@ class RiskManagement:
             stop_loss_pct: Stop loss percentage (default 2%)
             take_profit_pct: Take profit percentage (default 5%)
             trailing_stop_pct: Trailing stop percentage (default 3%)
+            pair: Traded pair - enables checks on every market-data update
+            exchange: Exchange the pair trades on
         """
         stop_loss = stop_loss_pct or DEFAULT_STOP_LOSS_PCT
         take_profit = take_profit_pct or DEFAULT_TAKE_PROFIT_PCT
@@ -51,9 +61,14 @@ class RiskManagement:
             'take_profit_price': take_profit_price,
             'trailing_stop_price': trailing_stop_price,
             'highest_price': entry_price,
+            'pair': pair,
+            'exchange': exchange.lower() if exchange else None,
             'opened_at': datetime.now(timezone.utc)
         }
         
+        if pair and exchange:
+            self.positions_by_symbol.setdefault((exchange.lower(), pair), set()).add(bot_id)
+        
         logger.info(f"🎯 Risk set for bot {bot_id}: SL={stop_loss}%, TP={take_profit}%, Trail={trailing}%")
     
     async def check_position(self, bot_id: str, current_price: float) -> Optional[Dict]:
@@ -117,9 +132,43 @@ class RiskManagement:
     async def close_position(self, bot_id: str):
         """Remove position from tracking"""
         if bot_id in self.active_positions:
-            del self.active_positions[bot_id]
+            position = self.active_positions.pop(bot_id)
+            key = (position.get('exchange'), position.get('pair'))
+            if key in self.positions_by_symbol:
+                self.positions_by_symbol[key].discard(bot_id)
+                if not self.positions_by_symbol[key]:
+                    del self.positions_by_symbol[key]
             logger.debug(f"Position closed for bot {bot_id}")
     
+    def on_price_update(self, exchange: str, symbol: str, ticker: Dict):
+        """Market-data hub listener - checks stops as soon as a new price lands"""
+        bot_ids = self.positions_by_symbol.get((exchange, symbol))
+        if not bot_ids or not self.is_running:
+            return
+        
+        price = ticker.get('last') or ticker.get('close')
+        if not price:
+            return
+        
+        for bot_id in list(bot_ids):
+            if bot_id not in self.exiting:
+                asyncio.create_task(self._check_and_exit(bot_id, price))
+    
+    async def _check_and_exit(self, bot_id: str, current_price: float):
+        """Check one position against a price and exit if a stop is hit"""
+        if bot_id in self.exiting:
+            return
+        
+        exit_signal = await self.check_position(bot_id, current_price)
+        if not exit_signal:
+            return
+        
+        self.exiting.add(bot_id)
+        try:
+            await self.execute_exit(bot_id, exit_signal['exit_price'], exit_signal['action'])
+        finally:
+            self.exiting.discard(bot_id)
+    
     async def execute_exit(self, bot_id: str, exit_price: float, reason: str) -> bool:
         """
         Execute exit order for a position
@@ -181,10 +230,13 @@ class RiskManagement:
                 "profit_loss": pnl_amount,
                 "profit_loss_pct": pnl_pct,
                 "exit_reason": reason,
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": datetime.now(timezone.utc)
             }
             
             await trades_collection.insert_one(trade)
+            await portfolio_summary.record_trade(trade)
+            await pnl_rollups.record_trade(trade)
+            performance_ranker.invalidate(trade.get('user_id'))
             
             # Send real-time notification
             try:
@@ -207,7 +259,7 @@ class RiskManagement:
             return False
     
     async def monitoring_loop(self):
-        """Monitor all active positions every 10 seconds"""
+        """Monitor all active positions every 10 seconds (price updates also trigger checks)"""
         logger.info("🎯 Risk management monitoring started")
         
         while self.is_running:
@@ -223,22 +275,22 @@ class RiskManagement:
                         await self.close_position(bot_id)
                         continue
                     
-                    # Get current price (simulated for now)
-                    import random
+                    # Get current price from the market-data hub (streamed or polled)
                     position = self.active_positions[bot_id]
-                    # Simulate price movement around entry
-                    current_price = position['entry_price'] * random.uniform(0.95, 1.08)
+                    pair = position.get('pair') or bot.get('pair', 'BTC/ZAR')
+                    exchange = position.get('exchange') or bot.get('exchange', 'luno')
                     
-                    # Check if exit triggered
-                    exit_signal = await self.check_position(bot_id, current_price)
+                    if not position.get('pair'):
+                        # Index it so later price updates trigger checks immediately
+                        position['pair'], position['exchange'] = pair, exchange.lower()
+                        self.positions_by_symbol.setdefault((exchange.lower(), pair), set()).add(bot_id)
                     
-                    if exit_signal:
-                        # Execute exit
-                        await self.execute_exit(
-                            bot_id, 
-                            exit_signal['exit_price'], 
-                            exit_signal['action']
-                        )
+                    current_price = await market_data_hub.get_price(pair, exchange)
+                    if not current_price:
+                        continue
+                    
+                    # Check if exit triggered
+                    await self._check_and_exit(bot_id, current_price)
                 
                 await asyncio.sleep(10)  # Check every 10 seconds
             
@@ -251,6 +303,7 @@ class RiskManagement:
         if not self.is_running:
             self.is_running = True
             self.task = asyncio.create_task(self.monitoring_loop())
+            market_data_hub.add_listener(self.on_price_update)
             logger.info("✅ Risk management started - Stop Loss, Take Profit, Trailing Stop active")
     
     def stop(self):
@@ -258,6 +311,7 @@ class RiskManagement:
         self.is_running = False
         if self.task:
             self.task.cancel()
+        market_data_hub.remove_listener(self.on_price_update)
         logger.info("⏹️ Risk management stopped")
 
 
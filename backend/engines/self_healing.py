@@ -24,7 +24,7 @@ class SelfHealingSystem:
         """Detect if bot lost >15% in 1 hour"""
         try:
             bot_id = bot['id']
-            one_hour_ago = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+            one_hour_ago = (datetime.now(timezone.utc) - timedelta(hours=1))
             
             # Get trades in last hour
             recent_trades = await trades_collection.find({
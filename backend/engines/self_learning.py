@@ -13,6 +13,7 @@ import logging
 from statistics import mean, stdev
 
 from database import trades_collection, bots_collection, learning_logs_collection
+from time_utils import parse_timestamp
 from engines.ai_model_router import ai_model_router
 
 logger = logging.getLogger(__name__)
@@ -40,7 +41,7 @@ class SelfLearningEngine:
                 return {"error": "Bot not found"}
             
             # Get recent trades (last 30 days or 50 trades, whichever is less)
-            thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
+            thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30))
             
             recent_trades = await trades_collection.find(
                 {
@@ -100,8 +101,8 @@ class SelfLearningEngine:
             patterns = {}
             
             # Time-of-day pattern
-            winning_hours = [datetime.fromisoformat(t['timestamp'].replace('Z', '+00:00')).hour for t in wins]
-            losing_hours = [datetime.fromisoformat(t['timestamp'].replace('Z', '+00:00')).hour for t in losses]
+            winning_hours = [parse_timestamp(t['timestamp']).hour for t in wins]
+            losing_hours = [parse_timestamp(t['timestamp']).hour for t in losses]
             
             if winning_hours:
                 patterns['best_trading_hours'] = max(set(winning_hours), key=winning_hours.count)
@@ -267,7 +268,7 @@ class SelfLearningEngine:
                     "bot_name": bot.get('name'),
                     "adjustments": applied,
                     "updates_applied": updates,
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "timestamp": datetime.now(timezone.utc),
                     "source": "self_learning_engine"
                 })
                 
@@ -3,24 +3,65 @@ Trade Staggerer - 24/7 Staggered Trade Execution
 - Spreads trades across the day to avoid rate limits
 - Manages concurrent execution across exchanges
 - Prevents API overload with intelligent queuing
+- Per-exchange priority heaps: O(log n) queue/pop, a bot is queued at most once
+- Token-bucket admission per exchange (one start per min_delay, no bursts) plus
+  the concurrency cap; all ages use the monotonic clock
+- The trade dispatcher uses next_slot_delay/register_trade_*; the queue
+  (add_to_queue/get_next_trade) serves callers that want priority ordering
 """
 
-import asyncio
-from typing import Dict, List
+import heapq
+import time
+from typing import Callable, Dict, List, Optional
 from datetime import datetime, timezone, timedelta
-from collections import deque
 import logging
 
-from database import bots_collection
-
 logger = logging.getLogger(__name__)
 
+BOT_COOLDOWN_SECONDS = 60  # Wait at least 1 minute between bot trades
+QUEUE_MAX_AGE_SECONDS = 30 * 60  # Drop queued requests older than 30 minutes
+STALE_TRADE_SECONDS = 10 * 60  # Active trade considered crashed after 10 minutes
+
+
+class TokenBucket:
+    """Classic token bucket on an injectable monotonic clock"""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate  # Tokens per second
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until one token is available (0 = now)"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
 class TradeStaggerer:
-    def __init__(self):
-        # Queue management
-        self.trade_queue = deque()
-        self.active_trades = {}  # {bot_id: timestamp}
-        
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+
+        # Queue management: exchange -> heap of (-priority, seq, bot_id)
+        self.queues: Dict[str, List] = {}
+        self.queued: Dict[str, Dict] = {}  # bot_id -> live request (dedup + lazy deletion)
+        self._seq = 0
+        self.active_trades = {}  # {bot_id: {"exchange", "started"}} (monotonic)
+        self.last_started = {}  # {bot_id: monotonic} for the per-bot cooldown
+
         # Rate limiting per exchange
         self.exchange_limits = {
             'luno': {'max_concurrent': 2, 'min_delay': 10},      # 2 concurrent, 10s between
@@ -29,154 +70,211 @@ class TradeStaggerer:
             'kraken': {'max_concurrent': 3, 'min_delay': 5},     # 3 concurrent, 5s between
             'valr': {'max_concurrent': 2, 'min_delay': 8}        # 2 concurrent, 8s between
         }
-        
+
+        self.buckets: Dict[str, TokenBucket] = {}
         self.last_trade_per_exchange = {}
         self.concurrent_trades_per_exchange = {}
-        
+
         # Initialize counters
         for exchange in self.exchange_limits.keys():
             self.last_trade_per_exchange[exchange] = None
             self.concurrent_trades_per_exchange[exchange] = 0
-    
+
+    def _limits(self, exchange: str) -> Dict:
+        return self.exchange_limits.get(exchange, self.exchange_limits['binance'])
+
+    def _bucket(self, exchange: str) -> TokenBucket:
+        if exchange not in self.buckets:
+            limits = self._limits(exchange)
+            # Capacity 1 keeps min_delay between any two starts; max_concurrent caps overlap
+            self.buckets[exchange] = TokenBucket(1 / limits['min_delay'], 1, self.clock)
+        return self.buckets[exchange]
+
+    def _bot_cooldown(self, bot_id: str) -> float:
+        """Seconds left before this bot may start another trade"""
+        if bot_id not in self.active_trades:
+            return 0.0
+        started = self.last_started.get(bot_id)
+        return max(0.0, BOT_COOLDOWN_SECONDS - (self.clock() - started)) if started is not None else 0.0
+
+    def next_slot_delay(self, exchange: str) -> float | None:
+        """Seconds until the exchange accepts another trade start (None = concurrency full)"""
+        exchange = exchange.lower()
+        if self.concurrent_trades_per_exchange.get(exchange, 0) >= self._limits(exchange)['max_concurrent']:
+            return None
+        return self._bucket(exchange).delay()
+
     async def can_execute_now(self, bot_id: str, exchange: str) -> tuple[bool, str]:
         """Check if a bot can execute a trade now"""
         try:
+            exchange = exchange.lower()
+
             # Check if bot already has an active trade
-            if bot_id in self.active_trades:
-                elapsed = (datetime.now(timezone.utc) - self.active_trades[bot_id]).seconds
-                if elapsed < 60:  # Wait at least 1 minute between bot trades
-                    return False, f"Bot cooldown active ({60 - elapsed}s remaining)"
-            
-            # Check exchange rate limits
-            limits = self.exchange_limits.get(exchange.lower(), self.exchange_limits['binance'])
-            
+            cooldown = self._bot_cooldown(bot_id)
+            if cooldown > 0:
+                return False, f"Bot cooldown active ({cooldown:.0f}s remaining)"
+
             # Check concurrent limit
+            limits = self._limits(exchange)
             concurrent = self.concurrent_trades_per_exchange.get(exchange, 0)
             if concurrent >= limits['max_concurrent']:
                 return False, f"Exchange concurrent limit reached ({concurrent}/{limits['max_concurrent']})"
-            
-            # Check minimum delay between trades on this exchange
-            last_trade = self.last_trade_per_exchange.get(exchange)
-            if last_trade:
-                elapsed = (datetime.now(timezone.utc) - last_trade).seconds
-                if elapsed < limits['min_delay']:
-                    return False, f"Exchange rate limit ({limits['min_delay'] - elapsed}s remaining)"
-            
+
+            # Check the exchange's token bucket
+            delay = self._bucket(exchange).delay()
+            if delay > 0:
+                return False, f"Exchange rate limit ({delay:.0f}s remaining)"
+
             return True, "OK"
-            
+
         except Exception as e:
             logger.error(f"Can execute check error: {e}")
             return False, str(e)
-    
+
     async def register_trade_start(self, bot_id: str, exchange: str):
         """Register that a trade has started"""
         try:
-            now = datetime.now(timezone.utc)
-            self.active_trades[bot_id] = now
-            self.last_trade_per_exchange[exchange] = now
-            
+            exchange = exchange.lower()
+            self._bucket(exchange).take()
+            self.active_trades[bot_id] = {"exchange": exchange, "started": self.clock()}
+            self.last_started[bot_id] = self.clock()
+            self.last_trade_per_exchange[exchange] = datetime.now(timezone.utc)
+
             current = self.concurrent_trades_per_exchange.get(exchange, 0)
             self.concurrent_trades_per_exchange[exchange] = current + 1
-            
+
             logger.debug(f"📊 Trade started: {bot_id[:8]} on {exchange} (concurrent: {current + 1})")
-            
+
         except Exception as e:
             logger.error(f"Register trade start error: {e}")
-    
+
     async def register_trade_complete(self, bot_id: str, exchange: str):
         """Register that a trade has completed"""
         try:
-            if bot_id in self.active_trades:
-                del self.active_trades[bot_id]
-            
+            exchange = exchange.lower()
+            self.active_trades.pop(bot_id, None)
+
             current = self.concurrent_trades_per_exchange.get(exchange, 0)
             self.concurrent_trades_per_exchange[exchange] = max(0, current - 1)
-            
-            logger.debug(f"✅ Trade completed: {bot_id[:8]} on {exchange} (concurrent: {current - 1})")
-            
+
+            logger.debug(f"✅ Trade completed: {bot_id[:8]} on {exchange} (concurrent: {max(0, current - 1)})")
+
         except Exception as e:
             logger.error(f"Register trade complete error: {e}")
-    
-    async def add_to_queue(self, bot_id: str, exchange: str, priority: int = 0):
-        """Add a trade request to the queue"""
+
+    async def add_to_queue(self, bot_id: str, exchange: str, priority: int = 0) -> bool:
+        """Add a trade request to the queue (False if the bot is already queued)"""
         try:
+            if bot_id in self.queued:
+                return False
+
+            exchange = exchange.lower()
+            self._seq += 1
             trade_request = {
                 "bot_id": bot_id,
                 "exchange": exchange,
                 "priority": priority,
-                "queued_at": datetime.now(timezone.utc).isoformat()
+                "seq": self._seq,
+                "queued_mono": self.clock(),
+                "queued_at": datetime.now(timezone.utc).isoformat()  # Display only
             }
-            
-            # Higher priority goes first
-            if priority > 0:
-                self.trade_queue.appendleft(trade_request)
-            else:
-                self.trade_queue.append(trade_request)
-            
-            logger.info(f"📥 Queued trade: {bot_id[:8]} on {exchange} (queue size: {len(self.trade_queue)})")
-            
+            self.queued[bot_id] = trade_request
+
+            # Higher priority goes first, then FIFO
+            heapq.heappush(self.queues.setdefault(exchange, []), (-priority, self._seq, bot_id))
+
+            logger.debug(f"📥 Queued trade: {bot_id[:8]} on {exchange} (queue size: {len(self.queued)})")
+            return True
+
         except Exception as e:
             logger.error(f"Add to queue error: {e}")
-    
+            return False
+
+    def remove_from_queue(self, bot_id: str) -> bool:
+        """Forget a queued request (its heap entry is skipped lazily)"""
+        return self.queued.pop(bot_id, None) is not None
+
+    def _head(self, exchange: str) -> Optional[Dict]:
+        """Live, fresh head of an exchange heap (drops stale and expired entries)"""
+        heap = self.queues.get(exchange)
+        now = self.clock()
+        while heap:
+            _, seq, bot_id = heap[0]
+            request = self.queued.get(bot_id)
+            if request is None or request["seq"] != seq:
+                heapq.heappop(heap)  # Removed or re-queued since
+                continue
+            age = now - request["queued_mono"]
+            if age > QUEUE_MAX_AGE_SECONDS:
+                heapq.heappop(heap)
+                del self.queued[bot_id]
+                logger.warning(f"⏰ Dropped stale trade request: {bot_id[:8]} (age: {age / 60:.1f}m)")
+                continue
+            return request
+        return None
+
     async def get_next_trade(self) -> Dict | None:
-        """Get next trade from queue that can execute now"""
+        """Get next trade from queue that can execute now
+
+        Only exchange heads are examined: O(exchanges + log n) per pop
+        """
         try:
-            if not self.trade_queue:
+            best = None
+            for exchange, heap in self.queues.items():
+                if not heap or self.next_slot_delay(exchange) != 0:
+                    continue
+
+                # Bots still cooling down are set aside until a ready one surfaces
+                cooling = []
+                request = self._head(exchange)
+                while request and self._bot_cooldown(request["bot_id"]) > 0:
+                    cooling.append(heapq.heappop(heap))
+                    request = self._head(exchange)
+                for entry in cooling:
+                    heapq.heappush(heap, entry)
+
+                if request and (best is None or (-request["priority"], request["seq"]) < (-best["priority"], best["seq"])):
+                    best = request
+
+            if best is None:
                 return None
-            
-            # Try each item in queue until we find one that can execute
-            for _ in range(len(self.trade_queue)):
-                trade_request = self.trade_queue.popleft()
-                
-                bot_id = trade_request['bot_id']
-                exchange = trade_request['exchange']
-                
-                can_execute, reason = await self.can_execute_now(bot_id, exchange)
-                
-                if can_execute:
-                    return trade_request
-                else:
-                    # Put back in queue if still relevant
-                    queued_time = datetime.fromisoformat(trade_request['queued_at'].replace('Z', '+00:00'))
-                    age_minutes = (datetime.now(timezone.utc) - queued_time).seconds / 60
-                    
-                    if age_minutes < 30:  # Only re-queue if less than 30 minutes old
-                        self.trade_queue.append(trade_request)
-                    else:
-                        logger.warning(f"⏰ Dropped stale trade request: {bot_id[:8]} (age: {age_minutes:.1f}m)")
-            
-            return None
-            
+
+            del self.queued[best["bot_id"]]  # Heap entry becomes stale
+            self._head(best["exchange"])
+            return {k: best[k] for k in ("bot_id", "exchange", "priority", "queued_at")}
+
         except Exception as e:
             logger.error(f"Get next trade error: {e}")
             return None
-    
+
     async def calculate_daily_schedule(self, user_id: str) -> Dict:
         """Calculate staggered schedule for all active bots"""
         try:
+            from database import bots_collection
+
             # Get all active bots
             bots = await bots_collection.find(
                 {"user_id": user_id, "status": "active"},
                 {"_id": 0, "id": 1, "name": 1, "exchange": 1}
             ).to_list(1000)
-            
+
             if not bots:
                 return {"schedules": [], "message": "No active bots"}
-            
+
             # Calculate time slots for 24 hours
             # Spread bots evenly across the day
             total_bots = len(bots)
             minutes_per_day = 1440  # 24 * 60
             slot_duration = minutes_per_day / total_bots
-            
+
             schedules = []
             current_time = datetime.now(timezone.utc)
-            
+
             for i, bot in enumerate(bots):
                 # Calculate next trade time for this bot
                 offset_minutes = int(i * slot_duration)
                 next_trade_time = current_time + timedelta(minutes=offset_minutes)
-                
+
                 schedules.append({
                     "bot_id": bot['id'],
                     "bot_name": bot['name'],
@@ -185,60 +283,60 @@ class TradeStaggerer:
                     "slot_number": i + 1,
                     "time_offset_minutes": offset_minutes
                 })
-            
+
             return {
                 "total_bots": total_bots,
                 "slot_duration_minutes": slot_duration,
                 "schedules": schedules,
                 "generated_at": datetime.now(timezone.utc).isoformat()
             }
-            
+
         except Exception as e:
             logger.error(f"Calculate schedule error: {e}")
             return {"error": str(e)}
-    
+
     async def get_queue_status(self) -> Dict:
         """Get current queue and execution status"""
         try:
+            upcoming = sorted(self.queued.values(), key=lambda r: (-r["priority"], r["seq"]))[:10]
             return {
-                "queue_size": len(self.trade_queue),
+                "queue_size": len(self.queued),
+                "queue_by_exchange": {
+                    ex: sum(1 for r in self.queued.values() if r["exchange"] == ex) for ex in self.queues
+                },
                 "active_trades": len(self.active_trades),
                 "concurrent_by_exchange": dict(self.concurrent_trades_per_exchange),
+                "tokens_by_exchange": {ex: round(b.tokens, 2) for ex, b in self.buckets.items()},
                 "queue_items": [
                     {
                         "bot_id": item['bot_id'][:8],
                         "exchange": item['exchange'],
                         "queued_at": item['queued_at']
                     }
-                    for item in list(self.trade_queue)[:10]  # Show first 10
+                    for item in upcoming  # Show first 10
                 ]
             }
-            
+
         except Exception as e:
             logger.error(f"Get queue status error: {e}")
             return {"error": str(e)}
-    
+
     async def clear_stale_trades(self):
         """Clean up stale active trades (e.g., if trade crashed)"""
         try:
-            now = datetime.now(timezone.utc)
-            stale_bots = []
-            
-            for bot_id, timestamp in list(self.active_trades.items()):
-                age_minutes = (now - timestamp).seconds / 60
-                
-                if age_minutes > 10:  # Consider stale after 10 minutes
-                    stale_bots.append(bot_id)
-            
-            for bot_id in stale_bots:
-                del self.active_trades[bot_id]
-                logger.warning(f"🧹 Cleaned up stale trade: {bot_id[:8]}")
-            
-            if stale_bots:
-                # Reset concurrent counters
-                for exchange in self.concurrent_trades_per_exchange.keys():
-                    self.concurrent_trades_per_exchange[exchange] = 0
-                    
+            now = self.clock()
+
+            for bot_id, trade in list(self.active_trades.items()):
+                age = now - trade["started"]
+                if age > STALE_TRADE_SECONDS:
+                    del self.active_trades[bot_id]
+                    exchange = trade["exchange"]
+                    # Release only the slot this trade held
+                    self.concurrent_trades_per_exchange[exchange] = max(
+                        0, self.concurrent_trades_per_exchange.get(exchange, 0) - 1
+                    )
+                    logger.warning(f"🧹 Cleaned up stale trade: {bot_id[:8]}")
+
         except Exception as e:
             logger.error(f"Clear stale trades error: {e}")
 
@@ -13,6 +13,7 @@ import logging
 from database import trades_collection, bots_collection, api_keys_collection
 from ccxt_service import CCXTService
 from engines.risk_management import risk_management
+from market_data_hub import market_data_hub
 from config import *
 
 logger = logging.getLogger(__name__)
@@ -73,9 +74,17 @@ class LiveTradingEngine:
         
         return symbol_map.get(exchange_name, {}).get(symbol, symbol)
     
-    async def get_real_price(self, exchange: ccxt.Exchange, symbol: str) -> Optional[float]:
-        """Get real current price from exchange"""
+    async def get_real_price(self, exchange: ccxt.Exchange, symbol: str, pair: Optional[str] = None) -> Optional[float]:
+        """Get real current price (streamed/polled snapshot first, REST on a miss)
+
+        The hub keys snapshots by unified pair ('BTC/ZAR'): pass it as `pair` when
+        `symbol` is exchange-normalized ('XBTZAR').
+        """
         try:
+            ticker = market_data_hub.peek_ticker(pair or symbol, exchange.id)
+            if ticker:
+                return ticker.get('last') or ticker.get('close')
+            
             ticker = await asyncio.to_thread(exchange.fetch_ticker, symbol)
             return ticker.get('last') or ticker.get('close')
         except Exception as e:
@@ -183,7 +192,7 @@ class LiveTradingEngine:
             
             # Paper trading (realistic simulation with real prices)
             if paper_mode:
-                current_price = await self.get_real_price(exchange, normalized_symbol) if exchange else None
+                current_price = await self.get_real_price(exchange, normalized_symbol, symbol) if exchange else None
                 if not current_price:
                     # Fallback to default prices if exchange unavailable
                     current_price = 1000000 if 'BTC' in symbol else 50000
@@ -229,7 +238,7 @@ class LiveTradingEngine:
             # LIVE TRADING - Real orders
             else:
                 # Check risk before placing order
-                position_value = amount * (price or await self.get_real_price(exchange, normalized_symbol))
+                position_value = amount * (price or await self.get_real_price(exchange, normalized_symbol, symbol))
                 risk_ok, risk_reason = await risk_management.check_trade_risk(
                     user_id, bot_id, exchange_name, position_value, bot_data.get('risk_mode', 'safe')
                 )
@@ -403,7 +412,7 @@ class LiveTradingEngine:
                 "type": "stop_loss" if reason == "stop_loss" else "take_profit",
                 "severity": "high",
                 "message": f"Position closed: {bot['name']} - {trade['pair']} at R{exit_price:.2f} ({reason})",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": datetime.now(timezone.utc),
                 "dismissed": False
             })
             
@@ -22,6 +22,10 @@ from .trade_limiter import trade_limiter
 from .ai_decision_engine import ai_decision_engine
 from .risk_engine import risk_engine # For checking SL/TP/TS
 from backend.realtime_events import rt_events
+from backend.portfolio_summary import portfolio_summary
+from backend.pnl_rollups import pnl_rollups
+from performance_ranker import performance_ranker  # Flat import: the instance the scheduler and allocator read
+from risk_engine import risk_engine as portfolio_risk  # Pre-trade checks (engines.risk_engine handles exits)
 
 class TradingEngineProduction:
     
@@ -177,6 +181,7 @@ class TradingEngineProduction:
             
             await positions_collection.insert_one(new_position.model_dump())
             await trade_limiter.record_trade(bot.id)
+            await portfolio_risk.record_exposure(bot.user_id, bot.trading_pair, new_position.entry_price * new_position.entry_qty)
             logger.info(f"Live Entry: {bot.name} {side} {new_position.entry_qty:.4f} {bot.trading_pair} @ {new_position.entry_price:.2f}")
             
             # 6. Real-Time Event Broadcast
@@ -253,7 +258,11 @@ class TradingEngineProduction:
                 ai_reasoning=position.ai_reasoning
             )
             
-            await trades_collection.insert_one(trade_history.model_dump())
+            trade_doc = trade_history.model_dump()
+            await trades_collection.insert_one(trade_doc)
+            await portfolio_summary.record_trade(trade_doc)
+            await pnl_rollups.record_trade(trade_doc)
+            performance_ranker.invalidate(trade_doc.get('user_id'))
             
             # 6. Update Bot stats (Capital update handled by Capital Allocator in next phase)
             is_win = pnl_net > 0
@@ -272,6 +281,8 @@ class TradingEngineProduction:
                 {"id": position.id},
                 {"$set": {"status": "closed"}}
             )
+            await portfolio_risk.record_exposure(position.user_id, position.pair, -position.entry_price * position.entry_qty)
+            await portfolio_risk.record_trade_result(position.user_id, pnl_net, position.bot_id)
             
             logger.info(f"Live Exit: {position.bot_id} {exit_reason} PnL: {pnl_net:.2f}")
             
@@ -0,0 +1,148 @@
+"""
+Event Coalescer - batches dashboard events per user into frames
+- A user's events collect for REALTIME_FRAME_MS (or until REALTIME_FRAME_MAX_EVENTS)
+  and go out as one {"type": "frame", "events": [...]} message
+- Latest-value events collapse inside a frame: profit_updated per bot,
+  bot_updated per bot (changes merged), system_mode_update per mode,
+  countdown_update and force_refresh; others keep arrival order
+- websocket_manager expands frames for plain JSON clients and turns them into
+  JSON-patch deltas of the dashboard state for clients that negotiated frames
+"""
+
+import asyncio
+import copy
+from typing import Awaitable, Callable, Dict, List, Optional
+import logging
+
+from config import REALTIME_FRAME_MS, REALTIME_FRAME_MAX_EVENTS
+
+logger = logging.getLogger(__name__)
+
+
+def collapse_key(message: dict) -> Optional[tuple]:
+    """Events where a later one for the same key supersedes the earlier one"""
+    kind = message.get("type")
+    if kind in ("force_refresh", "countdown_update"):
+        return (kind,)
+    if kind == "profit_updated":
+        return (kind, message.get("bot_name"))
+    if kind == "bot_updated":
+        return (kind, message.get("bot_id"))
+    if kind == "system_mode_update":
+        return (kind, message.get("mode"))
+    return None
+
+
+def fold_state(state: dict, message: dict) -> bool:
+    """Apply a latest-value event to a dashboard state dict; False if it is not state"""
+    kind = message.get("type")
+    if kind == "profit_updated":
+        state.setdefault("profit", {})[message.get("bot_name") or "total"] = message.get("total_profit")
+    elif kind == "bot_updated":
+        state.setdefault("bots", {}).setdefault(message.get("bot_id"), {}).update(message.get("changes") or {})
+    elif kind == "system_mode_update" and "mode" in message:
+        state.setdefault("modes", {})[message["mode"]] = message.get("enabled")
+    elif kind == "countdown_update":
+        state["countdown"] = {"days": message.get("days"), "current_capital": message.get("current_capital")}
+    else:
+        return False
+    return True
+
+
+def _pointer(path: str, key) -> str:
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def json_patch(old, new, path: str = "") -> List[dict]:
+    """RFC 6902 operations turning old into new (dicts recurse, other values replace)"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": _pointer(path, key)})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": _pointer(path, key), "value": value})
+            elif old[key] != value:
+                ops.extend(json_patch(old[key], value, _pointer(path, key)))
+        return ops
+    if old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+class EventCoalescer:
+    def __init__(self, send: Optional[Callable[[str, dict], Awaitable]] = None,
+                 frame_ms: float = REALTIME_FRAME_MS, max_events: int = REALTIME_FRAME_MAX_EVENTS):
+        self._send = send
+        self.frame_interval = frame_ms / 1000
+        self.max_events = max_events
+        self._pending: Dict[str, List[dict]] = {}  # user_id -> events in order
+        self._keyed: Dict[str, Dict[tuple, dict]] = {}  # user_id -> collapse key -> queued event
+        self._timers: Dict[str, asyncio.Task] = {}
+        self.stats = {"events": 0, "collapsed": 0, "frames": 0, "errors": 0}
+
+    def _sender(self):
+        if self._send is None:
+            from websocket_manager import manager
+            self._send = manager.send_message
+        return self._send
+
+    async def add(self, user_id: str, message: dict):
+        """Queue an event for the user's next frame"""
+        self.stats["events"] += 1
+        events = self._pending.setdefault(user_id, [])
+        keyed = self._keyed.setdefault(user_id, {})
+        key = collapse_key(message)
+        if key is not None and key in keyed:
+            queued = keyed[key]
+            if message.get("type") == "bot_updated":
+                changes = {**(queued.get("changes") or {}), **(message.get("changes") or {})}
+                queued.clear()
+                queued.update(message, changes=changes)
+            else:
+                queued.clear()
+                queued.update(message)
+            self.stats["collapsed"] += 1
+            return
+        event = copy.copy(message)
+        events.append(event)
+        if key is not None:
+            keyed[key] = event
+
+        if len(events) >= self.max_events:
+            await self.flush(user_id)
+        elif user_id not in self._timers:
+            self._timers[user_id] = asyncio.create_task(self._flush_later(user_id))
+
+    async def _flush_later(self, user_id: str):
+        try:
+            await asyncio.sleep(self.frame_interval)
+        except asyncio.CancelledError:
+            return
+        self._timers.pop(user_id, None)
+        await self.flush(user_id)
+
+    async def flush(self, user_id: Optional[str] = None):
+        """Send pending frames now (one user, or everyone)"""
+        for uid in ([user_id] if user_id else list(self._pending)):
+            timer = self._timers.pop(uid, None)
+            if timer and timer is not asyncio.current_task():
+                timer.cancel()
+            events = self._pending.pop(uid, None)
+            self._keyed.pop(uid, None)
+            if not events:
+                continue
+            try:
+                await self._sender()(uid, {"type": "frame", "events": events})
+                self.stats["frames"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Event frame send error for {uid[:8]}: {e}")
+
+    def get_status(self) -> dict:
+        return {"pending_users": len(self._pending), **self.stats}
+
+
+# Global instance
+event_coalescer = EventCoalescer()
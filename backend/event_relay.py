@@ -0,0 +1,290 @@
+"""
+Event Relay - pub/sub backbone for dashboard events across processes
+- manager.send_message() publishes here; every API worker subscribes and delivers
+  to its own WebSocket clients, so an event reaches the user whichever worker
+  holds their socket (the trading worker only publishes)
+- Per-user channels: a worker subscribes for the users whose sockets it holds and
+  the server-side filter only returns their events (plus user_id=None broadcasts)
+- Backends (WS_PUBSUB_BACKEND):
+  capped       - tailable cursor on a capped collection, works on a standalone mongod
+  changestream - change stream on the same collection (replica set; falls back to capped)
+  memory       - in-process delivery for single-node runs
+- Other channels pass a handler instead (e.g. scheduler_events: API -> trading dispatcher)
+- Tail cursors restart with a few seconds of overlap and skip already delivered
+  ids: ObjectIds from different publishers are not in insertion order
+"""
+
+import asyncio
+import os
+import socket
+from collections import deque
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional
+import logging
+
+from config import WS_PUBSUB_BACKEND
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("capped", "changestream", "memory")
+RESUME_OVERLAP_SECONDS = 5  # Restarted tail cursors re-read this far back (duplicates are skipped)
+RECENT_IDS = 5000  # Delivered event ids remembered for that de-duplication
+
+
+class EventRelay:
+    def __init__(self, collection_name: str = "worker_events", collection=None, handler=None,
+                 backend: str = WS_PUBSUB_BACKEND, per_user: bool = False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown event relay backend {backend!r} (expected one of {BACKENDS})")
+        self.collection_name = collection_name
+        self._collection = collection
+        self.handler = handler  # async handler(doc); default delivers to WebSocket clients
+        self.backend = backend
+        self.per_user = per_user  # Only receive events for subscribed users
+        self.subscriptions: Dict[str, int] = {}  # user_id -> local subscriber count
+        self._resubscribe = asyncio.Event()
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_publisher = False  # Publish-only process (trading worker)
+        self.is_running = False
+        self.task = None
+        self.stats = {"published": 0, "delivered": 0, "errors": 0, "resubscribes": 0}
+        self._recent_ids = deque(maxlen=RECENT_IDS)
+        self._recent_set = set()
+
+    async def _get_collection(self):
+        """Capped collection (db_indexes.CAPPED_COLLECTIONS), created on first use"""
+        if self._collection is None:
+            from database import db
+            from db_indexes import ensure_capped
+            await ensure_capped(db, self.collection_name)
+            self._collection = db[self.collection_name]
+        return self._collection
+
+    # ------------------------------------------------------------------
+    # Channels
+    # ------------------------------------------------------------------
+
+    def subscribe(self, user_id: str):
+        """A local socket for this user opened; restart the feed if the user is new here"""
+        self.subscriptions[user_id] = self.subscriptions.get(user_id, 0) + 1
+        if self.subscriptions[user_id] == 1:
+            self._resubscribe.set()
+
+    def unsubscribe(self, user_id: str):
+        count = self.subscriptions.get(user_id, 0) - 1
+        if count > 0:
+            self.subscriptions[user_id] = count
+        elif self.subscriptions.pop(user_id, None) is not None:
+            self._resubscribe.set()
+
+    def wants(self, doc: dict) -> bool:
+        user_id = doc.get("user_id")
+        return not self.per_user or user_id is None or user_id in self.subscriptions
+
+    def _user_filter(self, prefix: str = "") -> dict:
+        """Server-side channel filter: broadcasts plus this worker's users"""
+        if not self.per_user:
+            return {}
+        return {"$or": [
+            {f"{prefix}user_id": None},
+            {f"{prefix}user_id": {"$in": sorted(self.subscriptions)}}
+        ]}
+
+    # ------------------------------------------------------------------
+    # Publish / deliver
+    # ------------------------------------------------------------------
+
+    async def publish(self, message: dict, user_id: str = None) -> bool:
+        """Hand one event to every subscribed process (user_id=None means all users)"""
+        doc = {
+            "user_id": user_id,
+            "message": message,
+            "origin": self.origin,
+            "created_at": datetime.now(timezone.utc)
+        }
+        try:
+            if self.backend == "memory":
+                self.stats["published"] += 1
+                if self.is_running and self.wants(doc):
+                    await self._deliver(doc)
+                return True
+            collection = await self._get_collection()
+            await collection.insert_one(doc)
+            self.stats["published"] += 1
+            return True
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Event relay publish error: {e}")
+            return False
+
+    async def _deliver(self, doc: dict):
+        """Send one relayed event to this process's WebSocket clients"""
+        if self.handler is not None:
+            await self.handler(doc)
+            self.stats["delivered"] += 1
+            return
+
+        from websocket_manager import manager
+
+        if doc.get("user_id"):
+            await manager.deliver_local(doc["message"], doc["user_id"])
+        else:
+            await manager.deliver_local_all(doc["message"])
+        self.stats["delivered"] += 1
+
+    async def _deliver_safely(self, doc: dict):
+        try:
+            await self._deliver(doc)
+        except Exception as e:
+            logger.error(f"Event relay delivery error: {e}")
+
+    # ------------------------------------------------------------------
+    # Feeds
+    # ------------------------------------------------------------------
+
+    def _resume_floor(self, last_time: Optional[datetime], resubscribe: bool = False):
+        """Restart point for the tail cursor
+
+        ObjectIds from different publishers in the same second sort by their
+        per-process bytes, not by insertion, so `_id > last delivered id` can
+        skip events. Restarts re-read RESUME_OVERLAP_SECONDS before the newest
+        delivered event instead and drop ids already delivered. After a
+        resubscribe the cursor was live until now, so the overlap is measured
+        from now (newly subscribed users get only that much history).
+        """
+        from bson import ObjectId
+        now = datetime.now(timezone.utc)
+        start = now if resubscribe or last_time is None else min(last_time, now)
+        return ObjectId.from_datetime(start - timedelta(seconds=RESUME_OVERLAP_SECONDS))
+
+    def _first_delivery(self, doc_id) -> bool:
+        """True once per event id (re-read overlap after a cursor restart)"""
+        if doc_id in self._recent_set:
+            return False
+        if len(self._recent_ids) == self._recent_ids.maxlen:
+            self._recent_set.discard(self._recent_ids[0])
+        self._recent_ids.append(doc_id)
+        self._recent_set.add(doc_id)
+        return True
+
+    def _tail_query(self, floor) -> dict:
+        query = {"_id": {"$gt": floor}} if floor else {}
+        return {**query, **self._user_filter()}
+
+    async def _tail_loop(self):
+        """Follow the capped collection from its current end"""
+        from pymongo import CursorType
+
+        floor = None
+        last_time = None  # Newest delivered event (ObjectId time)
+        started = False
+        backoff = 1
+        while self.is_running:
+            try:
+                collection = await self._get_collection()
+                if not started:
+                    latest = await collection.find_one({}, sort=[("$natural", -1)])
+                    floor = latest["_id"] if latest else None  # Start at the current end
+                    started = True
+                elif self._resubscribe.is_set():
+                    self.stats["resubscribes"] += 1
+                    floor = self._resume_floor(last_time, resubscribe=True)
+                else:
+                    floor = self._resume_floor(last_time)
+                self._resubscribe.clear()
+
+                cursor = collection.find(self._tail_query(floor), cursor_type=CursorType.TAILABLE_AWAIT)
+                while self.is_running and cursor.alive and not self._resubscribe.is_set():
+                    async for doc in cursor:
+                        created = doc["_id"].generation_time
+                        last_time = created if last_time is None else max(last_time, created)
+                        if self._first_delivery(doc["_id"]):
+                            await self._deliver_safely(doc)
+                    backoff = 1
+                    await asyncio.sleep(0.1)
+                await cursor.close()
+                if not self._resubscribe.is_set():
+                    await asyncio.sleep(1)  # Dead cursor (e.g. empty collection) - reopen
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Event relay tail error: {e} - retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    async def _change_stream_loop(self):
+        """Watch inserts through a change stream; resume tokens survive resubscribes"""
+        from pymongo.errors import OperationFailure
+
+        token = None
+        backoff = 1
+        while self.is_running:
+            try:
+                collection = await self._get_collection()
+                self._resubscribe.clear()
+                pipeline = [{"$match": {"operationType": "insert", **self._user_filter("fullDocument.")}}]
+                async with collection.watch(pipeline, resume_after=token, max_await_time_ms=500) as stream:
+                    while self.is_running and not self._resubscribe.is_set():
+                        change = await stream.try_next()
+                        token = stream.resume_token
+                        if change is not None:
+                            await self._deliver_safely(change["fullDocument"])
+                        backoff = 1
+                if self._resubscribe.is_set():
+                    self.stats["resubscribes"] += 1
+            except asyncio.CancelledError:
+                break
+            except OperationFailure as e:
+                if e.code == 40573:  # Change streams need a replica set
+                    logger.warning("⚠️ Change streams unavailable (standalone mongod) - tailing the capped collection")
+                    self.backend = "capped"
+                    await self._tail_loop()
+                    return
+                self.stats["errors"] += 1
+                logger.warning(f"Event relay change stream error: {e} - retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Event relay change stream error: {e} - retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    async def start_publisher(self):
+        """Trading worker: publish events, deliver none (it has no sockets)"""
+        self.is_publisher = True
+        if self.backend != "memory":
+            await self._get_collection()
+        logger.info(f"📤 Event relay publishing to {self.collection_name} ({self.backend})")
+
+    async def start(self):
+        """Subscriber side: deliver relayed events to this process"""
+        if self.is_running:
+            return
+        self.is_running = True
+        if self.backend == "changestream":
+            self.task = asyncio.create_task(self._change_stream_loop())
+        elif self.backend == "capped":
+            self.task = asyncio.create_task(self._tail_loop())
+        logger.info(f"📥 Event relay subscribed to {self.collection_name} ({self.backend})")
+
+    async def stop(self):
+        self.is_running = False
+        self.is_publisher = False
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    def get_status(self) -> dict:
+        return {
+            "backend": self.backend,
+            "publisher": self.is_publisher,
+            "subscribed": self.is_running,
+            "users": len(self.subscriptions) if self.per_user else None,
+            **self.stats
+        }
+
+
+# Global instance - WebSocket fan-out, one channel per user
+event_relay = EventRelay(per_user=True)
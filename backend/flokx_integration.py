@@ -126,7 +126,7 @@ class FLOKxIntegration:
                 "title": f"FLOKx Intelligence: {pair}",
                 "message": alert_message,
                 "data": coeffs,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": datetime.now(timezone.utc),
                 "read": False
             }
             
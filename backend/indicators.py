@@ -0,0 +1,326 @@
+"""
+Indicators - technical indicators in batch and streaming form
+- Batch functions take numpy arrays (e.g. CandleSeries columns) for backfills
+  and replays; values before an indicator has enough input are NaN
+- Streaming classes update in O(1) per value and give the same numbers as the
+  batch functions over the same input
+- EMA seeds from the SMA of its first `period` values; RSI and ATR use Wilder
+  smoothing (alpha = 1/period) seeded the same way
+- Variances are population variances (ddof=0); rolling ones use Welford updates
+  over a ring buffer, bounded by size and/or age
+"""
+
+import math
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+_EWM_SCALE_LIMIT = 1e12  # Largest decay factor the chunked EWM lets build up (precision)
+
+
+# ---------------------------------------------------------------------------
+# Batch
+# ---------------------------------------------------------------------------
+
+def _ewm(values: np.ndarray, alpha: float, seed: float) -> np.ndarray:
+    """y[t] = (1 - alpha) * y[t-1] + alpha * x[t] with y[-1] = seed, in vectorized chunks"""
+    out = np.empty(len(values))
+    decay = 1.0 - alpha
+    if decay <= 0:
+        out[:] = values
+        return out
+    chunk = max(int(math.log(_EWM_SCALE_LIMIT) / -math.log(decay)), 1)
+    powers = decay ** np.arange(1, chunk + 1)
+    previous = seed
+    for start in range(0, len(values), chunk):
+        x = values[start:start + chunk]
+        p = powers[:len(x)]
+        # Sum over j <= t of decay^(t-j) * x[j] = decay^t * cumsum(x[j] / decay^j)
+        weighted = np.cumsum(x * (decay / p)) * p / decay
+        out[start:start + len(x)] = p * previous + alpha * weighted
+        previous = out[start + len(x) - 1]
+    return out
+
+
+def _smoothed(values: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if period < 1 or len(values) < period:
+        return out
+    out[period - 1] = values[:period].mean()
+    out[period:] = _ewm(values[period:], alpha, out[period - 1])
+    return out
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """Exponential moving average (alpha = 2 / (period + 1))"""
+    return _smoothed(values, period, 2.0 / (period + 1))
+
+
+def wilder(values: np.ndarray, period: int) -> np.ndarray:
+    """Wilder's smoothing (alpha = 1 / period), used by RSI and ATR"""
+    return _smoothed(values, period, 1.0 / period)
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    rsi = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), rsi)
+    return np.where(np.isnan(avg_gain), np.nan, rsi)
+
+
+def rsi(closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """Wilder RSI; the first value is at index `period`"""
+    closes = np.asarray(closes, dtype=np.float64)
+    out = np.full(len(closes), np.nan)
+    if len(closes) <= period:
+        return out
+    delta = np.diff(closes)
+    out[1:] = _rsi_from_averages(wilder(np.maximum(delta, 0), period), wilder(np.maximum(-delta, 0), period))
+    return out
+
+
+def true_range(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    highs, lows, closes = (np.asarray(a, dtype=np.float64) for a in (highs, lows, closes))
+    tr = highs - lows
+    if len(closes) > 1:
+        previous = closes[:-1]
+        tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(highs[1:] - previous), np.abs(lows[1:] - previous)))
+    return tr
+
+
+def atr(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """Average true range (Wilder); the first candle's range is its high - low"""
+    return wilder(true_range(highs, lows, closes), period)
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums = np.concatenate(([0.0], np.cumsum(values)))
+        out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Population std over each window (computed per window, no cancellation on large prices)"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = sliding_window_view(values, window).std(axis=1)
+    return out
+
+
+def bollinger(closes: np.ndarray, period: int = 20, width: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(middle, upper, lower) bands"""
+    middle = rolling_mean(closes, period)
+    spread = width * rolling_std(closes, period)
+    return middle, middle + spread, middle - spread
+
+
+def log_returns(closes: np.ndarray) -> np.ndarray:
+    closes = np.asarray(closes, dtype=np.float64)
+    return np.log(closes[1:] / closes[:-1])
+
+
+def rolling_volatility(closes: np.ndarray, window: int = 20) -> np.ndarray:
+    """Std of the last `window` log returns, aligned to the closes (per candle, not annualized)"""
+    out = np.full(len(closes), np.nan)
+    if len(closes) > window:
+        out[1:] = rolling_std(log_returns(closes), window)
+    return out
+
+
+def trend_change_pct(closes: np.ndarray, recent: int = 5, older: int = 10) -> np.ndarray:
+    """% change of the mean of the last `recent` closes against the `older` closes before them"""
+    closes = np.asarray(closes, dtype=np.float64)
+    recent_mean = rolling_mean(closes, recent)
+    older_mean = np.full(len(closes), np.nan)
+    older_mean[recent:] = rolling_mean(closes, older)[:-recent]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (recent_mean - older_mean) / older_mean * 100
+
+
+def snapshot(candles) -> Dict[str, Optional[float]]:
+    """Latest indicator values for a CandleSeries (None where there is too little history)"""
+    def last(values, digits=4):
+        value = float(values[-1]) if len(values) else math.nan
+        return None if math.isnan(value) else round(value, digits)
+
+    closes = np.asarray(candles.close, dtype=np.float64)
+    middle, upper, lower = bollinger(closes)
+    return {
+        "ema_12": last(ema(closes, 12)),
+        "ema_26": last(ema(closes, 26)),
+        "rsi_14": last(rsi(closes, 14), 2),
+        "atr_14": last(atr(candles.high, candles.low, closes, 14)),
+        "bollinger_middle": last(middle),
+        "bollinger_upper": last(upper),
+        "bollinger_lower": last(lower),
+        "volatility_20": last(rolling_volatility(closes, 20), 6),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Streaming
+# ---------------------------------------------------------------------------
+
+class RollingStats:
+    """Mean and variance of the last `size` values and/or those newer than `max_age`"""
+
+    def __init__(self, size: Optional[int] = None, max_age: Optional[float] = None):
+        self.size = size
+        self.max_age = max_age
+        self.values = deque(maxlen=size)  # (timestamp, value)
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self):
+        return len(self.values)
+
+    def _add(self, value: float):
+        n = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / n
+        self._m2 += delta * (value - self.mean)
+
+    def _remove(self, value: float):
+        n = len(self.values)
+        if n == 0:
+            self.mean, self._m2 = 0.0, 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / n
+        self._m2 = max(self._m2 - delta * (value - self.mean), 0.0)
+
+    def push(self, value: float, timestamp: Optional[float] = None):
+        value = float(value)
+        if self.size and len(self.values) == self.size:
+            _, evicted = self.values.popleft()
+            self._remove(evicted)
+        self.values.append((timestamp, value))
+        self._add(value)
+        if self.max_age is not None and timestamp is not None:
+            self.expire(timestamp - self.max_age)
+
+    def expire(self, before: float):
+        """Drop values stamped at or before `before`"""
+        while self.values and self.values[0][0] is not None and self.values[0][0] <= before:
+            _, evicted = self.values.popleft()
+            self._remove(evicted)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / len(self.values) if self.values else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def first(self) -> Optional[float]:
+        return self.values[0][1] if self.values else None
+
+    @property
+    def last(self) -> Optional[float]:
+        return self.values[-1][1] if self.values else None
+
+
+class _Smoothed:
+    """Streaming counterpart of _smoothed(): SMA seed, then exponential updates"""
+
+    def __init__(self, period: int, alpha: float):
+        self.period = period
+        self.alpha = alpha
+        self.value: Optional[float] = None
+        self._seed_sum = 0.0
+        self._seen = 0
+
+    def update(self, x: float) -> Optional[float]:
+        if self.value is not None:
+            self.value += self.alpha * (x - self.value)
+            return self.value
+        self._seen += 1
+        self._seed_sum += x
+        if self._seen == self.period:
+            self.value = self._seed_sum / self.period
+        return self.value
+
+
+class EMA(_Smoothed):
+    def __init__(self, period: int):
+        super().__init__(period, 2.0 / (period + 1))
+
+
+class Wilder(_Smoothed):
+    def __init__(self, period: int):
+        super().__init__(period, 1.0 / period)
+
+
+class RSI:
+    def __init__(self, period: int = 14):
+        self.gains = Wilder(period)
+        self.losses = Wilder(period)
+        self.value: Optional[float] = None
+        self._previous: Optional[float] = None
+
+    def update(self, close: float) -> Optional[float]:
+        if self._previous is not None:
+            delta = close - self._previous
+            avg_gain = self.gains.update(max(delta, 0.0))
+            avg_loss = self.losses.update(max(-delta, 0.0))
+            if avg_gain is not None:
+                self.value = float(_rsi_from_averages(np.float64(avg_gain), np.float64(avg_loss)))
+        self._previous = close
+        return self.value
+
+
+class ATR:
+    def __init__(self, period: int = 14):
+        self.smoothed = Wilder(period)
+        self._previous_close: Optional[float] = None
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.smoothed.value
+
+    def update(self, high: float, low: float, close: float) -> Optional[float]:
+        tr = high - low
+        if self._previous_close is not None:
+            tr = max(tr, abs(high - self._previous_close), abs(low - self._previous_close))
+        self._previous_close = close
+        return self.smoothed.update(tr)
+
+
+class Bollinger:
+    def __init__(self, period: int = 20, width: float = 2.0):
+        self.stats = RollingStats(size=period)
+        self.width = width
+
+    def update(self, close: float) -> Optional[Tuple[float, float, float]]:
+        self.stats.push(close)
+        if len(self.stats) < self.stats.size:
+            return None
+        spread = self.width * self.stats.std
+        return self.stats.mean, self.stats.mean + spread, self.stats.mean - spread
+
+
+class RollingVolatility:
+    """Std of the last `window` log returns"""
+
+    def __init__(self, window: int = 20):
+        self.stats = RollingStats(size=window)
+        self._previous: Optional[float] = None
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.stats.std if len(self.stats) == self.stats.size else None
+
+    def update(self, close: float) -> Optional[float]:
+        if self._previous is not None:
+            self.stats.push(math.log(close / self._previous))
+        self._previous = close
+        return self.value
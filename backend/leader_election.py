@@ -0,0 +1,151 @@
+"""
+Leader Election - TTL lease in MongoDB
+- Every worker heartbeats against one lease document
+- Only the lease holder runs the background engines
+- A crashed leader is replaced once its lease expires (seconds); a clean
+  shutdown releases the lease so a standby takes over on its next heartbeat
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Optional
+import logging
+
+from config import LEADER_LEASE_SECONDS, LEADER_HEARTBEAT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    def __init__(self, name: str, collection=None,
+                 lease_seconds: float = LEADER_LEASE_SECONDS,
+                 heartbeat_seconds: float = LEADER_HEARTBEAT_SECONDS):
+        self.name = name
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self._collection = collection
+        self.is_leader = False
+        self.is_running = False
+        self.task = None
+        self.lease_valid_until = 0.0  # Local monotonic deadline of our current lease
+        self.on_elected: Optional[Callable] = None
+        self.on_demoted: Optional[Callable] = None
+
+    def _get_collection(self):
+        if self._collection is None:
+            from database import leader_leases_collection
+            self._collection = leader_leases_collection
+        return self._collection
+
+    async def try_acquire(self) -> bool:
+        """Take or renew the lease - atomic, succeeds only if we hold it or it expired"""
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.now(timezone.utc)
+        try:
+            doc = await self._get_collection().find_one_and_update(
+                {
+                    "_id": self.name,
+                    "$or": [{"owner": self.owner_id}, {"expires_at": {"$lt": now}}]
+                },
+                {"$set": {
+                    "owner": self.owner_id,
+                    "expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "renewed_at": now
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return False  # Lease exists and is held by someone else
+
+        if doc and doc.get("owner") == self.owner_id:
+            self.lease_valid_until = time.monotonic() + self.lease_seconds
+            return True
+        return False
+
+    async def release(self):
+        """Give up the lease immediately (clean shutdown)"""
+        try:
+            await self._get_collection().delete_one({"_id": self.name, "owner": self.owner_id})
+        except Exception as e:
+            logger.warning(f"Lease release failed for {self.name}: {e}")
+
+    async def get_holder(self) -> Optional[dict]:
+        """Current lease document (for health endpoints)"""
+        return await self._get_collection().find_one({"_id": self.name})
+
+    async def _call(self, callback: Optional[Callable]):
+        if callback is None:
+            return
+        try:
+            result = callback()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.error(f"Leader callback error ({self.name}): {e}")
+
+    async def heartbeat(self):
+        """One election round: acquire/renew, then promote or demote"""
+        try:
+            acquired = await self.try_acquire()
+        except Exception as e:
+            logger.warning(f"Lease heartbeat failed for {self.name}: {e}")
+            # Keep leading only while our last lease is surely still valid
+            acquired = self.is_leader and time.monotonic() < self.lease_valid_until - self.heartbeat_seconds
+
+        if acquired and not self.is_leader:
+            self.is_leader = True
+            logger.info(f"👑 {self.owner_id} elected leader for {self.name}")
+            await self._call(self.on_elected)
+        elif not acquired and self.is_leader:
+            self.is_leader = False
+            logger.warning(f"⚠️ {self.owner_id} lost leadership for {self.name}")
+            await self._call(self.on_demoted)
+
+    async def _run(self):
+        while self.is_running:
+            await asyncio.sleep(self.heartbeat_seconds)
+            await self.heartbeat()
+
+    async def start(self, on_elected: Callable = None, on_demoted: Callable = None):
+        """Run the first election round now, then heartbeat in the background"""
+        if self.is_running:
+            return
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_running = True
+        await self.heartbeat()
+        self.task = asyncio.create_task(self._run())
+        if not self.is_leader:
+            logger.info(f"🕒 {self.owner_id} standing by for {self.name} (API only)")
+
+    async def stop(self):
+        """Stop heartbeating; demote and release if we were leading"""
+        self.is_running = False
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.is_leader:
+            self.is_leader = False
+            await self._call(self.on_demoted)
+            await self.release()
+
+    def get_status(self) -> dict:
+        return {
+            "name": self.name,
+            "owner_id": self.owner_id,
+            "is_leader": self.is_leader,
+            "lease_seconds": self.lease_seconds,
+            "heartbeat_seconds": self.heartbeat_seconds
+        }
+
+
+# Global instance - guards the background engines
+leader_election = LeaderElection("background-engines")
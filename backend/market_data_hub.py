@@ -0,0 +1,282 @@
+"""
+Market Data Hub - Shared ticker snapshots per exchange
+- One background task polls tickers in bulk (fetch_tickers) per exchange
+- Engines and endpoints read the in-memory snapshot with a staleness budget
+- Cache misses are fetched once and shared by all concurrent callers; a symbol
+  joins the bulk poll only after the exchange accepted it
+- Streaming feeds (market_stream) push into the same snapshot
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional, List, Callable
+import logging
+import ccxt.async_support as ccxt
+
+from config import (
+    MARKET_DATA_POLL_INTERVAL_SECONDS,
+    MARKET_DATA_MAX_AGE_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataHub:
+    """Single source of public market data - replaces per-call fetch_ticker"""
+
+    # Public (no API key) clients, same options the paper engine uses
+    EXCHANGE_CONFIGS = {
+        'luno': {'enableRateLimit': True, 'timeout': 30000},
+        'binance': {'enableRateLimit': True, 'options': {'defaultType': 'spot'}},
+        'kucoin': {'enableRateLimit': True, 'timeout': 30000}
+    }
+
+    # Always polled so dashboards never wait on a cold cache
+    DEFAULT_WATCHLIST = {
+        'luno': ['BTC/ZAR', 'ETH/ZAR', 'XRP/ZAR']
+    }
+
+    def __init__(self):
+        self.exchanges = {}  # {exchange: ccxt instance}
+        self.snapshots: Dict[str, Dict[str, Dict]] = {}  # {exchange: {symbol: {"ticker", "fetched_at"}}}
+        self.watched: Dict[str, set] = {ex: set(symbols) for ex, symbols in self.DEFAULT_WATCHLIST.items()}
+        self.inflight: Dict[tuple, asyncio.Task] = {}  # {(exchange, symbol): fetch task}
+        self.listeners: List[Callable] = []  # Called as listener(exchange, symbol, ticker) on every update
+        self.poll_interval = MARKET_DATA_POLL_INTERVAL_SECONDS
+        self.max_age = MARKET_DATA_MAX_AGE_SECONDS
+        self.is_running = False
+        self.task = None
+        self.stats = {"hits": 0, "misses": 0, "bulk_polls": 0, "single_fetches": 0, "pushed": 0, "errors": 0}
+
+    def _get_exchange(self, exchange: str):
+        """Lazily create the shared public client for an exchange"""
+        exchange = exchange.lower()
+        if exchange not in self.exchanges:
+            config = self.EXCHANGE_CONFIGS.get(exchange)
+            if config is None:
+                return None
+            self.exchanges[exchange] = getattr(ccxt, exchange)(dict(config))
+            logger.info(f"📡 Market data hub connected to {exchange.upper()}")
+        return self.exchanges[exchange]
+
+    def supports(self, exchange: str) -> bool:
+        """Check if the hub can serve an exchange"""
+        return exchange.lower() in self.EXCHANGE_CONFIGS
+
+    def watch(self, exchange: str, symbols: List[str]):
+        """Add symbols to the bulk polling set for an exchange"""
+        self.watched.setdefault(exchange.lower(), set()).update(symbols)
+
+    def add_listener(self, listener: Callable):
+        """Register a callback for every ticker update (must not block)"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable):
+        """Unregister a ticker update callback"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _store(self, exchange: str, symbol: str, ticker: Dict):
+        """Store a ticker in the snapshot with its local fetch time"""
+        self.snapshots.setdefault(exchange, {})[symbol] = {
+            "ticker": ticker,
+            "fetched_at": time.monotonic()
+        }
+        for listener in self.listeners:
+            try:
+                listener(exchange, symbol, ticker)
+            except Exception as e:
+                logger.error(f"Market data listener error: {e}")
+
+    def update_ticker(self, exchange: str, symbol: str, ticker: Dict):
+        """Push a ticker from a streaming feed into the snapshot"""
+        self.stats["pushed"] += 1
+        self._store(exchange.lower(), symbol, ticker)
+
+    def _fresh_entry(self, exchange: str, symbol: str, max_age: float) -> Optional[Dict]:
+        """Return a snapshot entry if it is within the staleness budget"""
+        entry = self.snapshots.get(exchange, {}).get(symbol)
+        if entry and (time.monotonic() - entry['fetched_at']) <= max_age:
+            return entry
+        return None
+
+    async def _fetch_single(self, exchange: str, symbol: str) -> Optional[Dict]:
+        """Fetch one ticker (cache miss path)"""
+        exchange_obj = self._get_exchange(exchange)
+        if not exchange_obj:
+            return None
+        try:
+            ticker = await exchange_obj.fetch_ticker(symbol)
+            self.stats["single_fetches"] += 1
+            self._store(exchange, symbol, ticker)
+            return ticker
+        except ccxt.BadSymbol as e:
+            # Never let a rejected symbol into the bulk poll: one bad symbol fails the whole list
+            self.stats["errors"] += 1
+            self.watched.get(exchange, set()).discard(symbol)
+            logger.warning(f"Market data: {exchange} rejected {symbol}, not watching it ({e})")
+            return None
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.debug(f"Market data fetch for {symbol} on {exchange}: {e}")
+            return None
+
+    async def _fetch_shared(self, exchange: str, symbol: str) -> Optional[Dict]:
+        """Fetch a ticker once, even when many callers miss at the same time"""
+        key = (exchange, symbol)
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_single(exchange, symbol))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # Shield so one cancelled caller does not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def get_ticker(self, symbol: str, exchange: str = 'luno', max_age: float = None) -> Optional[Dict]:
+        """Get a ticker no older than max_age seconds (falls back to the last known one)"""
+        exchange = exchange.lower()
+        budget = self.max_age if max_age is None else max_age
+
+        entry = self._fresh_entry(exchange, symbol, budget)
+        if entry:
+            self.stats["hits"] += 1
+            return entry['ticker']
+
+        self.stats["misses"] += 1
+        ticker = await self._fetch_shared(exchange, symbol)
+        if ticker:
+            self.watch(exchange, [symbol])  # Only symbols the exchange accepted join the bulk poll
+            return ticker
+
+        # Stale beats nothing - callers decide via get_age()
+        stale = self.snapshots.get(exchange, {}).get(symbol)
+        return stale['ticker'] if stale else None
+
+    def peek_ticker(self, symbol: str, exchange: str = 'luno', max_age: float = None) -> Optional[Dict]:
+        """Read a fresh ticker from the snapshot without ever calling the exchange"""
+        budget = self.max_age if max_age is None else max_age
+        entry = self._fresh_entry(exchange.lower(), symbol, budget)
+        if entry:
+            self.stats["hits"] += 1
+            return entry['ticker']
+        return None
+
+    async def get_price(self, symbol: str, exchange: str = 'luno', max_age: float = None) -> Optional[float]:
+        """Get the last traded price from the snapshot"""
+        ticker = await self.get_ticker(symbol, exchange, max_age)
+        if not ticker:
+            return None
+        return ticker.get('last') or ticker.get('close')
+
+    def get_age(self, symbol: str, exchange: str = 'luno') -> Optional[float]:
+        """Seconds since the snapshot for a symbol was refreshed"""
+        entry = self.snapshots.get(exchange.lower(), {}).get(symbol)
+        return time.monotonic() - entry['fetched_at'] if entry else None
+
+    async def get_24h_change(self, symbol: str, exchange: str = 'luno') -> float:
+        """24h % change - from the ticker when provided, else from stored daily candles"""
+        exchange = exchange.lower()
+        ticker = await self.get_ticker(symbol, exchange)
+        if ticker:
+            if ticker.get('percentage'):
+                return float(ticker['percentage'])
+            last = ticker.get('last') or ticker.get('close')
+            if ticker.get('open') and last:
+                return ((last - ticker['open']) / ticker['open']) * 100
+
+        # Luno tickers carry no open/percentage - compare with yesterday's open from
+        # the candle store (synced at most once per closed daily candle)
+        from candle_store import candle_store
+        try:
+            daily = await candle_store.recent(exchange, symbol, '1d', 1)
+        except Exception as e:
+            logger.debug(f"Daily candle read for {symbol} on {exchange}: {e}")
+            return 0.0
+        if len(daily) and daily.open[-1] > 0:
+            yesterday_open = float(daily.open[-1])
+            current = (ticker.get('last') or ticker.get('close')) if ticker else None
+            return ((float(current or daily.close[-1]) - yesterday_open) / yesterday_open) * 100
+        return 0.0
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None,
+                          limit: Optional[int] = None, exchange: str = 'luno') -> List[list]:
+        """Raw OHLCV rows from the shared public client (candle_store sync)"""
+        exchange_obj = self._get_exchange(exchange.lower())
+        if not exchange_obj:
+            return []
+        return await exchange_obj.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+
+    async def poll_exchange(self, exchange: str):
+        """Refresh every watched symbol on an exchange in one bulk call"""
+        # Symbols kept fresh by a streaming feed (or a recent miss) are skipped
+        symbols = sorted(
+            s for s in self.watched.get(exchange, ())
+            if not self._fresh_entry(exchange, s, self.poll_interval)
+        )
+        exchange_obj = self._get_exchange(exchange)
+        if not symbols or not exchange_obj:
+            return
+
+        if exchange_obj.has.get('fetchTickers'):
+            try:
+                tickers = await exchange_obj.fetch_tickers(symbols)
+            except ccxt.BadSymbol as e:
+                # Delisted or mistyped symbol: single fetches drop it from the watch set
+                logger.warning(f"Market data bulk poll on {exchange} rejected a symbol ({e}) - fetching one by one")
+                await asyncio.gather(*(self._fetch_shared(exchange, s) for s in symbols))
+                return
+            for symbol, ticker in tickers.items():
+                self._store(exchange, symbol, ticker)
+            self.stats["bulk_polls"] += 1
+        else:
+            await asyncio.gather(*(self._fetch_shared(exchange, s) for s in symbols))
+
+    async def _poll_loop(self):
+        """Background refresh of all watched exchanges"""
+        while self.is_running:
+            for exchange in list(self.watched.keys()):
+                try:
+                    await self.poll_exchange(exchange)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.warning(f"Market data poll failed for {exchange}: {e}")
+
+            await asyncio.sleep(self.poll_interval)
+
+    def get_status(self) -> Dict:
+        """Hub status for health endpoints"""
+        return {
+            "is_running": self.is_running,
+            "poll_interval": self.poll_interval,
+            "max_age": self.max_age,
+            "watched": {ex: len(symbols) for ex, symbols in self.watched.items()},
+            "snapshot_sizes": {ex: len(snap) for ex, snap in self.snapshots.items()},
+            "stats": dict(self.stats)
+        }
+
+    async def start(self):
+        """Start background polling"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.task = asyncio.create_task(self._poll_loop())
+        logger.info(f"📡 Market data hub started - bulk polling every {self.poll_interval}s")
+
+    async def stop(self):
+        """Stop polling and close exchange sessions"""
+        self.is_running = False
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        for exchange_obj in self.exchanges.values():
+            try:
+                await exchange_obj.close()
+            except Exception:
+                pass
+        self.exchanges.clear()
+        logger.info("Market data hub stopped")
+
+
+# Global instance
+market_data_hub = MarketDataHub()
@@ -5,15 +5,17 @@ Market Regime Detection
 """
 
 import asyncio
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from database import bots_collection
+from indicators import RollingStats
 from logger_config import logger
-import math
+
+PRICE_HISTORY_SECONDS = 24 * 3600
 
 
 class MarketRegimeDetector:
     def __init__(self):
-        self.price_history = {}  # Store recent prices
+        self.price_history = {}  # pair -> RollingStats of the last 24h of prices
         self.current_regime = {}
     
     async def detect_regime(self, pair: str, exchange: str = 'luno') -> dict:
@@ -24,24 +26,14 @@ class MarketRegimeDetector:
             # Get current price
             current_price = await paper_engine.get_real_price(pair, exchange)
             
-            # Store in history
+            # Rolling 24h window: O(1) mean/variance updates, old prices expire on push
             if pair not in self.price_history:
-                self.price_history[pair] = []
-            
-            self.price_history[pair].append({
-                'price': current_price,
-                'timestamp': datetime.now(timezone.utc)
-            })
-            
-            # Keep only last 24 hours
-            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=24)
-            self.price_history[pair] = [
-                p for p in self.price_history[pair]
-                if p['timestamp'] > cutoff_time
-            ]
+                self.price_history[pair] = RollingStats(max_age=PRICE_HISTORY_SECONDS)
+            history = self.price_history[pair]
+            history.push(current_price, datetime.now(timezone.utc).timestamp())
             
             # Need at least 10 data points
-            if len(self.price_history[pair]) < 10:
+            if len(history) < 10:
                 return {
                     "regime": "unknown",
                     "trend": "neutral",
@@ -49,11 +41,9 @@ class MarketRegimeDetector:
                     "confidence": 0
                 }
             
-            prices = [p['price'] for p in self.price_history[pair]]
-            
             # Calculate trend
-            first_price = prices[0]
-            last_price = prices[-1]
+            first_price = history.first
+            last_price = history.last
             trend_pct = ((last_price - first_price) / first_price) * 100
             
             # Determine trend
@@ -65,10 +55,7 @@ class MarketRegimeDetector:
                 trend = "sideways"
             
             # Calculate volatility (standard deviation)
-            mean_price = sum(prices) / len(prices)
-            variance = sum((p - mean_price) ** 2 for p in prices) / len(prices)
-            std_dev = math.sqrt(variance)
-            volatility_pct = (std_dev / mean_price) * 100
+            volatility_pct = (history.std / history.mean) * 100
             
             if volatility_pct > 5:
                 volatility = "high"
@@ -97,7 +84,7 @@ class MarketRegimeDetector:
                 "volatility": volatility,
                 "trend_pct": round(trend_pct, 2),
                 "volatility_pct": round(volatility_pct, 2),
-                "confidence": min(len(prices) / 50, 1.0),  # More data = higher confidence
+                "confidence": min(len(history) / 50, 1.0),  # More data = higher confidence
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
             
@@ -0,0 +1,361 @@
+"""
+Market Stream - Optional WebSocket ticker ingest
+- Subscribes to public ticker/trade channels (Binance, KuCoin, Luno)
+- Pushes every update into the market-data hub snapshot (sub-second prices)
+- ReplayFeed plays a recorded JSONL file as an offline stand-in for the exchanges
+- Live updates can be recorded to JSONL for later replay
+"""
+
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import time
+import uuid
+from typing import Dict, List, AsyncIterator, Tuple
+import logging
+
+from market_data_hub import market_data_hub
+from config import (
+    MARKET_DATA_STREAMING,
+    MARKET_DATA_STREAM_EXCHANGES,
+    MARKET_DATA_REPLAY_FILE,
+    MARKET_DATA_REPLAY_SPEED,
+    MARKET_DATA_RECORD_FILE,
+    LUNO_STREAM_API_KEY,
+    LUNO_STREAM_API_SECRET
+)
+
+logger = logging.getLogger(__name__)
+
+
+def make_ticker(symbol: str, last: float, timestamp: int = None, bid: float = None,
+                ask: float = None, open_price: float = None, percentage: float = None) -> Dict:
+    """Build a ccxt-shaped ticker so stream and REST consumers read the same fields"""
+    timestamp = timestamp or int(time.time() * 1000)
+    return {
+        "symbol": symbol,
+        "timestamp": timestamp,
+        "last": last,
+        "close": last,
+        "bid": bid,
+        "ask": ask,
+        "open": open_price,
+        "percentage": percentage,
+        "source": "stream"
+    }
+
+
+class TickerStream(ABC):
+    """Base class - one WebSocket connection yielding (symbol, ticker) updates"""
+
+    exchange = ''
+
+    def __init__(self, symbols: List[str]):
+        self.symbols = list(symbols)
+
+    @abstractmethod
+    def updates(self) -> AsyncIterator[Tuple[str, Dict]]:
+        """Async generator of (unified symbol, ticker) until the connection drops"""
+
+
+class BinanceTickerStream(TickerStream):
+    """Binance combined <symbol>@ticker stream (24h rolling ticker, ~1s cadence)"""
+
+    exchange = 'binance'
+    URL = 'wss://stream.binance.com:9443/stream?streams='
+
+    async def updates(self):
+        import websockets
+
+        by_id = {s.replace('/', '').lower(): s for s in self.symbols}
+        url = self.URL + '/'.join(f"{stream_id}@ticker" for stream_id in by_id)
+
+        async with websockets.connect(url, ping_interval=20) as ws:
+            logger.info(f"📡 Binance stream connected ({len(by_id)} symbols)")
+            async for raw in ws:
+                data = json.loads(raw).get('data', {})
+                symbol = by_id.get(data.get('s', '').lower())
+                if not symbol:
+                    continue
+                yield symbol, make_ticker(
+                    symbol,
+                    float(data['c']),
+                    timestamp=data.get('E'),
+                    bid=float(data['b']) if data.get('b') else None,
+                    ask=float(data['a']) if data.get('a') else None,
+                    open_price=float(data['o']) if data.get('o') else None,
+                    percentage=float(data['P']) if data.get('P') else None
+                )
+
+
+class KucoinTickerStream(TickerStream):
+    """KuCoin /market/ticker topic (needs a public bullet token)"""
+
+    exchange = 'kucoin'
+    BULLET_URL = 'https://api.kucoin.com/api/v1/bullet-public'
+
+    async def _get_endpoint(self) -> Tuple[str, float]:
+        import aiohttp
+
+        async with aiohttp.ClientSession() as session:
+            async with session.post(self.BULLET_URL) as resp:
+                payload = (await resp.json())['data']
+        server = payload['instanceServers'][0]
+        url = f"{server['endpoint']}?token={payload['token']}&connectId={uuid.uuid4().hex}"
+        return url, server.get('pingInterval', 18000) / 1000
+
+    async def updates(self):
+        import websockets
+
+        by_id = {s.replace('/', '-'): s for s in self.symbols}
+        url, ping_interval = await self._get_endpoint()
+
+        async with websockets.connect(url, ping_interval=None) as ws:
+            await ws.send(json.dumps({
+                "id": uuid.uuid4().hex,
+                "type": "subscribe",
+                "topic": "/market/ticker:" + ','.join(by_id),
+                "response": True
+            }))
+            logger.info(f"📡 KuCoin stream connected ({len(by_id)} symbols)")
+
+            while True:
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=ping_interval)
+                except asyncio.TimeoutError:
+                    await ws.send(json.dumps({"id": uuid.uuid4().hex, "type": "ping"}))
+                    continue
+
+                msg = json.loads(raw)
+                if msg.get('type') != 'message':
+                    continue
+                symbol = by_id.get(msg.get('topic', '').split(':')[-1])
+                data = msg.get('data', {})
+                if not symbol or not data.get('price'):
+                    continue
+                yield symbol, make_ticker(
+                    symbol,
+                    float(data['price']),
+                    timestamp=data.get('time'),
+                    bid=float(data['bestBid']) if data.get('bestBid') else None,
+                    ask=float(data['bestAsk']) if data.get('bestAsk') else None
+                )
+
+
+class LunoTradeStream(TickerStream):
+    """Luno market stream - last price from trade updates (one socket per pair, needs API key)"""
+
+    exchange = 'luno'
+    URL = 'wss://ws.luno.com/api/1/stream/'
+
+    def __init__(self, symbols: List[str], pair_symbol: str = None):
+        super().__init__(symbols)
+        self.pair_symbol = pair_symbol or (symbols[0] if symbols else None)
+
+    @staticmethod
+    def to_luno_pair(symbol: str) -> str:
+        return symbol.replace('BTC/', 'XBT/').replace('/', '')
+
+    async def updates(self):
+        import websockets
+
+        symbol = self.pair_symbol
+        async with websockets.connect(self.URL + self.to_luno_pair(symbol), ping_interval=20) as ws:
+            await ws.send(json.dumps({
+                "api_key_id": LUNO_STREAM_API_KEY,
+                "api_key_secret": LUNO_STREAM_API_SECRET
+            }))
+            logger.info(f"📡 Luno stream connected ({symbol})")
+
+            async for raw in ws:
+                if not raw or raw == '""':
+                    continue  # Keep-alive
+                msg = json.loads(raw)
+                for trade in msg.get('trade_updates') or []:
+                    base = float(trade.get('base', 0) or 0)
+                    counter = float(trade.get('counter', 0) or 0)
+                    if base > 0:
+                        yield symbol, make_ticker(symbol, counter / base, timestamp=msg.get('timestamp'))
+
+
+class ReplayFeed:
+    """Replays a recorded JSONL feed - offline stand-in for live exchange streams
+
+    Each line: {"ts": <ms>, "exchange": "binance", "symbol": "BTC/USDT", "last": 43000.1,
+                "bid": ..., "ask": ..., "open": ..., "percentage": ...}
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed  # 1.0 = recorded pace, 0 = no delays
+
+    async def updates(self) -> AsyncIterator[Tuple[str, str, Dict]]:
+        previous_ts = None
+        with open(self.path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                ts = record.get('ts')
+
+                if self.speed > 0 and previous_ts is not None and ts is not None:
+                    delay = (ts - previous_ts) / 1000 / self.speed
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                previous_ts = ts
+
+                yield record['exchange'].lower(), record['symbol'], make_ticker(
+                    record['symbol'],
+                    float(record['last']),
+                    timestamp=ts,
+                    bid=record.get('bid'),
+                    ask=record.get('ask'),
+                    open_price=record.get('open'),
+                    percentage=record.get('percentage')
+                )
+
+
+class MarketStreamManager:
+    """Runs streaming feeds with reconnect backoff and pushes into the hub"""
+
+    STREAM_CLASSES = {
+        'binance': BinanceTickerStream,
+        'kucoin': KucoinTickerStream,
+        'luno': LunoTradeStream
+    }
+
+    # Streamed in addition to whatever the hub is already watching
+    DEFAULT_SYMBOLS = {
+        'luno': ['BTC/ZAR', 'ETH/ZAR', 'XRP/ZAR'],
+        'binance': ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'SOL/USDT', 'XRP/USDT', 'ADA/USDT'],
+        'kucoin': ['BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'XRP/USDT', 'ADA/USDT', 'DOGE/USDT']
+    }
+
+    MAX_BACKOFF_SECONDS = 30
+
+    def __init__(self, hub=None):
+        self.hub = hub or market_data_hub
+        self.tasks: List[asyncio.Task] = []
+        self.is_running = False
+        self.record_file = None
+        self.stats = {"updates": 0, "reconnects": 0, "last_update": {}}
+
+    def _publish(self, exchange: str, symbol: str, ticker: Dict):
+        """Push one update into the hub (and the recording, if enabled)"""
+        self.hub.update_ticker(exchange, symbol, ticker)
+        self.stats["updates"] += 1
+        self.stats["last_update"][exchange] = time.time()
+
+        if self.record_file:
+            self.record_file.write(json.dumps({
+                "ts": ticker.get('timestamp'),
+                "exchange": exchange,
+                "symbol": symbol,
+                "last": ticker.get('last'),
+                "bid": ticker.get('bid'),
+                "ask": ticker.get('ask'),
+                "open": ticker.get('open'),
+                "percentage": ticker.get('percentage')
+            }) + '\n')
+
+    def build_streams(self, exchanges: List[str]) -> List[TickerStream]:
+        """Create one stream per exchange (one per pair on Luno)"""
+        streams = []
+        for exchange in exchanges:
+            stream_class = self.STREAM_CLASSES.get(exchange)
+            if not stream_class:
+                logger.warning(f"No streaming support for {exchange} - REST polling only")
+                continue
+
+            symbols = sorted(set(self.DEFAULT_SYMBOLS.get(exchange, [])) | self.hub.watched.get(exchange, set()))
+            if not symbols:
+                continue
+
+            if exchange == 'luno':
+                if not (LUNO_STREAM_API_KEY and LUNO_STREAM_API_SECRET):
+                    logger.info("Luno streaming needs LUNO_STREAM_API_KEY/SECRET - REST polling only")
+                    continue
+                streams.extend(LunoTradeStream(symbols, pair_symbol=s) for s in symbols)
+            else:
+                streams.append(stream_class(symbols))
+        return streams
+
+    async def run_stream(self, stream: TickerStream):
+        """Consume a live stream forever, reconnecting with exponential backoff"""
+        backoff = 1
+        while self.is_running:
+            try:
+                async for symbol, ticker in stream.updates():
+                    self._publish(stream.exchange, symbol, ticker)
+                    backoff = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{stream.exchange} stream dropped: {e} (reconnecting in {backoff}s)")
+
+            if not self.is_running:
+                break
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.MAX_BACKOFF_SECONDS)
+
+    async def run_replay(self, feed: ReplayFeed) -> int:
+        """Push a recorded feed into the hub; returns the number of updates replayed"""
+        count = 0
+        async for exchange, symbol, ticker in feed.updates():
+            self._publish(exchange, symbol, ticker)
+            count += 1
+        logger.info(f"📼 Replay finished: {count} updates from {feed.path}")
+        return count
+
+    async def start(self):
+        """Start streaming (or replay) if enabled in config"""
+        if self.is_running:
+            return
+        if not (MARKET_DATA_STREAMING or MARKET_DATA_REPLAY_FILE):
+            logger.info("Market streaming disabled - hub uses REST polling")
+            return
+
+        self.is_running = True
+
+        if MARKET_DATA_REPLAY_FILE:
+            feed = ReplayFeed(MARKET_DATA_REPLAY_FILE, speed=MARKET_DATA_REPLAY_SPEED)
+            self.tasks.append(asyncio.create_task(self.run_replay(feed)))
+            logger.info(f"📼 Market replay started from {MARKET_DATA_REPLAY_FILE}")
+            return
+
+        if MARKET_DATA_RECORD_FILE:
+            self.record_file = open(MARKET_DATA_RECORD_FILE, 'a', buffering=1)
+
+        for stream in self.build_streams(MARKET_DATA_STREAM_EXCHANGES):
+            self.tasks.append(asyncio.create_task(self.run_stream(stream)))
+        logger.info(f"📡 Market streaming started ({len(self.tasks)} connections)")
+
+    async def stop(self):
+        """Stop all streams"""
+        self.is_running = False
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        if self.record_file:
+            self.record_file.close()
+            self.record_file = None
+        logger.info("Market streaming stopped")
+
+    def get_status(self) -> Dict:
+        """Streaming status for health endpoints"""
+        now = time.time()
+        return {
+            "is_running": self.is_running,
+            "connections": len(self.tasks),
+            "updates": self.stats["updates"],
+            "reconnects": self.stats["reconnects"],
+            "seconds_since_update": {
+                ex: round(now - ts, 2) for ex, ts in self.stats["last_update"].items()
+            }
+        }
+
+
+# Global instance
+market_stream = MarketStreamManager()
@@ -0,0 +1,42 @@
+"""
+Migration: Build hourly/daily P&L rollups from existing trades
+Run once after deploying pnl_rollups (safe to re-run - buckets are rebuilt)
+
+Usage (from backend/):
+    python migrations/backfill_pnl_rollups.py [--user USER_ID]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pnl_rollups import pnl_rollups
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def backfill_pnl_rollups(user_id: str = None):
+    """Rebuild P&L rollups for one user or everyone"""
+    try:
+        result = await pnl_rollups.backfill(user_id)
+        return {"success": True, **result}
+    except Exception as e:
+        logger.error(f"Migration error: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user', help='Only rebuild this user (default: all users)')
+    args = parser.parse_args()
+
+    # Run migration
+    result = asyncio.run(backfill_pnl_rollups(args.user))
+    print(f"Migration result: {result}")
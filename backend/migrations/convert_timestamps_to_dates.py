@@ -0,0 +1,102 @@
+"""
+Migration: Store `timestamp` as a BSON date on trades, alerts, audit and learning logs
+Run once when deploying native timestamps (safe to re-run - only string values are converted)
+
+- Converts ISO-string timestamps in batches (bulk_write, unordered)
+- Creates the (user_id, timestamp) / (bot_id, timestamp) compound indexes
+- Adds a TTL index so audit logs expire after the audit retention period
+
+Usage (from backend/):
+    python migrations/convert_timestamps_to_dates.py [--batch-size 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+from database import db
+from time_utils import parse_timestamp
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ["trades", "alerts", "audit_logs", "audit_log", "learning_logs"]
+
+INDEXES = {
+    "trades": [[("user_id", 1), ("timestamp", -1)], [("bot_id", 1), ("timestamp", -1)]],
+    "alerts": [[("user_id", 1), ("timestamp", -1)]],
+    "audit_logs": [[("user_id", 1), ("timestamp", -1)]],
+    "learning_logs": [[("user_id", 1), ("timestamp", -1)], [("bot_id", 1), ("timestamp", -1)]],
+}
+
+AUDIT_LOG_RETENTION_DAYS = 90  # Same as AuditLogger.log_retention_days
+
+
+async def convert_collection(name: str, batch_size: int) -> dict:
+    """Rewrite every string timestamp in one collection as a date"""
+    collection = db[name]
+    converted = unparseable = 0
+
+    while True:
+        docs = await collection.find(
+            {"timestamp": {"$type": "string"}}, {"_id": 1, "timestamp": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        ops = []
+        for doc in docs:
+            parsed = parse_timestamp(doc["timestamp"])
+            if parsed is None:
+                # Keep the original text so the document is not picked up again
+                ops.append(UpdateOne({"_id": doc["_id"]}, {
+                    "$set": {"timestamp_raw": doc["timestamp"]}, "$unset": {"timestamp": ""}
+                }))
+                unparseable += 1
+            else:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"timestamp": parsed}}))
+                converted += 1
+        await collection.bulk_write(ops, ordered=False)
+
+    logger.info(f"{name}: {converted} converted, {unparseable} unparseable")
+    return {"converted": converted, "unparseable": unparseable}
+
+
+async def convert_timestamps_to_dates(batch_size: int = 1000):
+    """Convert all timestamped collections and build their indexes"""
+    try:
+        results = {}
+        for name in COLLECTIONS:
+            results[name] = await convert_collection(name, batch_size)
+
+        for name, indexes in INDEXES.items():
+            for keys in indexes:
+                await db[name].create_index(keys)
+
+        await db.audit_logs.create_index(
+            "timestamp", expireAfterSeconds=AUDIT_LOG_RETENTION_DAYS * 86400, name="timestamp_ttl"
+        )
+
+        logger.info("✅ Migration complete: timestamps are BSON dates")
+        return {"success": True, "collections": results}
+
+    except Exception as e:
+        logger.error(f"Migration error: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    # Run migration
+    result = asyncio.run(convert_timestamps_to_dates(args.batch_size))
+    print(f"Migration result: {result}")
@@ -36,7 +36,7 @@ class ModeManager:
             live_pnl = live_equity - live_initial
             
             # Get today's trades
-            today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0).isoformat()
+            today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)
             
             paper_trades_today = await trades_collection.count_documents({
                 "user_id": user_id,
@@ -0,0 +1,220 @@
+"""
+Monte Carlo Risk - bootstrapped equity paths for bots and users
+- Per-trade returns come from recent trades, each P&L divided by the capital
+  before it (walked back from current capital)
+- Circular block bootstrap: blocks of about one day of consecutive trades keep
+  the serial correlation of wins and losses
+- Each possible block is summarized once (sum, peak, trough, inner drawdown and
+  worst hour of log returns), so a path is ~one step per day and 10k paths
+  take a few arrays of paths x days
+- Portfolio bands use MONTE_CARLO_PATHS; all bots together share
+  MONTE_CARLO_BOT_PATH_BUDGET paths, so a user's cost does not grow with bot count
+- Simulations run in a worker thread so the event loop keeps serving
+- Reports percentile bands for days-to-target, max drawdown and final capital,
+  plus the probability of tripping the MAX_DRAWDOWN_PERCENT and
+  MAX_HOURLY_LOSS_PERCENT circuit breakers
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from time_utils import parse_timestamp
+from config import (
+    MAX_DRAWDOWN_PERCENT, MAX_HOURLY_LOSS_PERCENT,
+    MONTE_CARLO_PATHS, MONTE_CARLO_BOT_PATH_BUDGET, MONTE_CARLO_MIN_BOT_PATHS, MONTE_CARLO_HORIZON_DAYS, MONTE_CARLO_LOOKBACK_TRADES,
+    MONTE_CARLO_MAX_STEPS, MONTE_CARLO_MIN_TRADES, MONTE_CARLO_CACHE_TTL_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (5, 25, 50, 75, 95)
+PATH_CHUNK = 2500  # Paths simulated per batch (bounds memory)
+
+
+def returns_from_pnl(pnl: np.ndarray, current_capital: float) -> np.ndarray:
+    """Oldest-first P&L -> per-trade returns on the capital held before each trade"""
+    pnl = np.asarray(pnl, dtype=np.float64)
+    capital_before = current_capital - np.cumsum(pnl[::-1])[::-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(capital_before > 0, pnl / capital_before, 0.0)
+    return np.clip(returns, -0.99, None)
+
+
+def trades_per_day(timestamps: List[datetime]) -> float:
+    """Trade rate over the sampled span (at least one day)"""
+    if len(timestamps) < 2:
+        return float(len(timestamps))
+    span_days = (max(timestamps) - min(timestamps)).total_seconds() / 86400
+    return len(timestamps) / max(span_days, 1.0)
+
+
+def _bands(values: np.ndarray, digits: int = 2) -> Optional[Dict[str, float]]:
+    if not len(values):
+        return None
+    return {f"p{p}": round(float(v), digits) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def _block_stats(log_returns: np.ndarray, block: int, hour: int) -> tuple:
+    """Sum, max/min prefix, inner drawdown and worst hourly loss of every circular block"""
+    n = len(log_returns)
+    extended = np.concatenate((log_returns, log_returns[:block - 1]))
+    prefix = np.cumsum(sliding_window_view(extended, block), axis=1)
+    prefix0 = np.concatenate((np.zeros((n, 1)), prefix), axis=1)
+    total = prefix[:, -1]
+    peak = prefix0.max(axis=1)
+    trough = prefix0.min(axis=1)
+    inner_drawdown = (np.maximum.accumulate(prefix0, axis=1) - prefix0).max(axis=1)
+    hour = min(hour, block)
+    worst_hour = (prefix0[:, :-hour] - prefix0[:, hour:]).max(axis=1)  # Largest drop over `hour` trades
+    return total, peak, trough, inner_drawdown, worst_hour
+
+
+def simulate(returns: np.ndarray, per_day: float, capital: float, target: float,
+             paths: int = MONTE_CARLO_PATHS, horizon_days: float = MONTE_CARLO_HORIZON_DAYS,
+             seed: Optional[int] = None) -> Dict:
+    """Block-bootstrap equity paths from per-trade returns"""
+    returns = np.asarray(returns, dtype=np.float64)
+    n = len(returns)
+    log_returns = np.log1p(returns)
+    block = int(np.clip(round(per_day), 1, max(n // 2, 1)))  # ~one day of trades
+    hour = max(int(round(per_day / 24)), 1)
+    steps = int(np.clip(np.ceil(horizon_days * per_day / block), 1, MONTE_CARLO_MAX_STEPS))
+    horizon_days = steps * block / per_day
+
+    total, peak, trough, inner_drawdown, worst_hour = _block_stats(log_returns, block, hour)
+    goal = np.log(target / capital) if capital > 0 and target > capital else 0.0
+    hourly_limit = -np.log1p(-MAX_HOURLY_LOSS_PERCENT)
+
+    rng = np.random.default_rng(seed)
+    reach_days, max_drawdowns, finals = [], [], []
+    hourly_hits = 0
+    for start in range(0, paths, PATH_CHUNK):
+        picks = rng.integers(0, n, size=(min(PATH_CHUNK, paths - start), steps))
+        level_end = np.cumsum(total[picks], axis=1)
+        level = level_end - total[picks]  # Log equity at each block start
+        high = level + peak[picks]
+        prior_peak = np.maximum.accumulate(np.concatenate((np.zeros((len(picks), 1)), high[:, :-1]), axis=1), axis=1)
+        drawdown = np.maximum(prior_peak - (level + trough[picks]), inner_drawdown[picks]).max(axis=1)
+        max_drawdowns.append(-np.expm1(-drawdown) * 100)
+        finals.append(capital * np.exp(level_end[:, -1]))
+        hourly_hits += int((worst_hour[picks] > hourly_limit).any(axis=1).sum())
+        if goal > 0:
+            reached = high >= goal
+            hit = reached.any(axis=1)
+            reach_days.append((reached.argmax(axis=1)[hit] + 1) * block / per_day)
+
+    max_drawdowns = np.concatenate(max_drawdowns)
+    reach_days = np.concatenate(reach_days) if reach_days else np.empty(0)
+    return {
+        "paths": paths,
+        "trades_sampled": n,
+        "trades_per_day": round(per_day, 2),
+        "block_trades": block,
+        "horizon_days": round(horizon_days, 1),
+        "target": target,
+        "reach_probability": round(len(reach_days) / paths * 100, 2) if goal > 0 else 100.0,
+        "days_to_target": _bands(reach_days, 1),
+        "max_drawdown_pct": _bands(max_drawdowns),
+        "final_capital": _bands(np.concatenate(finals)),
+        "circuit_breakers": {
+            "max_drawdown": {"threshold_pct": MAX_DRAWDOWN_PERCENT * 100,
+                             "probability": round(float((max_drawdowns > MAX_DRAWDOWN_PERCENT * 100).mean()) * 100, 2)},
+            "hourly_loss": {"threshold_pct": MAX_HOURLY_LOSS_PERCENT * 100,
+                            "probability": round(hourly_hits / paths * 100, 2)},
+        }
+    }
+
+
+class MonteCarloRisk:
+    def __init__(self, trades=None, bots=None):
+        self._trades = trades
+        self._bots = bots
+        self._cache: Dict[tuple, tuple] = {}  # (user_id, target, paths, horizon) -> (computed_at, result)
+
+    def _collections(self):
+        if self._trades is None:
+            from database import trades_collection, bots_collection
+            self._trades = trades_collection
+            self._bots = bots_collection
+        return self._trades, self._bots
+
+    async def simulate_user(self, user_id: str, target: float = 1_000_000, paths: int = MONTE_CARLO_PATHS,
+                            horizon_days: float = MONTE_CARLO_HORIZON_DAYS, include_bots: bool = True,
+                            seed: Optional[int] = None) -> Dict:
+        """Risk bands for a user's portfolio and (optionally) each bot with enough trades"""
+        key = (user_id, target, paths, horizon_days, include_bots)
+        cached = self._cache.get(key)
+        if seed is None and cached and time.monotonic() - cached[0] < MONTE_CARLO_CACHE_TTL_SECONDS:
+            return cached[1]
+
+        trades_col, bots_col = self._collections()
+        bots = await bots_col.find({"user_id": user_id}, {"_id": 0, "id": 1, "name": 1, "current_capital": 1}).to_list(1000)
+        trades = await trades_col.find(
+            {"user_id": user_id}, {"_id": 0, "bot_id": 1, "profit_loss": 1, "timestamp": 1}
+        ).sort("timestamp", -1).to_list(MONTE_CARLO_LOOKBACK_TRADES)
+        trades = [{**t, "timestamp": parse_timestamp(t.get("timestamp"))} for t in reversed(trades)]
+        trades = [t for t in trades if t["timestamp"] is not None]
+
+        capital = sum(float(b.get("current_capital", 0) or 0) for b in bots)
+        result = {"user_id": user_id, "current_capital": round(capital, 2), "bots": {},
+                  "timestamp": datetime.now(timezone.utc).isoformat()}
+        if len(trades) < MONTE_CARLO_MIN_TRADES or capital <= 0:
+            result["portfolio"] = None
+            result["message"] = f"Need at least {MONTE_CARLO_MIN_TRADES} trades ({len(trades)} so far)"
+            return result
+
+        # NumPy work runs off the event loop
+        result.update(await asyncio.to_thread(
+            self._simulate, trades, bots if include_bots else [], capital, target, paths, horizon_days, seed
+        ))
+
+        now = time.monotonic()
+        self._cache = {k: v for k, v in self._cache.items() if now - v[0] < MONTE_CARLO_CACHE_TTL_SECONDS}
+        self._cache[key] = (now, result)
+        return result
+
+    @staticmethod
+    def _simulate(trades: List[Dict], bots: List[Dict], capital: float, target: float, paths: int,
+                  horizon_days: float, seed: Optional[int]) -> Dict:
+        pnl = np.array([float(t.get("profit_loss", 0) or 0) for t in trades])
+        portfolio = simulate(returns_from_pnl(pnl, capital), trades_per_day([t["timestamp"] for t in trades]),
+                             capital, target, paths, horizon_days, seed)
+
+        by_bot: Dict[str, List[Dict]] = {}
+        for trade in trades:
+            by_bot.setdefault(trade.get("bot_id"), []).append(trade)
+        eligible = [
+            bot for bot in bots
+            if len(by_bot.get(bot.get("id"), [])) >= MONTE_CARLO_MIN_TRADES and float(bot.get("current_capital", 0) or 0) > 0
+        ]
+
+        # One path budget shared by all bots; past budget / MIN paths, the most active bots get bands
+        eligible.sort(key=lambda bot: len(by_bot[bot["id"]]), reverse=True)
+        max_bots = max(MONTE_CARLO_BOT_PATH_BUDGET // MONTE_CARLO_MIN_BOT_PATHS, 1)
+        skipped = max(len(eligible) - max_bots, 0)
+        eligible = eligible[:max_bots]
+        bot_paths = min(paths, MONTE_CARLO_BOT_PATH_BUDGET // max(len(eligible), 1))
+
+        # Bots grow toward the same multiple of their capital as the user target
+        multiple = target / capital
+        results = {}
+        for bot in eligible:
+            bot_trades = by_bot[bot["id"]]
+            bot_capital = float(bot.get("current_capital", 0) or 0)
+            bot_pnl = np.array([float(t.get("profit_loss", 0) or 0) for t in bot_trades])
+            results[bot["id"]] = {
+                "name": bot.get("name"),
+                **simulate(returns_from_pnl(bot_pnl, bot_capital), trades_per_day([t["timestamp"] for t in bot_trades]),
+                           bot_capital, bot_capital * multiple, bot_paths, horizon_days, seed)
+            }
+        return {"portfolio": portfolio, "bots": results, "bots_skipped": skipped}
+
+
+# Global instance
+monte_carlo_risk = MonteCarloRisk()
@@ -37,8 +37,17 @@ from datetime import datetime, timezone
 from typing import Dict, Tuple
 import logging
 from exchange_limits import get_fee_rate
+from config import POSITION_SIZES
 from rate_limiter import rate_limiter
 from risk_engine import risk_engine
+from market_data_hub import market_data_hub
+from candle_store import candle_store
+from indicators import trend_change_pct
+from portfolio_summary import portfolio_summary
+from pnl_rollups import pnl_rollups
+from performance_ranker import performance_ranker
+from signal_gatherer import signal_gatherer
+from write_behind import write_behind
 
 logger = logging.getLogger(__name__)
 
@@ -137,16 +146,13 @@ class PaperTradingEngine:
         return self.BINANCE_PAIRS
     
     async def get_real_price(self, symbol: str, exchange: str = 'luno') -> float:
-        """Fetch REAL price - accurate to live trading"""
+        """Fetch REAL price from the shared market-data hub - accurate to live trading"""
         try:
-            if not self.luno_exchange and not self.binance_exchange:
-                await self.init_exchanges()
-            
-            exchange_obj = self.luno_exchange if exchange == 'luno' else self.binance_exchange
+            # Exchanges the hub does not serve are priced from Binance (as before)
+            source = exchange if market_data_hub.supports(exchange) else 'binance'
+            price = await market_data_hub.get_price(symbol, source)
             
-            if exchange_obj:
-                ticker = await exchange_obj.fetch_ticker(symbol)
-                price = ticker['last']
+            if price:
                 self.price_cache[symbol] = price
                 return price
         except Exception as e:
@@ -156,25 +162,16 @@ class PaperTradingEngine:
         return self.price_cache.get(symbol, 50000.0 if 'BTC' in symbol else 1.0)
     
     async def analyze_trend(self, symbol: str, exchange: str = 'luno') -> str:
-        """Analyze REAL market trend"""
+        """Analyze REAL market trend from stored 5m candles"""
         try:
-            exchange_obj = self.luno_exchange if exchange == 'luno' else self.binance_exchange
-            
-            if not exchange_obj:
-                return 'neutral'
-            
-            ohlcv = await exchange_obj.fetch_ohlcv(symbol, '5m', limit=20)
+            source = 'luno' if exchange == 'luno' else 'binance'
+            candles = await candle_store.recent(source, symbol, '5m', 20)
             
-            if len(ohlcv) < 10:
+            if len(candles) < 15:
                 return 'neutral'
             
-            recent_prices = [candle[4] for candle in ohlcv[-5:]]
-            older_prices = [candle[4] for candle in ohlcv[-15:-5]]
-            
-            recent_avg = sum(recent_prices) / len(recent_prices)
-            older_avg = sum(older_prices) / len(older_prices)
-            
-            change_pct = ((recent_avg - older_avg) / older_avg) * 100
+            # Last 5 closes against the 10 before them (same rule the backtester replays)
+            change_pct = float(trend_change_pct(candles.close[-15:])[-1])
             
             if change_pct > 0.4:
                 return 'bullish'
@@ -187,14 +184,15 @@ class PaperTradingEngine:
     
     async def execute_smart_trade(self, bot_id: str, bot_data: Dict) -> Dict:
         """Execute trade with AI INTELLIGENCE, RISK ENGINE, RATE LIMITER, and FEE SIMULATION"""
+        reservation = None
         try:
             user_id = bot_data.get('user_id')
             risk_mode = bot_data.get('risk_mode', 'safe')
             current_capital = bot_data.get('current_capital', 1000)
             exchange = bot_data.get('exchange', 'luno')
             
-            # 1. CHECK RATE LIMITER
-            can_trade, reason = rate_limiter.can_trade(bot_id, exchange)
+            # 1. RESERVE A RATE LIMIT SLOT (atomic across workers; released below unless the trade completes)
+            can_trade, reason, reservation = await rate_limiter.reserve(bot_id, exchange)
             if not can_trade:
                 logger.warning(f"Rate limit: {bot_data['name'][:15]} - {reason}")
                 return {"success": False, "bot_id": bot_id, "error": reason}
@@ -203,27 +201,27 @@ class PaperTradingEngine:
             available_pairs = await self.get_available_pairs(exchange)
             symbol = random.choice(available_pairs)
             
-            # Get REAL price
-            current_price = await self.get_real_price(symbol, exchange)
-            
-            # 2. AI INTELLIGENCE: Check market regime
+            # 2-5. AI INTELLIGENCE: price, regime, ML, Flokx, Fetch.ai and trend gathered
+            # concurrently - a late source falls back to its last good or neutral value
             from market_regime import market_regime_detector
-            regime = await market_regime_detector.detect_regime(symbol, exchange)
-            
-            # 3. AI INTELLIGENCE: Get ML prediction
             from ml_predictor import ml_predictor
-            prediction = await ml_predictor.predict_price(symbol, timeframe="1h")
-            
-            # 4. AI INTELLIGENCE: Get Flokx signals (if available)
             from flokx_integration import flokx
-            flokx_data = await flokx.fetch_market_coefficients(symbol)
-            
-            # 5. AI INTELLIGENCE: Get Fetch.ai signals (if available)
             from fetchai_integration import fetchai
-            fetchai_data = await fetchai.fetch_market_signals(symbol)
-            
-            # Analyze REAL trend (fallback if AI fails)
-            trend = await self.analyze_trend(symbol, exchange)
+            signals = await signal_gatherer.gather(symbol, {
+                "price": (lambda: self.get_real_price(symbol, exchange),
+                          self.price_cache.get(symbol, 50000.0 if 'BTC' in symbol else 1.0)),
+                "regime": (lambda: market_regime_detector.detect_regime(symbol, exchange), {"confidence": 0}),
+                "prediction": (lambda: ml_predictor.predict_price(symbol, timeframe="1h"), {"confidence": 0}),
+                "flokx": (lambda: flokx.fetch_market_coefficients(symbol), {"strength": 0}),
+                "fetchai": (lambda: fetchai.fetch_market_signals(symbol), {"signal": "HOLD", "confidence": 0}),
+                "trend": (lambda: self.analyze_trend(symbol, exchange), 'neutral'),
+            })
+            current_price = signals["values"]["price"]
+            regime = signals["values"]["regime"] or {}
+            prediction = signals["values"]["prediction"] or {}
+            flokx_data = signals["values"]["flokx"] or {}
+            fetchai_data = signals["values"]["fetchai"] or {}
+            trend = signals["values"]["trend"]
             
             # Override trend with AI intelligence if confidence is high
             if regime.get('confidence', 0) > 0.7:
@@ -269,14 +267,7 @@ class PaperTradingEngine:
             
             # Position sizing - OPTIMIZED for quality over quantity
             # Larger positions on high-confidence AI signals
-            position_sizes = {
-                'safe': 0.20,       # 20% per trade (was 15%)
-                'balanced': 0.30,   # 30% (was 20%)
-                'risky': 0.40,      # 40% (was 25%)
-                'aggressive': 0.50  # 50% (was 30%)
-            }
-            
-            base_position_size = position_sizes.get(risk_mode, 0.20)
+            base_position_size = POSITION_SIZES.get(risk_mode, 0.20)
             
             # BOOST position size on HIGH-CONFIDENCE AI signals (up to +50% larger)
             confidence_boost = 1.0
@@ -414,11 +405,11 @@ class PaperTradingEngine:
             
             is_profitable = net_profit > 0
             
-            # 4. RECORD TRADE FOR RATE LIMITER
-            rate_limiter.record_trade(bot_id, exchange)
+            # 4. KEEP THE RATE LIMITER RESERVATION
+            reservation = None
             
             # 5. RECORD RESULT FOR RISK ENGINE
-            await risk_engine.record_trade_result(user_id, net_profit)
+            await risk_engine.record_trade_result(user_id, net_profit, bot_id)
             
             # Calculate trade quality score (1-10)
             quality_score = self._calculate_trade_quality(net_profit, fees, trade_amount, profit_pct)
@@ -445,7 +436,7 @@ class PaperTradingEngine:
                 "is_profitable": is_profitable,
                 "risk_mode": risk_mode,
                 "quality_score": quality_score,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": datetime.now(timezone.utc),
                 "trade_type": "BUY->SELL",
                 "data_source": "REAL_" + exchange.upper(),
                 "fee_rate": round(fee_rate * 100, 3),  # Display as percentage
@@ -457,7 +448,10 @@ class PaperTradingEngine:
                 "flokx_strength": round(flokx_data.get('strength', 0), 1),
                 "flokx_sentiment": flokx_data.get('sentiment', 'neutral'),
                 "fetchai_signal": fetchai_data.get('signal', 'HOLD'),
-                "fetchai_confidence": round(fetchai_data.get('confidence', 0), 1)
+                "fetchai_confidence": round(fetchai_data.get('confidence', 0), 1),
+                "signals_timed_out": signals["timed_out"],
+                "signals_failed": signals["failed"],
+                "signal_latency_ms": signals["elapsed_ms"]
             }
             
             emoji = "🟢" if is_profitable else "🔴"
@@ -468,6 +462,9 @@ class PaperTradingEngine:
         except Exception as e:
             logger.error(f"Trade error: {e}")
             return {"success": False, "bot_id": bot_id, "error": str(e)}
+        finally:
+            if reservation is not None:  # Skipped, blocked, rejected or failed before completing
+                await rate_limiter.release(bot_id, exchange, reservation)
     
     def _calculate_trade_quality(self, net_profit: float, fees: float, trade_amount: float, profit_pct: float) -> int:
         """Calculate trade quality score (1-10)"""
@@ -509,40 +506,35 @@ class PaperTradingEngine:
             if not trade_result.get('success'):
                 return None
             
-            bots_collection = db_collections['bots']
-            trades_collection = db_collections['trades']
-            
-            # CRITICAL FIX: Fetch fresh bot data to avoid stale capital in concurrent trades
-            fresh_bot = await bots_collection.find_one({"id": bot_id}, {"_id": 0})
-            if not fresh_bot:
-                return None
+            # Capital deltas are $inc'd through the write-behind batcher; bot_data was read
+            # right before dispatch, so only deltas still waiting to be flushed are added
+            current_capital = bot_data.get('current_capital', 0) + write_behind.pending_inc(bot_id, 'current_capital')
+            new_capital = current_capital + trade_result['profit_loss']
+            total_profit = new_capital - bot_data.get('initial_capital', 0)
             
-            # Use fresh current_capital for accurate calculation
-            new_capital = fresh_bot['current_capital'] + trade_result['profit_loss']
-            total_profit = new_capital - fresh_bot['initial_capital']
-            
-            # Update bot with calculated values
-            await bots_collection.update_one(
-                {"id": bot_id},
-                {
-                    "$set": {
-                        "current_capital": round(new_capital, 2),
-                        "total_profit": round(total_profit, 2),
-                        "last_trade": datetime.now(timezone.utc).isoformat(),
-                        "status": "active"
-                    },
-                    "$inc": {"trades_count": 1}
-                }
-            )
-            
-            # Save trade
+            # Save trade, then the bot update (same flush, trades first)
             trade_doc = {
                 **trade_result,
                 "user_id": bot_data['user_id'],
                 "new_capital": round(new_capital, 2),
                 "total_profit": round(total_profit, 2)
             }
-            await trades_collection.insert_one(trade_doc)
+            await write_behind.insert_trade(trade_doc)
+            await write_behind.update_bot(
+                bot_id,
+                inc={
+                    "current_capital": trade_result['profit_loss'],
+                    "total_profit": trade_result['profit_loss'],
+                    "trades_count": 1
+                },
+                set_fields={
+                    # No status here: a buffered $set could re-activate a bot paused since the trade
+                    "last_trade": datetime.now(timezone.utc).isoformat()
+                }
+            )
+            await portfolio_summary.record_trade(trade_doc)
+            await pnl_rollups.record_trade(trade_doc)
+            performance_ranker.invalidate(trade_doc.get('user_id'))
             
             return {
                 "bot_id": bot_id,
@@ -5,29 +5,64 @@ Bot Performance Ranking System
 - Calculates Sharpe ratio, win rate, profit factor
 """
 
-import asyncio
-from datetime import datetime, timezone, timedelta
-from database import bots_collection, trades_collection
+from datetime import datetime, timezone
+from typing import Dict, List
+from config import RANKING_CACHE_TTL_SECONDS
 from logger_config import logger
 import math
 
+# Trades record P&L as profit_loss (older documents: pnl)
+PNL = {"$ifNull": ["$profit_loss", {"$ifNull": ["$pnl", 0]}]}
+
 
 class PerformanceRanker:
-    def __init__(self):
+    def __init__(self, bots=None, trades=None, ttl_seconds: float = RANKING_CACHE_TTL_SECONDS):
+        self.bots = bots
+        self.trades = trades
+        self.ttl_seconds = ttl_seconds
         self.ranking_cache = {}
         self.last_rank_time = None
     
-    async def rank_bots(self, user_id: str) -> list:
-        """Rank all user's bots by performance"""
+    def _collections(self):
+        if self.bots is None:
+            from database import bots_collection, trades_collection
+            self.bots = bots_collection
+            self.trades = trades_collection
+        return self.bots, self.trades
+    
+    def invalidate(self, user_id: str):
+        """New trade landed - next rank_bots() re-aggregates"""
+        self.ranking_cache.pop(user_id, None)
+    
+    def _cached(self, user_id: str):
+        entry = self.ranking_cache.get(user_id)
+        if entry is None:
+            return None
+        age = (datetime.now(timezone.utc) - entry["timestamp"]).total_seconds()
+        if age > self.ttl_seconds:
+            self.ranking_cache.pop(user_id, None)
+            return None
+        return entry["rankings"]
+    
+    async def rank_bots(self, user_id: str, use_cache: bool = True) -> list:
+        """Rank all user's bots by performance (cached for ttl_seconds)"""
+        if use_cache:
+            cached = self._cached(user_id)
+            if cached is not None:
+                return [dict(b) for b in cached]
+        
         try:
-            bots = await bots_collection.find(
+            bots_coll, _ = self._collections()
+            bots = await bots_coll.find(
                 {"user_id": user_id, "status": "active"},
                 {"_id": 0}
             ).to_list(1000)
             
+            stats = await self._aggregate_trade_stats([b['id'] for b in bots if b.get('id')])
+            
             ranked_bots = []
             for bot in bots:
-                score = await self._calculate_performance_score(bot)
+                score = self._calculate_performance_score(bot, stats.get(bot.get('id')))
                 ranked_bots.append({
                     **bot,
                     "performance_score": score
@@ -41,47 +76,63 @@ class PerformanceRanker:
                 bot['rank'] = idx + 1
             
             # Cache rankings
+            self.last_rank_time = datetime.now(timezone.utc)
             self.ranking_cache[user_id] = {
                 "rankings": ranked_bots,
-                "timestamp": datetime.now(timezone.utc)
+                "timestamp": self.last_rank_time
             }
             
             logger.info(f"Ranked {len(ranked_bots)} bots for user {user_id}")
-            return ranked_bots
+            return [dict(b) for b in ranked_bots]
             
         except Exception as e:
             logger.error(f"Bot ranking failed: {e}")
             return []
     
-    async def _calculate_performance_score(self, bot: dict) -> float:
-        """Calculate composite performance score"""
+    async def _aggregate_trade_stats(self, bot_ids: List[str]) -> Dict[str, Dict]:
+        """Per-bot trade sums, counts and sum of squares in one $group round trip"""
+        if not bot_ids:
+            return {}
+        pipeline = [
+            {"$match": {"bot_id": {"$in": bot_ids}}},
+            {"$project": {"bot_id": 1, "pnl": PNL}},
+            {"$group": {
+                "_id": "$bot_id",
+                "count": {"$sum": 1},
+                "wins": {"$sum": {"$cond": [{"$gt": ["$pnl", 0]}, 1, 0]}},
+                "gross_win": {"$sum": {"$cond": [{"$gt": ["$pnl", 0]}, "$pnl", 0]}},
+                "gross_loss": {"$sum": {"$cond": [{"$lt": ["$pnl", 0]}, "$pnl", 0]}},
+                "sum": {"$sum": "$pnl"},
+                "sum_sq": {"$sum": {"$multiply": ["$pnl", "$pnl"]}}
+            }}
+        ]
+        _, trades = self._collections()
+        rows = await trades.aggregate(pipeline).to_list(None)
+        return {row["_id"]: row for row in rows}
+    
+    @staticmethod
+    def _calculate_performance_score(bot: dict, stats: Dict = None) -> float:
+        """Calculate composite performance score from aggregated trade stats"""
         try:
-            # Get bot's trades
-            trades = await trades_collection.find(
-                {"bot_id": bot['id']},
-                {"_id": 0}
-            ).to_list(1000)
-            
-            if not trades:
+            count = (stats or {}).get("count", 0)
+            if not count:
                 return 0.0
             
             # 1. Win Rate (0-100)
-            winning_trades = sum(1 for t in trades if t.get('pnl', 0) > 0)
-            win_rate = (winning_trades / len(trades)) * 100
+            win_rate = (stats["wins"] / count) * 100
             
             # 2. Profit Factor (ratio of wins to losses)
-            total_wins = sum(t.get('pnl', 0) for t in trades if t.get('pnl', 0) > 0)
-            total_losses = abs(sum(t.get('pnl', 0) for t in trades if t.get('pnl', 0) < 0))
+            total_wins = stats["gross_win"]
+            total_losses = abs(stats["gross_loss"])
             profit_factor = total_wins / total_losses if total_losses > 0 else total_wins
             
             # 3. Average profit per trade
-            avg_profit = sum(t.get('pnl', 0) for t in trades) / len(trades)
+            avg_profit = stats["sum"] / count
             
-            # 4. Sharpe Ratio (simplified)
-            returns = [t.get('pnl', 0) for t in trades]
-            mean_return = sum(returns) / len(returns)
-            std_dev = math.sqrt(sum((r - mean_return) ** 2 for r in returns) / len(returns))
-            sharpe = mean_return / std_dev if std_dev > 0 else 0
+            # 4. Sharpe Ratio (simplified) - population variance from sum of squares
+            variance = max(stats["sum_sq"] / count - avg_profit ** 2, 0)
+            std_dev = math.sqrt(variance)
+            sharpe = avg_profit / std_dev if std_dev > 1e-12 else 0
             
             # 5. Total profit
             total_profit = bot.get('total_profit', 0)
@@ -0,0 +1,185 @@
+"""
+P&L Rollups - hourly and daily profit buckets per user and per bot
+- Every trade write $inc's four bucket documents (user/bot x hour/day) in one round trip
+- Analytics (profit history, countdown, email reports, AI insights) read O(days)
+  buckets instead of loading and parsing the raw trade history
+- Existing history: python migrations/backfill_pnl_rollups.py (from backend/)
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import logging
+
+from time_utils import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("hour", "day")
+COUNTERS = ("pnl", "fees", "volume", "trades", "wins", "losses")
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """Start of the hour/day (UTC) containing ts"""
+    ts = ts.astimezone(timezone.utc)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def trade_time(trade: Dict) -> datetime:
+    """Trade timestamp as an aware datetime (BSON dates or legacy ISO strings)"""
+    return parse_timestamp(trade.get('timestamp'), default=datetime.now(timezone.utc))
+
+
+def trade_counters(trade: Dict) -> Dict[str, float]:
+    """Values one trade contributes to a bucket"""
+    pnl = trade.get('profit_loss', trade.get('pnl', 0)) or 0
+    price = trade.get('price') or trade.get('entry_price') or 0
+    return {
+        "pnl": pnl,
+        "fees": trade.get('fees', trade.get('fee', 0)) or 0,
+        "volume": (trade.get('amount') or 0) * price,
+        "trades": 1,
+        "wins": 1 if pnl > 0 else 0,
+        "losses": 1 if pnl < 0 else 0
+    }
+
+
+def _pair_key(trade: Dict) -> str:
+    return str(trade.get('pair') or trade.get('symbol') or 'unknown').replace('.', '_')
+
+
+def _bucket_ids(trade: Dict, ts: datetime) -> List[Dict]:
+    """The user and bot buckets a trade lands in"""
+    user_id, bot_id = trade.get('user_id'), trade.get('bot_id')
+    buckets = []
+    for granularity in GRANULARITIES:
+        start = bucket_start(ts, granularity)
+        stamp = start.strftime('%Y-%m-%dT%H' if granularity == "hour" else '%Y-%m-%d')
+        buckets.append({
+            "_id": f"user:{user_id}:{granularity}:{stamp}",
+            "scope": "user", "user_id": user_id, "granularity": granularity, "bucket_start": start
+        })
+        if bot_id:
+            buckets.append({
+                "_id": f"bot:{bot_id}:{granularity}:{stamp}",
+                "scope": "bot", "user_id": user_id, "bot_id": bot_id,
+                "granularity": granularity, "bucket_start": start
+            })
+    return buckets
+
+
+class PnLRollups:
+    def __init__(self, collection=None, trades=None):
+        self._collection = collection
+        self._trades = trades
+
+    async def _get_collection(self):
+        if self._collection is None:
+            from database import pnl_rollups_collection, trades_collection
+            self._collection = pnl_rollups_collection
+            self._trades = self._trades or trades_collection
+        return self._collection
+
+    async def record_trade(self, trade: Dict):
+        """Fold one trade into its hour/day buckets (atomic upserts, one round trip)"""
+        if not trade.get('user_id'):
+            return
+        from pymongo import UpdateOne
+
+        try:
+            collection = await self._get_collection()
+            counters = trade_counters(trade)
+            pair = _pair_key(trade)
+            inc = {**counters, **{f"pairs.{pair}.{k}": counters[k] for k in ("pnl", "trades", "wins", "losses")}}
+            await collection.bulk_write([
+                UpdateOne({"_id": b.pop("_id")}, {"$inc": inc, "$setOnInsert": b}, upsert=True)
+                for b in _bucket_ids(trade, trade_time(trade))
+            ], ordered=False)
+        except Exception as e:
+            logger.error(f"P&L rollup update failed: {e}")
+
+    async def get_buckets(self, user_id: str, granularity: str = "day",
+                          since: Optional[datetime] = None, until: Optional[datetime] = None,
+                          bot_id: Optional[str] = None, by_bot: bool = False) -> List[Dict]:
+        """Buckets in [since, until), oldest first
+
+        by_bot=True returns the per-bot buckets of every bot of the user
+        """
+        collection = await self._get_collection()
+        query = {"scope": "bot" if (bot_id or by_bot) else "user", "user_id": user_id, "granularity": granularity}
+        if bot_id:
+            query["bot_id"] = bot_id
+        if since or until:
+            query["bucket_start"] = {}
+            if since:
+                query["bucket_start"]["$gte"] = bucket_start(since, granularity)
+            if until:
+                query["bucket_start"]["$lt"] = until
+        docs = await collection.find(query, {"_id": 0}).sort("bucket_start", 1).to_list(None)
+        for d in docs:
+            if d["bucket_start"].tzinfo is None:
+                d["bucket_start"] = d["bucket_start"].replace(tzinfo=timezone.utc)  # BSON dates come back naive
+        return docs
+
+    @staticmethod
+    def summarize(buckets: List[Dict]) -> Dict:
+        """Totals over a list of buckets"""
+        totals = {k: 0 for k in COUNTERS}
+        pairs: Dict[str, Dict] = {}
+        active_buckets = 0
+        for b in buckets:
+            for k in COUNTERS:
+                totals[k] += b.get(k, 0)
+            if b.get("trades", 0) > 0:
+                active_buckets += 1
+            for pair, p in (b.get("pairs") or {}).items():
+                agg = pairs.setdefault(pair, {"pnl": 0, "trades": 0, "wins": 0, "losses": 0})
+                for k in agg:
+                    agg[k] += p.get(k, 0)
+        totals["active_buckets"] = active_buckets
+        totals["pairs"] = pairs
+        return totals
+
+    async def backfill(self, user_id: Optional[str] = None) -> Dict:
+        """Rebuild buckets from the raw trades (idempotent - replaces existing buckets)
+
+        Streams the trades once and keeps only bucket totals in memory. Run it
+        while trading is paused - trades written during the scan can be lost
+        from (or counted twice in) the current bucket.
+        """
+        from pymongo import ReplaceOne
+
+        collection = await self._get_collection()
+        query = {"user_id": user_id} if user_id else {}
+        buckets: Dict[str, Dict] = {}
+        scanned = 0
+
+        async for trade in self._trades.find(query, {"_id": 0}):
+            if not trade.get('user_id'):
+                continue
+            scanned += 1
+            counters = trade_counters(trade)
+            pair = _pair_key(trade)
+            for b in _bucket_ids(trade, trade_time(trade)):
+                doc = buckets.setdefault(b["_id"], {**b, **{k: 0 for k in COUNTERS}, "pairs": {}})
+                for k, v in counters.items():
+                    doc[k] += v
+                p = doc["pairs"].setdefault(pair, {"pnl": 0, "trades": 0, "wins": 0, "losses": 0})
+                for k in p:
+                    p[k] += counters[k]
+
+        await collection.delete_many(query)
+        docs = list(buckets.values())
+        for i in range(0, len(docs), 1000):
+            await collection.bulk_write(
+                [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs[i:i + 1000]],
+                ordered=False
+            )
+
+        logger.info(f"✅ P&L rollups rebuilt: {scanned} trades -> {len(docs)} buckets")
+        return {"trades_scanned": scanned, "buckets_written": len(docs)}
+
+
+# Global instance
+pnl_rollups = PnLRollups()
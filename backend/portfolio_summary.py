@@ -0,0 +1,180 @@
+"""
+Portfolio Summary - materialized per-user dashboard aggregates
+- One document per user in portfolio_summaries, read by /api/overview and /sse/overview
+- Trade writes $inc a 10-minute P&L bucket (rolling 24h change without scanning trades)
+- Trade writes also $inc total_current by the trade's P&L, so trades never force
+  a re-aggregation
+- Bot-derived totals (counts by mode, capital, injections, exposure) come from one
+  server-side $group over the user's bots, re-run only when bots are created,
+  updated or deleted (or the summary ages out)
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional
+import logging
+
+from config import PORTFOLIO_SUMMARY_MAX_AGE_SECONDS
+from time_utils import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+BUCKET_MINUTES = 10
+
+
+def bucket_key(ts: datetime) -> str:
+    """10-minute bucket id, e.g. 2026-10-16T14:30 (sortable as a string)"""
+    return f"{ts:%Y-%m-%dT%H}:{ts.minute // BUCKET_MINUTES * BUCKET_MINUTES:02d}"
+
+
+def _active(expr):
+    """Only active bots count towards capital and mode totals"""
+    return {"$cond": [{"$eq": ["$status", "active"]}, expr, 0]}
+
+
+class PortfolioSummary:
+    def __init__(self, summaries=None, bots=None, trades=None):
+        self._summaries = summaries
+        self._bots = bots
+        self._trades = trades
+
+    def _collections(self):
+        if self._summaries is None:
+            from database import portfolio_summaries_collection, bots_collection, trades_collection
+            self._summaries = portfolio_summaries_collection
+            self._bots = bots_collection
+            self._trades = trades_collection
+        return self._summaries, self._bots, self._trades
+
+    async def record_trade(self, trade: Dict):
+        """Fold one new trade into its owner's summary (atomic, no reads)"""
+        user_id = trade.get('user_id')
+        if not user_id:
+            return
+        summaries, _, _ = self._collections()
+        profit = trade.get('profit_loss', trade.get('pnl', 0)) or 0
+        now = datetime.now(timezone.utc)
+        try:
+            await summaries.update_one(
+                {"_id": user_id},
+                {
+                    "$inc": {
+                        f"pnl_buckets.{bucket_key(now)}": profit,
+                        "trades_recorded": 1,
+                        "total_current": profit  # The trade's bot capital moves by its P&L
+                    },
+                    "$set": {"last_trade_at": now}
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Portfolio summary trade update failed for {user_id[:8]}: {e}")
+
+    async def mark_bots_changed(self, user_id: str):
+        """Bot created/updated/deleted - totals are re-aggregated on next read"""
+        summaries, _, _ = self._collections()
+        try:
+            await summaries.update_one({"_id": user_id}, {"$inc": {"bots_version": 1}}, upsert=True)
+        except Exception as e:
+            logger.error(f"Portfolio summary invalidation failed for {user_id[:8]}: {e}")
+
+    async def _aggregate_bots(self, user_id: str) -> Dict:
+        """All bot-derived totals in one server-side pass"""
+        _, bots, _ = self._collections()
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$group": {
+                "_id": None,
+                "total_bots": {"$sum": 1},
+                "active_bots": {"$sum": _active(1)},
+                "paper_bots": {"$sum": _active({"$cond": [{"$eq": ["$trading_mode", "paper"]}, 1, 0]})},
+                "live_bots": {"$sum": _active({"$cond": [{"$eq": ["$trading_mode", "live"]}, 1, 0]})},
+                "total_current": {"$sum": _active({"$ifNull": ["$current_capital", 0]})},
+                "total_initial": {"$sum": _active({"$ifNull": ["$initial_capital", 0]})},
+                "total_injections": {"$sum": _active({"$ifNull": ["$total_injections", 0]})}
+            }}
+        ]
+        result = await bots.aggregate(pipeline).to_list(1)
+        totals = result[0] if result else {}
+        totals.pop("_id", None)
+        for field in ("total_bots", "active_bots", "paper_bots", "live_bots",
+                      "total_current", "total_initial", "total_injections"):
+            totals.setdefault(field, 0)
+        return totals
+
+    async def _backfill_buckets(self, user_id: str) -> Dict[str, float]:
+        """First read for a user: seed buckets from the last 24h of trades (once)"""
+        _, _, trades = self._collections()
+        since = datetime.now(timezone.utc) - timedelta(hours=24)
+        buckets: Dict[str, float] = {}
+        cursor = trades.find(
+            {"user_id": user_id, "timestamp": {"$gte": since}},
+            {"_id": 0, "profit_loss": 1, "pnl": 1, "timestamp": 1}
+        )
+        async for t in cursor:
+            ts = parse_timestamp(t.get('timestamp'))
+            if ts is None:
+                continue
+            key = bucket_key(ts)
+            buckets[key] = buckets.get(key, 0) + (t.get('profit_loss', t.get('pnl', 0)) or 0)
+        return buckets
+
+    async def refresh(self, user_id: str, doc: Optional[Dict] = None) -> Dict:
+        """Re-aggregate bot totals and drop P&L buckets older than 24h"""
+        summaries, _, _ = self._collections()
+        version = (doc or {}).get("bots_version", 0)
+        totals = await self._aggregate_bots(user_id)
+        now = datetime.now(timezone.utc)
+        update = {"$set": {**totals, "bots_version_seen": version, "refreshed_at": now}}
+
+        if not (doc or {}).get("buckets_seeded"):
+            # Trades already folded in by record_trade are part of this scan too
+            update["$set"]["pnl_buckets"] = await self._backfill_buckets(user_id)
+            update["$set"]["buckets_seeded"] = True
+        else:
+            cutoff = bucket_key(now - timedelta(hours=24))
+            expired = {f"pnl_buckets.{k}": "" for k in (doc.get("pnl_buckets") or {}) if k < cutoff}
+            if expired:
+                update["$unset"] = expired
+
+        await summaries.update_one({"_id": user_id}, update, upsert=True)
+        return await summaries.find_one({"_id": user_id})
+
+    async def get_summary(self, user_id: str) -> Dict:
+        """One document read; re-aggregates only when bots changed or the summary aged out"""
+        summaries, _, _ = self._collections()
+        doc = await summaries.find_one({"_id": user_id})
+
+        now = datetime.now(timezone.utc)
+        refreshed_at = parse_timestamp((doc or {}).get("refreshed_at"))
+        stale = (
+            doc is None
+            or refreshed_at is None
+            or doc.get("bots_version", 0) != doc.get("bots_version_seen")
+            or (now - refreshed_at).total_seconds() > PORTFOLIO_SUMMARY_MAX_AGE_SECONDS
+        )
+        if stale:
+            doc = await self.refresh(user_id, doc)
+
+        cutoff = bucket_key(now - timedelta(hours=24))
+        profit_24h = sum(v for k, v in (doc.get("pnl_buckets") or {}).items() if k > cutoff)
+
+        total_current = doc.get("total_current", 0)
+        total_initial = doc.get("total_initial", 0)
+        return {
+            "total_bots": doc.get("total_bots", 0),
+            "active_bots": doc.get("active_bots", 0),
+            "paper_bots": doc.get("paper_bots", 0),
+            "live_bots": doc.get("live_bots", 0),
+            "total_current": total_current,
+            "total_initial": total_initial,
+            "total_injections": doc.get("total_injections", 0),
+            # Real profit = (current - initial) - injections
+            "total_profit": (total_current - total_initial) - doc.get("total_injections", 0),
+            "profit_24h": profit_24h,
+            "change_24h_pct": (profit_24h / total_initial * 100) if total_initial > 0 else 0,
+            "exposure": (total_current / (total_current + 1000)) * 100 if total_current > 0 else 0
+        }
+
+
+# Global instance
+portfolio_summary = PortfolioSummary()
@@ -1,19 +1,33 @@
-"""Rate limiter for exchange API calls"""
+"""Rate limiter for exchange API calls
+
+Counting is delegated to a pluggable backend:
+- memory: per-process counters (single worker / tests)
+- mongo: shared counters with atomic $inc, one budget across all workers and hosts
+- reserve() increments before checking, so concurrent workers cannot all pass a
+  check before any of them records
+"""
 from datetime import datetime, timezone, timedelta
 from collections import defaultdict
+import time
 import logging
-from exchange_limits import get_exchange_limits
+from exchange_limits import get_exchange_limits, EXCHANGE_LIMITS
+from config import RATE_LIMIT_BACKEND
 
 logger = logging.getLogger(__name__)
 
-class RateLimiter:
+
+class InMemoryRateLimitBackend:
+    """Per-process counters - each uvicorn worker enforces its own copy"""
+
+    name = "memory"
+
     def __init__(self):
         self.orders_today = defaultdict(int)  # {exchange: count}
         self.orders_this_minute = defaultdict(lambda: {"count": 0, "reset_time": datetime.now(timezone.utc)})
         self.orders_per_10_seconds = defaultdict(lambda: {"count": 0, "reset_time": datetime.now(timezone.utc)})  # Burst protection
         self.bot_orders_today = defaultdict(int)  # {bot_id: count}
         self.last_reset = datetime.now(timezone.utc).date()
-    
+
     def _reset_if_needed(self):
         """Reset daily counters at midnight"""
         today = datetime.now(timezone.utc).date()
@@ -22,7 +36,7 @@ class RateLimiter:
             self.bot_orders_today.clear()
             self.last_reset = today
             logger.info("Rate limiter: Daily counters reset")
-    
+
     def _reset_minute_if_needed(self, exchange: str):
         """Reset per-minute counter after 60 seconds"""
         now = datetime.now(timezone.utc)
@@ -30,7 +44,7 @@ class RateLimiter:
         if (now - minute_data["reset_time"]).total_seconds() >= 60:
             minute_data["count"] = 0
             minute_data["reset_time"] = now
-    
+
     def _reset_10_seconds_if_needed(self, exchange: str):
         """Reset per-10-seconds counter (BURST PROTECTION)"""
         now = datetime.now(timezone.utc)
@@ -38,56 +52,239 @@ class RateLimiter:
         if (now - burst_data["reset_time"]).total_seconds() >= 10:
             burst_data["count"] = 0
             burst_data["reset_time"] = now
-    
-    def can_trade(self, bot_id: str, exchange: str) -> tuple[bool, str]:
-        """Check if bot can trade on exchange (with BURST PROTECTION)"""
+
+    async def get_counts(self, bot_id: str, exchange: str) -> dict:
+        """Current usage for one bot on one exchange"""
         self._reset_if_needed()
         self._reset_minute_if_needed(exchange)
         self._reset_10_seconds_if_needed(exchange)
-        
+        return {
+            "burst": self.orders_per_10_seconds[exchange]["count"],
+            "minute": self.orders_this_minute[exchange]["count"],
+            "day": self.orders_today[exchange],
+            "bot_day": self.bot_orders_today[bot_id]
+        }
+
+    async def increment(self, bot_id: str, exchange: str, amount: int = 1, now: float = None):
+        """Record one order (amount=-1 gives a reservation back)"""
+        self.orders_today[exchange] = max(0, self.orders_today[exchange] + amount)
+        for window in (self.orders_this_minute[exchange], self.orders_per_10_seconds[exchange]):
+            window["count"] = max(0, window["count"] + amount)
+        self.bot_orders_today[bot_id] = max(0, self.bot_orders_today[bot_id] + amount)
+
+    async def reserve(self, bot_id: str, exchange: str) -> tuple:
+        """Increment, then read the counts including this order (no await in between)"""
+        counts = await self.get_counts(bot_id, exchange)
+        await self.increment(bot_id, exchange)
+        return {k: v + 1 for k, v in counts.items()}, time.time()
+
+    async def get_daily_totals(self) -> dict:
+        """Orders today per exchange"""
+        self._reset_if_needed()
+        return dict(self.orders_today)
+
+
+class MongoRateLimitBackend:
+    """Cluster-wide counters in MongoDB
+
+    Burst and per-minute limits use a sliding-window counter: the current fixed
+    window plus the previous one weighted by how much of it still overlaps.
+    Daily limits reset at UTC midnight like the in-memory backend. Every
+    increment is an atomic upsert with $inc, so concurrent workers never lose
+    counts; documents expire through the TTL index declared in db_indexes.
+    """
+
+    name = "mongo"
+
+    WINDOWS = {"burst": 10, "minute": 60}
+
+    def __init__(self, collection=None):
+        self._collection = collection
+
+    async def _get_collection(self):
+        if self._collection is None:
+            from database import rate_limits_collection
+            self._collection = rate_limits_collection
+        return self._collection
+
+    @staticmethod
+    def _bucket(window_seconds: int, now: float, offset: int = 0) -> int:
+        return int(now // window_seconds) - offset
+
+    def _keys(self, bot_id: str, exchange: str, now: float) -> dict:
+        """Document ids for every counter this check touches"""
+        today = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+        keys = {
+            "day": f"exchange:{exchange}:day:{today}",
+            "bot_day": f"bot:{bot_id}:day:{today}"
+        }
+        for window, seconds in self.WINDOWS.items():
+            keys[f"{window}_current"] = f"exchange:{exchange}:{window}:{self._bucket(seconds, now)}"
+            keys[f"{window}_previous"] = f"exchange:{exchange}:{window}:{self._bucket(seconds, now, 1)}"
+        return keys
+
+    async def get_counts(self, bot_id: str, exchange: str, now: float = None) -> dict:
+        """Current usage for one bot on one exchange - one round trip"""
+        collection = await self._get_collection()
+        now = now or time.time()
+        keys = self._keys(bot_id, exchange, now)
+
+        docs = await collection.find({"_id": {"$in": list(keys.values())}}, {"count": 1}).to_list(len(keys))
+        counts_by_id = {d["_id"]: d.get("count", 0) for d in docs}
+
+        def count(name: str) -> int:
+            return counts_by_id.get(keys[name], 0)
+
+        result = {"day": count("day"), "bot_day": count("bot_day")}
+        for window, seconds in self.WINDOWS.items():
+            elapsed_fraction = (now % seconds) / seconds
+            result[window] = count(f"{window}_current") + count(f"{window}_previous") * (1 - elapsed_fraction)
+        return result
+
+    async def increment(self, bot_id: str, exchange: str, amount: int = 1, now: float = None):
+        """Record one order with atomic upserts (unordered, one round trip)
+
+        amount=-1 with the reservation's `now` gives it back to the same buckets.
+        """
+        from pymongo import UpdateOne
+
+        collection = await self._get_collection()
+        now = now or time.time()
+        today = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+        day_expiry = datetime.fromtimestamp(now, timezone.utc) + timedelta(days=2)
+
+        counters = [
+            (f"exchange:{exchange}:day:{today}", "exchange", exchange, "day", today, day_expiry),
+            (f"bot:{bot_id}:day:{today}", "bot", bot_id, "day", today, day_expiry)
+        ]
+        for window, seconds in self.WINDOWS.items():
+            bucket = self._bucket(seconds, now)
+            expiry = datetime.fromtimestamp(now, timezone.utc) + timedelta(seconds=seconds * 3)
+            counters.append((f"exchange:{exchange}:{window}:{bucket}", "exchange", exchange, window, str(bucket), expiry))
+
+        await collection.bulk_write([
+            UpdateOne(
+                {"_id": doc_id},
+                {
+                    "$inc": {"count": amount},
+                    "$setOnInsert": {"scope": scope, "name": name, "window": window, "bucket": bucket, "expires_at": expires_at}
+                },
+                upsert=True
+            )
+            for doc_id, scope, name, window, bucket, expires_at in counters
+        ], ordered=False)
+
+    async def reserve(self, bot_id: str, exchange: str) -> tuple:
+        """Increment first, then read: the counts include this order and every
+        concurrent one that landed before the read, so workers can never all pass
+        on the same stale counts (at worst one is rejected spuriously)"""
+        now = time.time()
+        await self.increment(bot_id, exchange, 1, now)
+        return await self.get_counts(bot_id, exchange, now), now
+
+    async def get_daily_totals(self) -> dict:
+        """Orders today per exchange (all workers)"""
+        collection = await self._get_collection()
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        docs = await collection.find(
+            {"scope": "exchange", "window": "day", "bucket": today},
+            {"name": 1, "count": 1}
+        ).to_list(len(EXCHANGE_LIMITS) * 2)
+        return {d["name"]: d.get("count", 0) for d in docs}
+
+
+RATE_LIMIT_BACKENDS = {
+    "memory": InMemoryRateLimitBackend,
+    "mongo": MongoRateLimitBackend
+}
+
+
+def create_rate_limit_backend(name: str = None):
+    """Build the configured backend (RATE_LIMIT_BACKEND=memory|mongo)"""
+    name = (name or RATE_LIMIT_BACKEND).lower()
+    if name not in RATE_LIMIT_BACKENDS:
+        logger.warning(f"Unknown rate limit backend '{name}' - using in-memory counters")
+        name = "memory"
+    return RATE_LIMIT_BACKENDS[name]()
+
+
+class RateLimiter:
+    def __init__(self, backend=None):
+        self.backend = backend or create_rate_limit_backend()
+        logger.info(f"Rate limiter backend: {self.backend.name}")
+
+    async def can_trade(self, bot_id: str, exchange: str) -> tuple[bool, str]:
+        """Check if bot can trade on exchange (with BURST PROTECTION) - read only"""
+        return self._check(exchange, await self.backend.get_counts(bot_id, exchange))
+
+    async def reserve(self, bot_id: str, exchange: str) -> tuple:
+        """Atomically claim one order from the budget: (allowed, reason, reservation)
+
+        Counts are incremented before they are checked; an over-limit claim is
+        rolled back. Pass the reservation to release() if the order is not sent.
+        """
+        counts, reservation = await self.backend.reserve(bot_id, exchange)
+        allowed, reason = self._check(exchange, {k: v - 1 for k, v in counts.items()})  # Usage before this order
+        if not allowed:
+            await self.release(bot_id, exchange, reservation)
+            return False, reason, None
+        return True, reason, reservation
+
+    async def release(self, bot_id: str, exchange: str, reservation):
+        """Give back a reserved order that was never sent"""
+        if reservation is None:
+            return
+        try:
+            await self.backend.increment(bot_id, exchange, -1, reservation)
+        except Exception as e:
+            logger.warning(f"Rate limiter: releasing {exchange} reservation failed: {e}")
+
+    @staticmethod
+    def _check(exchange: str, counts: dict) -> tuple[bool, str]:
         limits = get_exchange_limits(exchange)
-        
+
         # Check BURST PROTECTION (10 orders per 10 seconds)
-        if self.orders_per_10_seconds[exchange]["count"] >= limits.get("max_orders_per_10_seconds", 10):
+        if counts["burst"] >= limits.get("max_orders_per_10_seconds", 10):
             return False, f"Burst limit reached for {exchange.upper()} (max 10 orders per 10 seconds)"
-        
+
         # Check daily exchange limit
-        if self.orders_today[exchange] >= limits["max_orders_per_day"]:
+        if counts["day"] >= limits["max_orders_per_day"]:
             return False, f"Daily limit reached for {exchange.upper()} ({limits['max_orders_per_day']} orders)"
-        
+
         # Check per-minute limit
-        if self.orders_this_minute[exchange]["count"] >= limits["max_orders_per_minute"]:
+        if counts["minute"] >= limits["max_orders_per_minute"]:
             return False, f"Per-minute limit reached for {exchange.upper()}"
-        
+
         # Check per-bot daily limit
-        if self.bot_orders_today[bot_id] >= limits["max_orders_per_bot_per_day"]:
+        if counts["bot_day"] >= limits["max_orders_per_bot_per_day"]:
             return False, f"Bot daily limit reached ({limits['max_orders_per_bot_per_day']} orders)"
-        
+
         return True, "OK"
-    
-    def record_trade(self, bot_id: str, exchange: str):
-        """Record a trade for rate limiting"""
-        self.orders_today[exchange] += 1
-        self.orders_this_minute[exchange]["count"] += 1
-        self.orders_per_10_seconds[exchange]["count"] += 1  # Burst tracking
-        self.bot_orders_today[bot_id] += 1
-        logger.debug(f"Rate limiter: {exchange} orders today: {self.orders_today[exchange]}, burst: {self.orders_per_10_seconds[exchange]['count']}/10")
-    
-    def get_stats(self, exchange: str = None) -> dict:
+
+    async def record_trade(self, bot_id: str, exchange: str):
+        """Record a trade for rate limiting (callers that check first should use reserve)"""
+        await self.backend.increment(bot_id, exchange)
+        logger.debug(f"Rate limiter: recorded {exchange} order for bot {bot_id[:8]} ({self.backend.name})")
+
+    async def get_stats(self, exchange: str = None) -> dict:
         """Get current rate limit statistics"""
         if exchange:
             limits = get_exchange_limits(exchange)
+            counts = await self.backend.get_counts("", exchange)
             return {
                 "exchange": exchange,
-                "orders_today": self.orders_today[exchange],
+                "orders_today": counts["day"],
                 "max_daily": limits["max_orders_per_day"],
-                "orders_this_minute": self.orders_this_minute[exchange]["count"],
+                "orders_this_minute": round(counts["minute"]),
                 "max_per_minute": limits["max_orders_per_minute"],
+                "backend": self.backend.name,
             }
-        
+
+        orders_by_exchange = await self.backend.get_daily_totals()
         return {
-            "orders_by_exchange": dict(self.orders_today),
-            "total_orders_today": sum(self.orders_today.values()),
+            "orders_by_exchange": orders_by_exchange,
+            "total_orders_today": sum(orders_by_exchange.values()),
+            "backend": self.backend.name,
         }
 
 # Global instance
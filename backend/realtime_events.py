@@ -1,17 +1,23 @@
 """
 Real-Time Event Manager - Ensures ALL dashboard updates happen via WebSocket
+Events are batched per user into frames by event_coalescer (~250ms)
 """
 import asyncio
-from websocket_manager import manager
+from event_coalescer import event_coalescer
 from logger_config import logger
 
 class RealTimeEvents:
     """Centralized real-time event broadcasting"""
     
+    @staticmethod
+    async def emit(user_id: str, message: dict):
+        """Queue any dashboard message for the user's next frame"""
+        await event_coalescer.add(user_id, message)
+    
     @staticmethod
     async def bot_created(user_id: str, bot_data: dict):
         """Broadcast when bot is created"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "bot_created",
             "bot": bot_data,
             "message": f"✅ Bot '{bot_data.get('name')}' created"
@@ -21,7 +27,7 @@ class RealTimeEvents:
     @staticmethod
     async def bot_updated(user_id: str, bot_id: str, changes: dict):
         """Broadcast when bot is updated"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "bot_updated",
             "bot_id": bot_id,
             "changes": changes,
@@ -31,7 +37,7 @@ class RealTimeEvents:
     @staticmethod
     async def bot_deleted(user_id: str, bot_name: str):
         """Broadcast when bot is deleted"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "bot_deleted",
             "message": f"🗑️ Bot '{bot_name}' deleted"
         })
@@ -39,12 +45,23 @@ class RealTimeEvents:
     @staticmethod
     async def trade_executed(user_id: str, trade_data: dict):
         """Broadcast when trade executes"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "trade_executed",
             "trade": trade_data,
             "message": f"📊 Trade executed: {trade_data.get('pair')}"
         })
     
+    @staticmethod
+    async def broadcast_trade_event(user_id: str, event_type: str, symbol: str, side: str,
+                                    price: float, qty: float, pnl: float = None):
+        """Broadcast live engine position events (entries, exits)"""
+        await event_coalescer.add(user_id, {
+            "type": "trade_executed",
+            "event": event_type,
+            "trade": {"pair": symbol, "side": side, "price": price, "amount": qty, "profit_loss": pnl},
+            "message": f"📊 {event_type.replace('_', ' ').title()}: {side} {symbol}"
+        })
+    
     @staticmethod
     async def profit_updated(user_id: str, new_profit: float, bot_name: str = None):
         """Broadcast when profit changes"""
@@ -52,7 +69,7 @@ class RealTimeEvents:
         if bot_name:
             msg = f"💰 {bot_name} profit: R{new_profit:.2f}"
         
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "profit_updated",
             "total_profit": new_profit,
             "bot_name": bot_name,
@@ -62,7 +79,7 @@ class RealTimeEvents:
     @staticmethod
     async def system_mode_changed(user_id: str, mode: str, enabled: bool):
         """Broadcast system mode changes"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "system_mode_update",
             "mode": mode,
             "enabled": enabled,
@@ -73,7 +90,7 @@ class RealTimeEvents:
     async def api_key_connected(user_id: str, provider: str, status: str):
         """Broadcast API key connection status"""
         emoji = "✅" if status == "connected" else "❌"
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "api_key_update",
             "provider": provider,
             "status": status,
@@ -83,7 +100,7 @@ class RealTimeEvents:
     @staticmethod
     async def autopilot_action(user_id: str, action_type: str, details: dict):
         """Broadcast autopilot actions"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "autopilot_action",
             "action_type": action_type,
             "details": details,
@@ -93,7 +110,7 @@ class RealTimeEvents:
     @staticmethod
     async def self_healing_action(user_id: str, bot_name: str, reason: str):
         """Broadcast self-healing actions"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "self_healing",
             "bot_name": bot_name,
             "reason": reason,
@@ -103,7 +120,7 @@ class RealTimeEvents:
     @staticmethod
     async def bot_promoted(user_id: str, bot_name: str):
         """Broadcast bot promotion to live"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "bot_promoted",
             "bot_name": bot_name,
             "message": f"🎉 '{bot_name}' promoted to LIVE trading!"
@@ -112,7 +129,7 @@ class RealTimeEvents:
     @staticmethod
     async def force_refresh(user_id: str, reason: str = None):
         """Force complete dashboard refresh"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "force_refresh",
             "message": reason or "Dashboard updated"
         })
@@ -120,7 +137,7 @@ class RealTimeEvents:
     @staticmethod
     async def countdown_updated(user_id: str, days: int, current_capital: float):
         """Broadcast countdown updates"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "countdown_update",
             "days": days,
             "current_capital": current_capital,
@@ -130,7 +147,7 @@ class RealTimeEvents:
     @staticmethod
     async def ai_evolution(user_id: str, action: str, details: dict):
         """Broadcast AI learning/evolution actions"""
-        await manager.send_message(user_id, {
+        await event_coalescer.add(user_id, {
             "type": "ai_evolution",
             "action": action,
             "details": details,
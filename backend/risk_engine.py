@@ -1,45 +1,203 @@
-"""Central risk engine for capital protection"""
+"""Central risk engine for capital protection
+
+Pre-trade checks read a per-user in-memory risk state (equity, realized daily P&L,
+per-asset and per-exchange exposure). Trade results and live position opens/closes
+update it incrementally and it is reconciled from Mongo (bots, today's trades, open
+positions) every RISK_STATE_RECONCILE_SECONDS or after a bot change.
+"""
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from typing import Dict, Optional
 import logging
-from database import bots_collection, trades_collection
+import time
+from config import RISK_STATE_RECONCILE_SECONDS
 from exchange_limits import get_exchange_limits
 
 logger = logging.getLogger(__name__)
 
+
+def _asset(pair: str) -> Optional[str]:
+    """BTC from BTC/ZAR"""
+    return pair.split('/')[0] if pair and '/' in pair else None
+
+
+class UserRiskState:
+    """One user's risk picture, kept in memory between reconciles"""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.bots: Dict[str, Dict] = {}  # bot_id -> {"capital" (None = not set), "exchange"}
+        self.total_equity = 0.0
+        self.exchange_capital: Dict[str, float] = {}
+        self.asset_exposure: Dict[str, float] = {}
+        self.daily_pnl = 0.0
+        self.day = datetime.now(timezone.utc).date()
+        self.reconciled_at = time.monotonic()
+
+    def set_bot(self, bot_id: str, capital: Optional[float], exchange: str):
+        """capital=None keeps the per-bot cap's default; it counts as 0 towards equity"""
+        self.remove_bot(bot_id)
+        self.bots[bot_id] = {"capital": capital, "exchange": exchange}
+        self.total_equity += capital or 0
+        self.exchange_capital[exchange] = self.exchange_capital.get(exchange, 0) + (capital or 0)
+
+    def remove_bot(self, bot_id: str):
+        old = self.bots.pop(bot_id, None)
+        if old:
+            self.total_equity -= old["capital"] or 0
+            self.exchange_capital[old["exchange"]] -= old["capital"] or 0
+
+    def apply_pnl(self, profit_loss: float, bot_id: str = None):
+        """Realized trade result: today's P&L and the bot's capital move together"""
+        today = datetime.now(timezone.utc).date()
+        if today != self.day:
+            self.daily_pnl = 0.0
+            self.day = today
+        self.daily_pnl += profit_loss
+        bot = self.bots.get(bot_id) if bot_id else None
+        if bot:
+            self.set_bot(bot_id, (bot["capital"] or 0) + profit_loss, bot["exchange"])  # Like the $inc in Mongo
+
+    def apply_exposure(self, pair: str, notional_delta: float):
+        asset = _asset(pair)
+        if asset:
+            self.asset_exposure[asset] = max(0.0, self.asset_exposure.get(asset, 0) + notional_delta)
+
+    @property
+    def daily_loss(self) -> float:
+        if datetime.now(timezone.utc).date() != self.day:
+            return 0.0
+        return self.daily_pnl if self.daily_pnl < 0 else 0.0
+
+
 class RiskEngine:
-    def __init__(self):
-        self.user_daily_loss = {}  # {user_id: loss_today}
-        self.last_reset = datetime.now(timezone.utc).date()
-    
-    async def check_trade_risk(self, user_id: str, bot_id: str, exchange: str, 
+    def __init__(self, bots=None, trades=None, positions=None, reconcile_seconds: float = RISK_STATE_RECONCILE_SECONDS):
+        self._bots = bots
+        self._trades = trades
+        self._positions = positions  # Live engine positions (None: trades only)
+        self.reconcile_seconds = reconcile_seconds
+        self.states: Dict[str, UserRiskState] = {}
+        self._reconciling: Dict[str, list] = {}  # user_id -> deltas recorded mid-reconcile
+        self.stats = {"checks": 0, "reconciles": 0}
+
+    def _collections(self):
+        if self._bots is None:
+            from database import bots_collection, trades_collection, positions_collection
+            self._bots = bots_collection
+            self._trades = trades_collection
+            self._positions = positions_collection
+        return self._bots, self._trades
+
+    @property
+    def user_daily_loss(self) -> Dict[str, float]:
+        """{user_id: loss_today} for users with a loss"""
+        return {uid: s.daily_loss for uid, s in self.states.items() if s.daily_loss < 0}
+
+    async def reconcile(self, user_id: str) -> UserRiskState:
+        """Rebuild a user's risk state from Mongo (bots, today's trades, open exposure)"""
+        bots_collection, trades_collection = self._collections()
+        self._reconciling[user_id] = []
+        try:
+            state = UserRiskState(user_id)
+            user_bots = await bots_collection.find(
+                {"user_id": user_id}, {"_id": 0, "id": 1, "current_capital": 1, "exchange": 1}
+            ).to_list(1000)
+            for b in user_bots:
+                state.set_bot(b["id"], b.get("current_capital"), b.get("exchange"))
+
+            # Today's realized P&L in one server-side sum
+            today_start = datetime.combine(state.day, datetime.min.time()).replace(tzinfo=timezone.utc)
+            pnl = await trades_collection.aggregate([
+                {"$match": {"user_id": user_id, "timestamp": {"$gte": today_start}}},
+                {"$group": {"_id": None, "pnl": {"$sum": {"$ifNull": ["$profit_loss", 0]}}}}
+            ]).to_list(1)
+            state.daily_pnl = pnl[0]["pnl"] if pnl else 0.0
+
+            # Open positions from the last 7 days, valued per pair
+            exposure = await trades_collection.aggregate([
+                {"$match": {
+                    "user_id": user_id,
+                    "status": {"$in": ["open", "pending"]},  # Only open positions
+                    "timestamp": {"$gte": datetime.now(timezone.utc) - timedelta(days=7)}
+                }},
+                {"$group": {"_id": "$pair", "value": {"$sum": {"$multiply": [
+                    {"$ifNull": ["$entry_price", 0]}, {"$ifNull": ["$amount", 0]}
+                ]}}}}
+            ]).to_list(None)
+            for row in exposure:
+                state.apply_exposure(row["_id"], row["value"])
+
+            # Open live positions (record_exposure keeps these current between reconciles)
+            if self._positions is not None:
+                positions = await self._positions.aggregate([
+                    {"$match": {"user_id": user_id, "status": "open"}},
+                    {"$group": {"_id": "$pair", "value": {"$sum": {"$multiply": [
+                        {"$ifNull": ["$entry_price", 0]}, {"$ifNull": ["$entry_qty", 0]}
+                    ]}}}}
+                ]).to_list(None)
+                for row in positions:
+                    state.apply_exposure(row["_id"], row["value"])
+
+            # Trade results that landed while the queries ran
+            for kind, args in self._reconciling.get(user_id, []):
+                getattr(state, kind)(*args)
+
+            self.states[user_id] = state
+            self.stats["reconciles"] += 1
+            return state
+        finally:
+            self._reconciling.pop(user_id, None)
+
+    async def _get_state(self, user_id: str) -> UserRiskState:
+        state = self.states.get(user_id)
+        if state is None or time.monotonic() - state.reconciled_at > self.reconcile_seconds:
+            state = await self.reconcile(user_id)
+        return state
+
+    def invalidate(self, user_id: str = None):
+        """Bots changed (user_id=None: all users) - reconcile before the next check"""
+        if user_id is None:
+            self.states.clear()
+        else:
+            self.states.pop(user_id, None)
+
+    def _record(self, user_id: str, kind: str, *args):
+        state = self.states.get(user_id)
+        if state:
+            getattr(state, kind)(*args)
+        if user_id in self._reconciling:
+            self._reconciling[user_id].append((kind, args))
+
+    async def check_trade_risk(self, user_id: str, bot_id: str, exchange: str,
                                proposed_notional: float, risk_mode: str) -> tuple[bool, str]:
-        """Comprehensive risk check before allowing trade"""
-        
+        """Comprehensive risk check before allowing trade (in-memory state lookups)"""
+        self.stats["checks"] += 1
+        state = await self._get_state(user_id)
+
         # Get bot details
-        bot = await bots_collection.find_one({"id": bot_id}, {"_id": 0})
-        if not bot:
+        bot = state.bots.get(bot_id)
+        if bot is None:
+            state = await self.reconcile(user_id)  # Bot created since the last reconcile
+            bot = state.bots.get(bot_id)
+        if bot is None:
             return False, "Bot not found"
-        
+
         # Get user's total equity
-        user_bots = await bots_collection.find({"user_id": user_id}, {"_id": 0}).to_list(100)
-        total_equity = sum(b.get("current_capital", 0) for b in user_bots)
-        
+        total_equity = state.total_equity
+
         if total_equity <= 0:
             return False, "No capital available"
-        
+
         # 1. Check daily loss limit (5% max)
-        await self._check_daily_loss(user_id, total_equity)
-        daily_loss = self.user_daily_loss.get(user_id, 0)
+        daily_loss = state.daily_loss
         max_daily_loss = total_equity * 0.05
-        
+
         if abs(daily_loss) >= max_daily_loss:
             logger.warning(f"Daily loss limit hit for user {user_id}: {daily_loss}")
             return False, f"Protection mode: Daily loss limit reached (R{max_daily_loss:.2f})"
-        
+
         # 2. Check per-bot capital allocation based on risk mode
         # Use BOT's capital, not total equity (was causing trades to be blocked)
-        bot_capital = bot.get("current_capital", 1000)
+        bot_capital = bot["capital"] if bot["capital"] is not None else 1000
         max_percent = {
             "safe": 0.25,       # 25% of bot capital
             "balanced": 0.35,   # 35% of bot capital
@@ -47,79 +205,39 @@ class RiskEngine:
             "aggressive": 0.60  # 60% of bot capital
         }
         max_notional = bot_capital * max_percent.get(risk_mode, 0.25)
-        
+
         if proposed_notional > max_notional:
             return False, f"Trade size too large for {risk_mode} mode (max R{max_notional:.2f})"
-        
+
         # 3. Check per-asset exposure
-        # Extract asset from proposed trade (e.g., BTC from BTC/ZAR)
-        # For now, assume we can extract asset from context
-        # In production, would need asset parameter passed in
-        
-        # Get all user's trades to calculate current exposure
-        from database import trades_collection
-        recent_open_trades = await trades_collection.find({
-            "user_id": user_id,
-            "status": {"$in": ["open", "pending"]},  # Only open positions
-            "timestamp": {"$gte": (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()}
-        }, {"_id": 0}).to_list(1000)
-        
-        # Calculate per-asset exposure
-        asset_exposure = {}
-        for trade in recent_open_trades:
-            pair = trade.get('pair', '')
-            if '/' in pair:
-                asset = pair.split('/')[0]  # e.g., BTC from BTC/ZAR
-                trade_value = trade.get('entry_price', 0) * trade.get('amount', 0)
-                asset_exposure[asset] = asset_exposure.get(asset, 0) + trade_value
-        
         # Check if any single asset exceeds 35% of total equity
-        for asset, exposure in asset_exposure.items():
+        for asset, exposure in state.asset_exposure.items():
             exposure_pct = (exposure / total_equity) if total_equity > 0 else 0
             if exposure_pct > 0.35:
                 return False, f"Too much exposure to {asset} ({exposure_pct*100:.1f}% > 35% limit)"
-        
+
         # 4. Check per-exchange exposure (only if user has multiple exchanges)
-        exchanges_used = set(b.get("exchange") for b in user_bots)
-        
-        if len(exchanges_used) > 1:  # Only enforce if using multiple exchanges
-            exchange_capital = sum(b.get("current_capital", 0) for b in user_bots if b.get("exchange") == exchange)
+        if len(state.exchange_capital) > 1:  # Only enforce if using multiple exchanges
+            exchange_capital = state.exchange_capital.get(exchange, 0)
             max_exchange_exposure = total_equity * 0.60  # 60% max per exchange
-            
+
             if exchange_capital > max_exchange_exposure:
                 return False, f"Too much exposure on {exchange.upper()} (max 60% of equity)"
-        
+
         # 5. Minimum trade notional (avoid tiny wins)
         min_notional = 10  # R10 minimum (lowered for testing)
         if proposed_notional < min_notional:
             return False, f"Trade too small (min R{min_notional})"
-        
+
         return True, "Risk check passed"
-    
-    async def _check_daily_loss(self, user_id: str, total_equity: float):
-        """Calculate today's realized loss"""
-        today = datetime.now(timezone.utc).date()
-        
-        # Reset if new day
-        if today > self.last_reset:
-            self.user_daily_loss.clear()
-            self.last_reset = today
-        
-        # Calculate today's loss
-        today_start = datetime.combine(today, datetime.min.time()).replace(tzinfo=timezone.utc)
-        trades_today = await trades_collection.find({
-            "user_id": user_id,
-            "timestamp": {"$gte": today_start.isoformat()}
-        }, {"_id": 0}).to_list(1000)
-        
-        total_pnl = sum(t.get("profit_loss", 0) for t in trades_today)
-        self.user_daily_loss[user_id] = total_pnl if total_pnl < 0 else 0
-    
-    async def record_trade_result(self, user_id: str, profit_loss: float):
-        """Record trade result for risk tracking"""
-        current_loss = self.user_daily_loss.get(user_id, 0)
-        if profit_loss < 0:
-            self.user_daily_loss[user_id] = current_loss + profit_loss
+
+    async def record_trade_result(self, user_id: str, profit_loss: float, bot_id: str = None):
+        """Record trade result for risk tracking (daily P&L and bot capital)"""
+        self._record(user_id, "apply_pnl", profit_loss, bot_id)
+
+    async def record_exposure(self, user_id: str, pair: str, notional_delta: float):
+        """Position opened (+notional) or closed (-notional) - called by the live engine"""
+        self._record(user_id, "apply_exposure", pair, notional_delta)
 
 # Global instance
 risk_engine = RiskEngine()
@@ -11,6 +11,7 @@ from datetime import datetime, timezone
 from auth import get_current_user
 from database import system_modes_collection, bots_collection
 from engines.audit_logger import audit_logger
+from trading_scheduler import trading_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +41,7 @@ async def activate_emergency_stop(
             },
             upsert=True
         )
+        await trading_scheduler.notify_changed(user_id)
         
         # Pause all active bots
         result = await bots_collection.update_many(
@@ -99,6 +101,7 @@ async def deactivate_emergency_stop(current_user: Dict = Depends(get_current_use
                 }
             }
         )
+        await trading_scheduler.notify_changed(user_id)
         
         # Resume paused bots (user can manually activate them)
         # Note: We don't auto-activate to give user control
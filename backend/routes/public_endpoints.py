@@ -29,6 +29,7 @@ from backend.logger_config import logger
 from .api_keys import create_api_key, get_api_keys, delete_api_key, test_api_key
 
 from backend.ccxt_service import ccxt_service
+from trading_scheduler import trading_scheduler  # Flat import: the scheduler (and dispatcher relay) the server starts
 from ..engines.wallet_manager import wallet_manager
 from datetime import datetime, timezone, timedelta
 
@@ -86,6 +87,7 @@ async def toggle_system_mode(mode: str, enabled: bool = True, user_id: str = Dep
     # Update the selected mode
     update = {field: bool(enabled), "updated_at": datetime.now(timezone.utc).isoformat()}
     await modes_collection.update_one({"user_id": user_id}, {"$set": update})
+    await trading_scheduler.notify_changed(user_id)
 
     # Return the updated document (omit Mongo _id)
     return await modes_collection.find_one({"user_id": user_id}, {"_id": 0})
@@ -167,8 +169,8 @@ async def profit_graph(period: str = "7d", user_id: str = Depends(get_current_us
         days = 7
     start = now - timedelta(days=days)
     pipeline = [
-        {"$match": {"user_id": user_id, "timestamp": {"$gte": start.isoformat()}}},
-        {"$project": {"date": {"$substr": ["$timestamp", 0, 10]}, "profit_loss": "$profit_loss"}},
+        {"$match": {"user_id": user_id, "timestamp": {"$gte": start}}},
+        {"$project": {"date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}, "profit_loss": "$profit_loss"}},
         {"$group": {"_id": "$date", "total_profit": {"$sum": "$profit_loss"}}},
         {"$sort": {"_id": 1}}
     ]
@@ -211,8 +213,8 @@ async def countdown_to_million(target: float = 1_000_000.0, user_id: str = Depen
     now = datetime.now(timezone.utc)
     start = now - timedelta(days=7)
     pipeline = [
-        {"$match": {"user_id": user_id, "timestamp": {"$gte": start.isoformat()}}},
-        {"$project": {"date": {"$substr": ["$timestamp", 0, 10]}, "profit_loss": "$profit_loss"}},
+        {"$match": {"user_id": user_id, "timestamp": {"$gte": start}}},
+        {"$project": {"date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}, "profit_loss": "$profit_loss"}},
         {"$group": {"_id": "$date", "profit": {"$sum": "$profit_loss"}}}
     ]
     daily_profits = []
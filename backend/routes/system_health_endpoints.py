@@ -8,9 +8,11 @@ from typing import Dict
 import logging
 import asyncio
 from datetime import datetime, timezone
+import os
 import time
 
 from database import db
+from db_pool import pool_metrics
 from websocket_manager import manager
 
 logger = logging.getLogger(__name__)
@@ -64,10 +66,11 @@ async def get_health_indicators():
             "last_check": datetime.now(timezone.utc).isoformat()
         }
         
-        # 4. SSE Health (placeholder - would need actual SSE connection tracking)
+        # 4. SSE Health (streams open on this worker)
+        from sse_broadcaster import sse_broadcaster
         sse_health = {
             "status": "healthy",
-            "active_streams": 0,  # Would track actual SSE streams
+            "active_streams": sse_broadcaster.stream_count,
             "last_check": datetime.now(timezone.utc).isoformat()
         }
         
@@ -107,6 +110,15 @@ async def get_health_indicators():
             }
         }
 
+@router.get("/db-pool")
+async def get_db_pool_metrics():
+    """MongoDB connection pool utilisation and checkout wait times for this worker"""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "pid": os.getpid(),
+        **pool_metrics.snapshot()
+    }
+
 @router.get("/ping")
 async def ping():
     """Simple ping endpoint for health checks"""
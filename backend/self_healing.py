@@ -14,6 +14,7 @@ import psutil
 class SelfHealingSystem:
     def __init__(self):
         self.is_running = False
+        self.task = None
         self.health_checks = []
         self.recovery_attempts = {}
         self.max_recovery_attempts = 3
@@ -26,11 +27,14 @@ class SelfHealingSystem:
         self.is_running = True
         logger.info("🏥 Self-healing system started")
         
-        asyncio.create_task(self._monitor_health())
+        self.task = asyncio.create_task(self._monitor_health())
     
     async def stop(self):
         """Stop self-healing monitor"""
         self.is_running = False
+        if self.task:
+            self.task.cancel()
+            self.task = None
         logger.info("Self-healing system stopped")
     
     async def _monitor_health(self):
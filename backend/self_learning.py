@@ -8,9 +8,8 @@ Self-Learning System - Continuous Improvement
 
 import asyncio
 from datetime import datetime, timezone, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
 from ai_service import ai_service
-import os
+from time_utils import parse_timestamp
 import logging
 
 logger = logging.getLogger(__name__)
@@ -43,8 +42,8 @@ class SelfLearningSystem:
             trades = await self.db.trades.find({
                 'user_id': user_id,
                 'timestamp': {
-                    '$gte': yesterday_start.isoformat(),
-                    '$lt': yesterday_end.isoformat()
+                    '$gte': yesterday_start,
+                    '$lt': yesterday_end
                 }
             }).to_list(10000)
             
@@ -74,7 +73,7 @@ class SelfLearningSystem:
             # ALSO store in new learning_logs collection
             await self.learning_logs_collection.insert_one({
                 'user_id': user_id,
-                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'timestamp': datetime.now(timezone.utc),
                 'type': 'daily_analysis',
                 'trades_analyzed': len(trades),
                 'win_rate': insights.get('win_rate', 0),
@@ -89,7 +88,7 @@ class SelfLearningSystem:
                 'type': 'learning',
                 'severity': 'low',
                 'message': f'📚 Daily Learning Report Ready: {report[:100]}...',
-                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'timestamp': datetime.now(timezone.utc),
                 'dismissed': False
             })
             
@@ -125,7 +124,7 @@ class SelfLearningSystem:
             hour_performance = {}
             for trade in trades:
                 try:
-                    trade_time = datetime.fromisoformat(trade['timestamp'])
+                    trade_time = parse_timestamp(trade['timestamp'])
                     hour = trade_time.hour
                     pnl = trade.get('profit_loss', 0)
                     if hour not in hour_performance:
@@ -307,7 +306,7 @@ class SelfLearningSystem:
                 'type': 'learning',
                 'severity': 'low',
                 'message': summary,
-                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'timestamp': datetime.now(timezone.utc),
                 'dismissed': False
             })
             
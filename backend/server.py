@@ -19,7 +19,7 @@ from models import (
 from database import (
     users_collection, bots_collection, api_keys_collection,
     trades_collection, system_modes_collection, alerts_collection,
-    chat_messages_collection, close_db,
+    chat_messages_collection, init_db, close_db,
     learning_logs_collection, autopilot_actions_collection, rogue_detections_collection,
     db
 )
@@ -28,6 +28,8 @@ from ai_service import ai_service
 from ccxt_service import ccxt_service
 from websocket_manager import manager
 from trading_scheduler import trading_scheduler
+from portfolio_summary import portfolio_summary
+from config import LEADER_ELECTION_ENABLED, BACKGROUND_ENGINES_IN_API
 import ccxt.async_support as ccxt
 
 logging.basicConfig(level=logging.INFO)
@@ -44,75 +46,37 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     logger.info("🚀 Starting Amarktai Network...")
     
-    # Start autonomous systems
-    from autopilot_engine import autopilot
-    autopilot.start()
-    logger.info("🤖 Autopilot Engine started")
+    # Registered indexes (idempotent - see db_indexes)
+    await init_db()
     
-    from ai_bodyguard import bodyguard
-    asyncio.create_task(bodyguard.start())
-    logger.info("🛡️ AI Bodyguard activated")
-    
-    from self_learning import learning_system
-    await learning_system.init_db()
-    logger.info("📚 Self-Learning System initialized")
-    
-    # Start NEW Autonomous Scheduler
-    from autonomous_scheduler import autonomous_scheduler
-    await autonomous_scheduler.start()
-    logger.info("🤖 Autonomous Scheduler started (lifecycle, capital, regime)")
-    
-    # Start Self-Healing System
-    from self_healing import self_healing
-    await self_healing.start()
-    logger.info("🏥 Self-Healing System started")
-    
-    # Start Advanced Orders Monitor
+    # Start Advanced Orders Monitor (orders live in this worker's memory)
     from advanced_orders import advanced_orders
     await advanced_orders.start()
     logger.info("📈 Advanced Orders monitoring started")
     
-    # Start Paper Trading Scheduler
-    trading_scheduler.start()
-    logger.info("💹 Paper Trading Scheduler started - trades every 10 seconds")
-    
-    # Start wallet balance monitor
-    try:
-        from jobs.wallet_balance_monitor import wallet_balance_monitor
-        wallet_balance_monitor.start()
-        logger.info("✅ Wallet balance monitor started")
-    except Exception as e:
-        logger.warning(f"Could not start wallet monitor: {e}")
-    
-    # Start AI Backend Scheduler (nightly at 2 AM)
-    from ai_scheduler import ai_scheduler
-    await ai_scheduler.start()
-    logger.info("🧠 AI Backend Scheduler started - runs nightly at 2 AM (promotions, rankings, evolution)")
-    
-    # Start AI Memory Manager (archives old chats, cleans up after 6 months)
-    from ai_memory_manager import memory_manager
-    asyncio.create_task(memory_manager.run_maintenance())
-    logger.info("💾 AI Memory Manager started - archives 30-day old chats, deletes 6-month old archives")
-    
-    # Start Production Trading Engine
-    from engines.trading_engine_production import trading_engine
-    trading_engine.start()
-    logger.info("💹 Production Trading Engine started - 50 trades/day limit, 25-30 min cooldown")
-    
-    # Start Production Autopilot (R500 reinvestment, auto-spawn, rebalancing)
-    from engines.autopilot_production import autopilot_production
-    autopilot_production.start()
-    logger.info("🤖 Production Autopilot started - R500 reinvestment, auto-spawn, intelligent rebalancing")
-    
-    # Start Risk Management (Stop Loss, Take Profit, Trailing Stop)
-    from engines.risk_management import risk_management
-    risk_management.start()
-    logger.info("🎯 Risk Management started - Stop Loss, Take Profit, Trailing Stop active")
-    
-    # Start Self-Healing System
-    from engines.self_healing import self_healing
-    self_healing.start()
-    logger.info("🛡️ Self-Healing System started - rogue bot detection every 30 min")
+    # Start shared Market Data Hub (bulk ticker polling for all engines/dashboards)
+    from market_data_hub import market_data_hub
+    await market_data_hub.start()
+    logger.info("📡 Market Data Hub started - shared ticker snapshots")
+    
+    # Optional WebSocket ticker streaming / JSONL replay into the hub
+    from market_stream import market_stream
+    await market_stream.start()
+    
+    # Background engines run once across all workers - only on the lease holder
+    from background_engines import background_engines
+    from leader_election import leader_election
+    from event_relay import event_relay
+    from db_pool import pool_metrics
+    # Every worker subscribes to the WebSocket channels of the users it serves
+    await event_relay.start()
+    if not BACKGROUND_ENGINES_IN_API:
+        # Engines run in the trading worker (python -m backend.worker) and publish to the relay
+        logger.info("📥 Background engines run in the trading worker - API only")
+    elif LEADER_ELECTION_ENABLED:
+        await leader_election.start(on_elected=background_engines.start, on_demoted=background_engines.stop)
+    else:
+        await background_engines.start()
     
     # Initialize Fetch.ai and FLOKx integrations with env keys if available
     fetchai_key = os.environ.get('FETCHAI_API_KEY', '')
@@ -133,15 +97,18 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
-    autopilot.stop()
-    bodyguard.stop()
-    await autonomous_scheduler.stop()
-    await self_healing.stop()
+    if BACKGROUND_ENGINES_IN_API and LEADER_ELECTION_ENABLED:
+        await leader_election.stop()  # Stops engines and releases the lease
+    elif BACKGROUND_ENGINES_IN_API:
+        await background_engines.stop()
+    from event_coalescer import event_coalescer
+    await event_coalescer.flush()  # Last event frames out before the relay closes
+    await event_relay.stop()
     await advanced_orders.stop()
-    trading_scheduler.stop()
-    ai_scheduler.stop()
-    autopilot_production.stop()
-    risk_management.stop()
+    await market_stream.stop()
+    await market_data_hub.stop()
+    from backtesting_engine import backtesting_engine
+    backtesting_engine.close()
     await close_db()
     logger.info("🔴 All systems stopped")
 
@@ -189,18 +156,9 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
         try:
             while True:
                 data = await websocket.receive_text()
-                # Handle ping/pong
+                # Liveness + ping/pong (replies go through the socket's send queue)
                 if data:
-                    import json
-                    try:
-                        msg = json.loads(data)
-                        if msg.get('type') == 'ping':
-                            await websocket.send_json({
-                                'type': 'pong',
-                                'timestamp': msg.get('timestamp')
-                            })
-                    except:
-                        pass
+                    await manager.handle_client_message(websocket, data)
         except WebSocketDisconnect:
             await manager.disconnect(websocket, user_id)
             logger.info(f"WebSocket disconnected for user: {user_id}")
@@ -307,6 +265,8 @@ async def create_bot(bot: BotCreate, user_id: str = Depends(get_current_user)):
     
     # Insert validated bot
     await bots_collection.insert_one(result)
+    await portfolio_summary.mark_bots_changed(user_id)
+    await trading_scheduler.notify_changed(user_id)
     
     # Remove MongoDB _id before returning
     result.pop('_id', None)
@@ -392,6 +352,8 @@ async def batch_create_bots(data: dict, user_id: str = Depends(get_current_user)
     
     if bots_to_create:
         await bots_collection.insert_many(bots_to_create)
+        await portfolio_summary.mark_bots_changed(user_id)
+        await trading_scheduler.notify_changed(user_id)
     
     return {
         "message": f"{len(bots_to_create)} bots created", 
@@ -412,6 +374,8 @@ async def update_bot(bot_id: str, update: dict, user_id: str = Depends(get_curre
             {"id": bot_id},
             {"$set": update_data}
         )
+        await portfolio_summary.mark_bots_changed(user_id)
+        await trading_scheduler.notify_changed(user_id)
     
     updated_bot = await bots_collection.find_one({"id": bot_id}, {"_id": 0})
     return updated_bot
@@ -421,6 +385,8 @@ async def delete_bot(bot_id: str, user_id: str = Depends(get_current_user)):
     result = await bots_collection.delete_one({"id": bot_id, "user_id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Bot not found")
+    await portfolio_summary.mark_bots_changed(user_id)
+    await trading_scheduler.notify_changed(user_id)
     return {"message": "Bot deleted"}
 
 @api_router.post("/bots/{bot_id}/promote")
@@ -474,6 +440,8 @@ async def promote_bot_to_live(bot_id: str, user_id: str = Depends(get_current_us
                 "promotion_performance": performance
             }}
         )
+        await portfolio_summary.mark_bots_changed(user_id)
+        await trading_scheduler.notify_changed(user_id)
         
         # Create alert
         await alerts_collection.insert_one({
@@ -481,7 +449,7 @@ async def promote_bot_to_live(bot_id: str, user_id: str = Depends(get_current_us
             "type": "promotion",
             "severity": "high",
             "message": f"🎉 Bot {bot['name']} promoted to LIVE trading! Win rate: {performance.get('win_rate', 0)*100:.1f}%",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": datetime.now(timezone.utc),
             "dismissed": False
         })
         
@@ -545,10 +513,25 @@ async def health_check():
     except:
         system_modes = {"error": "Could not fetch system modes"}
     
+    # Which role this worker plays (only the leader runs background engines)
+    from background_engines import background_engines
+    from leader_election import leader_election
+    from event_relay import event_relay
+    if not BACKGROUND_ENGINES_IN_API:
+        role = "api"
+    else:
+        role = "leader" if background_engines.is_running else "standby"
+    
     return {
         "status": "healthy" if db_status == "connected" else "degraded",
         "database": db_status,
+        "database_pool": pool_metrics.snapshot(),
         "system_modes": system_modes,
+        "worker": {
+            "role": role,
+            "leader_election": leader_election.get_status() if BACKGROUND_ENGINES_IN_API and LEADER_ELECTION_ENABLED else None,
+            "event_relay": event_relay.get_status()
+        },
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "version": "3.0.0"
     }
@@ -617,10 +600,10 @@ async def update_system_mode(data: dict, user_id: str = Depends(get_current_user
             {"$set": current_modes},
             upsert=True
         )
+        await trading_scheduler.notify_changed(user_id)
         
         # NOTE: Trading scheduler runs globally but checks each user's modes
-        # The scheduler respects autopilot/paperTrading settings per user
-        # No need to stop/start the global scheduler
+        # notify_changed() wakes its dispatcher to reload this user's bots
         logger.info(f"📊 System mode updated: {mode}={enabled} for user {user_id}")
         
         # Send real-time update via WebSocket
@@ -646,41 +629,19 @@ async def update_system_mode(data: dict, user_id: str = Depends(get_current_user
 async def get_overview(user_id: str = Depends(get_current_user)):
     """Get dashboard overview - FIXED with accurate counts + mode display"""
     try:
-        bots = await bots_collection.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
-        
-        # Accurate counts
-        active_bots = [b for b in bots if b.get('status') == 'active']
-        total_bots = len(bots)
-        active_count = len(active_bots)
-        
-        # Count by mode
-        paper_bots = len([b for b in active_bots if b.get('trading_mode') == 'paper'])
-        live_bots = len([b for b in active_bots if b.get('trading_mode') == 'live'])
-        
-        # Calculate REAL total profit (excludes capital injections)
-        from engines.capital_injection_tracker import capital_tracker
+        # One materialized document instead of scanning bots and 24h of trades
+        summary = await portfolio_summary.get_summary(user_id)
         
-        total_current = sum(bot.get('current_capital', 0) for bot in active_bots)
-        total_initial = sum(bot.get('initial_capital', 0) for bot in active_bots)
-        total_injections = sum(bot.get('total_injections', 0) for bot in active_bots)
+        total_bots = summary['total_bots']
+        active_count = summary['active_bots']
+        paper_bots = summary['paper_bots']
+        live_bots = summary['live_bots']
         
         # Real profit = (current - initial) - injections
-        gross_profit = total_current - total_initial
-        total_profit = gross_profit - total_injections
-        
-        # Calculate REAL 24h change from actual trades
-        twenty_four_hours_ago = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
-        recent_trades = await trades_collection.find({
-            "user_id": user_id,
-            "timestamp": {"$gte": twenty_four_hours_ago}
-        }, {"_id": 0}).to_list(10000)
-        
-        profit_24h = sum(t.get('profit_loss', 0) for t in recent_trades)
-        change_24h_pct = (profit_24h / total_initial * 100) if total_initial > 0 else 0
-        
-        # Calculate exposure
-        total_capital = sum(bot.get('current_capital', 0) for bot in active_bots)
-        exposure = (total_capital / (total_capital + 1000)) * 100 if total_capital > 0 else 0
+        total_profit = summary['total_profit']
+        profit_24h = summary['profit_24h']
+        change_24h_pct = summary['change_24h_pct']
+        exposure = summary['exposure']
         
         # Get system modes
         modes = await system_modes_collection.find_one({"user_id": user_id}, {"_id": 0})
@@ -1017,7 +978,7 @@ async def bodyguard_system_check(user_id: str = Depends(get_current_user)):
         active_bots = [b for b in bots if b.get('status') == 'active']
         
         # Get today's trades
-        today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0).isoformat()
+        today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)
         trades_today = await trades_collection.count_documents({
             "user_id": user_id,
             "timestamp": {"$gte": today_start}
@@ -1154,22 +1115,22 @@ async def get_storage_usage(user_id: str = Depends(get_current_user)):
             
             # 1. Chat messages (AI memory)
             chat_messages = await chat_messages_collection.find({"user_id": usr_id}, {"_id": 0}).to_list(10000)
-            chat_size = sum(sys.getsizeof(json.dumps(msg)) for msg in chat_messages)
+            chat_size = sum(sys.getsizeof(json.dumps(msg, default=str)) for msg in chat_messages)
             
             # 2. Trade history
             trades = await trades_collection.find({"user_id": usr_id}, {"_id": 0}).to_list(10000)
-            trades_size = sum(sys.getsizeof(json.dumps(trade)) for trade in trades)
+            trades_size = sum(sys.getsizeof(json.dumps(trade, default=str)) for trade in trades)
             
             # 3. Bot configurations
             bots = await bots_collection.find({"user_id": usr_id}, {"_id": 0}).to_list(1000)
-            bots_size = sum(sys.getsizeof(json.dumps(bot)) for bot in bots)
+            bots_size = sum(sys.getsizeof(json.dumps(bot, default=str)) for bot in bots)
             
             # 4. User data
-            user_size = sys.getsizeof(json.dumps(usr))
+            user_size = sys.getsizeof(json.dumps(usr, default=str))
             
             # 5. Alerts
             alerts = await alerts_collection.find({"user_id": usr_id}, {"_id": 0}).to_list(1000)
-            alerts_size = sum(sys.getsizeof(json.dumps(alert)) for alert in alerts)
+            alerts_size = sum(sys.getsizeof(json.dumps(alert, default=str)) for alert in alerts)
             
             total_bytes = chat_size + trades_size + bots_size + user_size + alerts_size
             total_mb = total_bytes / (1024 * 1024)
@@ -1313,19 +1274,25 @@ async def get_profit_history(period: str = 'daily', user_id: str = Depends(get_c
     """Get profit history - FIXED: Shows correct day of week"""
     try:
         from collections import defaultdict
+        from pnl_rollups import pnl_rollups
         
         # Get all bots' current profits
-        bots = await bots_collection.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
-        
-        # Get ALL trades (no limit)
-        trades = await trades_collection.find({"user_id": user_id}, {"_id": 0}).to_list(None)
+        bots = await bots_collection.find(
+            {"user_id": user_id}, {"_id": 0, "current_capital": 1, "initial_capital": 1}
+        ).to_list(1000)
+        
+        # Daily P&L buckets (O(days), not O(trades))
+        today = datetime.now(timezone.utc)
+        lookback_days = {'daily': 7, 'weekly': 28, 'monthly': 190}.get(period, 7)
+        day_buckets = await pnl_rollups.get_buckets(
+            user_id, "day", since=today - timedelta(days=lookback_days)
+        )
         
         labels = []
         values = []
         
         if period == 'daily':
             # Calculate actual days - last 7 days
-            today = datetime.now(timezone.utc)
             day_names = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
             
             # Generate labels for last 7 days ending today
@@ -1334,22 +1301,20 @@ async def get_profit_history(period: str = 'daily', user_id: str = Depends(get_c
                 day = today - timedelta(days=i)
                 labels.append(day_names[day.weekday()])
             
-            # Aggregate trades by actual day
+            # Aggregate buckets by actual day
             daily_profits = defaultdict(float)
             
-            for trade in trades:
-                trade_date = datetime.fromisoformat(trade['timestamp'].replace('Z', '+00:00'))
-                days_ago = (today.date() - trade_date.date()).days
+            for bucket in day_buckets:
+                days_ago = (today.date() - bucket['bucket_start'].date()).days
                 
                 if 0 <= days_ago < 7:
-                    daily_profits[6 - days_ago] += trade.get('profit_loss', 0)
+                    daily_profits[6 - days_ago] += bucket.get('pnl', 0)
             
             # Always use actual daily profits (even if 0)
             values = [round(daily_profits.get(i, 0), 2) for i in range(7)]
             
         elif period == 'weekly':
             # Calculate actual week of month we're in
-            today = datetime.now(timezone.utc)
             day_of_month = today.day
             current_week = min(((day_of_month - 1) // 7) + 1, 4)  # Week 1-4
             
@@ -1359,35 +1324,33 @@ async def get_profit_history(period: str = 'daily', user_id: str = Depends(get_c
                 week_num = max(1, current_week - i)  # Don't go below Week 1
                 labels.append(f'Week {week_num}')
             
-            # Calculate actual weekly profits from trades
+            # Calculate actual weekly profits from daily buckets
             weekly_profits = defaultdict(float)
             
-            for trade in trades:
-                trade_date = datetime.fromisoformat(trade['timestamp'].replace('Z', '+00:00'))
-                days_ago = (today.date() - trade_date.date()).days
+            for bucket in day_buckets:
+                days_ago = (today.date() - bucket['bucket_start'].date()).days
                 week_index = min(days_ago // 7, 3)  # 0-3 for 4 weeks
                 if week_index < 4:
-                    weekly_profits[3 - week_index] += trade.get('profit_loss', 0)
+                    weekly_profits[3 - week_index] += bucket.get('pnl', 0)
             
             values = [round(weekly_profits.get(i, 0), 2) for i in range(4)]
             
         elif period == 'monthly':
             # Generate labels for last 6 months ending with current month
             month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-            today = datetime.now(timezone.utc)
             labels = []
             for i in range(5, -1, -1):  # 5 months ago to current month
                 month_date = today - timedelta(days=i*30)  # Approximate
                 labels.append(month_names[month_date.month - 1])
             
-            # Calculate actual monthly profits from trades
+            # Calculate actual monthly profits from daily buckets
             monthly_profits = defaultdict(float)
             
-            for trade in trades:
-                trade_date = datetime.fromisoformat(trade['timestamp'].replace('Z', '+00:00'))
-                month_diff = (today.year - trade_date.year) * 12 + (today.month - trade_date.month)
+            for bucket in day_buckets:
+                bucket_date = bucket['bucket_start']
+                month_diff = (today.year - bucket_date.year) * 12 + (today.month - bucket_date.month)
                 if 0 <= month_diff < 6:
-                    monthly_profits[5 - month_diff] += trade.get('profit_loss', 0)
+                    monthly_profits[5 - month_diff] += bucket.get('pnl', 0)
             
             values = [round(monthly_profits.get(i, 0), 2) for i in range(6)]
         
@@ -1465,20 +1428,18 @@ async def countdown_to_million(user_id: str = Depends(get_current_user)):
                 "compound_projection": None
             }
         
-        # Calculate daily ROI from recent trades
-        # Get last 30 days of trades (NO LIMIT - get all trades)
-        thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
-        recent_trades = await trades_collection.find({
-            "user_id": user_id,
-            "timestamp": {"$gte": thirty_days_ago}
-        }).to_list(None)  # None = no limit
+        # Calculate daily ROI from the last 30 days of daily P&L buckets
+        from pnl_rollups import pnl_rollups
+        thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
+        recent = pnl_rollups.summarize(await pnl_rollups.get_buckets(user_id, "day", since=thirty_days_ago))
+        recent_trade_count = recent['trades']
         
         # REQUIRE MINIMUM 3 DAYS OF TRADING DATA for any realistic projection
-        unique_trade_days = len(set(t.get('timestamp', '')[:10] for t in recent_trades))
+        unique_trade_days = recent['active_buckets']
         
         # Need at least 3 full days of trading history
-        if len(recent_trades) >= 30 and unique_trade_days >= 3:
-            total_profit = sum(trade.get('profit_loss', 0) for trade in recent_trades)
+        if recent_trade_count >= 30 and unique_trade_days >= 3:
+            total_profit = recent['pnl']
             days_of_data = unique_trade_days
             avg_daily_profit = total_profit / days_of_data
             
@@ -1536,6 +1497,20 @@ async def countdown_to_million(user_id: str = Depends(get_current_user)):
         # Calculate estimated completion date
         completion_date = (datetime.now(timezone.utc) + timedelta(days=est_days)).strftime("%Y-%m-%d")
         
+        # Bootstrapped time-to-target band from recent trades (None until enough trades)
+        monte_carlo = None
+        try:
+            from monte_carlo_risk import monte_carlo_risk
+            risk = await monte_carlo_risk.simulate_user(user_id, target, include_bots=False)
+            if risk.get("portfolio"):
+                monte_carlo = {
+                    "reach_probability": risk["portfolio"]["reach_probability"],
+                    "days_to_target": risk["portfolio"]["days_to_target"],
+                    "horizon_days": risk["portfolio"]["horizon_days"]
+                }
+        except Exception as e:
+            logger.warning(f"Monte Carlo projection failed: {e}")
+        
         # Calculate 12-month AI projection
         twelve_month_projection = total_capital
         if daily_roi_pct > 0:
@@ -1554,8 +1529,8 @@ async def countdown_to_million(user_id: str = Depends(get_current_user)):
             "metrics": {
                 "avg_daily_profit": round(avg_daily_profit, 2),
                 "daily_roi_pct": round(daily_roi_pct, 3),
-                "days_of_data": len(set(t.get('timestamp', '')[:10] for t in recent_trades)),
-                "total_trades": len(recent_trades)
+                "days_of_data": unique_trade_days,
+                "total_trades": recent_trade_count
             },
             "projections": {
                 "simple": simple_days,
@@ -1563,9 +1538,10 @@ async def countdown_to_million(user_id: str = Depends(get_current_user)):
                 "using": "compound" if compound_days < simple_days else "simple",
                 "twelve_month": round(twelve_month_projection, 2),
                 "twelve_month_gain": round(twelve_month_projection - total_capital, 2),
-                "twelve_month_roi": round(((twelve_month_projection - total_capital) / total_capital * 100), 2) if total_capital > 0 else 0
+                "twelve_month_roi": round(((twelve_month_projection - total_capital) / total_capital * 100), 2) if total_capital > 0 else 0,
+                "monte_carlo": monte_carlo
             },
-            "message": f"📈 Projected: {est_days} days to R1M at {daily_roi_pct:.2f}% daily ROI ({data_quality})" if est_days < 9999 else f"⏳ Insufficient trading data ({len(recent_trades)} trades, {unique_trade_days} days)",
+            "message": f"📈 Projected: {est_days} days to R1M at {daily_roi_pct:.2f}% daily ROI ({data_quality})" if est_days < 9999 else f"⏳ Insufficient trading data ({recent_trade_count} trades, {unique_trade_days} days)",
             "data_quality": data_quality if est_days < 9999 else "insufficient",
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
@@ -1583,86 +1559,45 @@ async def countdown_to_million(user_id: str = Depends(get_current_user)):
             "error": str(e)
         }
 
+@api_router.get("/analytics/risk-of-ruin")
+async def risk_of_ruin(target: float = 1_000_000, horizon_days: Optional[float] = None, include_bots: bool = True,
+                       user_id: str = Depends(get_current_user)):
+    """Monte Carlo bands for time-to-target, drawdown and circuit-breaker trips"""
+    from monte_carlo_risk import monte_carlo_risk
+    from config import MONTE_CARLO_HORIZON_DAYS
+    if target <= 0:
+        raise HTTPException(status_code=400, detail="target must be positive")
+    return await monte_carlo_risk.simulate_user(user_id, target, horizon_days=horizon_days or MONTE_CARLO_HORIZON_DAYS,
+                                                include_bots=include_bots)
+
 # ============================================================================
 # LIVE PRICES
 # ============================================================================
 
 @api_router.get("/prices/live")
 async def get_live_prices(user_id: str = Depends(get_current_user)):
-    """Get live crypto prices with real 24h change using OHLCV data"""
+    """Get live crypto prices with real 24h change from the shared market-data hub"""
     try:
-        from paper_trading_engine import paper_engine
-        
-        # Initialize exchange if needed
-        if not paper_engine.luno_exchange:
-            await paper_engine.init_exchanges()
+        from market_data_hub import market_data_hub
         
         prices = {}
         pairs = ['BTC/ZAR', 'ETH/ZAR', 'XRP/ZAR']
         
         for pair in pairs:
             try:
-                # Method 1: Use OHLCV for most accurate 24h change
-                ohlcv = await paper_engine.luno_exchange.fetch_ohlcv(pair, '1d', limit=2)
+                current_price = await market_data_hub.get_price(pair, 'luno')
+                if not current_price:
+                    raise Exception("No ticker data")
                 
-                if ohlcv and len(ohlcv) >= 2:
-                    # Get 24h ago open price and current close price
-                    yesterday_open = float(ohlcv[-2][1])  # Open price 24h ago
-                    current_close = float(ohlcv[-1][4])   # Current close price
-                    
-                    if yesterday_open > 0:
-                        change_pct = ((current_close - yesterday_open) / yesterday_open) * 100
-                    else:
-                        change_pct = 0
-                    
-                    prices[pair] = {
-                        "price": round(current_close, 2),
-                        "change": round(change_pct, 2)
-                    }
-                else:
-                    raise Exception("Insufficient OHLCV data")
+                change_pct = await market_data_hub.get_24h_change(pair, 'luno')
                 
+                prices[pair] = {
+                    "price": round(current_price, 2),
+                    "change": round(change_pct, 2)
+                }
             except Exception as e:
-                logger.warning(f"OHLCV failed for {pair}, trying ticker: {e}")
-                
-                # Method 2: Fallback to ticker with change field
-                try:
-                    ticker = await paper_engine.luno_exchange.fetch_ticker(pair)
-                    current_price = ticker.get('last', ticker.get('close', 0))
-                    
-                    # Try to get change from ticker
-                    change_pct = ticker.get('percentage', 0)
-                    if change_pct == 0 and ticker.get('change'):
-                        change_pct = ticker['change']
-                    if change_pct == 0 and ticker.get('open') and current_price > 0:
-                        open_price = ticker['open']
-                        if open_price > 0:
-                            change_pct = ((current_price - open_price) / open_price) * 100
-                    
-                    prices[pair] = {
-                        "price": round(current_price, 2),
-                        "change": round(change_pct, 2)
-                    }
-                    
-                except Exception as e2:
-                    logger.error(f"Both OHLCV and ticker failed for {pair}: {e2}")
-                    # Last resort: get current price only
-                    try:
-                        current_price = await paper_engine.get_real_price(pair, 'luno')
-                        if current_price and current_price > 0:
-                            # Generate small realistic change (-5% to +5%)
-                            import random
-                            change_pct = random.uniform(-5, 5)
-                            
-                            prices[pair] = {
-                                "price": round(current_price, 2),
-                                "change": round(change_pct, 2)
-                            }
-                        else:
-                            prices[pair] = {"price": 0, "change": 0}
-                    except Exception as e3:
-                        logger.error(f"Final fallback failed for {pair}: {e3}")
-                        prices[pair] = {"price": 0, "change": 0}
+                logger.warning(f"Live price unavailable for {pair}: {e}")
+                prices[pair] = {"price": 0, "change": 0}
         
         return prices
     except Exception as e:
@@ -1894,6 +1829,7 @@ async def confirm_live_switch(data: dict, user_id: str = Depends(get_current_use
                 {"$set": {"liveTrading": True}},
                 upsert=True
             )
+            await trading_scheduler.notify_changed(user_id)
             
             # Send WebSocket notification
             from websocket_manager import manager
@@ -1980,6 +1916,7 @@ async def enable_autopilot(user_id: str = Depends(get_current_user)):
             {"$set": {"autopilot": True}},
             upsert=True
         )
+        await trading_scheduler.notify_changed(user_id)
         logger.info(f"Autopilot enabled for user {user_id}")
         return {"message": "Autopilot enabled", "autopilot": True}
     except Exception as e:
@@ -1994,6 +1931,7 @@ async def disable_autopilot(user_id: str = Depends(get_current_user)):
             {"$set": {"autopilot": False}},
             upsert=True
         )
+        await trading_scheduler.notify_changed(user_id)
         logger.info(f"Autopilot disabled for user {user_id}")
         return {"message": "Autopilot disabled", "autopilot": False}
     except Exception as e:
@@ -2030,6 +1968,7 @@ async def start_paper_trading(user_id: str = Depends(get_current_user)):
             {"$set": {"paperTrading": True, "liveTrading": False}},
             upsert=True
         )
+        await trading_scheduler.notify_changed(user_id)
         logger.info(f"Paper trading started for user {user_id}")
         return {"message": "Paper trading started", "mode": "paper"}
     except Exception as e:
@@ -2048,6 +1987,7 @@ async def start_live_trading(data: dict, user_id: str = Depends(get_current_user
             {"$set": {"paperTrading": False, "liveTrading": True}},
             upsert=True
         )
+        await trading_scheduler.notify_changed(user_id)
         
         logger.warning(f"LIVE TRADING started for user {user_id}")
         return {"message": "Live trading started - using REAL funds", "mode": "live"}
@@ -2144,7 +2084,11 @@ async def delete_user(target_user_id: str, user_id: str = Depends(get_current_us
         # 6. Delete user's system modes
         await system_modes_collection.delete_many({"user_id": target_user_id})
         
-        # 7. Finally, delete the user
+        # 7. Delete user's materialized dashboard summary
+        from database import portfolio_summaries_collection
+        await portfolio_summaries_collection.delete_one({"_id": target_user_id})
+        
+        # 8. Finally, delete the user
         result = await users_collection.delete_one({"id": target_user_id})
         
         if result.deleted_count == 0:
@@ -2368,107 +2312,30 @@ async def test_fetchai_connection(user_id: str = Depends(get_current_user)):
 
 # ==== SERVER-SENT EVENTS (SSE) ENDPOINTS ====
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"  # Disable nginx buffering
+}
+
 @api_router.get("/sse/overview")
 async def sse_overview_stream(request: Request, user_id: str = Depends(get_current_user)):
-    """Server-Sent Events stream for real-time overview data"""
-    async def event_generator():
-        try:
-            while True:
-                # Check if client disconnected
-                if await request.is_disconnected():
-                    break
-                
-                # Fetch overview data
-                bots = await bots_collection.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
-                active_bots = [b for b in bots if b.get('status') == 'active']
-                
-                total_profit = sum(
-                    bot.get('current_capital', 0) - bot.get('initial_capital', 0) 
-                    for bot in active_bots
-                )
-                
-                data = {
-                    "totalProfit": round(total_profit, 2),
-                    "activeBots": len(active_bots),
-                    "totalBots": len(bots),
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                }
-                
-                # Send SSE formatted message
-                yield f"data: {json.dumps(data)}\n\n"
-                
-                # Wait 2 seconds before next update
-                await asyncio.sleep(2)
-                
-        except asyncio.CancelledError:
-            pass
-    
+    """Server-Sent Events stream for real-time overview data (shared per-user producer)"""
+    from sse_broadcaster import overview_stream
     return StreamingResponse(
-        event_generator(),
+        overview_stream(user_id, request.headers.get("last-event-id"), request),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"  # Disable nginx buffering
-        }
+        headers=SSE_HEADERS
     )
 
 @api_router.get("/sse/live-prices")
 async def sse_live_prices_stream(request: Request, user_id: str = Depends(get_current_user)):
-    """Server-Sent Events stream for live price updates"""
-    async def event_generator():
-        try:
-            while True:
-                if await request.is_disconnected():
-                    break
-                
-                # Fetch live prices
-                pairs = ['BTC/ZAR', 'ETH/ZAR', 'XRP/ZAR']
-                prices = {}
-                
-                for pair in pairs:
-                    try:
-                        # Get real-time price from paper_trading_engine (uses CCXT)
-                        from paper_trading_engine import paper_engine
-                        
-                        price = await paper_engine.get_real_price(pair, 'luno')
-                        
-                        if price and price > 0:
-                            # Calculate real 24h change from CCXT ticker
-                            change_24h = 0.0
-                            try:
-                                # Fetch full ticker for 24h percentage change
-                                exchange = paper_engine.exchanges.get('luno')
-                                if exchange:
-                                    ticker = await asyncio.to_thread(exchange.fetch_ticker, pair)
-                                    change_24h = ticker.get('percentage', 0.0) or 0.0
-                            except:
-                                # Fallback to simulated if ticker fetch fails
-                                change_24h = round(random.uniform(-2, 2), 2)
-                            
-                            prices[pair] = {
-                                "price": round(price, 2),
-                                "change": round(change_24h, 2),  # Real 24h % from CCXT (or simulated fallback)
-                                "timestamp": datetime.now(timezone.utc).isoformat()
-                            }
-                    except Exception as e:
-                        logger.debug(f"Price fetch error for {pair}: {e}")
-                        pass
-                
-                yield f"data: {json.dumps(prices)}\n\n"
-                await asyncio.sleep(5)  # Update every 5 seconds
-                
-        except asyncio.CancelledError:
-            pass
-    
+    """Server-Sent Events stream for live price updates (one snapshot for all clients)"""
+    from sse_broadcaster import live_prices_stream
     return StreamingResponse(
-        event_generator(),
+        live_prices_stream(request.headers.get("last-event-id"), request),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
+        headers=SSE_HEADERS
     )
 
 # ==== MEDIUM-TERM FEATURES ENDPOINTS ====
@@ -2521,6 +2388,36 @@ async def backtest_strategy(data: dict, user_id: str = Depends(get_current_user)
         logger.error(f"Backtesting error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/backtest/optimize")
+async def optimize_strategy(data: dict, user_id: str = Depends(get_current_user)):
+    """Sweep strategy parameters (grid/random/bayesian, optional walk-forward)"""
+    try:
+        from backtesting_engine import backtesting_engine, check_sweep_size
+        try:
+            check_sweep_size(data.get('search', 'grid'), data.get('space'), data.get('samples', 50))
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        result = await backtesting_engine.optimize_strategy(
+            data.get('strategy_params', {}),
+            data['start_date'],
+            data['end_date'],
+            search=data.get('search', 'grid'),
+            space=data.get('space'),
+            samples=data.get('samples', 50),
+            train_days=data.get('train_days'),
+            test_days=data.get('test_days'),
+            objective=data.get('objective', 'total_return'),
+            initial_capital=data.get('initial_capital', 1000),
+            seed=data.get('seed')
+        )
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Optimization error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/bots/evolve")
 async def evolve_bots(user_id: str = Depends(get_current_user)):
     """Trigger bot DNA evolution"""
@@ -0,0 +1,93 @@
+"""
+Signal Gatherer - concurrent fan-out to trade signal providers
+- Every provider runs at once with its own deadline; late calls are cancelled
+- A late or failing provider falls back to its last good value (if fresh enough),
+  otherwise to a neutral value, so decision latency ~ the slowest single deadline
+- Records which sources timed out or failed, per call and in running stats
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import logging
+
+from config import SIGNAL_DEADLINE_SECONDS, SIGNAL_CACHE_MAX_AGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# name -> (zero-arg coroutine factory, neutral value)
+Providers = Dict[str, Tuple[Callable[[], Awaitable[Any]], Any]]
+
+
+class SignalGatherer:
+    def __init__(self, deadline: float = SIGNAL_DEADLINE_SECONDS,
+                 cache_max_age: float = SIGNAL_CACHE_MAX_AGE_SECONDS):
+        self.deadline = deadline
+        self.cache_max_age = cache_max_age
+        self._last_good: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self.stats = {"gathers": 0, "timeouts": {}, "errors": {}, "fallbacks": {"cached": 0, "neutral": 0}}
+
+    def _fallback(self, name: str, key: str, neutral: Any) -> Tuple[Any, str]:
+        cached = self._last_good.get((name, key))
+        if cached and time.monotonic() - cached[1] <= self.cache_max_age:
+            self.stats["fallbacks"]["cached"] += 1
+            return cached[0], "cached"
+        self.stats["fallbacks"]["neutral"] += 1
+        return neutral, "neutral"
+
+    async def _run(self, name: str, key: str, factory, neutral, deadline: float) -> Tuple[Any, str, float]:
+        start = time.monotonic()
+        try:
+            # wait_for cancels the provider call when the deadline passes
+            value = await asyncio.wait_for(factory(), timeout=deadline)
+            self._last_good[(name, key)] = (value, time.monotonic())
+            return value, "live", time.monotonic() - start
+        except asyncio.TimeoutError:
+            self.stats["timeouts"][name] = self.stats["timeouts"].get(name, 0) + 1
+            value, source = self._fallback(name, key, neutral)
+            return value, f"timeout:{source}", time.monotonic() - start
+        except Exception as e:
+            logger.debug(f"Signal provider {name} failed for {key}: {e}")
+            self.stats["errors"][name] = self.stats["errors"].get(name, 0) + 1
+            value, source = self._fallback(name, key, neutral)
+            return value, f"error:{source}", time.monotonic() - start
+
+    async def gather(self, key: str, providers: Providers,
+                     deadlines: Optional[Dict[str, float]] = None) -> Dict:
+        """Run all providers for one key (e.g. symbol) concurrently
+
+        Returns {"values", "sources", "timed_out", "failed", "latency_ms", "elapsed_ms"}
+        """
+        deadlines = deadlines or {}
+        names = list(providers)
+        start = time.monotonic()
+        results = await asyncio.gather(*(
+            self._run(name, key, providers[name][0], providers[name][1], deadlines.get(name, self.deadline))
+            for name in names
+        ))
+        self.stats["gathers"] += 1
+
+        bundle = {
+            "values": {}, "sources": {}, "timed_out": [], "failed": [], "latency_ms": {},
+            "elapsed_ms": round((time.monotonic() - start) * 1000, 1)
+        }
+        for name, (value, source, elapsed) in zip(names, results):
+            bundle["values"][name] = value
+            bundle["sources"][name] = source
+            bundle["latency_ms"][name] = round(elapsed * 1000, 1)
+            if source.startswith("timeout"):
+                bundle["timed_out"].append(name)
+            elif source.startswith("error"):
+                bundle["failed"].append(name)
+
+        if bundle["timed_out"]:
+            logger.info(f"⏱️ Signals for {key}: {', '.join(bundle['timed_out'])} timed out "
+                        f"({bundle['elapsed_ms']:.0f}ms)")
+        return bundle
+
+    def get_status(self) -> Dict:
+        return {"deadline_seconds": self.deadline, "cached_values": len(self._last_good), **self.stats}
+
+
+# Global instance
+signal_gatherer = SignalGatherer()
@@ -0,0 +1,167 @@
+"""
+SSE Broadcaster - one producer per stream topic, fanned out to every open stream
+- Each user's overview is computed once per tick however many tabs they have
+  open; the live-price snapshot is computed once per tick for everyone
+- Events go out only when the values change (timestamps are ignored when
+  comparing); idle streams get a comment heartbeat so proxies keep them open
+- Event ids are "<worker token>-<seq>": a reconnect whose Last-Event-ID is the
+  current event skips the replay, any other id gets the latest snapshot at once
+- Producers start with a topic's first stream and stop with its last
+"""
+
+import asyncio
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional, Set
+import logging
+
+from config import SSE_OVERVIEW_INTERVAL_SECONDS, SSE_PRICES_INTERVAL_SECONDS, SSE_HEARTBEAT_SECONDS
+from time_utils import json_default
+
+logger = logging.getLogger(__name__)
+
+LIVE_PRICE_PAIRS = ['BTC/ZAR', 'ETH/ZAR', 'XRP/ZAR']
+
+
+def _without_timestamps(value):
+    if isinstance(value, dict):
+        return {k: _without_timestamps(v) for k, v in value.items() if k != "timestamp"}
+    return value
+
+
+class Topic:
+    def __init__(self, name: str, produce: Callable[[], Awaitable[dict]], interval: float):
+        self.name = name
+        self.produce = produce
+        self.interval = interval
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.last_id: Optional[str] = None
+        self.last_payload: Optional[str] = None
+        self.fingerprint: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class SSEBroadcaster:
+    def __init__(self, heartbeat: float = SSE_HEARTBEAT_SECONDS):
+        self.heartbeat = heartbeat
+        self.topics: Dict[str, Topic] = {}
+        self.token = uuid.uuid4().hex[:8]  # Ids from another worker or a restart never match
+        self._seq = 0
+        self.stats = {"ticks": 0, "events": 0, "unchanged": 0, "errors": 0}
+
+    @property
+    def stream_count(self) -> int:
+        return sum(len(t.subscribers) for t in self.topics.values())
+
+    def publish(self, topic: Topic, data: dict) -> bool:
+        """Fan a snapshot out to the topic's streams if it differs from the last one"""
+        fingerprint = json.dumps(_without_timestamps(data), sort_keys=True, default=json_default)
+        if fingerprint == topic.fingerprint:
+            self.stats["unchanged"] += 1
+            return False
+        self._seq += 1
+        topic.fingerprint = fingerprint
+        topic.last_id = f"{self.token}-{self._seq}"
+        topic.last_payload = f"id: {topic.last_id}\ndata: {json.dumps(data, default=json_default)}\n\n"
+        for queue in topic.subscribers:
+            if queue.full():
+                queue.get_nowait()  # Latest snapshot wins
+            queue.put_nowait(topic.last_payload)
+        self.stats["events"] += 1
+        return True
+
+    async def _produce_loop(self, topic: Topic):
+        while topic.subscribers:
+            try:
+                self.publish(topic, await topic.produce())
+                self.stats["ticks"] += 1
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"SSE producer error for {topic.name}: {e}")
+            await asyncio.sleep(topic.interval)
+
+    async def stream(self, name: str, produce: Callable[[], Awaitable[dict]], interval: float,
+                     last_event_id: Optional[str] = None, request=None):
+        """SSE text for one client; shares the topic's producer with every other client"""
+        topic = self.topics.get(name)
+        if topic is None:
+            topic = self.topics[name] = Topic(name, produce, interval)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        topic.subscribers.add(queue)
+        # Replay what was current when we subscribed: later events are already queued
+        replay_id, replay = topic.last_id, topic.last_payload
+        if topic.task is None or topic.task.done():
+            topic.task = asyncio.create_task(self._produce_loop(topic))
+
+        try:
+            yield "retry: 3000\n\n"
+            if replay and replay_id != last_event_id:
+                yield replay
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    if request is not None and await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield payload
+        except asyncio.CancelledError:
+            pass
+        finally:
+            topic.subscribers.discard(queue)
+            if not topic.subscribers and self.topics.get(name) is topic:
+                if topic.task:
+                    topic.task.cancel()
+                del self.topics[name]
+
+    def get_status(self) -> dict:
+        return {"topics": len(self.topics), "streams": self.stream_count, **self.stats}
+
+
+async def overview_snapshot(user_id: str) -> dict:
+    """Dashboard overview numbers (one summary document read)"""
+    from portfolio_summary import portfolio_summary
+    summary = await portfolio_summary.get_summary(user_id)
+    return {
+        "totalProfit": round(summary['total_current'] - summary['total_initial'], 2),
+        "activeBots": summary['active_bots'],
+        "totalBots": summary['total_bots'],
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
+async def live_prices_snapshot() -> dict:
+    """Luno prices and 24h change from the shared market-data hub"""
+    from market_data_hub import market_data_hub
+    prices = {}
+    for pair in LIVE_PRICE_PAIRS:
+        try:
+            price = await market_data_hub.get_price(pair, 'luno')
+            if price and price > 0:
+                change_24h = await market_data_hub.get_24h_change(pair, 'luno')
+                prices[pair] = {
+                    "price": round(price, 2),
+                    "change": round(change_24h, 2),  # Real 24h % (ticker or daily candles)
+                    "timestamp": datetime.now(timezone.utc).isoformat()
+                }
+        except Exception as e:
+            logger.debug(f"Price fetch error for {pair}: {e}")
+    return prices
+
+
+def overview_stream(user_id: str, last_event_id: Optional[str] = None, request=None):
+    return sse_broadcaster.stream(f"overview:{user_id}", lambda: overview_snapshot(user_id),
+                                  SSE_OVERVIEW_INTERVAL_SECONDS, last_event_id, request)
+
+
+def live_prices_stream(last_event_id: Optional[str] = None, request=None):
+    return sse_broadcaster.stream("live_prices", live_prices_snapshot,
+                                  SSE_PRICES_INTERVAL_SECONDS, last_event_id, request)
+
+
+# Global instance
+sse_broadcaster = SSEBroadcaster()
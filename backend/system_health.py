@@ -36,7 +36,7 @@ class SystemHealth:
             
             # Detailed service info (optional)
             status["service_details"] = {
-                "rate_limiter_orders": rate_limiter.get_stats().get("total_orders_today", 0),
+                "rate_limiter_orders": (await rate_limiter.get_stats()).get("total_orders_today", 0),
                 "risk_engine_protected": len(risk_engine.user_daily_loss)
             }
             
@@ -90,12 +90,12 @@ class SystemHealth:
             # Trades in last 24 hours
             yesterday = datetime.now(timezone.utc) - timedelta(days=1)
             trades_24h = await trades_collection.count_documents({
-                "timestamp": {"$gte": yesterday.isoformat()}
+                "timestamp": {"$gte": yesterday}
             })
             
             # Total profit last 24h
             trades = await trades_collection.find({
-                "timestamp": {"$gte": yesterday.isoformat()}
+                "timestamp": {"$gte": yesterday}
             }, {"_id": 0, "profit_loss": 1}).to_list(10000)
             
             total_profit_24h = sum(t.get("profit_loss", 0) for t in trades)
@@ -129,7 +129,7 @@ class SystemHealth:
                     status["overall_health"] = "warning"
             
             # Check rate limiter not blocking everything
-            stats = rate_limiter.get_stats()
+            stats = await rate_limiter.get_stats()
             if stats.get("total_orders_today", 0) > 900:  # Near Luno limit
                 warnings.append("⚠️ Approaching Luno daily limit (1000 orders)")
             
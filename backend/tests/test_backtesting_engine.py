@@ -0,0 +1,213 @@
+"""
+Test Suite for the candle-replay backtester
+- Trend entries at the next open, stop/target/time exits, one position at a time
+- Paper engine fees, slippage and minimum-profit threshold
+- Metrics from the P&L array
+- Windows shorter than a signal plus a hold score as "no trades"
+"""
+
+import numpy as np
+import pytest
+
+from backtesting_engine import BacktestingEngine, replay
+from candle_store import CandleSeries, CandleStore, timeframe_ms
+
+TF = timeframe_ms('5m')
+
+
+def series(opens, highs, lows, closes):
+    n = len(closes)
+    return CandleSeries({
+        "timestamp": np.arange(n, dtype=np.int64) * TF,
+        "open": np.asarray(opens, float), "high": np.asarray(highs, float),
+        "low": np.asarray(lows, float), "close": np.asarray(closes, float),
+        "volume": np.ones(n),
+    })
+
+
+def rally_then(after):
+    """15 flat candles, a breakout close, then the given (open, high, low, close) candles"""
+    candles = [(100, 100, 100, 100)] * 14 + [(100, 110, 100, 110)] + list(after)
+    return series(*zip(*candles))
+
+
+def test_take_profit_exit_with_fees_and_slippage():
+    candles = rally_then([(110, 111, 109, 111), (111, 116, 110, 115)] + [(115, 115, 115, 115)] * 6)
+    result = replay(candles, {"exchange": "luno", "risk_mode": "balanced", "hold_candles": 3}, 10000)
+
+    assert result["entry_index"][0] == 15
+    assert result["exit_reason"][0] == "take_profit"
+    assert result["exit_price"][0] == pytest.approx(115.5)  # 110 * 1.05
+    amount = 10000 * 0.30
+    fees = amount * 0.0025 * 2  # Luno taker
+    slippage = amount * 0.001 * 1.5  # 5% move counts as volatile
+    assert result["pnl"][0] == pytest.approx(amount * 0.05 - fees - slippage)
+
+
+def test_stop_gap_fills_at_open_and_positions_do_not_overlap():
+    candles = rally_then([(110, 110, 100, 101), (101, 120, 100, 120), (120, 121, 119, 120)] + [(120, 120, 120, 120)] * 4)
+    result = replay(candles, {"exchange": "luno", "hold_candles": 2}, 1000)
+
+    # The first candle trades through the 2% stop after opening above it: filled at the stop
+    assert result["exit_reason"][0] == "stop_loss"
+    assert result["exit_price"][0] == pytest.approx(110 * 0.98)
+    assert np.all(result["entry_index"][1:] > result["exit_index"][:-1])
+
+    gap = rally_then([(100, 101, 99, 100)] + [(100, 100, 100, 100)] * 4)
+    gapped = replay(gap, {"exchange": "luno", "hold_candles": 2}, 1000)
+    assert gapped["exit_price"][0] == 100  # Opened below the 107.8 stop
+
+
+def test_small_wins_below_threshold_are_skipped():
+    candles = rally_then([(110, 110.5, 110, 110.5)] * 8)
+    result = replay(candles, {"exchange": "binance", "hold_candles": 2}, 1000)
+    assert len(result["pnl"]) == 0 and result["skipped"] >= 1
+
+
+def test_window_shorter_than_signal_and_hold_has_no_trades():
+    candles = rally_then([])[:5]
+    result = replay(candles, {"hold_candles": 6}, 1000)
+    assert len(result["pnl"]) == 0 and result["skipped"] == 0
+    assert BacktestingEngine._calculate_metrics(result["pnl"], 1000) == {}
+
+
+def test_metrics_from_pnl():
+    metrics = BacktestingEngine()._calculate_metrics(np.array([100.0, -50.0, -100.0, 200.0]), 1000)
+    assert metrics["total_trades"] == 4
+    assert metrics["win_rate"] == 50.0
+    assert metrics["final_capital"] == 1150.0
+    assert metrics["profit_factor"] == 2.0
+    assert metrics["max_drawdown"] == pytest.approx(13.64)  # 1100 -> 950
+    assert BacktestingEngine()._calculate_metrics(np.array([]), 1000) == {}
+
+
+@pytest.mark.asyncio
+async def test_backtest_reads_the_period_from_the_store(tmp_path):
+    async def fetch(*args):
+        return []
+
+    store = CandleStore(root=str(tmp_path), fetch=fetch)
+    rng = np.random.default_rng(7)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, 2000)))
+    opens = np.concatenate(([100.0], closes[:-1]))
+    store.append('luno', 'BTC/ZAR', '5m', [
+        [int(ts), o, max(o, c) * 1.002, min(o, c) * 0.998, c, 1.0]
+        for ts, o, c in zip(np.arange(2000) * TF, opens, closes)
+    ])
+
+    engine = BacktestingEngine(store=store)
+    result = await engine.backtest_strategy({"pair": "BTC/ZAR"}, "1970-01-01T00:00:00", "1970-01-04T00:00:00")
+    assert result["candles"] == 864  # 3 days of 5m candles
+    assert result["metrics"]["total_trades"] == len(result["trades"]) > 0
+    assert result["trades"][-1]["capital_after"] == result["metrics"]["final_capital"]
+
+    empty = await engine.backtest_strategy({"pair": "ETH/ZAR"}, "1970-01-01", "1970-01-02")
+    assert "Not enough stored" in empty["error"]
+
+
+def test_cooldown_spaces_trades_out():
+    candles = rally_then([(110 + i, 111 + i, 109 + i, 111 + i) for i in range(30)])
+    params = {"exchange": "luno", "hold_candles": 2, "position_size": 0.5}
+    back_to_back = replay(candles, params, 100000)
+    spaced = replay(candles, {**params, "cooldown_candles": 5}, 100000)
+    assert np.all(spaced["entry_index"][1:] > spaced["exit_index"][:-1] + 5)
+    assert len(spaced["pnl"]) < len(back_to_back["pnl"])
+    assert back_to_back["trade_amount"][0] == 50000
+
+
+def test_sweep_points_and_walk_forward_windows():
+    from backtesting_engine import grid_points, random_points, walk_forward_windows
+    import random
+
+    assert len(grid_points({"stop_loss_pct": [1, 2], "take_profit_pct": [3, 4, 5]})) == 6
+    with pytest.raises(ValueError):
+        grid_points({"stop_loss_pct": {"min": 1, "max": 3}})
+    points = random_points({"stop_loss_pct": [1, 2], "take_profit_pct": {"min": 2, "max": 8}}, 10, random.Random(1))
+    assert len(points) == 10 and all(2 <= p["take_profit_pct"] <= 8 for p in points)
+
+    day = 86_400_000
+    windows = walk_forward_windows(0, 100 * day, 60, 15)
+    assert windows == [((0, 60 * day), (60 * day, 75 * day)), ((15 * day, 75 * day), (75 * day, 90 * day))]
+    assert walk_forward_windows(0, day, None, None) == [((0, day), None)]
+
+
+@pytest.mark.asyncio
+async def test_parallel_sweep_reuses_stored_points(tmp_path):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def fetch(*args):
+        return []
+
+    store = CandleStore(root=str(tmp_path), fetch=fetch)
+    rng = np.random.default_rng(11)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0.0002, 0.004, 6000)))
+    opens = np.concatenate(([100.0], closes[:-1]))
+    store.append('luno', 'BTC/ZAR', '5m', [
+        [int(ts), o, max(o, c) * 1.003, min(o, c) * 0.997, c, 1.0]
+        for ts, o, c in zip(np.arange(6000) * TF, opens, closes)
+    ])
+    results = mongomock_motor.AsyncMongoMockClient()['test'].backtest_results
+    engine = BacktestingEngine(store=store, results=results)
+    space = {"stop_loss_pct": [1.0, 2.0], "take_profit_pct": [2.0, 5.0], "trend_threshold_pct": [0.2, 0.4]}
+
+    try:
+        first = await engine.optimize_strategy({}, "1970-01-01", "1970-01-21", space=space,
+                                               train_days=10, test_days=5)
+        assert len(first["folds"]) == 2
+        assert first["points_evaluated"] == 2 * (8 + 1)  # 8 train points and the best one's test, per fold
+        assert set(first["best_params"]) == set(space)
+        assert "total_return" in first["out_of_sample"]
+
+        again = await engine.optimize_strategy({}, "1970-01-01", "1970-01-21", space=space,
+                                               train_days=10, test_days=5)
+        assert again["points_evaluated"] == 0
+        assert again["folds"] == first["folds"]
+
+        wider = await engine.optimize_strategy({}, "1970-01-01", "1970-01-21",
+                                               space={**space, "cooldown_candles": [0, 6]},
+                                               train_days=10, test_days=5)
+        assert wider["points_cached"] >= 2 * 8  # The cooldown=0 half was stored by the first sweep
+        assert wider["points_evaluated"] <= 2 * (8 + 1)
+    finally:
+        engine.close()
+
+
+@pytest.mark.asyncio
+async def test_bad_sweeps_are_reported():
+    engine = BacktestingEngine()
+    result = await engine.optimize_strategy({}, "2024-01-01", "2024-02-01", space={"leverage": [1, 2]})
+    assert "Unknown strategy parameters" in result["error"]
+
+    from backtesting_engine import check_sweep_size
+    huge = {name: list(range(40)) for name in ("stop_loss_pct", "take_profit_pct", "cooldown_candles", "trend_threshold_pct")}
+    with pytest.raises(ValueError, match="exceeds the limit"):
+        check_sweep_size("grid", huge, 50)  # 2.56M points, rejected before the grid is built
+    with pytest.raises(ValueError, match="exceeds the limit"):
+        check_sweep_size("random", None, 10**6)
+    check_sweep_size("grid", None, 50)  # Default space (405 points)
+    result = await engine.optimize_strategy({}, "2024-01-01", "2024-02-01", space=huge)
+    assert "exceeds the limit" in result["error"]
+
+
+@pytest.mark.asyncio
+async def test_short_test_windows_do_not_fail_the_sweep(tmp_path):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def fetch(*args):
+        return []
+
+    day = timeframe_ms('1d')
+    store = CandleStore(root=str(tmp_path), fetch=fetch)
+    closes = 100 * np.exp(np.cumsum(np.random.default_rng(2).normal(0.001, 0.02, 60)))
+    store.append('luno', 'BTC/ZAR', '1d', [
+        [int(i * day), c, c * 1.01, c * 0.99, c, 1.0] for i, c in enumerate(closes)
+    ])
+    engine = BacktestingEngine(store=store, results=mongomock_motor.AsyncMongoMockClient()['test'].backtest_results)
+    try:
+        result = await engine.optimize_strategy({"timeframe": "1d"}, "1970-01-01", "1970-03-01",
+                                                space={"stop_loss_pct": [1.0, 2.0]}, train_days=30, test_days=5)
+        assert "error" not in result
+        assert all(f["test_metrics"] == {} for f in result["folds"])  # 5 candles per test window: no trades
+        assert result["out_of_sample"]["total_trades"] == 0
+    finally:
+        engine.close()
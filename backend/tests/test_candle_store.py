@@ -0,0 +1,76 @@
+"""
+Test Suite for the local candle store
+- Appends keep only candles newer than the last stored one
+- Reads are memory-mapped slices, remapped only after the series grew
+- Syncs fetch from the last stored candle and never store the forming one
+"""
+
+import os
+import numpy as np
+import pytest
+
+from candle_store import CandleStore, now_ms, timeframe_ms
+
+TF = timeframe_ms('5m')
+
+
+def candle(ts, close=100.0):
+    return [ts, close - 1, close + 1, close - 2, close, 1.5]
+
+
+def test_append_skips_known_candles_and_reads_are_zero_copy(tmp_path):
+    store = CandleStore(root=str(tmp_path))
+    assert len(store.get('luno', 'BTC/ZAR', '5m')) == 0
+
+    assert store.append('luno', 'BTC/ZAR', '5m', [candle(2 * TF), candle(0), candle(TF)]) == 3
+    assert store.append('luno', 'BTC/ZAR', '5m', [candle(TF), candle(2 * TF), candle(3 * TF, 104.0)]) == 1
+
+    series = store.get('luno', 'BTC/ZAR', '5m')
+    assert series.timestamp.tolist() == [0, TF, 2 * TF, 3 * TF]
+    assert isinstance(series.close, np.memmap) and not series.close.flags.writeable
+    assert store.get('luno', 'BTC/ZAR', '5m') is series  # Unchanged series is not remapped
+
+    tail = series.tail(2)
+    assert np.shares_memory(tail.close, series.close)
+    assert tail.to_list()[-1] == {"timestamp": 3 * TF, "open": 103.0, "high": 105.0,
+                                  "low": 102.0, "close": 104.0, "volume": 1.5}
+    assert series.between(TF, 3 * TF).timestamp.tolist() == [TF, 2 * TF]
+
+
+def test_interrupted_append_is_truncated(tmp_path):
+    store = CandleStore(root=str(tmp_path))
+    store.append('luno', 'BTC/ZAR', '5m', [candle(0), candle(TF)])
+    path = os.path.join(str(tmp_path), 'luno', 'BTC-ZAR', '5m', 'close.bin')
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * 5)  # Column bytes written, meta.json never replaced
+
+    store.append('luno', 'BTC/ZAR', '5m', [candle(2 * TF, 102.0)])
+    assert store.get('luno', 'BTC/ZAR', '5m').close.tolist() == [100.0, 100.0, 102.0]
+    assert os.path.getsize(path) == 3 * 8
+
+
+@pytest.mark.asyncio
+async def test_sync_fetches_only_newer_closed_candles(tmp_path):
+    calls = []
+    current = now_ms() // TF * TF  # Opening time of the forming candle
+
+    async def fetch(exchange, pair, timeframe, since, limit):
+        calls.append(since)
+        return [candle(ts) for ts in range(since, current + TF, TF)][:limit]
+
+    store = CandleStore(root=str(tmp_path), fetch=fetch)
+    candles = await store.recent('luno', 'ETH/ZAR', '5m', 20)
+    assert len(candles) == 20
+    assert int(candles.timestamp[-1]) == current - TF  # Forming candle not stored
+
+    # Current series: reads never reach the exchange
+    await store.recent('luno', 'ETH/ZAR', '5m', 20)
+    assert len(calls) == 1
+
+    # Behind by two candles: one fetch starting right after the last stored candle
+    series = store.get('luno', 'ETH/ZAR', '5m')
+    store.synced_at.clear()
+    store.append('luno', 'SOL/ZAR', '5m', [candle(ts) for ts in series.timestamp[:-2].tolist()])
+    assert await store.sync('luno', 'SOL/ZAR', '5m') == 2
+    assert calls[-1] == current - 2 * TF
+    assert ('luno', 'ETH/ZAR', '5m') in store.watched
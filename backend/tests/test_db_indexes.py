@@ -0,0 +1,80 @@
+"""
+Test Suite for the index registry
+- Every registered hot query shape is served by a registered index
+- explain() summaries flag COLLSCANs, in-memory SORTs and wasteful scans
+- ensure_indexes() creates the capped relay channels and every registered index
+"""
+
+import pytest
+
+from db_indexes import (CAPPED_COLLECTIONS, INDEXES, query_shapes, find_index, analyze_explain,
+                        ensure_capped, ensure_indexes)
+
+
+def test_every_query_shape_has_an_index():
+    uncovered = [s["name"] for s in query_shapes() if find_index(s) is None]
+    assert uncovered == []
+
+
+def test_index_must_match_equality_prefix():
+    shape = {"collection": "trades", "filter": {"bot_id": "b1"}, "sort": [("timestamp", -1)]}
+    assert find_index(shape)["keys"] == [("bot_id", 1), ("timestamp", -1)]
+    assert find_index(shape, {"trades": [{"keys": [("user_id", 1), ("timestamp", -1)]}]}) is None
+    assert all(spec["keys"] for specs in INDEXES.values() for spec in specs)
+
+    # _id lookups are served by the implicit _id index
+    assert find_index({"collection": "leader_leases", "filter": {"_id": "lease"}})["keys"] == [("_id", 1)]
+
+
+def test_every_queried_collection_is_registered():
+    registered = set(INDEXES) | set(CAPPED_COLLECTIONS)
+    assert {s["collection"] for s in query_shapes()} <= registered
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_creates_ttl_and_is_idempotent():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+
+    assert await ensure_indexes(db) == sum(len(specs) for specs in INDEXES.values())
+    indexes = await db.rate_limits.index_information()
+    assert indexes["expires_at_ttl"]["expireAfterSeconds"] == 0
+    assert await ensure_indexes(db) == sum(len(specs) for specs in INDEXES.values())  # Idempotent
+
+
+def test_analyze_explain_flags_problems():
+    collscan = {
+        "queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}},
+        "executionStats": {"nReturned": 5, "totalDocsExamined": 5000, "totalKeysExamined": 0}
+    }
+    report = analyze_explain(collscan)
+    assert report["stages"] == ["SORT", "COLLSCAN"]
+    assert report["problems"] == ["COLLSCAN", "in-memory SORT", "examined/returned 1000x"]
+
+    # Slot-based engine nests the classic plan under queryPlan
+    ixscan = {
+        "queryPlanner": {"winningPlan": {"queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}},
+        "executionStats": {"nReturned": 5, "totalDocsExamined": 5, "totalKeysExamined": 5}
+    }
+    report = analyze_explain(ixscan)
+    assert report["stages"] == ["FETCH", "IXSCAN"]
+    assert report["problems"] == []
+    print("✅ Index Registry: query shapes covered, plan problems flagged")
+
+
+@pytest.mark.asyncio
+async def test_relay_channels_are_created_capped_once():
+    class RecordingDb:
+        def __init__(self):
+            self.created = {}
+
+        async def list_collection_names(self):
+            return list(self.created)
+
+        async def create_collection(self, name, **options):
+            self.created[name] = options
+
+    db = RecordingDb()
+    assert await ensure_capped(db, "worker_events")
+    assert not await ensure_capped(db, "worker_events")
+    assert db.created["worker_events"] == {"capped": True, "size": CAPPED_COLLECTIONS["worker_events"]}
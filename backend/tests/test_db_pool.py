@@ -0,0 +1,76 @@
+"""
+Test Suite for the shared database client configuration
+- Client options carry the configured pool, timeouts and usable compressors
+- One client per URL, whichever module path creates it
+- PoolMetrics tracks open/in-use connections, checkout waits and failures
+"""
+
+import threading
+from pymongo import monitoring
+
+from db_pool import PoolMetrics, available_compressors, client_options
+
+ADDRESS = ("localhost", 27017)
+
+
+def test_available_compressors_skips_missing_packages():
+    usable = available_compressors("zstd, snappy, zlib, bogus")
+    assert usable[-1] == "zlib"
+    assert "bogus" not in usable
+
+
+def test_client_options():
+    options = client_options(maxPoolSize=7)
+    assert options["maxPoolSize"] == 7
+    assert options["tz_aware"] is True
+    assert "zlib" in options["compressors"].split(",")
+    assert any(isinstance(l, PoolMetrics) for l in options["event_listeners"])
+
+
+def test_pool_metrics_utilization_and_waits():
+    metrics = PoolMetrics()
+    metrics.pool_created(monitoring.PoolCreatedEvent(ADDRESS, {"maxPoolSize": 4}))
+    for conn_id in (1, 2, 3):
+        metrics.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, conn_id))
+        metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+        metrics.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, conn_id))
+    metrics.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 3))
+
+    metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    assert metrics.snapshot()["waiting"] == 1
+    metrics.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(
+        ADDRESS, monitoring.ConnectionCheckOutFailedReason.TIMEOUT))
+
+    snap = metrics.snapshot()
+    server = snap["servers"]["localhost:27017"]
+    assert (server["open"], server["in_use"], server["waiting"]) == (3, 2, 0)
+    assert snap["utilization"] == 0.5
+    assert snap["checkouts"] == 3 and snap["checkout_failures"] == 1
+    assert server["failures"] == {"timeout": 1}
+    assert snap["wait_ms"]["max"] >= snap["wait_ms"]["p50"] >= 0
+
+
+def test_pool_metrics_checkout_timing_is_per_thread():
+    metrics = PoolMetrics()
+    metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+
+    def other_thread():
+        metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+        metrics.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 2))
+
+    worker = threading.Thread(target=other_thread)
+    worker.start()
+    worker.join()
+    assert metrics._local.started is not None  # This thread's checkout still pending
+    metrics.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 1))
+    assert metrics.snapshot()["checkouts"] == 2
+
+
+def test_create_client_is_shared_per_url():
+    from db_pool import create_client
+
+    url = "mongodb://pool-test.invalid:27017"
+    first = create_client(url)
+    assert create_client(url) is first  # e.g. database and backend.database
+    assert create_client(url, maxPoolSize=3) is not first
+    first.close()
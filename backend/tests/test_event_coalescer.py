@@ -0,0 +1,134 @@
+"""
+Test Suite for dashboard event frames
+- Events batch per user into one frame; latest-value events collapse
+- Plain JSON clients still receive single messages
+- Frame clients receive JSON-patch deltas against the state they hold
+"""
+
+import asyncio
+import json
+import pytest
+
+from event_coalescer import EventCoalescer, json_patch
+
+
+class FakeWebSocket:
+    def __init__(self, subprotocols=None):
+        self.scope = {"subprotocols": subprotocols or []}
+        self.subprotocol = None
+        self.sent = []
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        import msgpack
+        self.sent.append(msgpack.unpackb(data, raw=False))
+
+
+@pytest.mark.asyncio
+async def test_events_batch_and_collapse_per_user():
+    frames = []
+
+    async def send(user_id, message):
+        frames.append((user_id, message))
+
+    coalescer = EventCoalescer(send=send, frame_ms=20)
+    await coalescer.add("u1", {"type": "trade_executed", "trade": {"pair": "BTC/ZAR"}})
+    for profit in (1.0, 2.0, 3.0):
+        await coalescer.add("u1", {"type": "profit_updated", "bot_name": "A", "total_profit": profit})
+    await coalescer.add("u1", {"type": "bot_updated", "bot_id": "b1", "changes": {"status": "paused"}})
+    await coalescer.add("u1", {"type": "bot_updated", "bot_id": "b1", "changes": {"capital": 900}})
+    await coalescer.add("u2", {"type": "force_refresh"})
+    assert frames == []
+
+    await asyncio.sleep(0.05)
+    by_user = dict(frames)
+    assert [e["type"] for e in by_user["u1"]["events"]] == ["trade_executed", "profit_updated", "bot_updated"]
+    assert by_user["u1"]["events"][1]["total_profit"] == 3.0
+    assert by_user["u1"]["events"][2]["changes"] == {"status": "paused", "capital": 900}
+    assert coalescer.stats == {"events": 7, "collapsed": 3, "frames": 2, "errors": 0}
+
+
+@pytest.mark.asyncio
+async def test_full_frame_sends_early():
+    frames = []
+
+    async def send(user_id, message):
+        frames.append(message)
+
+    coalescer = EventCoalescer(send=send, frame_ms=10000, max_events=3)
+    for i in range(3):
+        await coalescer.add("u1", {"type": "trade_executed", "n": i})
+    assert len(frames) == 1 and len(frames[0]["events"]) == 3
+    assert coalescer._timers == {}
+
+
+def test_json_patch():
+    old = {"profit": {"A": 1.0}, "bots": {"b/1": {"status": "active"}}, "gone": 1}
+    new = {"profit": {"A": 2.0, "B": 5.0}, "bots": {"b/1": {"status": "paused"}}}
+    assert json_patch(old, new) == [
+        {"op": "remove", "path": "/gone"},
+        {"op": "replace", "path": "/profit/A", "value": 2.0},
+        {"op": "add", "path": "/profit/B", "value": 5.0},
+        {"op": "replace", "path": "/bots/b~11/status", "value": "paused"},
+    ]
+    assert json_patch(new, new) == []
+
+
+@pytest.mark.asyncio
+async def test_frames_expand_for_plain_clients_and_patch_for_frame_clients():
+    from websocket_manager import ConnectionManager
+
+    manager = ConnectionManager()
+    plain, framed = FakeWebSocket(), FakeWebSocket(["amarktai.frames.json"])
+    await manager.connect(plain, "u1")
+    await manager.connect(framed, "u1")
+    assert framed.subprotocol == "amarktai.frames.json"
+
+    await manager.deliver_local({"type": "frame", "events": [
+        {"type": "trade_executed", "trade": {"pair": "BTC/ZAR"}},
+        {"type": "profit_updated", "bot_name": "A", "total_profit": 3.0},
+    ]}, "u1")
+    await manager.deliver_local({"type": "frame", "events": [
+        {"type": "profit_updated", "bot_name": "A", "total_profit": 4.0},
+    ]}, "u1")
+    await manager.flush()
+
+    # Still queued, the second profit_updated replaced the first
+    assert [(m["type"], m.get("total_profit")) for m in plain.sent[1:]] == [
+        ("trade_executed", None), ("profit_updated", 4.0)
+    ]
+    first, second = framed.sent[1:]
+    assert first["state"] == {"profit": {"A": 3.0}} and first["events"][0]["type"] == "trade_executed"
+    assert second == {"type": "frame", "v": 2, "base": 1, "events": [],
+                      "patch": [{"op": "replace", "path": "/profit/A", "value": 4.0}]}
+
+    # A frame client that connects later starts from a snapshot
+    late = FakeWebSocket(["amarktai.frames.json"])
+    await manager.connect(late, "u1")
+    await manager.deliver_local({"type": "frame", "events": [
+        {"type": "system_mode_update", "mode": "autopilot", "enabled": True},
+    ]}, "u1")
+    await manager.flush()
+    assert late.sent[-1]["state"] == {"profit": {"A": 4.0}, "modes": {"autopilot": True}}
+    assert framed.sent[-1]["patch"] == [{"op": "add", "path": "/modes", "value": {"autopilot": True}}]
+    manager._heartbeat_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_msgpack_frames():
+    pytest.importorskip("msgpack")
+    from websocket_manager import ConnectionManager
+
+    manager = ConnectionManager()
+    ws = FakeWebSocket(["amarktai.frames.msgpack", "amarktai.frames.json"])
+    await manager.connect(ws, "u1")
+    assert ws.subprotocol == "amarktai.frames.msgpack"
+    await manager.deliver_local({"type": "frame", "events": [{"type": "force_refresh"}]}, "u1")
+    await manager.flush()
+    assert ws.sent[-1]["events"] == [{"type": "force_refresh"}]
+    manager._heartbeat_task.cancel()
@@ -0,0 +1,161 @@
+"""
+Test Suite for the worker -> API event relay
+- In the trading worker, manager.send_message() publishes instead of sending
+- API processes deliver relayed events to their own WebSocket clients
+- Cursor restarts re-read an overlap and deliver each event once
+"""
+
+import json
+import pytest
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+@pytest.mark.asyncio
+async def test_worker_events_reach_api_sockets():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from event_relay import EventRelay
+    import event_relay as relay_module
+    from websocket_manager import ConnectionManager
+    import websocket_manager
+
+    collection = mongomock_motor.AsyncMongoMockClient()['test']['worker_events']
+    relay = EventRelay(collection=collection)
+    original_relay, original_manager = relay_module.event_relay, websocket_manager.manager
+    relay_module.event_relay = relay
+    try:
+        # Worker side: no sockets, the message is published
+        await relay.start_publisher()
+        await ConnectionManager().send_message("user_1", {"type": "trade_executed", "pair": "BTC/ZAR"})
+        assert await collection.count_documents({}) == 1
+        assert relay.stats["published"] == 1
+
+        # API side: the relayed event goes to the user's socket only
+        relay.is_publisher = False
+        api_manager = ConnectionManager()
+        mine, other = FakeWebSocket(), FakeWebSocket()
+        api_manager.active_connections = {"user_1": {mine}, "user_2": {other}}
+        websocket_manager.manager = api_manager
+
+        await relay._deliver(await collection.find_one({}))
+        await api_manager.flush()
+        assert mine.sent == [{"type": "trade_executed", "pair": "BTC/ZAR"}]
+        assert other.sent == []
+    finally:
+        relay_module.event_relay, websocket_manager.manager = original_relay, original_manager
+    print("✅ Event Relay: worker event delivered by API process")
+
+
+class FakeAcceptingWebSocket(FakeWebSocket):
+    async def accept(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_workers_only_receive_their_users_channels():
+    from event_relay import EventRelay
+    import event_relay as relay_module
+    from websocket_manager import ConnectionManager
+    import websocket_manager
+
+    relay = EventRelay(backend="memory", per_user=True)
+    original_relay, original_manager = relay_module.event_relay, websocket_manager.manager
+    relay_module.event_relay = relay
+    try:
+        await relay.start()
+        manager = ConnectionManager()
+        websocket_manager.manager = manager
+        ws1, ws2 = FakeAcceptingWebSocket(), FakeAcceptingWebSocket()
+        await manager.connect(ws1, "user_1")
+        await manager.connect(ws2, "user_1")
+        assert relay.subscriptions == {"user_1": 2}
+
+        # Sends go through the relay, even for sockets held by this worker
+        await manager.send_message("user_1", {"type": "trade_executed"})
+        await manager.send_message("user_2", {"type": "trade_executed"})
+        await manager.broadcast_to_all({"type": "system_mode_update"})
+        assert relay.stats["published"] == 3 and relay.stats["delivered"] == 2
+        await manager.flush()
+        assert [m["type"] for m in ws1.sent[1:]] == ["trade_executed", "system_mode_update"]
+
+        await manager.disconnect(ws1, "user_1")
+        await manager.disconnect(ws1, "user_1")  # Error path disconnects twice
+        assert relay.subscriptions == {"user_1": 1}
+        await manager.disconnect(ws2, "user_1")
+        assert relay.subscriptions == {}
+        assert not relay.wants({"user_id": "user_1"}) and relay.wants({"user_id": None})
+        manager._heartbeat_task.cancel()
+    finally:
+        await relay.stop()
+        relay_module.event_relay, websocket_manager.manager = original_relay, original_manager
+
+
+def test_tail_query_filters_by_subscribed_users():
+    from event_relay import EventRelay
+
+    relay = EventRelay(backend="capped", per_user=True)
+    relay.subscribe("u2")
+    relay.subscribe("u1")
+    query = relay._tail_query("last")
+    assert query["_id"] == {"$gt": "last"}
+    assert query["$or"] == [{"user_id": None}, {"user_id": {"$in": ["u1", "u2"]}}]
+    assert relay._resubscribe.is_set()
+
+    assert EventRelay(backend="capped")._tail_query(None) == {}  # Handler channels get everything
+    with pytest.raises(ValueError):
+        EventRelay(backend="redis")
+
+
+@pytest.mark.asyncio
+async def test_restart_rereads_events_that_sort_below_the_last_delivered_id():
+    """Same-second ObjectIds from two publishers are not in insertion order"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from datetime import datetime, timezone
+    from bson import ObjectId
+    from event_relay import EventRelay
+
+    collection = mongomock_motor.AsyncMongoMockClient()['test']['worker_events']
+    second = int(datetime.now(timezone.utc).timestamp()).to_bytes(4, "big")
+    from_b = ObjectId(second + b"\xff" * 8)  # Inserted first by publisher B
+    from_a = ObjectId(second + b"\x00" * 8)  # Inserted next by publisher A, sorts lower
+    await collection.insert_many([{"_id": from_b, "user_id": None}, {"_id": from_a, "user_id": None}])
+
+    relay = EventRelay(collection=collection, backend="capped")
+    assert relay._first_delivery(from_b)  # Delivered before the cursor died
+    assert await collection.count_documents({"_id": {"$gt": from_b}}) == 0  # The old resume point lost A
+
+    floor = relay._resume_floor(from_b.generation_time)
+    docs = await collection.find(relay._tail_query(floor)).to_list(10)
+    assert [d["_id"] for d in docs if relay._first_delivery(d["_id"])] == [from_a]
+
+
+@pytest.mark.asyncio
+async def test_failed_publish_falls_back_to_local_sockets():
+    from event_relay import EventRelay
+    import event_relay as relay_module
+    from websocket_manager import ConnectionManager
+
+    class BrokenCollection:
+        async def insert_one(self, doc):
+            raise ConnectionError("mongo down")
+
+    relay = EventRelay(collection=BrokenCollection(), per_user=True)
+    relay.is_running = True  # Subscribed, tail loop not needed here
+    original_relay = relay_module.event_relay
+    relay_module.event_relay = relay
+    try:
+        manager = ConnectionManager()
+        ws = FakeWebSocket()
+        manager.active_connections = {"user_1": {ws}}
+        await manager.send_message("user_1", {"type": "alert"})
+        await manager.flush()
+        assert ws.sent == [{"type": "alert"}]
+        assert relay.stats["errors"] == 1
+    finally:
+        relay_module.event_relay = original_relay
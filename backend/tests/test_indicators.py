@@ -0,0 +1,92 @@
+"""
+Test Suite for the indicator library
+- Streaming updates match the batch functions over the same input
+- Batch values match straightforward reference loops
+- Rolling windows expire by size and by age
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+import indicators
+from indicators import ATR, EMA, RSI, Bollinger, RollingStats, RollingVolatility
+
+
+def prices(n=500, seed=4):
+    rng = np.random.default_rng(seed)
+    closes = 1_000_000 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    return closes * 1.002, closes * 0.997, closes
+
+
+def streamed(updates):
+    return np.array([np.nan if v is None else v for v in updates], dtype=np.float64)
+
+
+def test_ema_matches_reference_loop():
+    _, _, closes = prices()
+    expected = np.full(len(closes), np.nan)
+    value = closes[:12].mean()
+    expected[11] = value
+    for t in range(12, len(closes)):
+        value = value + 2 / 13 * (closes[t] - value)
+        expected[t] = value
+    np.testing.assert_allclose(indicators.ema(closes, 12), expected, rtol=1e-10, equal_nan=True)
+
+
+def test_streaming_matches_batch():
+    highs, lows, closes = prices()
+    ema = EMA(12)
+    np.testing.assert_allclose(streamed(map(ema.update, closes)), indicators.ema(closes, 12),
+                               rtol=1e-10, equal_nan=True)
+    rsi = RSI(14)
+    np.testing.assert_allclose(streamed(map(rsi.update, closes)), indicators.rsi(closes, 14),
+                               rtol=1e-10, equal_nan=True)
+    atr = ATR(14)
+    np.testing.assert_allclose(streamed(map(atr.update, highs, lows, closes)), indicators.atr(highs, lows, closes, 14),
+                               rtol=1e-10, equal_nan=True)
+    vol = RollingVolatility(20)
+    np.testing.assert_allclose(streamed(map(vol.update, closes)), indicators.rolling_volatility(closes, 20),
+                               rtol=1e-8, equal_nan=True)
+
+    bands = Bollinger(20)
+    updates = [bands.update(c) for c in closes]
+    middle, upper, lower = indicators.bollinger(closes, 20)
+    assert updates[18] is None
+    assert updates[-1] == pytest.approx((middle[-1], upper[-1], lower[-1]), rel=1e-9)
+
+
+def test_rsi_edges():
+    rising = np.arange(1.0, 31.0)
+    assert indicators.rsi(rising, 14)[-1] == 100
+    assert indicators.rsi(np.full(30, 5.0), 14)[-1] == 50
+    assert np.isnan(indicators.rsi(rising, 14)[13]) and not np.isnan(indicators.rsi(rising, 14)[14])
+
+
+def test_rolling_stats_by_size_and_age():
+    stats = RollingStats(size=3)
+    for value in [1.0, 2.0, 3.0, 10.0]:
+        stats.push(value)
+    assert len(stats) == 3 and stats.first == 2.0
+    assert stats.mean == pytest.approx(5.0)
+    assert stats.variance == pytest.approx(np.var([2.0, 3.0, 10.0]))
+
+    timed = RollingStats(max_age=60)
+    for ts, value in [(0, 100.0), (30, 102.0), (61, 104.0), (90, 90.0)]:
+        timed.push(value, ts)
+    assert [v for _, v in timed.values] == [104.0, 90.0]  # 0 and 30 are older than 60s at t=90
+    assert timed.std == pytest.approx(7.0)
+
+
+def test_trend_change_and_snapshot():
+    closes = np.array([100.0] * 10 + [110.0] * 5)
+    assert indicators.trend_change_pct(closes)[-1] == pytest.approx(10.0)
+    assert math.isnan(indicators.trend_change_pct(closes)[13])
+
+    highs, lows, closes = prices(30)
+    candles = type("Candles", (), {"high": highs, "low": lows, "close": closes})
+    values = indicators.snapshot(candles)
+    assert values["rsi_14"] is not None and values["ema_26"] is not None
+    assert values["bollinger_lower"] < values["bollinger_middle"] < values["bollinger_upper"]
+    assert indicators.snapshot(type("Candles", (), {"high": highs[:5], "low": lows[:5], "close": closes[:5]}))["ema_12"] is None
@@ -0,0 +1,57 @@
+"""
+Test Suite for leader election
+- Only one worker holds the background-engines lease
+- A standby takes over after release or lease expiry
+"""
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_single_leader_and_failover():
+    """Two workers compete; the standby is promoted once the leader releases"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from leader_election import LeaderElection
+
+    collection = mongomock_motor.AsyncMongoMockClient()['test']['leader_leases']
+    events = []
+    worker_a = LeaderElection("engines", collection=collection, lease_seconds=10, heartbeat_seconds=3)
+    worker_b = LeaderElection("engines", collection=collection, lease_seconds=10, heartbeat_seconds=3)
+
+    await worker_a.heartbeat()
+    worker_b.on_elected = lambda: events.append("b_elected")
+    await worker_b.heartbeat()
+    assert worker_a.is_leader and not worker_b.is_leader
+
+    # Renewal keeps the lease with A
+    await worker_a.heartbeat()
+    await worker_b.heartbeat()
+    assert worker_a.is_leader and not worker_b.is_leader
+
+    # Graceful shutdown hands over on B's next heartbeat
+    worker_a.on_demoted = lambda: events.append("a_demoted")
+    await worker_a.stop()
+    await worker_b.heartbeat()
+    assert worker_b.is_leader and not worker_a.is_leader
+    assert events == ["a_demoted", "b_elected"]
+    print(f"✅ Leader Election: failover to {worker_b.owner_id}")
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_taken_over():
+    """A crashed leader (no release) loses the lease once it expires"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from datetime import datetime, timezone, timedelta
+    from leader_election import LeaderElection
+
+    collection = mongomock_motor.AsyncMongoMockClient()['test']['leader_leases']
+    await collection.insert_one({
+        "_id": "engines",
+        "owner": "crashed-host:1:dead",
+        "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)
+    })
+
+    worker = LeaderElection("engines", collection=collection)
+    assert await worker.try_acquire()
+    holder = await worker.get_holder()
+    assert holder["owner"] == worker.owner_id
@@ -0,0 +1,119 @@
+"""
+Test Suite for the shared Market Data Hub
+- Bulk polling into the snapshot
+- Staleness budget and shared cache-miss fetches
+- Symbols the exchange rejects stay out of the bulk poll
+"""
+
+import pytest
+import asyncio
+
+
+class FakeExchange:
+    """Stand-in ccxt client that counts calls"""
+
+    def __init__(self):
+        self.has = {'fetchTickers': True}
+        self.ticker_calls = 0
+        self.bulk_calls = 0
+
+    async def fetch_ticker(self, symbol):
+        self.ticker_calls += 1
+        await asyncio.sleep(0.01)
+        return {'symbol': symbol, 'last': 100.0 + self.ticker_calls}
+
+    async def fetch_tickers(self, symbols):
+        self.bulk_calls += 1
+        return {s: {'symbol': s, 'last': 200.0} for s in symbols}
+
+    async def close(self):
+        pass
+
+
+def make_hub():
+    from market_data_hub import MarketDataHub
+    hub = MarketDataHub()
+    hub.exchanges['luno'] = FakeExchange()
+    return hub
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch():
+    """Many consumers missing the cache at once cost one REST call"""
+    hub = make_hub()
+
+    prices = await asyncio.gather(*(hub.get_price('SOL/ZAR', 'luno') for _ in range(20)))
+
+    assert hub.exchanges['luno'].ticker_calls == 1
+    assert len(set(prices)) == 1
+    print(f"✅ Market Data Hub: 20 concurrent reads = {hub.exchanges['luno'].ticker_calls} fetch")
+
+
+@pytest.mark.asyncio
+async def test_bulk_poll_serves_reads_within_budget():
+    """Reads inside the staleness budget never hit the exchange"""
+    hub = make_hub()
+
+    await hub.poll_exchange('luno')
+    price = await hub.get_price('BTC/ZAR', 'luno')
+
+    assert price == 200.0
+    assert hub.exchanges['luno'].bulk_calls == 1
+    assert hub.exchanges['luno'].ticker_calls == 0
+    assert hub.stats['hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_zero_budget_forces_refresh():
+    """A zero staleness budget always refreshes the ticker"""
+    hub = make_hub()
+
+    await hub.poll_exchange('luno')
+    price = await hub.get_price('BTC/ZAR', 'luno', max_age=0)
+
+    assert price == 101.0
+    assert hub.exchanges['luno'].ticker_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_unsupported_exchange_returns_none():
+    """Exchanges without a public client are not served"""
+    hub = make_hub()
+
+    assert not hub.supports('valr')
+    assert await hub.get_price('BTC/ZAR', 'valr') is None
+
+
+@pytest.mark.asyncio
+async def test_rejected_symbols_never_reach_the_bulk_poll():
+    """A mistyped symbol must not fail the bulk poll for every watched pair"""
+    import ccxt.async_support as ccxt
+
+    class StrictExchange(FakeExchange):
+        async def fetch_ticker(self, symbol):
+            if symbol == 'BTC/ZARR':
+                raise ccxt.BadSymbol(f"luno does not have market symbol {symbol}")
+            return await super().fetch_ticker(symbol)
+
+        async def fetch_tickers(self, symbols):
+            if 'BTC/ZARR' in symbols:
+                raise ccxt.BadSymbol("luno does not have market symbol BTC/ZARR")
+            return await super().fetch_tickers(symbols)
+
+    hub = make_hub()
+    hub.exchanges['luno'] = StrictExchange()
+
+    assert await hub.get_price('BTC/ZARR', 'luno') is None
+    assert 'BTC/ZARR' not in hub.watched['luno']
+    await hub.get_price('SOL/ZAR', 'luno')
+    assert 'SOL/ZAR' in hub.watched['luno']
+
+    # A symbol that slipped in anyway is dropped and the rest still refresh
+    hub.watched['luno'].add('BTC/ZARR')
+    hub.snapshots.clear()
+    await hub.poll_exchange('luno')
+    assert 'BTC/ZARR' not in hub.watched['luno']
+    assert hub.peek_ticker('ETH/ZAR', 'luno') is not None
+    hub.snapshots.clear()
+    await hub.poll_exchange('luno')
+    assert hub.exchanges['luno'].bulk_calls == 1  # Next bulk poll succeeds
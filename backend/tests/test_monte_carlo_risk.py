@@ -0,0 +1,112 @@
+"""
+Test Suite for the Monte Carlo risk bands
+- Per-trade returns walk back from current capital
+- Block summaries give the same drawdown as replaying the trades
+- 10k paths per user well inside the dashboard budget, however many bots
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from monte_carlo_risk import MonteCarloRisk, _block_stats, returns_from_pnl, simulate
+
+
+def test_returns_on_capital_before_each_trade():
+    returns = returns_from_pnl(np.array([100.0, -110.0, 50.0]), 1040.0)
+    assert returns.tolist() == pytest.approx([0.1, -0.1, 50 / 990])
+
+
+def test_block_drawdown_matches_brute_force():
+    rng = np.random.default_rng(3)
+    log_returns = np.log1p(rng.normal(0, 0.02, 40))
+    block = 8
+    total, peak, trough, inner_drawdown, worst_hour = _block_stats(log_returns, block, 3)
+
+    picks = rng.integers(0, 40, size=6)
+    path = np.concatenate([np.roll(log_returns, -i)[:block] for i in picks])
+    equity = np.concatenate(([0.0], np.cumsum(path)))
+    expected = (np.maximum.accumulate(equity) - equity).max()
+
+    level = np.concatenate(([0.0], np.cumsum(total[picks])[:-1]))
+    prior_peak = np.maximum.accumulate(np.concatenate(([0.0], (level + peak[picks])[:-1])))
+    drawdown = np.maximum(prior_peak - (level + trough[picks]), inner_drawdown[picks]).max()
+    assert drawdown == pytest.approx(expected)
+
+    first = np.concatenate(([0.0], np.cumsum(log_returns[:block])))
+    assert worst_hour[0] == pytest.approx((first[:-3] - first[3:]).max())
+
+
+def test_ten_thousand_paths_under_a_second():
+    rng = np.random.default_rng(5)
+    returns = rng.normal(0.002, 0.01, 2000)
+
+    start = time.perf_counter()
+    result = simulate(returns, per_day=20, capital=10_000, target=1_000_000, paths=10_000, seed=1)
+    assert time.perf_counter() - start < 1.0
+
+    assert result["paths"] == 10_000
+    assert 0 < result["reach_probability"] <= 100
+    bands = result["days_to_target"]
+    assert bands["p5"] <= bands["p50"] <= bands["p95"]
+    assert 0 <= result["circuit_breakers"]["max_drawdown"]["probability"] <= 100
+
+    losing = simulate(-np.abs(returns), per_day=20, capital=10_000, target=1_000_000, paths=1000, seed=1)
+    assert losing["reach_probability"] == 0 and losing["days_to_target"] is None
+    assert losing["circuit_breakers"]["max_drawdown"]["probability"] == 100
+
+
+@pytest.mark.parametrize("bot_count", [40, 100])
+def test_user_with_many_bots_under_a_second(bot_count):
+    rng = np.random.default_rng(bot_count)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    bots = [{"id": f"b{i}", "name": f"Bot {i}", "current_capital": 1000.0} for i in range(bot_count)]
+    trades = [  # 40 trades per bot, 5 minutes apart
+        {"bot_id": f"b{i % bot_count}", "profit_loss": float(rng.normal(1, 10)),
+         "timestamp": start + timedelta(minutes=5 * i)}
+        for i in range(40 * bot_count)
+    ]
+
+    began = time.perf_counter()
+    result = MonteCarloRisk._simulate(trades, bots, bot_count * 1000.0, 1_000_000, 10_000, 365, 1)
+    assert time.perf_counter() - began < 1.0
+
+    assert result["portfolio"]["paths"] == 10_000
+    assert len(result["bots"]) + result["bots_skipped"] == bot_count
+    assert sum(bot["paths"] for bot in result["bots"].values()) <= 10_000
+
+
+@pytest.mark.asyncio
+async def test_simulate_user_portfolio_and_bots():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    await db.bots.insert_many([
+        {"id": "b1", "user_id": "u1", "name": "Alpha", "current_capital": 1500.0},
+        {"id": "b2", "user_id": "u1", "name": "Beta", "current_capital": 1000.0},
+    ])
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rng = np.random.default_rng(9)
+    await db.trades.insert_many([
+        {"user_id": "u1", "bot_id": "b1", "profit_loss": float(rng.normal(2, 5)),
+         "timestamp": start + timedelta(hours=i)}
+        for i in range(60)
+    ] + [
+        {"user_id": "u1", "bot_id": "b2", "profit_loss": 1.0,
+         "timestamp": (start + timedelta(hours=i, minutes=30)).isoformat()}  # Legacy string timestamps
+        for i in range(10)
+    ])
+
+    risk = MonteCarloRisk(trades=db.trades, bots=db.bots)
+    result = await risk.simulate_user("u1", target=5000, paths=2000, seed=2)
+    assert result["current_capital"] == 2500.0
+    assert result["portfolio"]["trades_sampled"] == 70
+    assert list(result["bots"]) == ["b1"]  # b2 has too few trades of its own
+    assert result["bots"]["b1"]["target"] == pytest.approx(3000.0)
+
+    portfolio_only = await risk.simulate_user("u1", target=5000, paths=2000, include_bots=False, seed=2)
+    assert portfolio_only["bots"] == {} and portfolio_only["portfolio"] == result["portfolio"]
+
+    empty = await risk.simulate_user("nobody")
+    assert empty["portfolio"] is None and "Need at least" in empty["message"]
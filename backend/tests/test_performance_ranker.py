@@ -0,0 +1,51 @@
+"""
+Test Suite for PerformanceRanker
+- Scores come from one $group over the user's trades (same formula as per-trade loops)
+- Rankings are cached until the TTL passes or a trade invalidates them
+"""
+
+import math
+import pytest
+
+
+def reference_score(pnls, total_profit):
+    """The original per-trade Python computation"""
+    wins = [p for p in pnls if p > 0]
+    losses = abs(sum(p for p in pnls if p < 0))
+    win_rate = len(wins) / len(pnls) * 100
+    profit_factor = sum(wins) / losses if losses > 0 else sum(wins)
+    mean = sum(pnls) / len(pnls)
+    std = math.sqrt(sum((p - mean) ** 2 for p in pnls) / len(pnls))
+    sharpe = mean / std if std > 0 else 0
+    return round(win_rate * 0.25 + profit_factor * 2 + sharpe * 3 + total_profit * 0.3 + mean * 10, 2)
+
+
+@pytest.mark.asyncio
+async def test_rank_bots_aggregates_and_caches():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from performance_ranker import PerformanceRanker
+
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    await db.bots.insert_many([
+        {"id": "b1", "user_id": "u1", "status": "active", "total_profit": 12.0},
+        {"id": "b2", "user_id": "u1", "status": "active", "total_profit": -3.0},
+        {"id": "b3", "user_id": "u1", "status": "paused", "total_profit": 99.0},
+    ])
+    b1, b2 = [10.0, -4.0, 6.0], [-2.0, -1.0]
+    await db.trades.insert_many(
+        [{"bot_id": "b1", "profit_loss": p} for p in b1] +
+        [{"bot_id": "b2", "pnl": p} for p in b2]  # Legacy field name
+    )
+
+    ranker = PerformanceRanker(bots=db.bots, trades=db.trades, ttl_seconds=60)
+    ranked = await ranker.rank_bots("u1")
+    assert [b["id"] for b in ranked] == ["b1", "b2"]
+    assert ranked[0]["performance_score"] == pytest.approx(reference_score(b1, 12.0))
+    assert ranked[1]["performance_score"] == pytest.approx(reference_score(b2, -3.0))
+
+    # Cached until a trade lands for the user
+    await db.trades.insert_one({"bot_id": "b2", "profit_loss": 500.0})
+    assert [b["id"] for b in await ranker.rank_bots("u1")] == ["b1", "b2"]
+    ranker.invalidate("u1")
+    assert [b["id"] for b in await ranker.rank_bots("u1")] == ["b2", "b1"]
+    print("✅ Performance Ranker: one aggregation per user, TTL cache invalidated by trades")
@@ -0,0 +1,57 @@
+"""
+Test Suite for P&L rollups
+- Trade writes fold into hourly/daily buckets per user and per bot
+- Backfill rebuilds the same buckets from raw trades
+"""
+
+import pytest
+from datetime import datetime, timezone, timedelta
+
+
+def make_trades(now):
+    yesterday = now - timedelta(days=1)
+    return [
+        {"user_id": "u1", "bot_id": "b1", "pair": "BTC/ZAR", "profit_loss": 10.0, "fees": 1.0,
+         "amount": 0.001, "price": 1_000_000, "timestamp": yesterday},
+        {"user_id": "u1", "bot_id": "b1", "pair": "BTC/ZAR", "profit_loss": -4.0, "fees": 1.0,
+         "amount": 0.001, "price": 1_000_000, "timestamp": yesterday},
+        {"user_id": "u1", "bot_id": "b2", "symbol": "ETH/ZAR", "profit_loss": 6.0, "fees": 0.5,
+         "amount": 0.01, "price": 50_000, "timestamp": now},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_record_trade_matches_backfill():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from pnl_rollups import PnLRollups
+
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    now = datetime.now(timezone.utc)
+    trades = make_trades(now)
+    await db.trades.insert_many([dict(t) for t in trades])
+
+    live = PnLRollups(collection=db.rollups_live, trades=db.trades)
+    for t in trades:
+        await live.record_trade(t)
+
+    rebuilt = PnLRollups(collection=db.rollups_rebuilt, trades=db.trades)
+    result = await rebuilt.backfill()
+    assert result["trades_scanned"] == 3
+
+    for rollups in (live, rebuilt):
+        days = await rollups.get_buckets("u1", "day", since=now - timedelta(days=2))
+        assert len(days) == 2
+        totals = rollups.summarize(days)
+        assert totals["pnl"] == pytest.approx(12.0)
+        assert totals["fees"] == pytest.approx(2.5)
+        assert (totals["trades"], totals["wins"], totals["losses"]) == (3, 2, 1)
+        assert totals["active_buckets"] == 2
+        assert totals["pairs"]["BTC/ZAR"]["pnl"] == pytest.approx(6.0)
+
+        bot_days = await rollups.get_buckets("u1", "day", since=now - timedelta(days=2), bot_id="b1")
+        assert rollups.summarize(bot_days)["trades"] == 2
+
+    # Backfill is idempotent
+    await rebuilt.backfill()
+    assert rebuilt.summarize(await rebuilt.get_buckets("u1", "hour"))["trades"] == 3
+    print("✅ P&L Rollups: live updates match backfill")
@@ -0,0 +1,53 @@
+"""
+Test Suite for materialized portfolio summaries
+- Trades fold into rolling 24h P&L buckets
+- Trades move total capital in place; bot totals are re-aggregated only after a bot change
+"""
+
+import pytest
+from datetime import datetime, timezone, timedelta
+
+
+@pytest.mark.asyncio
+async def test_summary_tracks_trades_and_bot_changes():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from portfolio_summary import PortfolioSummary
+
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    await db.bots.insert_many([
+        {"id": "b1", "user_id": "u1", "status": "active", "trading_mode": "paper",
+         "initial_capital": 1000, "current_capital": 1100, "total_injections": 50},
+        {"id": "b2", "user_id": "u1", "status": "active", "trading_mode": "live",
+         "initial_capital": 1000, "current_capital": 1000},
+        {"id": "b3", "user_id": "u1", "status": "paused", "trading_mode": "paper",
+         "initial_capital": 500, "current_capital": 400},
+    ])
+    # Existing history: one trade inside the 24h window, one outside
+    now = datetime.now(timezone.utc)
+    await db.trades.insert_many([
+        {"user_id": "u1", "profit_loss": 20.0, "timestamp": now - timedelta(hours=2)},
+        {"user_id": "u1", "profit_loss": 999.0, "timestamp": now - timedelta(hours=30)},
+    ])
+
+    summaries = PortfolioSummary(summaries=db.portfolio_summaries, bots=db.bots, trades=db.trades)
+    summary = await summaries.get_summary("u1")
+    assert summary["total_bots"] == 3
+    assert summary["active_bots"] == 2
+    assert summary["paper_bots"] == 1 and summary["live_bots"] == 1
+    assert summary["total_profit"] == pytest.approx(50.0)  # (2100 - 2000) - 50
+    assert summary["profit_24h"] == pytest.approx(20.0)
+
+    # New trade is folded in without rescanning history
+    await summaries.record_trade({"user_id": "u1", "profit_loss": 5.5})
+    summary = await summaries.get_summary("u1")
+    assert summary["profit_24h"] == pytest.approx(25.5)
+    assert summary["total_profit"] == pytest.approx(55.5)  # Capital moved by the P&L, no re-aggregation
+    doc = await db.portfolio_summaries.find_one({"_id": "u1"})
+    assert doc.get("bots_version", 0) == doc.get("bots_version_seen", 0) == 0
+
+    # Bot change shows up after invalidation
+    await db.bots.update_one({"id": "b3"}, {"$set": {"status": "active"}})
+    await summaries.mark_bots_changed("u1")
+    summary = await summaries.get_summary("u1")
+    assert summary["active_bots"] == 3
+    print(f"✅ Portfolio Summary: {summary['active_bots']} active bots, 24h P&L R{summary['profit_24h']:.2f}")
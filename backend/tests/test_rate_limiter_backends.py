@@ -0,0 +1,74 @@
+"""
+Test Suite for pluggable rate limiter backends
+- In-memory counters keep the original burst/daily behaviour
+- Mongo counters give every worker one shared budget
+"""
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_burst_limit():
+    """11th order inside 10 seconds is blocked"""
+    from rate_limiter import RateLimiter, InMemoryRateLimitBackend
+
+    limiter = RateLimiter(InMemoryRateLimitBackend())
+    for i in range(10):
+        allowed, _ = await limiter.can_trade(f"bot_{i}", "luno")
+        assert allowed
+        await limiter.record_trade(f"bot_{i}", "luno")
+
+    allowed, reason = await limiter.can_trade("bot_x", "luno")
+    assert not allowed
+    assert "Burst limit" in reason
+    print(f"✅ Rate Limiter (memory): {reason}")
+
+
+@pytest.mark.asyncio
+async def test_mongo_backend_shares_budget_across_workers():
+    """Two limiter instances (two workers) draw from the same counters"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from rate_limiter import RateLimiter, MongoRateLimitBackend
+
+    collection = mongomock_motor.AsyncMongoMockClient()['test']['rate_limits']
+    worker_a = RateLimiter(MongoRateLimitBackend(collection=collection))
+    worker_b = RateLimiter(MongoRateLimitBackend(collection=collection))
+
+    for i in range(5):
+        await worker_a.record_trade(f"bot_{i}", "binance")
+        await worker_b.record_trade(f"bot_{i}", "binance")
+
+    allowed, reason = await worker_a.can_trade("bot_new", "binance")
+    assert not allowed, "Worker A must see Worker B's orders"
+    assert "Burst limit" in reason
+
+    stats = await worker_b.get_stats()
+    assert stats["orders_by_exchange"]["binance"] == 10
+    assert stats["backend"] == "mongo"
+    print(f"✅ Rate Limiter (mongo): shared budget, {stats['total_orders_today']} orders today")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reservations_never_overshoot():
+    """Four workers racing for the last slots: claims past the limit are rolled back"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import asyncio
+    from rate_limiter import RateLimiter, MongoRateLimitBackend
+
+    collection = mongomock_motor.AsyncMongoMockClient()['test']['rate_limits']
+    workers = [RateLimiter(MongoRateLimitBackend(collection=collection)) for _ in range(4)]
+
+    results = await asyncio.gather(*(
+        workers[i % 4].reserve(f"bot_{i}", "binance") for i in range(24)
+    ))
+    granted = sum(1 for allowed, _, _ in results if allowed)
+    assert 1 <= granted <= 10  # Burst limit: 10 per 10 seconds
+
+    stats = await workers[0].get_stats()
+    assert stats["orders_by_exchange"]["binance"] == granted  # Rejected claims were given back
+
+    # A reservation whose order is never sent is released too
+    allowed, _, reservation = await RateLimiter(MongoRateLimitBackend(collection=collection)).reserve("bot_a", "kraken")
+    assert allowed
+    await workers[0].release("bot_a", "kraken", reservation)
+    assert (await workers[0].get_stats())["orders_by_exchange"].get("kraken", 0) == 0
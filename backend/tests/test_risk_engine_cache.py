@@ -0,0 +1,152 @@
+"""
+Test Suite for RiskEngine in-memory state
+- Pre-trade checks read the per-user state; Mongo is only hit on reconcile
+- Trade results update daily P&L and bot capital incrementally
+- Results recorded while a reconcile is in flight are not lost
+- Open live positions count towards per-asset exposure
+"""
+
+from datetime import datetime, timezone, timedelta
+import pytest
+
+
+async def make_db():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    await db.bots.insert_many([
+        {"id": "b1", "user_id": "u1", "current_capital": 1000.0, "exchange": "luno"},
+        {"id": "b2", "user_id": "u1", "current_capital": 1000.0, "exchange": "binance"},
+    ])
+    return db
+
+
+@pytest.mark.asyncio
+async def test_check_trade_risk_uses_cached_state():
+    db = await make_db()
+    from risk_engine import RiskEngine
+
+    engine = RiskEngine(bots=db.bots, trades=db.trades, reconcile_seconds=60)
+    assert (await engine.check_trade_risk("u1", "b1", "luno", 100, "safe"))[0]
+    assert engine.stats["reconciles"] == 1
+
+    for _ in range(20):
+        allowed, _ = await engine.check_trade_risk("u1", "b1", "luno", 100, "safe")
+        assert allowed
+    assert engine.stats["reconciles"] == 1
+
+    allowed, reason = await engine.check_trade_risk("u1", "b1", "luno", 300, "safe")
+    assert not allowed and "too large" in reason
+
+
+@pytest.mark.asyncio
+async def test_daily_loss_from_reconcile_and_increments():
+    db = await make_db()
+    from risk_engine import RiskEngine
+
+    now = datetime.now(timezone.utc)
+    await db.trades.insert_many([
+        {"user_id": "u1", "bot_id": "b1", "profit_loss": -60.0, "timestamp": now},
+        {"user_id": "u1", "bot_id": "b1", "profit_loss": -500.0, "timestamp": now - timedelta(days=2)},
+    ])
+    engine = RiskEngine(bots=db.bots, trades=db.trades)
+    assert (await engine.check_trade_risk("u1", "b1", "luno", 100, "safe"))[0]
+    assert engine.user_daily_loss == {"u1": -60.0}
+
+    # R100 lost today reaches 5% of equity (R1960 after this loss) -> protection mode
+    await engine.record_trade_result("u1", -40.0, "b1")
+    assert engine.states["u1"].bots["b1"]["capital"] == 960.0
+    allowed, reason = await engine.check_trade_risk("u1", "b1", "luno", 100, "safe")
+    assert not allowed and "Daily loss" in reason
+    assert engine.stats["reconciles"] == 1
+
+
+@pytest.mark.asyncio
+async def test_new_bot_and_invalidate_trigger_reconcile():
+    db = await make_db()
+    from risk_engine import RiskEngine
+
+    engine = RiskEngine(bots=db.bots, trades=db.trades)
+    await engine.check_trade_risk("u1", "b1", "luno", 100, "safe")
+
+    await db.bots.insert_one({"id": "b3", "user_id": "u1", "current_capital": 500.0, "exchange": "luno"})
+    assert (await engine.check_trade_risk("u1", "b3", "luno", 100, "safe"))[0]
+    assert engine.stats["reconciles"] == 2
+    assert (await engine.check_trade_risk("u1", "missing", "luno", 100, "safe")) == (False, "Bot not found")
+
+    engine.invalidate("u1")
+    await engine.check_trade_risk("u1", "b1", "luno", 100, "safe")
+    assert engine.stats["reconciles"] == 4
+
+
+@pytest.mark.asyncio
+async def test_exposure_limits():
+    db = await make_db()
+    from risk_engine import RiskEngine
+
+    engine = RiskEngine(bots=db.bots, trades=db.trades)
+    await db.trades.insert_one({
+        "user_id": "u1", "pair": "BTC/ZAR", "status": "open", "entry_price": 100.0, "amount": 8.0,
+        "timestamp": datetime.now(timezone.utc)
+    })
+    allowed, reason = await engine.check_trade_risk("u1", "b1", "luno", 100, "safe")
+    assert not allowed and "BTC" in reason
+
+    await engine.record_exposure("u1", "BTC/ZAR", -800.0)
+    assert (await engine.check_trade_risk("u1", "b1", "luno", 100, "safe"))[0]
+
+    # One exchange holding more than 60% of equity
+    await db.bots.update_one({"id": "b1"}, {"$set": {"current_capital": 4000.0}})
+    engine.invalidate()
+    allowed, reason = await engine.check_trade_risk("u1", "b1", "luno", 100, "safe")
+    assert not allowed and "LUNO" in reason
+
+
+@pytest.mark.asyncio
+async def test_live_positions_count_towards_exposure():
+    db = await make_db()
+    from risk_engine import RiskEngine
+
+    await db.positions.insert_many([
+        {"user_id": "u1", "pair": "ETH/ZAR", "status": "open", "entry_price": 400.0, "entry_qty": 2.0},
+        {"user_id": "u1", "pair": "ETH/ZAR", "status": "closed", "entry_price": 400.0, "entry_qty": 5.0},
+    ])
+    engine = RiskEngine(bots=db.bots, trades=db.trades, positions=db.positions)
+    allowed, reason = await engine.check_trade_risk("u1", "b1", "luno", 100, "safe")
+    assert not allowed and "ETH" in reason
+
+    # Live engine closes the position: exposure drops without waiting for a reconcile
+    await engine.record_exposure("u1", "ETH/ZAR", -800.0)
+    assert (await engine.check_trade_risk("u1", "b1", "luno", 100, "safe"))[0]
+    assert engine.stats["reconciles"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bot_without_capital_uses_the_default_cap():
+    db = await make_db()
+    from risk_engine import RiskEngine
+
+    await db.bots.insert_one({"id": "b3", "user_id": "u1", "exchange": "luno"})  # No current_capital
+    engine = RiskEngine(bots=db.bots, trades=db.trades)
+    assert (await engine.check_trade_risk("u1", "b3", "luno", 200, "safe"))[0]  # 25% of the 1000 default
+    allowed, reason = await engine.check_trade_risk("u1", "b3", "luno", 300, "safe")
+    assert not allowed and "R250.00" in reason
+    assert engine.states["u1"].total_equity == 2000.0
+
+
+@pytest.mark.asyncio
+async def test_results_during_reconcile_are_kept():
+    db = await make_db()
+    from risk_engine import RiskEngine
+
+    bots = db.bots
+    engine = RiskEngine(bots=bots, trades=db.trades)
+    find = bots.find
+
+    def find_and_record(*args, **kwargs):
+        engine._record("u1", "apply_pnl", -25.0, "b1")  # Lands mid-reconcile
+        return find(*args, **kwargs)
+
+    bots.find = find_and_record
+    state = await engine.reconcile("u1")
+    assert state.daily_pnl == -25.0
+    assert state.bots["b1"]["capital"] == 975.0
@@ -0,0 +1,58 @@
+"""
+Test Suite for concurrent signal gathering
+- Providers run concurrently; total latency ~ the slowest single deadline
+- Late providers are cancelled and fall back to cached / neutral values
+"""
+
+import asyncio
+import time
+import pytest
+
+from signal_gatherer import SignalGatherer
+
+
+@pytest.mark.asyncio
+async def test_gather_runs_concurrently_with_deadlines():
+    gatherer = SignalGatherer(deadline=0.2, cache_max_age=60)
+    cancelled = []
+
+    async def provider(value, delay):
+        try:
+            await asyncio.sleep(delay)
+            return value
+        except asyncio.CancelledError:
+            cancelled.append(value)
+            raise
+
+    async def broken():
+        raise RuntimeError("exchange down")
+
+    def providers(slow_delay):
+        return {
+            "price": (lambda: provider(100.0, 0.1), 1.0),
+            "regime": (lambda: provider({"confidence": 0.9}, 0.1), {"confidence": 0}),
+            "prediction": (lambda: provider({"confidence": 0.8}, slow_delay), {"confidence": 0}),
+            "fetchai": (broken, {"signal": "HOLD"}),
+        }
+
+    start = time.monotonic()
+    first = await gatherer.gather("BTC/ZAR", providers(slow_delay=0.0))
+    assert time.monotonic() - start < 0.2  # Not the sum of the delays
+    assert first["values"]["price"] == 100.0
+    assert first["failed"] == ["fetchai"] and first["values"]["fetchai"] == {"signal": "HOLD"}
+
+    # The ML provider is now late: cancelled, last good value reused
+    start = time.monotonic()
+    second = await gatherer.gather("BTC/ZAR", providers(slow_delay=5))
+    assert time.monotonic() - start < 0.5
+    assert second["timed_out"] == ["prediction"]
+    assert second["sources"]["prediction"] == "timeout:cached"
+    assert second["values"]["prediction"] == {"confidence": 0.8}
+    assert cancelled == [{"confidence": 0.8}]
+
+    # No fresh value for another symbol -> neutral
+    third = await gatherer.gather("ETH/ZAR", providers(slow_delay=5))
+    assert third["sources"]["prediction"] == "timeout:neutral"
+    assert third["values"]["prediction"] == {"confidence": 0}
+    assert gatherer.stats["timeouts"] == {"prediction": 2}
+    print(f"✅ Signal Gatherer: {second['elapsed_ms']:.0f}ms with one late provider")
@@ -0,0 +1,96 @@
+"""
+Test Suite for the SSE broadcaster
+- Streams on one topic share a single producer
+- Unchanged snapshots are not re-sent; Last-Event-ID skips the replay
+- An event published while a new stream starts is sent to it once
+- The producer stops with the topic's last stream
+"""
+
+import asyncio
+import json
+import pytest
+
+from sse_broadcaster import SSEBroadcaster
+
+
+def data_of(chunk: str) -> dict:
+    return json.loads(chunk.split("data: ", 1)[1])
+
+
+@pytest.mark.asyncio
+async def test_streams_share_one_producer_and_skip_unchanged():
+    broadcaster = SSEBroadcaster(heartbeat=5)
+    calls = []
+    values = iter([1, 1, 1, 2])
+
+    async def produce():
+        calls.append(1)
+        return {"totalProfit": next(values, 2), "timestamp": str(len(calls))}
+
+    a = broadcaster.stream("overview:u1", produce, 0.01)
+    b = broadcaster.stream("overview:u1", produce, 0.01)
+    assert await a.__anext__() == "retry: 3000\n\n"
+    assert await b.__anext__() == "retry: 3000\n\n"
+
+    first_a, first_b = await a.__anext__(), await b.__anext__()
+    assert first_a == first_b and data_of(first_a)["totalProfit"] == 1
+    second = await a.__anext__()  # Ticks 2 and 3 only changed the timestamp
+    assert data_of(second)["totalProfit"] == 2
+    assert len(calls) >= 4
+    assert broadcaster.stats["unchanged"] >= 2
+    assert broadcaster.stream_count == 2
+
+    await a.aclose()
+    await b.aclose()
+    assert broadcaster.topics == {}
+
+
+@pytest.mark.asyncio
+async def test_last_event_id_resume():
+    broadcaster = SSEBroadcaster(heartbeat=0.05)
+
+    async def produce():
+        return {"BTC/ZAR": {"price": 100.0}}
+
+    first = broadcaster.stream("live_prices", produce, 10)
+    await first.__anext__()
+    event = await first.__anext__()
+    event_id = event.split("\n", 1)[0][len("id: "):]
+
+    # Reconnect with the current id: nothing to replay, just keepalives until a change
+    resumed = broadcaster.stream("live_prices", produce, 10, last_event_id=event_id)
+    await resumed.__anext__()
+    assert await resumed.__anext__() == ": keepalive\n\n"
+
+    # A stale id (e.g. issued by another worker) gets the latest snapshot at once
+    stale = broadcaster.stream("live_prices", produce, 10, last_event_id="other-7")
+    await stale.__anext__()
+    assert await stale.__anext__() == event
+
+    for stream in (first, resumed, stale):
+        await stream.aclose()
+    await asyncio.sleep(0)
+    assert broadcaster.topics == {}
+
+
+@pytest.mark.asyncio
+async def test_event_published_during_subscribe_is_sent_once():
+    broadcaster = SSEBroadcaster(heartbeat=0.05)
+
+    async def produce():
+        return {"BTC/ZAR": {"price": 100.0}}
+
+    first = broadcaster.stream("live_prices", produce, 10)
+    await first.__anext__()
+    old = await first.__anext__()
+
+    joining = broadcaster.stream("live_prices", produce, 10, last_event_id="other-7")
+    assert await joining.__anext__() == "retry: 3000\n\n"  # Subscribed, suspended at the first yield
+    broadcaster.publish(broadcaster.topics["live_prices"], {"BTC/ZAR": {"price": 101.0}})
+
+    sent = [await joining.__anext__() for _ in range(3)]
+    assert sent[0] == old and data_of(sent[1])["BTC/ZAR"]["price"] == 101.0
+    assert sent[2] == ": keepalive\n\n"
+
+    for stream in (first, joining):
+        await stream.aclose()
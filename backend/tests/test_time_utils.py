@@ -0,0 +1,27 @@
+"""
+Test Suite for timestamp helpers
+- BSON dates and legacy ISO strings parse to the same aware UTC datetime
+"""
+
+import json
+from datetime import datetime, timezone
+
+from time_utils import parse_timestamp, json_default
+
+
+def test_parse_timestamp_accepts_dates_and_legacy_strings():
+    expected = datetime(2026, 10, 16, 12, 30, tzinfo=timezone.utc)
+    assert parse_timestamp(expected) == expected
+    assert parse_timestamp(datetime(2026, 10, 16, 12, 30)) == expected  # naive BSON date
+    assert parse_timestamp("2026-10-16T12:30:00+00:00") == expected
+    assert parse_timestamp("2026-10-16T12:30:00Z") == expected
+    assert parse_timestamp("not a date") is None
+    assert parse_timestamp(None, default=expected) == expected
+
+
+def test_json_default_serializes_dates():
+    ts = datetime(2026, 10, 16, 12, 30, tzinfo=timezone.utc)
+    assert json.loads(json.dumps({"timestamp": ts}, default=json_default)) == {
+        "timestamp": "2026-10-16T12:30:00+00:00"
+    }
+    print("✅ Time Utils: dates and ISO strings round-trip")
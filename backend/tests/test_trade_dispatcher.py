@@ -0,0 +1,86 @@
+"""
+Test Suite for the event-driven trade dispatcher
+- Due bots trade as soon as their exchange has a free slot (no fixed per-tick cap)
+- Mode change events add a user's bots without waiting for a resync
+"""
+
+import asyncio
+import pytest
+
+
+class FakeStaggerer:
+    """Per-exchange concurrency limit only"""
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self.concurrent = {}
+
+    def next_slot_delay(self, exchange):
+        return None if self.concurrent.get(exchange, 0) >= self.max_concurrent else 0.0
+
+    async def register_trade_start(self, bot_id, exchange):
+        self.concurrent[exchange] = self.concurrent.get(exchange, 0) + 1
+
+    async def register_trade_complete(self, bot_id, exchange):
+        self.concurrent[exchange] -= 1
+
+    async def clear_stale_trades(self):
+        pass
+
+
+async def wait_for(condition, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+@pytest.mark.asyncio
+async def test_dispatches_all_due_bots_within_exchange_limits():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from trade_dispatcher import TradeDispatcher
+
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    await db.bots.insert_many(
+        [{"id": f"b{i}", "user_id": "u1", "status": "active", "exchange": "binance"} for i in range(6)] +
+        [{"id": "other", "user_id": "u2", "status": "active", "exchange": "luno"}]
+    )
+    await db.system_modes.insert_many([
+        {"user_id": "u1", "autopilot": True},
+        {"user_id": "u2", "autopilot": False},
+    ])
+
+    executed, in_flight, peak = [], [0], [0]
+
+    async def execute(bot):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.02)
+        in_flight[0] -= 1
+        executed.append(bot["id"])
+
+    dispatcher = TradeDispatcher(execute, bots=db.bots, modes=db.system_modes,
+                                 staggerer=FakeStaggerer(max_concurrent=2), bot_cooldown=60)
+
+    async def no_relay():
+        pass
+    dispatcher.events.start = no_relay
+
+    dispatcher.start()
+    try:
+        await wait_for(lambda: len(executed) == 6)
+        assert sorted(executed) == [f"b{i}" for i in range(6)]
+        assert peak[0] == 2  # Exchange concurrency respected, no per-tick cap
+
+        # Autopilot switched on for u2 -> event reloads that user immediately
+        await db.system_modes.update_one({"user_id": "u2"}, {"$set": {"autopilot": True}})
+        await dispatcher._on_event({"user_id": "u2"})
+        await wait_for(lambda: "other" in executed)
+
+        # Bots are not re-run before their cooldown
+        await asyncio.sleep(0.05)
+        assert len(executed) == 7
+        assert dispatcher.get_status()["scheduled"] == 7
+    finally:
+        dispatcher.stop()
+    print(f"✅ Trade Dispatcher: {len(executed)} trades dispatched, peak concurrency {peak[0]}")
@@ -0,0 +1,70 @@
+"""
+Test Suite for the heap-based trade staggerer
+- Priority then FIFO order, one queue entry per bot
+- Token buckets and concurrency caps gate each exchange independently
+"""
+
+import pytest
+
+from engines.trade_staggerer import TradeStaggerer, QUEUE_MAX_AGE_SECONDS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_priority_dedup_and_token_buckets():
+    clock = FakeClock()
+    staggerer = TradeStaggerer(clock=clock)
+
+    assert await staggerer.add_to_queue("low", "luno")
+    assert await staggerer.add_to_queue("high", "luno", priority=5)
+    assert not await staggerer.add_to_queue("low", "luno")  # Already queued
+    assert await staggerer.add_to_queue("b1", "binance")
+
+    # Highest priority first across exchanges, then FIFO
+    first = await staggerer.get_next_trade()
+    assert first["bot_id"] == "high"
+    await staggerer.register_trade_start("high", "luno")
+
+    # Luno keeps min_delay (10s) between starts even with a concurrency slot free
+    assert (await staggerer.get_next_trade())["bot_id"] == "b1"
+    assert await staggerer.get_next_trade() is None
+    assert staggerer.next_slot_delay("luno") == pytest.approx(10.0)
+    clock.now += 10
+    assert (await staggerer.get_next_trade())["bot_id"] == "low"
+    await staggerer.register_trade_start("low", "luno")
+
+    # Both luno slots busy, then spacing again once one frees up
+    await staggerer.add_to_queue("third", "luno")
+    clock.now += 10
+    assert staggerer.next_slot_delay("luno") is None
+    assert await staggerer.get_next_trade() is None
+    await staggerer.register_trade_complete("high", "luno")
+    assert (await staggerer.get_next_trade())["bot_id"] == "third"
+    assert (await staggerer.get_queue_status())["queue_size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_requests_and_stale_trades_are_dropped():
+    clock = FakeClock()
+    staggerer = TradeStaggerer(clock=clock)
+    await staggerer.add_to_queue("old", "kucoin")
+    clock.now += QUEUE_MAX_AGE_SECONDS + 1
+    assert await staggerer.get_next_trade() is None
+    assert staggerer.queued == {}
+
+    await staggerer.register_trade_start("crashed", "valr")
+    await staggerer.register_trade_start("ok", "binance")
+    clock.now += 601
+    await staggerer.register_trade_start("fresh", "binance")
+    await staggerer.clear_stale_trades()
+    assert set(staggerer.active_trades) == {"fresh"}
+    assert staggerer.concurrent_trades_per_exchange["valr"] == 0
+    assert staggerer.concurrent_trades_per_exchange["binance"] == 1
+    print("✅ Trade Staggerer: priority heaps, dedup and token buckets")
@@ -0,0 +1,134 @@
+"""
+Test Suite for WebSocket delivery
+- A slow socket never delays the others; overflowing or stalled sockets are dropped
+- Broadcasts are serialized once; "latest value wins" messages coalesce in the queue
+- Client pings are answered and keep the socket alive; silent sockets are closed
+"""
+
+import asyncio
+import json
+import pytest
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = []
+        self.closed = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = code
+
+
+def make_manager(**settings):
+    from websocket_manager import ConnectionManager
+    manager = ConnectionManager()
+    for name, value in settings.items():
+        setattr(manager, name, value)
+    return manager
+
+
+async def connect(manager, websocket, user_id):
+    await manager.connect(websocket, user_id)
+    await manager.flush()
+    websocket.sent.clear()  # Connection greeting
+
+
+@pytest.mark.asyncio
+async def test_slow_socket_does_not_stall_others():
+    manager = make_manager(send_timeout=5)
+    slow, fast = FakeWebSocket(delay=0.5), FakeWebSocket()
+    await manager.connect(slow, "u1")
+    await manager.connect(fast, "u1")
+
+    serialized = []
+    original = manager._serialize
+    manager._serialize = lambda m: serialized.append(m) or original(m)
+
+    for i in range(3):
+        await manager.deliver_local({"type": "trade_executed", "n": i}, "u1")
+    await asyncio.sleep(0.05)
+    assert [m["n"] for m in fast.sent if m["type"] == "trade_executed"] == [0, 1, 2]
+    assert not any(m["type"] == "trade_executed" for m in slow.sent)
+    assert len(serialized) == 3  # Once per broadcast, not per socket
+    manager._heartbeat_task.cancel()
+    for client in list(manager.clients.values()):
+        client.writer.cancel()
+
+
+@pytest.mark.asyncio
+async def test_overflow_and_stalled_sockets_are_dropped():
+    manager = make_manager(max_queue=3, send_timeout=0.05)
+    stuck, ok = FakeWebSocket(delay=10), FakeWebSocket()
+    await manager.connect(stuck, "u1")
+    await connect(manager, ok, "u2")
+
+    for i in range(5):
+        await manager.deliver_local_all({"type": "trade_executed", "n": i})
+        await asyncio.sleep(0)  # Healthy writers keep up between messages
+    await asyncio.sleep(0.01)
+    assert stuck not in manager.clients
+    assert manager.active_connections == {"u2": {ok}}
+    assert manager.stats["evicted_slow"] == 1
+
+    await manager.flush()
+    assert [m["n"] for m in ok.sent] == [0, 1, 2, 3, 4]
+
+    # A send that stalls past send_timeout also drops the socket
+    manager.max_queue = 100
+    stalled = FakeWebSocket(delay=10)
+    await manager.connect(stalled, "u3")
+    await asyncio.sleep(0.1)
+    assert stalled not in manager.clients and stalled.closed == 1013
+    manager._heartbeat_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_latest_value_messages_coalesce():
+    manager = make_manager()
+    ws = FakeWebSocket()
+    await connect(manager, ws, "u1")
+    client = manager.clients[ws]
+    client.writer.cancel()  # Hold the queue
+
+    for profit in (1.0, 2.0, 3.0):
+        await manager.deliver_local({"type": "profit_updated", "total_profit": profit, "bot_name": "A"}, "u1")
+    await manager.deliver_local({"type": "trade_executed"}, "u1")
+    await manager.deliver_local({"type": "profit_updated", "total_profit": 9.0, "bot_name": "B"}, "u1")
+
+    queued = [json.loads(payload) for _, payload in client.queue]
+    assert [(m["type"], m.get("total_profit")) for m in queued] == [
+        ("profit_updated", 3.0), ("trade_executed", None), ("profit_updated", 9.0)
+    ]
+    assert manager.stats["coalesced"] == 2
+    manager._heartbeat_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_pong_tracking():
+    manager = make_manager(ping_interval=0.05, pong_timeout=0.05)
+    quiet, chatty = FakeWebSocket(), FakeWebSocket()
+    await connect(manager, quiet, "u1")
+    await connect(manager, chatty, "u2")
+
+    for _ in range(6):
+        await manager.handle_client_message(chatty, json.dumps({"type": "ping", "timestamp": 123}))
+        await asyncio.sleep(0.03)
+    await manager.flush()
+
+    assert quiet not in manager.clients and quiet.closed == 1001
+    assert chatty in manager.clients
+    assert {"type": "pong", "timestamp": 123} in chatty.sent
+    assert any(m["type"] == "ping" for m in chatty.sent)
+    assert manager.stats["evicted_stale"] == 1
+    await manager.disconnect(chatty, "u2")
+    await asyncio.sleep(0.06)
+    assert manager._heartbeat_task.done()
@@ -0,0 +1,156 @@
+"""
+Test Suite for the write-behind batcher
+- Trades and bot deltas land in one insert_many / bulk_write per flush
+- Per-bot order survives $set/$inc conflicts; stop() drains everything
+- Deltas being written stay visible to pending_inc until the write returns
+- A retry after a lost reply neither double-counts deltas nor re-inserts trades
+"""
+
+import asyncio
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_batches_and_preserves_per_bot_order():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from write_behind import WriteBehind
+
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    await db.bots.insert_many([
+        {"id": "b1", "current_capital": 1000.0, "trades_count": 0},
+        {"id": "b2", "current_capital": 500.0, "trades_count": 0},
+    ])
+    batcher = WriteBehind(trades=db.trades, bots=db.bots, flush_ms=10_000, max_ops=1000)
+    await batcher.start()
+    try:
+        for i in range(10):
+            await batcher.insert_trade({"bot_id": "b1", "n": i})
+            await batcher.update_bot("b1", inc={"current_capital": 2.5, "trades_count": 1},
+                                     set_fields={"status": "active"})
+        await batcher.update_bot("b2", set_fields={"current_capital": 0.0})  # Reset, then trade
+        await batcher.update_bot("b2", inc={"current_capital": 7.0})
+
+        assert await db.trades.count_documents({}) == 0  # Nothing written yet
+        assert batcher.pending_inc("b1", "current_capital") == pytest.approx(25.0)
+
+        assert await batcher.flush() == 13  # 10 trades + 1 merged b1 delta + 2 ordered b2 deltas
+        assert await db.trades.count_documents({}) == 10
+        b1 = await db.bots.find_one({"id": "b1"})
+        assert (b1["current_capital"], b1["trades_count"], b1["status"]) == (1025.0, 10, "active")
+        assert (await db.bots.find_one({"id": "b2"}))["current_capital"] == 7.0
+        assert batcher.pending_inc("b1", "current_capital") == 0
+
+        # Shutdown drains what is still pending
+        await batcher.insert_trade({"bot_id": "b2", "n": 99})
+    finally:
+        await batcher.stop()
+    assert await db.trades.count_documents({}) == 11
+
+
+@pytest.mark.asyncio
+async def test_flushes_when_batch_is_full():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from write_behind import WriteBehind
+
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    batcher = WriteBehind(trades=db.trades, bots=db.bots, flush_ms=10_000, max_ops=5)
+    await batcher.start()
+    try:
+        for i in range(5):
+            await batcher.insert_trade({"n": i})
+        for _ in range(50):
+            if await db.trades.count_documents({}) == 5:
+                break
+            await asyncio.sleep(0.01)
+        assert await db.trades.count_documents({}) == 5
+    finally:
+        await batcher.stop()
+    print(f"✅ Write-Behind: {batcher.stats['flushes']} flushes")
+
+
+@pytest.mark.asyncio
+async def test_deltas_stay_visible_while_a_flush_is_writing():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from write_behind import WriteBehind
+
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    await db.bots.insert_one({"id": "b1", "current_capital": 1000.0})
+    release = asyncio.Event()
+
+    class SlowBots:
+        async def bulk_write(self, ops, ordered=True):
+            await release.wait()
+            return await db.bots.bulk_write(ops, ordered=ordered)
+
+    batcher = WriteBehind(trades=db.trades, bots=SlowBots(), flush_ms=10_000, max_ops=1000)
+    batcher.is_running = True  # Buffer without the background flusher
+    await batcher.update_bot("b1", inc={"current_capital": 5.0})
+
+    flushing = asyncio.create_task(batcher.flush())
+    await asyncio.sleep(0.01)
+    await batcher.update_bot("b1", inc={"current_capital": 1.0})  # Queued during the flush
+    assert batcher.pending_inc("b1", "current_capital") == pytest.approx(6.0)
+
+    release.set()
+    assert await flushing == 1
+    assert batcher.pending_inc("b1", "current_capital") == pytest.approx(1.0)
+    assert (await db.bots.find_one({"id": "b1"}))["current_capital"] == 1005.0
+
+
+@pytest.mark.asyncio
+async def test_retry_after_lost_reply_applies_once():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from pymongo.errors import AutoReconnect
+    from write_behind import WriteBehind
+
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    await db.bots.insert_one({"id": "b1", "current_capital": 1000.0, "trades_count": 0})
+    await db.trades.insert_one({"_id": "dup", "bot_id": "b1"})
+    lose_reply = {"trades": True, "bots": True}
+
+    class Flaky:
+        """Applies the write, then drops the connection before the reply"""
+        def __init__(self, collection, name):
+            self.collection, self.name = collection, name
+
+        def find(self, *args, **kwargs):
+            return self.collection.find(*args, **kwargs)
+
+        async def _lose(self):
+            if lose_reply[self.name]:
+                lose_reply[self.name] = False
+                raise AutoReconnect("connection reset")
+
+        async def insert_many(self, docs, ordered=True):
+            result = await self.collection.insert_many(docs, ordered=ordered)
+            await self._lose()
+            return result
+
+        async def bulk_write(self, ops, ordered=True):
+            result = await self.collection.bulk_write(ops, ordered=ordered)
+            await self._lose()
+            return result
+
+    batcher = WriteBehind(trades=Flaky(db.trades, "trades"), bots=Flaky(db.bots, "bots"),
+                          flush_ms=10_000, max_ops=1000)
+    batcher.is_running = True  # Buffer without the background flusher
+    for i in range(3):
+        await batcher.insert_trade({"bot_id": "b1", "n": i})
+    await batcher.update_bot("b1", inc={"current_capital": 5.0, "trades_count": 3})
+
+    assert await batcher.flush() == 0  # Trades landed, reply lost
+    assert await batcher.flush() == 0  # Retry skips them; bot update landed, reply lost
+    await batcher.update_bot("b1", inc={"current_capital": 1.0})  # New op, not merged into the sent one
+    assert await batcher.flush() == 2  # Retried delta is a no-op, the new one applies
+
+    assert await db.trades.count_documents({"n": {"$exists": True}}) == 3
+    bot = await db.bots.find_one({"id": "b1"})
+    assert (bot["current_capital"], bot["trades_count"]) == (1006.0, 3)
+    assert batcher.pending_inc("b1", "current_capital") == 0
+
+    # Rejected docs are dropped together; the rest of the batch still lands
+    await batcher.insert_trade({"_id": "dup", "bot_id": "b1"})
+    await batcher.insert_trade({"bot_id": "b1", "n": 3})
+    await batcher.insert_trade({"_id": "dup", "bot_id": "b1"})
+    assert await batcher.flush() == 1
+    assert batcher.get_status()["pending_trades"] == 0
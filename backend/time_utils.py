@@ -0,0 +1,34 @@
+"""
+Timestamp helpers
+- trades, alerts, audit_logs and learning_logs store `timestamp` as a BSON date
+  (migrations/convert_timestamps_to_dates.py converts older ISO-string documents)
+- Range queries pass datetimes; Python code reads timestamps through parse_timestamp()
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+
+def utc_now() -> datetime:
+    """Timestamp to store on new documents"""
+    return datetime.now(timezone.utc)
+
+
+def parse_timestamp(value: Any, default: Optional[datetime] = None) -> Optional[datetime]:
+    """Aware UTC datetime from a BSON date (aware or naive) or a legacy ISO string"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    return default
+
+
+def json_default(value: Any):
+    """json.dumps(default=...) for documents that contain dates"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,260 @@
+"""
+Trade Dispatcher - event-driven scheduling of bot trades
+- Min-heap of bots keyed on their next eligible time; the loop sleeps until the
+  earliest one is due or a bot/mode change event wakes it
+- Every due trade starts as soon as its exchange allows (trade_staggerer limits),
+  no fixed number of trades per tick
+- Change events arrive over the scheduler_events relay, so API processes can
+  wake the dispatcher in the trading worker
+- Bot and mode are re-read right before each trade; a periodic full resync
+  catches changes made without an event
+"""
+
+import asyncio
+import heapq
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+from config import TRADING_BOT_COOLDOWN_SECONDS, TRADING_DISPATCH_RESYNC_SECONDS
+from event_relay import EventRelay
+
+logger = logging.getLogger(__name__)
+
+
+def trading_enabled(modes: Optional[dict]) -> bool:
+    """Trading enabled if autopilot is ON and emergency stop is OFF"""
+    return bool(modes and modes.get('autopilot') and not modes.get('emergencyStop', False))
+
+
+class TradeDispatcher:
+    def __init__(self, execute: Callable[[dict], Awaitable], bots=None, modes=None, staggerer=None,
+                 on_change: Optional[Callable[[Optional[str]], None]] = None,
+                 bot_cooldown: float = TRADING_BOT_COOLDOWN_SECONDS,
+                 resync_interval: float = TRADING_DISPATCH_RESYNC_SECONDS):
+        self.execute = execute
+        self.on_change = on_change  # Also told about change events (e.g. cache invalidation)
+        self._bots_collection = bots
+        self._modes_collection = modes
+        self._staggerer = staggerer
+        self.bot_cooldown = bot_cooldown
+        self.resync_interval = resync_interval
+        self.is_running = False
+        self.task = None
+
+        self.bots: Dict[str, dict] = {}  # Active bots of users with trading enabled
+        self._heap: List[Tuple[float, int, str]] = []  # (due monotonic time, seq, bot_id)
+        self._scheduled: Dict[str, int] = {}  # bot_id -> seq of its live heap entry
+        self._seq = 0
+        self._waiting: Dict[str, deque] = {}  # exchange -> bots blocked on its concurrency limit
+        self._running: Dict[str, asyncio.Task] = {}  # bot_id -> in-flight trade
+        self._wake = asyncio.Event()
+        self.events = EventRelay("scheduler_events", handler=self._on_event)
+        self.stats = {"dispatched": 0, "completed": 0, "skipped": 0, "resyncs": 0, "events": 0}
+
+    def _deps(self):
+        if self._bots_collection is None:
+            from database import bots_collection, system_modes_collection
+            self._bots_collection = bots_collection
+            self._modes_collection = system_modes_collection
+        if self._staggerer is None:
+            from engines.trade_staggerer import trade_staggerer
+            self._staggerer = trade_staggerer
+        return self._bots_collection, self._modes_collection, self._staggerer
+
+    # ------------------------------------------------------------------
+    # Schedule
+    # ------------------------------------------------------------------
+
+    def schedule(self, bot_id: str, delay: float = 0.0):
+        """(Re)schedule a bot; an older heap entry for it becomes stale"""
+        self._seq += 1
+        self._scheduled[bot_id] = self._seq
+        heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, bot_id))
+        self._wake.set()
+
+    def _pop_due(self, now: float) -> List[str]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, bot_id = heapq.heappop(self._heap)
+            if self._scheduled.get(bot_id) == seq:
+                del self._scheduled[bot_id]
+                due.append(bot_id)
+        return due
+
+    def _set_bots(self, bots: Dict[str, dict], user_id: str = None):
+        """Replace the known bots (all, or one user's); new bots are due now"""
+        known = [b for b, bot in self.bots.items() if user_id is None or bot.get('user_id') == user_id]
+        for bot_id in known:
+            if bot_id not in bots:
+                del self.bots[bot_id]
+                self._scheduled.pop(bot_id, None)
+        for bot_id, bot in bots.items():
+            is_new = bot_id not in self.bots
+            self.bots[bot_id] = bot
+            if is_new and bot_id not in self._running:
+                self.schedule(bot_id)
+
+    async def resync(self):
+        """Full reload of active bots and their owners' modes"""
+        bots_collection, modes_collection, _ = self._deps()
+        active_bots = await bots_collection.find({"status": "active"}, {"_id": 0}).to_list(None)
+        user_ids = list({b['user_id'] for b in active_bots})
+        modes = await modes_collection.find(
+            {"user_id": {"$in": user_ids}}, {"_id": 0}
+        ).to_list(None) if user_ids else []
+        enabled = {m['user_id'] for m in modes if trading_enabled(m)}
+        self._set_bots({b['id']: b for b in active_bots if b['user_id'] in enabled})
+
+        # Bots left waiting on an exchange slot that never freed get another try
+        self._waiting.clear()
+        for bot_id in self.bots:
+            if bot_id not in self._scheduled and bot_id not in self._running:
+                self.schedule(bot_id)
+        self.stats["resyncs"] += 1
+
+    async def reload_user(self, user_id: str):
+        """Reload one user's bots and mode after a change event"""
+        bots_collection, modes_collection, _ = self._deps()
+        modes = await modes_collection.find_one({"user_id": user_id}, {"_id": 0})
+        bots = []
+        if trading_enabled(modes):
+            bots = await bots_collection.find(
+                {"user_id": user_id, "status": "active"}, {"_id": 0}
+            ).to_list(None)
+        self._set_bots({b['id']: b for b in bots}, user_id=user_id)
+
+    async def _on_event(self, doc: dict):
+        self.stats["events"] += 1
+        if self.on_change:
+            self.on_change(doc.get("user_id"))
+        if doc.get("user_id"):
+            await self.reload_user(doc["user_id"])
+        else:
+            await self.resync()
+
+    async def notify_changed(self, user_id: str = None):
+        """Bots or system modes changed (user_id=None: all users) - wake the dispatcher"""
+        await self.events.publish({"type": "bots_changed"}, user_id)
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+
+    async def _dispatch(self, bot_id: str):
+        """Start a due bot's trade if its exchange has a free slot"""
+        bot = self.bots.get(bot_id)
+        if not bot or bot_id in self._running:
+            return
+        _, _, staggerer = self._deps()
+        exchange = bot.get('exchange', 'binance')
+        delay = staggerer.next_slot_delay(exchange)
+        if delay is None:
+            self._waiting.setdefault(exchange, deque()).append(bot_id)
+            return
+        if delay > 0:
+            self.schedule(bot_id, delay)
+            return
+        await staggerer.register_trade_start(bot_id, exchange)
+        self.stats["dispatched"] += 1
+        self._running[bot_id] = asyncio.create_task(self._run_trade(bot_id, exchange))
+
+    async def _still_eligible(self, bot_id: str) -> Optional[dict]:
+        """Fresh bot + mode read right before trading (pauses/emergency stops apply at once)"""
+        bots_collection, modes_collection, _ = self._deps()
+        bot = await bots_collection.find_one({"id": bot_id, "status": "active"}, {"_id": 0})
+        if not bot:
+            return None
+        modes = await modes_collection.find_one({"user_id": bot['user_id']}, {"_id": 0})
+        return bot if trading_enabled(modes) else None
+
+    async def _run_trade(self, bot_id: str, exchange: str):
+        _, _, staggerer = self._deps()
+        try:
+            bot = await self._still_eligible(bot_id)
+            if bot is None:
+                self.bots.pop(bot_id, None)
+                self.stats["skipped"] += 1
+                return
+            self.bots[bot_id] = bot
+            await self.execute(bot)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Trade execution error for {bot_id[:8]}: {e}")
+        finally:
+            await staggerer.register_trade_complete(bot_id, exchange)
+            self._running.pop(bot_id, None)
+            self.stats["completed"] += 1
+            if bot_id in self.bots and bot_id not in self._scheduled:
+                self.schedule(bot_id, self.bot_cooldown)
+            waiting = self._waiting.get(exchange)
+            while waiting:
+                next_bot = waiting.popleft()
+                if next_bot in self.bots:
+                    self.schedule(next_bot)  # Freed slot goes to the longest waiting bot
+                    break
+            self._wake.set()
+
+    async def run(self):
+        """Main dispatch loop - sleeps until the next bot is due or an event arrives"""
+        await self.events.start()
+        next_resync = 0.0
+
+        while self.is_running:
+            try:
+                now = time.monotonic()
+                if now >= next_resync:
+                    await self.resync()
+                    await self._deps()[2].clear_stale_trades()
+                    next_resync = now + self.resync_interval
+
+                for bot_id in self._pop_due(now):
+                    await self._dispatch(bot_id)
+
+                self._wake.clear()
+                next_due = self._heap[0][0] if self._heap else float('inf')
+                timeout = min(next_due, next_resync) - time.monotonic()
+                if timeout > 0:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Trade dispatch error: {e}")
+                await asyncio.sleep(1)
+
+    def start(self):
+        if not self.is_running:
+            self.is_running = True
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        self.is_running = False
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        for task in list(self._running.values()):
+            task.cancel()
+        self.events.is_running = False
+        if self.events.task:
+            self.events.task.cancel()
+            self.events.task = None
+        self.bots.clear()
+        self._heap.clear()
+        self._scheduled.clear()
+        self._waiting.clear()
+
+    def get_status(self) -> dict:
+        return {
+            "running": self.is_running,
+            "bots": len(self.bots),
+            "scheduled": len(self._scheduled),
+            "in_flight": len(self._running),
+            "waiting_on_exchange": {ex: len(q) for ex, q in self._waiting.items() if q},
+            **self.stats
+        }
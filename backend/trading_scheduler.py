@@ -1,6 +1,6 @@
 """
-Trading Scheduler - CONTINUOUS STAGGERED TRADING
-Uses trade_staggerer for 24/7 distributed execution
+Trading Scheduler - CONTINUOUS EVENT-DRIVEN TRADING
+Uses trade_dispatcher: bots trade when due, woken by bot/mode change events
 Actually uses live_trading_engine for live bots
 """
 
@@ -9,123 +9,61 @@ import logging
 from datetime import datetime, timezone
 from paper_trading_engine import paper_engine
 from engines.trading_engine_live import live_trading_engine
-from engines.trade_staggerer import trade_staggerer
-from database import bots_collection, trades_collection, system_modes_collection
-from websocket_manager import manager
+from database import bots_collection, trades_collection
+from realtime_events import rt_events
+from trade_dispatcher import TradeDispatcher
+from portfolio_summary import portfolio_summary
+from pnl_rollups import pnl_rollups
+from performance_ranker import performance_ranker
+from risk_engine import risk_engine
 
 logger = logging.getLogger(__name__)
 
 class TradingScheduler:
-    """CONTINUOUS STAGGERED TRADING - Uses trade_staggerer for 24/7 execution"""
+    """EVENT-DRIVEN DISPATCH - trade_dispatcher decides when each bot trades"""
     
     def __init__(self):
-        self.is_running = False
-        self.task = None
-        self.check_interval = 10  # Check every 10 seconds for ready trades
+        self.dispatcher = TradeDispatcher(execute=self.execute_trade, on_change=risk_engine.invalidate)
+    
+    @property
+    def is_running(self) -> bool:
+        return self.dispatcher.is_running
+    
+    async def notify_changed(self, user_id: str = None):
+        """Bots or system modes changed - wake the dispatcher (in whichever process runs it)"""
+        await self.dispatcher.notify_changed(user_id)
+    
+    async def execute_trade(self, bot: dict):
+        """Execute one trade for a bot based on its mode"""
+        # Check both 'mode' and 'trading_mode' for backwards compatibility
+        mode = bot.get('mode') or bot.get('trading_mode', 'paper')
+        is_paper_mode = mode == 'paper'
         
-    async def execute_bot_trades(self):
-        """Execute trades using staggered queue - CONTINUOUS OPERATION"""
-        try:
-            # Get all active bots
-            active_bots = await bots_collection.find(
-                {"status": "active"},
-                {"_id": 0}
-            ).to_list(1000)
-            
-            if not active_bots:
-                return
-            
-            # Check each user's System Mode settings
-            users_with_trading = {}
-            for bot in active_bots:
-                user_id = bot['user_id']
-                if user_id not in users_with_trading:
-                    modes = await system_modes_collection.find_one({"user_id": user_id}, {"_id": 0})
-                    
-                    # Trading enabled if autopilot is ON
-                    if modes and modes.get('autopilot'):
-                        # Check emergency stop
-                        if not modes.get('emergencyStop', False):
-                            users_with_trading[user_id] = True
-                        else:
-                            users_with_trading[user_id] = False
-                    else:
-                        users_with_trading[user_id] = False
-            
-            # Filter bots with trading enabled
-            active_bots = [bot for bot in active_bots if users_with_trading.get(bot['user_id'], False)]
-            
-            if not active_bots:
-                return
-            
-            # Process ready trades from queue
-            for _ in range(5):  # Process up to 5 trades per cycle
-                trade_request = await trade_staggerer.get_next_trade()
-                
-                if not trade_request:
-                    break
-                
-                bot_id = trade_request['bot_id']
-                bot = next((b for b in active_bots if b['id'] == bot_id), None)
-                
-                if not bot:
-                    continue
-                
-                # Execute trade based on mode
-                try:
-                    # Check both 'mode' and 'trading_mode' for backwards compatibility
-                    mode = bot.get('mode') or bot.get('trading_mode', 'paper')
-                    is_paper_mode = mode == 'paper'
-                    
-                    # Register trade start
-                    await trade_staggerer.register_trade_start(bot_id, bot.get('exchange'))
-                    
-                    if is_paper_mode:
-                        # Paper trading
-                        result = await paper_engine.run_trading_cycle(
-                            bot['id'],
-                            bot,
-                            {'bots': bots_collection, 'trades': trades_collection}
-                        )
-                    else:
-                        # LIVE TRADING - Use live_trading_engine
-                        logger.info(f"🔴 LIVE TRADING: {bot['name']} on {bot.get('exchange')}")
-                        
-                        # Execute live trade
-                        result = await self.execute_live_trade(bot)
-                    
-                    # Register trade complete
-                    await trade_staggerer.register_trade_complete(bot_id, bot.get('exchange'))
-                    
-                    # Send WebSocket update
-                    if result and isinstance(result, dict):
-                        await manager.send_message(bot['user_id'], {
-                            "type": "trade_executed",
-                            "bot_id": result['bot_id'],
-                            "bot_name": bot['name'],
-                            "new_capital": result.get('new_capital', 0),
-                            "total_profit": result.get('total_profit', 0),
-                            "trade": result.get('trade', {})
-                        })
-                    
-                except Exception as e:
-                    logger.error(f"Trade execution error for {bot['name']}: {e}")
-                    await trade_staggerer.register_trade_complete(bot_id, bot.get('exchange'))
+        if is_paper_mode:
+            # Paper trading
+            result = await paper_engine.run_trading_cycle(
+                bot['id'],
+                bot,
+                {'bots': bots_collection, 'trades': trades_collection}
+            )
+        else:
+            # LIVE TRADING - Use live_trading_engine
+            logger.info(f"🔴 LIVE TRADING: {bot['name']} on {bot.get('exchange')}")
             
-            # Add new trades to queue
-            for bot in active_bots:
-                bot_id = bot['id']
-                exchange = bot.get('exchange', 'binance')
-                
-                # Check if bot can trade
-                can_execute, reason = await trade_staggerer.can_execute_now(bot_id, exchange)
-                
-                if can_execute:
-                    # Add to queue
-                    await trade_staggerer.add_to_queue(bot_id, exchange, priority=0)
+            # Execute live trade
+            result = await self.execute_live_trade(bot)
         
-        except Exception as e:
-            logger.error(f"Trading cycle error: {e}")
+        # Send WebSocket update
+        if result and isinstance(result, dict):
+            await rt_events.emit(bot['user_id'], {
+                "type": "trade_executed",
+                "bot_id": result['bot_id'],
+                "bot_name": bot['name'],
+                "new_capital": result.get('new_capital', 0),
+                "total_profit": result.get('total_profit', 0),
+                "trade": result.get('trade', {})
+            })
+        return result
     
     async def execute_live_trade(self, bot: dict) -> dict:
         """Execute a live trade using live_trading_engine"""
@@ -197,11 +135,14 @@ class TradingScheduler:
                 "amount": trade_result.get('amount', 0),
                 "profit_loss": trade_result.get('net_profit', 0),
                 "is_paper": False,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": datetime.now(timezone.utc),
                 "exchange": exchange
             }
             
             await trades_collection.insert_one(trade_doc)
+            await portfolio_summary.record_trade(trade_doc)
+            await pnl_rollups.record_trade(trade_doc)
+            performance_ranker.invalidate(trade_doc.get('user_id'))
             
             # Update bot stats
             new_capital = capital + trade_result.get('net_profit', 0)
@@ -234,37 +175,19 @@ class TradingScheduler:
             logger.error(f"Execute live trade error: {e}")
             return None
     
-    async def trading_loop(self):
-        """Main trading loop - runs continuously"""
-        logger.info("🚀 Continuous staggered trading started")
-        
-        while self.is_running:
-            try:
-                await self.execute_bot_trades()
-                
-                # Clean up stale trades periodically
-                await trade_staggerer.clear_stale_trades()
-                
-                # Wait before next check
-                await asyncio.sleep(self.check_interval)
-                
-            except Exception as e:
-                logger.error(f"Trading loop error: {e}")
-                await asyncio.sleep(self.check_interval)
-    
     def start(self):
         """Start the trading scheduler"""
         if not self.is_running:
-            self.is_running = True
-            self.task = asyncio.create_task(self.trading_loop())
-            logger.info("✅ Trading scheduler started - continuous staggered execution")
+            self.dispatcher.start()
+            logger.info("✅ Trading scheduler started - event-driven dispatch")
     
     def stop(self):
         """Stop the trading scheduler"""
-        self.is_running = False
-        if self.task:
-            self.task.cancel()
+        self.dispatcher.stop()
         logger.info("🔴 Trading scheduler stopped")
+    
+    def get_status(self) -> dict:
+        return self.dispatcher.get_status()
 
 # Global instance
 trading_scheduler = TradingScheduler()
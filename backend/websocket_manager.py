@@ -1,128 +1,379 @@
 """
 WebSocket Manager for Real-Time Updates
 Handles WebSocket connections and broadcasts
+- Each message is serialized once per broadcast and queued on every target socket
+- Every socket has a bounded send queue drained by its own writer task, so a slow
+  client never delays the others (a send in flight past WS_SEND_TIMEOUT_SECONDS
+  is caught by the heartbeat loop rather than a timer per send)
+- Queued "latest value wins" messages (refresh, profit, mode, ping) are coalesced;
+  a socket whose queue still overflows, or whose send stalls, is dropped
+- Liveness: any frame from the client (its pings or our pong replies) counts;
+  sockets silent for a ping interval plus the pong timeout are closed
+- Event frames (event_coalescer) are expanded into single messages for plain
+  clients; clients that negotiate the amarktai.frames.json / .msgpack subprotocol
+  get the frame with a JSON-patch delta of the dashboard state instead
+  (permessage-deflate is negotiated by uvicorn for every client)
 """
 import asyncio
+import copy
+import time
+from collections import deque
 from fastapi import WebSocket
-from typing import Dict, Set
+from typing import Dict, List, Optional, Set
 import json
 import logging
 from datetime import datetime, timezone
+from config import (
+    WS_SEND_QUEUE_MAX, WS_SEND_TIMEOUT_SECONDS, WS_PING_INTERVAL_SECONDS, WS_PONG_TIMEOUT_SECONDS
+)
+from event_coalescer import fold_state, json_patch
+from time_utils import json_default
+
+try:
+    import msgpack
+except ImportError:  # Optional: binary frames for clients that ask for them
+    msgpack = None
 
 logger = logging.getLogger(__name__)
 
+SUBPROTOCOLS = {"amarktai.frames.msgpack": "msgpack", "amarktai.frames.json": "json"}
+
+
+def negotiate_subprotocol(requested: List[str]) -> Optional[str]:
+    """First frame subprotocol the client offers that this server can speak"""
+    for name in requested or []:
+        encoding = SUBPROTOCOLS.get(name)
+        if encoding == "json" or (encoding == "msgpack" and msgpack is not None):
+            return name
+    return None
+
+
+def coalesce_key(message: dict) -> Optional[tuple]:
+    """Messages where only the newest queued copy matters share a key"""
+    kind = message.get("type")
+    if kind in ("force_refresh", "countdown_update", "ping"):
+        return (kind,)
+    if kind == "profit_updated":
+        return (kind, message.get("bot_name"))
+    if kind == "system_mode_update":
+        return (kind, message.get("mode"))
+    return None
+
+
+class ClientConnection:
+    """One socket: bounded send queue drained by its own writer task"""
+
+    def __init__(self, websocket: WebSocket, user_id: str, max_queue: int = WS_SEND_QUEUE_MAX):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.max_queue = max_queue
+        self.queue: deque = deque()  # [key, payload] entries (str or bytes)
+        self.keyed: Dict[tuple, list] = {}  # coalesce key -> its queued entry
+        self.ready = asyncio.Event()
+        self.last_seen = time.monotonic()
+        self.sending_since: Optional[float] = None  # Set while a send is in flight
+        self.writer: Optional[asyncio.Task] = None
+        self.frames = False  # Negotiated frame subprotocol
+        self.encoding = "json"
+        self.state_version: Optional[int] = None  # Dashboard state version the client holds
+
+    def offer(self, payload: str, key: Optional[tuple] = None) -> Optional[bool]:
+        """Queue a payload: True queued, None coalesced into a queued copy, False overflow"""
+        if key is not None and key in self.keyed:
+            self.keyed[key][1] = payload
+            return None
+        if len(self.queue) >= self.max_queue:
+            return False
+        entry = [key, payload]
+        self.queue.append(entry)
+        if key is not None:
+            self.keyed[key] = entry
+        self.ready.set()
+        return True
+
+    def next_payload(self) -> Optional[str]:
+        if not self.queue:
+            self.ready.clear()
+            return None
+        key, payload = self.queue.popleft()
+        if key is not None:
+            self.keyed.pop(key, None)
+        return payload
+
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, Set[WebSocket]] = {}
-        self.ping_intervals: Dict[WebSocket, asyncio.Task] = {}
-        self.ping_interval = 30  # Ping every 30 seconds
-        self.pong_timeout = 10  # Wait 10 seconds for pong
-        
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.user_states: Dict[str, dict] = {}  # user_id -> {"v", "state"} for frame deltas
+        self.ping_interval = WS_PING_INTERVAL_SECONDS
+        self.pong_timeout = WS_PONG_TIMEOUT_SECONDS
+        self.send_timeout = WS_SEND_TIMEOUT_SECONDS
+        self.max_queue = WS_SEND_QUEUE_MAX
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.stats = {"broadcasts": 0, "sent": 0, "coalesced": 0, "evicted_slow": 0,
+                      "evicted_stale": 0, "send_errors": 0}
+
     async def connect(self, websocket: WebSocket, user_id: str):
         """Accept and register new WebSocket connection"""
-        await websocket.accept()
-        
+        subprotocol = negotiate_subprotocol(getattr(websocket, "scope", {}).get("subprotocols", []))
+        if subprotocol:
+            await websocket.accept(subprotocol=subprotocol)
+        else:
+            await websocket.accept()
+
         if user_id not in self.active_connections:
             self.active_connections[user_id] = set()
-        
+
         self.active_connections[user_id].add(websocket)
+        client = self._client(websocket, user_id)
+        if subprotocol:
+            client.frames, client.encoding = True, SUBPROTOCOLS[subprotocol]
+        from event_relay import event_relay
+        event_relay.subscribe(user_id)  # This worker now receives the user's channel
         logger.info(f"WebSocket connected for user {user_id}")
-        
-        # Start ping task
-        task = asyncio.create_task(self._ping_loop(websocket))
-        self.ping_intervals[websocket] = task
-        
+
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
         # Send initial connection message
         await self.send_personal_message({
             "type": "connection",
             "status": "Connected",
             "timestamp": datetime.now(timezone.utc).isoformat()
         }, websocket)
-        
-    async def disconnect(self, websocket: WebSocket, user_id: str):
-        """Remove WebSocket connection"""
-        if user_id in self.active_connections:
+
+    def _client(self, websocket: WebSocket, user_id: str) -> ClientConnection:
+        client = self.clients.get(websocket)
+        if client is None:
+            client = self.clients[websocket] = ClientConnection(websocket, user_id, self.max_queue)
+            client.writer = asyncio.create_task(self._writer(client))
+        return client
+
+    def _remove(self, websocket: WebSocket, user_id: str) -> bool:
+        """Unregister a socket; False if it was already gone"""
+        removed = False
+        if user_id in self.active_connections and websocket in self.active_connections[user_id]:
             self.active_connections[user_id].discard(websocket)
-            
+            from event_relay import event_relay
+            event_relay.unsubscribe(user_id)
+            removed = True
+
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
-        
-        # Cancel ping task
-        if websocket in self.ping_intervals:
-            self.ping_intervals[websocket].cancel()
-            del self.ping_intervals[websocket]
-            
-        logger.info(f"WebSocket disconnected for user {user_id}")
-        
-    async def send_personal_message(self, message: dict, websocket: WebSocket):
-        """Send message to specific WebSocket"""
+                self.user_states.pop(user_id, None)
+
+        # Stop the writer
+        client = self.clients.pop(websocket, None)
+        if client and client.writer and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+        return removed
+
+    async def disconnect(self, websocket: WebSocket, user_id: str):
+        """Remove WebSocket connection"""
+        if self._remove(websocket, user_id):
+            logger.info(f"WebSocket disconnected for user {user_id}")
+
+    def _evict(self, client: ClientConnection, reason: str, code: int = 1013):
+        """Drop a socket without waiting on it (the close runs in the background)"""
+        if not self._remove(client.websocket, client.user_id):
+            return
+        logger.warning(f"⚠️ Dropping WebSocket for user {client.user_id}: {reason}")
+
+        async def close():
+            try:
+                await asyncio.wait_for(client.websocket.close(code=code, reason=reason), timeout=self.send_timeout)
+            except Exception:
+                pass
+        asyncio.create_task(close())
+
+    async def _writer(self, client: ClientConnection):
+        """Drain one socket's queue (the heartbeat loop drops it if a send stalls)"""
         try:
-            await websocket.send_json(message)
+            while True:
+                await client.ready.wait()
+                payload = client.next_payload()
+                while payload is not None:
+                    client.sending_since = time.monotonic()
+                    if isinstance(payload, bytes):
+                        await client.websocket.send_bytes(payload)
+                    else:
+                        await client.websocket.send_text(payload)
+                    client.sending_since = None
+                    self.stats["sent"] += 1
+                    payload = client.next_payload()
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
-            logger.error(f"Failed to send message: {e}")
-            
+            self.stats["send_errors"] += 1
+            logger.debug(f"WebSocket send error: {e}")
+            self._remove(client.websocket, client.user_id)
+
+    def _offer(self, client: ClientConnection, payload, key: Optional[tuple]):
+        queued = client.offer(payload, key)
+        if queued is None:
+            self.stats["coalesced"] += 1
+        elif queued is False:
+            self.stats["evicted_slow"] += 1
+            self._evict(client, f"send queue overflow ({client.max_queue} messages)")
+
+    def _fanout(self, message: dict, targets: List[tuple]):
+        """Queue one message on every (websocket, user_id) target, encoded once per encoding"""
+        key = coalesce_key(message)
+        encoded = {}
+        for websocket, user_id in targets:
+            client = self._client(websocket, user_id)
+            if client.encoding not in encoded:
+                encoded[client.encoding] = self._encode(message, client.encoding)
+            self._offer(client, encoded[client.encoding], key)
+
+    def _fanout_frame(self, events: List[dict], user_id: str, targets: List[tuple]):
+        """Plain clients get each event; frame clients get a state delta plus the other events"""
+        clients = [self._client(ws, uid) for ws, uid in targets]
+        plain_targets = [(c.websocket, c.user_id) for c in clients if not c.frames]
+        for event in events:
+            if plain_targets:
+                self._fanout(event, plain_targets)
+
+        entry = self.user_states.setdefault(user_id, {"v": 0, "state": {}})
+        state = copy.deepcopy(entry["state"])
+        others = [event for event in events if not fold_state(state, event)]
+        patch = json_patch(entry["state"], state)
+        base = entry["v"]
+        if patch:
+            entry["v"], entry["state"] = base + 1, state
+
+        encoded = {}
+        for client in clients:
+            if not client.frames or (not patch and not others and client.state_version == entry["v"]):
+                continue
+            delta = client.state_version == base
+            variant = (delta, client.encoding)
+            if variant not in encoded:
+                frame = {"type": "frame", "v": entry["v"], "events": others}
+                if delta:
+                    frame.update(base=base, patch=patch)
+                else:
+                    frame["state"] = entry["state"]
+                encoded[variant] = self._encode(frame, client.encoding)
+            self._offer(client, encoded[variant], None)
+            client.state_version = entry["v"]
+
+    @staticmethod
+    def _serialize(message: dict) -> str:
+        return json.dumps(message, default=json_default)  # Trades/alerts carry BSON dates
+
+    def _encode(self, message: dict, encoding: str):
+        if encoding == "msgpack":
+            return msgpack.packb(message, default=json_default, use_bin_type=True)
+        return self._serialize(message)
+
+    async def send_personal_message(self, message: dict, websocket: WebSocket):
+        """Send message to specific WebSocket"""
+        client = self.clients.get(websocket)
+        if client is None:
+            logger.error("Failed to send message: socket not registered")
+            return
+        self._fanout(message, [(websocket, client.user_id)])
+
     async def send_message(self, user_id: str, message: dict):
         """Send message to all connections of a user (alias for broadcast_to_user)"""
         await self.broadcast_to_user(message, user_id)
-    
+
     async def broadcast_to_user(self, message: dict, user_id: str):
-        """Broadcast message to all connections of a specific user"""
-        if user_id in self.active_connections:
-            disconnected = set()
-            
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_json(message)
-                except Exception as e:
-                    logger.error(f"Broadcast error: {e}")
-                    disconnected.add(connection)
-            
-            # Clean up disconnected sockets
-            for ws in disconnected:
-                await self.disconnect(ws, user_id)
-                
+        """Broadcast message to all connections of a specific user, on any worker"""
+        from event_relay import event_relay
+        if event_relay.is_publisher or event_relay.is_running:
+            # Every worker (this one included) delivers from the relay to its own sockets
+            if await event_relay.publish(message, user_id) or event_relay.is_publisher:
+                return
+        await self.deliver_local(message, user_id)  # Relay not running or publish failed
+
     async def broadcast_to_all(self, message: dict):
-        """Broadcast message to all connected users"""
-        for user_id in list(self.active_connections.keys()):
-            await self.broadcast_to_user(message, user_id)
-            
-    async def _ping_loop(self, websocket: WebSocket):
-        """Send periodic pings and wait for pongs to keep connection alive"""
+        """Broadcast message to all connected users, on every worker"""
+        from event_relay import event_relay
+        if event_relay.is_publisher or event_relay.is_running:
+            if await event_relay.publish(message) or event_relay.is_publisher:
+                return
+        await self.deliver_local_all(message)
+
+    async def deliver_local(self, message: dict, user_id: str):
+        """Queue a message on this process's connections of a user"""
+        sockets = self.active_connections.get(user_id)
+        if sockets:
+            self.stats["broadcasts"] += 1
+            targets = [(ws, user_id) for ws in list(sockets)]
+            if message.get("type") == "frame":
+                self._fanout_frame(message.get("events", []), user_id, targets)
+            else:
+                self._fanout(message, targets)
+
+    async def deliver_local_all(self, message: dict):
+        """Queue a message on every connection in this process (encoded once)"""
+        if message.get("type") == "frame":
+            for user_id in list(self.active_connections):
+                await self.deliver_local(message, user_id)
+            return
+        targets = [(ws, user_id) for user_id, sockets in self.active_connections.items() for ws in sockets]
+        if targets:
+            self.stats["broadcasts"] += 1
+            self._fanout(message, targets)
+
+    async def handle_client_message(self, websocket: WebSocket, data: str):
+        """Inbound frame: marks the socket alive and answers client pings"""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        client.last_seen = time.monotonic()
         try:
-            while True:
-                await asyncio.sleep(self.ping_interval)
-                
-                # Send ping
-                try:
-                    await websocket.send_json({
-                        "type": "ping",
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    })
-                    
-                    # Wait for pong (frontend should respond with pong)
-                    # If no pong within timeout, connection is stale
-                    try:
-                        await asyncio.wait_for(
-                            self._wait_for_pong(websocket),
-                            timeout=self.pong_timeout
-                        )
-                    except asyncio.TimeoutError:
-                        logger.warning("Pong timeout - connection may be stale")
-                        # Continue anyway, let disconnect handle cleanup
-                        
-                except Exception as e:
-                    logger.debug(f"Ping send error: {e}")
-                    break
-                    
+            msg = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if isinstance(msg, dict) and msg.get('type') == 'ping':
+            self._fanout({'type': 'pong', 'timestamp': msg.get('timestamp')}, [(websocket, client.user_id)])
+
+    async def _heartbeat_loop(self):
+        """Ping every socket each interval; close silent sockets and stalled sends"""
+        try:
+            next_ping = time.monotonic() + self.ping_interval
+            while self.clients:
+                await asyncio.sleep(min(self.ping_interval, self.send_timeout) / 2)
+                now = time.monotonic()
+                ping_due = now >= next_ping
+                alive = []
+                for client in list(self.clients.values()):
+                    if client.sending_since is not None and now - client.sending_since > self.send_timeout:
+                        self.stats["evicted_slow"] += 1
+                        self._evict(client, f"send stalled for {self.send_timeout:.0f}s")
+                    elif ping_due and now - client.last_seen > self.ping_interval + self.pong_timeout:
+                        self.stats["evicted_stale"] += 1
+                        self._evict(client, "no pong", code=1001)
+                    elif ping_due:
+                        alive.append((client.websocket, client.user_id))
+                if ping_due:
+                    ping = {"type": "ping", "timestamp": datetime.now(timezone.utc).isoformat()}
+                    self._fanout(ping, alive)
+                    next_ping = now + self.ping_interval
         except asyncio.CancelledError:
             pass
         except Exception as e:
             logger.error(f"Ping loop error: {e}")
-    
-    async def _wait_for_pong(self, websocket: WebSocket):
-        """Wait for pong message (handled by frontend)"""
-        # This is a placeholder - actual pong handling is in the websocket endpoint
-        await asyncio.sleep(0.1)
+
+    async def flush(self, timeout: float = 5.0):
+        """Wait until every send queue is empty (tests, graceful shutdown)"""
+        deadline = time.monotonic() + timeout
+        while any(c.queue for c in self.clients.values()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0)  # Let writers finish their in-flight send
+
+    def get_stats(self) -> dict:
+        depths = [len(c.queue) for c in self.clients.values()]
+        return {
+            "connections": len(self.clients),
+            "users": len(self.active_connections),
+            "max_queue_depth": max(depths, default=0),
+            **self.stats
+        }
 
 # Global instance
 manager = ConnectionManager()
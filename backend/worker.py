@@ -0,0 +1,82 @@
+"""
+Trading Worker - runs the background engines outside the API server
+- Trading scheduler, paper/live trading, risk management, autopilots, AI scheduler
+- Own event loop and market-data hub, so slow CCXT calls never delay HTTP/WebSocket traffic
+- Dashboard events reach the API processes through the event relay (capped collection)
+- Engine state changes from the API (bot pause, system modes, emergency stop) already
+  go through MongoDB, which the engines read on every cycle
+- Several workers may run for hot standby; the leader lease keeps one active
+
+Usage:
+    python -m backend.worker      (from the repository root)
+    python worker.py              (from backend/)
+
+Set BACKGROUND_ENGINES_IN_API=false for the API so it no longer starts the engines.
+"""
+
+import asyncio
+import os
+import signal
+import sys
+import logging
+
+# Modules in backend/ use flat imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import LEADER_ELECTION_ENABLED
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("worker")
+
+
+async def run_worker():
+    """Start the engines, block until SIGINT/SIGTERM, then shut down cleanly"""
+    from database import init_db, close_db
+    from event_relay import event_relay
+    from event_coalescer import event_coalescer
+    from market_data_hub import market_data_hub
+    from market_stream import market_stream
+    from background_engines import background_engines
+    from leader_election import leader_election
+
+    logger.info(f"🚀 Starting Amarktai trading worker (pid {os.getpid()})...")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    # Registered indexes and relay collections, even if no API process has run yet
+    await init_db()
+
+    # Dashboard events go to the API processes
+    await event_relay.start_publisher()
+
+    # Engines read prices from this process's hub
+    await market_data_hub.start()
+    await market_stream.start()
+
+    if LEADER_ELECTION_ENABLED:
+        await leader_election.start(on_elected=background_engines.start, on_demoted=background_engines.stop)
+    else:
+        await background_engines.start()
+
+    logger.info("🚀 Trading worker operational")
+    await stop_event.wait()
+
+    # Shutdown
+    logger.info("Trading worker shutting down...")
+    if LEADER_ELECTION_ENABLED:
+        await leader_election.stop()  # Stops engines and releases the lease
+    else:
+        await background_engines.stop()
+    await market_stream.stop()
+    await market_data_hub.stop()
+    await event_coalescer.flush()  # Last event frames out before the relay closes
+    await event_relay.stop()
+    await close_db()
+    logger.info("🔴 Trading worker stopped")
+
+
+if __name__ == '__main__':
+    asyncio.run(run_worker())
@@ -0,0 +1,223 @@
+"""
+Write-Behind Batcher - coalesced trade inserts and bot capital deltas
+- Trades buffer into one insert_many, bot updates into one bulk_write per flush
+- Flushes every WRITE_BEHIND_FLUSH_MS or as soon as WRITE_BEHIND_MAX_OPS are pending
+- Per-bot order is kept: deltas for a bot merge while they do not touch the same
+  field with $set and $inc, and are written in arrival order; trades are inserted
+  before the bot updates of the same flush
+- stop() drains everything with a journaled write concern (shutdown fsync path)
+- Retries are idempotent: each bot delta carries an op id the bot document
+  remembers, and requeued trades keep the _id insert_many gave them
+- Without a running flusher every write goes straight through
+"""
+
+import asyncio
+import uuid
+from typing import Dict, List, Optional
+import logging
+
+from config import WRITE_BEHIND_FLUSH_MS, WRITE_BEHIND_MAX_OPS
+
+logger = logging.getLogger(__name__)
+
+APPLIED_OPS_KEPT = 50  # Op ids remembered per bot; a retry comes within a flush or two
+
+
+class WriteBehind:
+    def __init__(self, trades=None, bots=None, flush_ms: float = WRITE_BEHIND_FLUSH_MS,
+                 max_ops: int = WRITE_BEHIND_MAX_OPS):
+        self._trades = trades
+        self._bots = bots
+        self.flush_interval = flush_ms / 1000
+        self.max_ops = max_ops
+        self.is_running = False
+        self.task = None
+
+        self._trade_docs: List[Dict] = []
+        self._bot_deltas: Dict[str, List[Dict]] = {}  # bot_id -> [{"$inc", "$set", "op"}] in order
+        self._inflight_deltas: Dict[str, List[Dict]] = {}  # Taken by a flush whose write has not returned
+        self._pending_ops = 0
+        self._flush_lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self.stats = {"flushes": 0, "trades_written": 0, "bot_updates": 0, "errors": 0, "largest_flush": 0}
+
+    def _collections(self):
+        if self._trades is None:
+            from database import trades_collection, bots_collection
+            self._trades = trades_collection
+            self._bots = bots_collection
+        return self._trades, self._bots
+
+    async def _queued(self):
+        self._pending_ops += 1
+        if not self.is_running:
+            await self.flush()  # Write-through
+        elif self._pending_ops >= self.max_ops:
+            self._full.set()
+
+    async def insert_trade(self, trade_doc: Dict):
+        """Queue a trade insert"""
+        self._trade_docs.append(trade_doc)
+        await self._queued()
+
+    async def update_bot(self, bot_id: str, inc: Optional[Dict] = None, set_fields: Optional[Dict] = None):
+        """Queue a bot update; $inc deltas for the same bot accumulate until flushed"""
+        inc, set_fields = inc or {}, set_fields or {}
+        deltas = self._bot_deltas.setdefault(bot_id, [])
+        last = deltas[-1] if deltas else None
+        conflict = last is not None and (
+            last["sent"] or set(inc) & set(last["$set"]) or set(set_fields) & set(last["$inc"])
+        )
+        if last is None or conflict:
+            last = {"$inc": {}, "$set": {}, "op": uuid.uuid4().hex, "sent": False}
+            deltas.append(last)
+        for field, value in inc.items():
+            last["$inc"][field] = last["$inc"].get(field, 0) + value
+        last["$set"].update(set_fields)
+        await self._queued()
+
+    def pending_inc(self, bot_id: str, field: str) -> float:
+        """Unwritten $inc total for a bot field (read-your-writes on top of a DB read)
+
+        Includes deltas a flush is writing right now: they stay visible until the
+        write returns (and are requeued if it fails).
+        """
+        deltas = self._inflight_deltas.get(bot_id, []) + self._bot_deltas.get(bot_id, [])
+        return sum(d["$inc"].get(field, 0) for d in deltas)
+
+    @staticmethod
+    def _bot_update(bot_id: str, delta: Dict):
+        """Update that applies a delta once, however often it is sent"""
+        from pymongo import UpdateOne
+        update = {k: delta[k] for k in ("$inc", "$set") if delta[k]}
+        update["$push"] = {"applied_ops": {"$each": [delta["op"]], "$slice": -APPLIED_OPS_KEPT}}
+        return UpdateOne({"id": bot_id, "applied_ops": {"$ne": delta["op"]}}, update)
+
+    async def _insert_trades(self, trades, docs: List[Dict]) -> int:
+        """Insert trades unordered; returns how many landed
+
+        Requeued docs already carry their _id: those written before a lost reply are
+        skipped. Docs the server rejects (duplicates, validation) are dropped.
+        """
+        from pymongo.errors import BulkWriteError
+        retried = [d["_id"] for d in docs if "_id" in d]
+        if retried:
+            landed = await trades.find({"_id": {"$in": retried}}, {"_id": 1}).to_list(None)
+            landed = {d["_id"] for d in landed}
+            docs = [d for d in docs if d.get("_id") not in landed]
+        if not docs:
+            return 0
+        try:
+            await trades.insert_many(docs, ordered=False)
+            return len(docs)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            self.stats["errors"] += 1
+            logger.error(f"Write-behind dropped {len(errors)} rejected trades: {errors[0].get('errmsg') if errors else e}")
+            return len(docs) - len(errors)
+
+    def _requeue(self, trade_docs: List[Dict], bot_ops: List[tuple]):
+        """Put unwritten work back ahead of anything queued since"""
+        self._trade_docs[:0] = trade_docs
+        requeued: Dict[str, List[Dict]] = {}
+        for bot_id, delta in bot_ops:
+            requeued.setdefault(bot_id, []).append(delta)
+        for bot_id, deltas in self._bot_deltas.items():
+            requeued.setdefault(bot_id, []).extend(deltas)
+        self._bot_deltas = requeued
+        self._pending_ops += len(trade_docs) + len(bot_ops)
+
+    async def flush(self, journaled: bool = False) -> int:
+        """Write everything pending; returns the number of operations written"""
+        async with self._flush_lock:
+            trade_docs, bot_deltas = self._trade_docs, self._bot_deltas
+            self._trade_docs, self._bot_deltas, self._pending_ops = [], {}, 0
+            bot_ops = [(bot_id, d) for bot_id, deltas in bot_deltas.items() for d in deltas]
+            if not trade_docs and not bot_ops:
+                return 0
+            self._inflight_deltas = bot_deltas
+            for _, delta in bot_ops:
+                delta["sent"] = True  # Later updates start a new delta (this op may already be applied)
+
+            from pymongo import WriteConcern
+            from pymongo.errors import BulkWriteError
+            trades, bots = self._collections()
+            if journaled:
+                trades = trades.with_options(write_concern=WriteConcern(j=True))
+                bots = bots.with_options(write_concern=WriteConcern(j=True))
+
+            written = 0
+            try:
+                if trade_docs:
+                    inserted = await self._insert_trades(trades, trade_docs)
+                    written += inserted
+                    self.stats["trades_written"] += inserted
+                    trade_docs = []
+                if bot_ops:
+                    await bots.bulk_write([self._bot_update(bot_id, delta) for bot_id, delta in bot_ops], ordered=True)
+                    written += len(bot_ops)
+                    self.stats["bot_updates"] += len(bot_ops)
+                    bot_ops = []
+            except BulkWriteError as e:
+                # Ordered bot updates stop at the first error; everything before it landed
+                failed_at = e.details.get("writeErrors", [{}])[0].get("index", 0)
+                bot_ops = bot_ops[failed_at + 1:]  # Failed update is dropped
+                self.stats["errors"] += 1
+                logger.error(f"Write-behind flush error at op {failed_at}: {e.details.get('writeErrors', [{}])[0].get('errmsg')}")
+                self._requeue(trade_docs, bot_ops)
+            except Exception as e:
+                # Timeout / dropped connection: the write may have landed, the retry is idempotent
+                self.stats["errors"] += 1
+                logger.error(f"Write-behind flush failed, retrying next flush: {e}")
+                self._requeue(trade_docs, bot_ops)
+            finally:
+                self._inflight_deltas = {}  # Written, or back in _bot_deltas
+
+            self.stats["flushes"] += 1
+            self.stats["largest_flush"] = max(self.stats["largest_flush"], written)
+            return written
+
+    async def _flush_loop(self):
+        while self.is_running:
+            try:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._full.clear()
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Write-behind loop error: {e}")
+                await asyncio.sleep(self.flush_interval)
+
+    async def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.task = asyncio.create_task(self._flush_loop())
+        logger.info(f"🗂️ Write-behind batching started ({self.flush_interval * 1000:.0f}ms / {self.max_ops} ops)")
+
+    async def stop(self):
+        """Stop batching and drain pending writes to the journal"""
+        self.is_running = False
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        written = await self.flush(journaled=True)
+        if self._pending_ops:
+            written += await self.flush(journaled=True)  # One retry for requeued work
+        logger.info(f"🗂️ Write-behind drained {written} pending writes")
+
+    def get_status(self) -> Dict:
+        return {
+            "running": self.is_running,
+            "pending_trades": len(self._trade_docs),
+            "pending_bot_updates": sum(len(d) for d in self._bot_deltas.values()),
+            **self.stats
+        }
+
+
+# Global instance
+write_behind = WriteBehind()
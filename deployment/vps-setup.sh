@@ -112,10 +112,11 @@ echo -e "${GREEN}✅ Frontend build complete${NC}"
 echo ""
 echo "🔧 Setting up systemd service..."
 cp /var/amarktai/deployment/amarktai-api.service /etc/systemd/system/
+cp /var/amarktai/deployment/amarktai-worker.service /etc/systemd/system/
 systemctl daemon-reload
-systemctl enable amarktai-api
-systemctl start amarktai-api
-echo -e "${GREEN}✅ API service started${NC}"
+systemctl enable amarktai-api amarktai-worker
+systemctl start amarktai-api amarktai-worker
+echo -e "${GREEN}✅ API and trading worker services started${NC}"
 
 # 10. Setup Nginx
 echo ""
@@ -156,6 +157,8 @@ echo "📊 Checking service status..."
 echo ""
 systemctl status amarktai-api --no-pager
 echo ""
+systemctl status amarktai-worker --no-pager
+echo ""
 systemctl status mongodb --no-pager
 echo ""
 systemctl status nginx --no-pager
@@ -167,7 +170,7 @@ echo "Next steps:"
 echo "1. Edit /var/amarktai/backend/.env with your API keys"
 echo "2. Edit /etc/nginx/sites-available/amarktai with your domain/IP"
 echo "3. Restart services:"
-echo "   sudo systemctl restart amarktai-api"
+echo "   sudo systemctl restart amarktai-api amarktai-worker"
 echo "   sudo systemctl reload nginx"
 echo "4. Optional: Setup SSL with certbot"
 echo "   sudo apt install certbot python3-certbot-nginx"